@@ -0,0 +1,79 @@
+import copy
+
+class AllocationState:
+    """Snapshot of the scheduler state used to compute an allocation.
+
+    Only the fields requested by the policy (see Policy.allocation_inputs)
+    are populated; the remaining fields are None.
+
+    Attributes:
+      throughputs: Map from job combination to map from worker type to
+                   throughput.
+      scale_factors: Map from job ID to scale factor.
+      priority_weights: Map from job ID to priority weight.
+      num_steps_remaining: Map from job ID to number of steps remaining.
+      times_since_start: Map from job ID to time since the job was added.
+      cluster_spec: Map from worker type to number of workers.
+      instance_costs: Map from worker type to price per hour.
+      SLOs: Map from job ID to time remaining until its SLO.
+      job_type_throughputs: Map from job type to map from worker type to
+                            map from other job type (or None) to
+                            throughput.
+      job_id_to_job_type_key: Map from job ID to job type.
+    """
+
+    FIELDS = ('throughputs', 'scale_factors', 'priority_weights',
+              'num_steps_remaining', 'times_since_start', 'cluster_spec',
+              'instance_costs', 'SLOs', 'job_type_throughputs',
+              'job_id_to_job_type_key')
+
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for field in AllocationState.FIELDS:
+            setattr(self, field, fields.pop(field, None))
+        if len(fields) > 0:
+            raise ValueError('Unknown allocation state fields: %s' % (
+                ', '.join(sorted(fields.keys()))))
+
+    def get_inputs(self, names):
+        """Returns the values of the named fields, in order."""
+        return [getattr(self, name) for name in names]
+
+
+class ThroughputSnapshots:
+    """Copy-on-write snapshots of the scheduler's throughputs.
+
+    Keeps a private copy of every job combination's throughputs, which is
+    only refreshed for job combinations marked dirty since the previous
+    snapshot. Per-job-combination copies are replaced rather than modified,
+    so a snapshot is a shallow copy of the outer map and stays unchanged
+    after later updates.
+    """
+
+    def __init__(self):
+        self._throughputs = {}
+        self._dirty = set()
+
+    def mark_dirty(self, job_id):
+        """Records that the throughputs of job_id were added, changed, or
+        removed."""
+        self._dirty.add(job_id)
+
+    def snapshot(self, throughputs):
+        """Returns a snapshot of throughputs.
+
+        Args:
+          throughputs: The scheduler's map from job combination to map from
+                       worker type to throughput.
+        """
+        if len(self._dirty) > 0:
+            for job_id in self._dirty:
+                if job_id in throughputs:
+                    self._throughputs[job_id] = \
+                        copy.deepcopy(throughputs[job_id])
+                else:
+                    self._throughputs.pop(job_id, None)
+            self._dirty = set()
+        assert(len(self._throughputs) == len(throughputs))
+        return dict(self._throughputs)
@@ -0,0 +1,46 @@
+import collections
+
+class ArrivalQueue:
+    """Queue of job arrivals read lazily from a trace.
+
+    Arrivals are only read from the trace when the head of the queue is
+    needed, so at most one job that has not yet been popped is held in
+    memory and the trace itself can be a generator (e.g., utils.read_trace).
+    """
+
+    def __init__(self, trace):
+        """
+        Args:
+          trace: An iterable of (job, arrival_time) tuples sorted by
+                 arrival time.
+        """
+        self._trace = iter(trace)
+        self._queue = collections.deque()
+        self._last_arrival_time = None
+
+    def __len__(self):
+        self._fill()
+        return len(self._queue)
+
+    def peek(self):
+        """Returns the (arrival_time, job) tuple at the head of the queue."""
+        self._fill()
+        return self._queue[0]
+
+    def pop(self):
+        """Removes and returns the (arrival_time, job) tuple at the head of
+        the queue."""
+        self._fill()
+        return self._queue.popleft()
+
+    def _fill(self):
+        if len(self._queue) > 0:
+            return
+        try:
+            job, arrival_time = next(self._trace)
+        except StopIteration:
+            return
+        assert(self._last_arrival_time is None or
+               arrival_time >= self._last_arrival_time)
+        self._last_arrival_time = arrival_time
+        self._queue.append((arrival_time, job))
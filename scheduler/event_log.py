@@ -0,0 +1,159 @@
+import json
+import numpy as np
+import struct
+
+# Event log files start with EVENT_LOG_MAGIC, followed by the length of a
+# JSON header (a little-endian uint32) and the header itself, and then a
+# sequence of fixed-size RECORD_DTYPE records.
+EVENT_LOG_MAGIC = b'GAVELEV1'
+EVENT_LOG_VERSION = 1
+
+# Event types. The meaning of the value0 and value1 fields of each event
+# type's records is given in the comments.
+JOB_ARRIVAL = 0            # scale_factor, total_steps
+MICRO_TASK_SCHEDULED = 1   # priority, deficit (steps run in ideal mode)
+MICRO_TASK_SUCCEEDED = 2   # steps, execution_time
+MICRO_TASK_FAILED = 3      # unused
+JOB_SUCCEEDED = 4          # start_timestamp, duration
+JOB_FAILED = 5             # start_timestamp, duration
+ALLOCATION_CHANGE = 6      # fraction of time allocated on worker_type
+LEASE_EXTENSION = 7        # unused
+
+EVENT_TYPE_NAMES = {
+    JOB_ARRIVAL: 'Job arrival',
+    MICRO_TASK_SCHEDULED: 'Micro-task scheduled',
+    MICRO_TASK_SUCCEEDED: 'Micro-task succeeded',
+    MICRO_TASK_FAILED: 'Micro-task failed',
+    JOB_SUCCEEDED: 'Job succeeded',
+    JOB_FAILED: 'Job failed',
+    ALLOCATION_CHANGE: 'Allocation change',
+    LEASE_EXTENSION: 'Lease extension',
+}
+
+# Records are packed without padding. job_id is the first job of a job
+# combination and other_job_id the second (-1 for single jobs); worker_id is
+# the first of num_workers worker IDs (-1 if not applicable).
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('event_type', 'u1'),
+    ('worker_type', 'S8'),
+    ('num_workers', '<u2'),
+    ('worker_id', '<i4'),
+    ('job_id', '<i8'),
+    ('other_job_id', '<i8'),
+    ('value0', '<f8'),
+    ('value1', '<f8'),
+])
+_RECORD_STRUCT = struct.Struct('<dB8sHiqqdd')
+assert(_RECORD_STRUCT.size == RECORD_DTYPE.itemsize)
+
+_HEADER_LENGTH_STRUCT = struct.Struct('<I')
+
+class EventLog:
+    """Append-only binary log of simulator events.
+
+    Records are packed into an in-memory buffer and written to the file
+    whenever the buffer fills up, so that recording an event does not
+    format any strings or issue any I/O.
+    """
+
+    def __init__(self, event_log_file, buffer_size=1 << 20, metadata=None):
+        """
+        Args:
+          event_log_file: Path of the event log file (overwritten).
+          buffer_size: Number of bytes to buffer before writing to the file.
+          metadata: An optional JSON-serializable dict stored in the header.
+        """
+        self._f = open(event_log_file, 'wb')
+        header = {
+            'version': EVENT_LOG_VERSION,
+            'metadata': metadata,
+        }
+        header = json.dumps(header).encode()
+        self._f.write(EVENT_LOG_MAGIC)
+        self._f.write(_HEADER_LENGTH_STRUCT.pack(len(header)))
+        self._f.write(header)
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._encoded_worker_types = {None: b''}
+
+    def record(self, timestamp, event_type, job_id, worker_type=None,
+               worker_ids=None, value0=0.0, value1=0.0):
+        """Records an event.
+
+        Args:
+          timestamp: The time of the event (in seconds).
+          event_type: One of the event types defined in this module.
+          job_id: The JobIdPair of the job (combination).
+          worker_type: The worker type, or None.
+          worker_ids: A list of worker IDs, or None.
+          value0: The first event-specific value.
+          value1: The second event-specific value.
+        """
+        encoded_worker_type = self._encoded_worker_types.get(worker_type)
+        if encoded_worker_type is None:
+            encoded_worker_type = worker_type.encode()
+            self._encoded_worker_types[worker_type] = encoded_worker_type
+        if worker_ids:
+            num_workers = len(worker_ids)
+            worker_id = worker_ids[0]
+        else:
+            num_workers = 0
+            worker_id = -1
+        other_job_id = job_id[1]
+        if other_job_id is None:
+            other_job_id = -1
+        self._buffer += _RECORD_STRUCT.pack(
+            timestamp, event_type, encoded_worker_type, num_workers,
+            worker_id, job_id[0], other_job_id, value0, value1)
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        self._f.write(self._buffer)
+        self._f.flush()
+        self._buffer = bytearray()
+
+    def close(self):
+        if self._f.closed:
+            return
+        self.flush()
+        self._f.close()
+
+def is_event_log(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(EVENT_LOG_MAGIC)) == EVENT_LOG_MAGIC
+
+def read_event_log_header(event_log_file):
+    """Returns the header of an event log and the offset of its first
+    record."""
+    with open(event_log_file, 'rb') as f:
+        magic = f.read(len(EVENT_LOG_MAGIC))
+        if magic != EVENT_LOG_MAGIC:
+            raise ValueError('%s is not an event log' % (event_log_file))
+        header_length, = _HEADER_LENGTH_STRUCT.unpack(
+            f.read(_HEADER_LENGTH_STRUCT.size))
+        header = json.loads(f.read(header_length).decode())
+    if header['version'] != EVENT_LOG_VERSION:
+        raise ValueError('Unsupported event log version %d' % (
+            header['version']))
+    offset = len(EVENT_LOG_MAGIC) + _HEADER_LENGTH_STRUCT.size + header_length
+    return header, offset
+
+def read_event_log(event_log_file, event_types=None):
+    """Reads an event log into a NumPy structured array of RECORD_DTYPE
+    records, in the order they were recorded.
+
+    Args:
+      event_log_file: Path of the event log file.
+      event_types: If specified, only returns records of these event types.
+    """
+    _, offset = read_event_log_header(event_log_file)
+    # A truncated trailing record (e.g., if the simulator was killed) is
+    # ignored.
+    records = np.fromfile(event_log_file, dtype=np.uint8, offset=offset)
+    num_records = len(records) // RECORD_DTYPE.itemsize
+    records = records[:num_records * RECORD_DTYPE.itemsize].view(RECORD_DTYPE)
+    if event_types is not None:
+        records = records[np.isin(records['event_type'], list(event_types))]
+    return records
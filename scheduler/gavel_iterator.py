@@ -1,10 +1,14 @@
 import atexit
+from concurrent import futures
+import copy
 import datetime
+import fcntl
 from filelock import FileLock
 import json
 from collections.abc import Iterable
 import logging
 import os
+import threading
 import time
 import torch
 import traceback
@@ -18,13 +22,20 @@ logging.getLogger('filelock').setLevel(logging.CRITICAL)
 
 INFINITY = (1e9)
 LEASE_UPDATE_FRACTION = 0.75
+# Background lease updates are requested this many times the expected lease
+# update latency ahead of the lease update point.
+LEASE_UPDATE_LATENCY_MARGIN = 2.0
+# Weight of the latest latency in the moving average of lease update latencies.
+LEASE_UPDATE_LATENCY_EMA_ALPHA = 0.5
 LOG_FORMAT = '[{asctime}] [{event}] [{status}] {message}'
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
 class GavelIterator:
     def __init__(self, data_loader, checkpoint_dir, load_checkpoint_func,
                  save_checkpoint_func, synthetic_data=False,
-                 write_on_close=True, verbose=True):
+                 write_on_close=True, verbose=True, gang_lease_updates=False,
+                 background_lease_updates=True,
+                 asynchronous_checkpointing=False):
         if not isinstance(data_loader, Iterable):
             raise ValueError('Data is of uniterable '
                              'type %s' % (type(data_loader)))
@@ -38,6 +49,15 @@ class GavelIterator:
         self._verbose = verbose
         self._load_checkpoint_func = load_checkpoint_func
         self._save_checkpoint_func = save_checkpoint_func
+        # If set, save_checkpoint copies the checkpoint's tensors to (pinned)
+        # CPU memory and returns, and the checkpoint is written on a
+        # background thread. Two sets of buffers are used so that a
+        # checkpoint can be copied while the previous one is being written.
+        # The last checkpoint of a lease is written by a detached process
+        # instead, so that the lease can end without waiting for the write.
+        self._asynchronous_checkpointing = asynchronous_checkpointing
+        if self._asynchronous_checkpointing:
+            self._init_checkpoint_writes()
         self._job_id = int(os.environ['GAVEL_JOB_ID'])
         self._worker_id = int(os.environ['GAVEL_WORKER_ID'])
         self._round_id = int(os.environ['GAVEL_ROUND_ID'])
@@ -46,6 +66,13 @@ class GavelIterator:
         self._lock_file = os.path.join(checkpoint_dir, '.gavel.lock')
         self._lock = FileLock(self._lock_file)
         self._gavel_dir = os.path.join(checkpoint_dir, '.gavel')
+        # Held by the detached process writing the last checkpoint of a
+        # lease until the checkpoint is written, and by load_checkpoint.
+        self._checkpoint_lock_file = \
+            os.path.join(self._gavel_dir, 'checkpoint.lock')
+        # Records the error of a failed detached checkpoint write.
+        self._checkpoint_error_file = \
+            os.path.join(self._gavel_dir, 'checkpoint.error')
         self._round_dir = \
             os.path.join(self._gavel_dir, 'round={0}'.format(self._round_id))
         self._worker_dir = \
@@ -57,6 +84,12 @@ class GavelIterator:
                 os.mkdir(self._round_dir)
         self._log_file = os.path.join(self._round_dir,
                                       'worker={0}.log'.format(self._worker_id))
+        # If set, the first of a distributed job's workers to need a new
+        # lease renews the lease of all workers with a single RPC, and
+        # shares it with the other workers through the round directory.
+        self._gang_lease_updates = gang_lease_updates
+        self._gang_lease_file = os.path.join(self._round_dir, 'lease.json')
+        self._num_gang_lease_updates = 0
         self._init_logger()
         self._rpc_client = \
             iterator_client.IteratorRpcClient(self._job_id, self._worker_id,
@@ -70,10 +103,46 @@ class GavelIterator:
         if self._synthetic_data:
             self._initial_val = None
         self._lease = Lease(0, 0)
-        self._update_lease(init=True)
+        # The steps and duration at which to request the next lease update.
+        self._lease_update_point = (0, 0)
+        self._lease_update_latency = None
+        # If set, lease updates are requested on a background thread (ahead
+        # of the lease update point, by the expected lease update latency),
+        # so that iteration does not block on the scheduler.
+        self._background_lease_updates = background_lease_updates
+        self._lease_update_cv = threading.Condition()
+        self._lease_update_request = None
+        # The exception raised by the last background lease update, if any,
+        # which is re-raised by __next__.
+        self._lease_update_error = None
+        self._update_lease(0, 0, init=True)
+        if self._background_lease_updates:
+            self._start_lease_update_thread()
         self._write_info()
         self._prev_time = None
 
+    def __getstate__(self):
+        # Threads, locks, and the checkpoint executor cannot be pickled
+        # (e.g., to hand the iterator to a training process), so they are
+        # recreated when the iterator is unpickled.
+        if self._asynchronous_checkpointing:
+            self._wait_for_checkpoint_writes()
+        state = self.__dict__.copy()
+        for attr in ['_lock', '_lease_update_cv', '_lease_update_thread',
+                     '_checkpoint_executor', '_checkpoint_buffers',
+                     '_checkpoint_writes']:
+            state.pop(attr, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = FileLock(self._lock_file)
+        self._lease_update_cv = threading.Condition()
+        if self._background_lease_updates:
+            self._start_lease_update_thread()
+        if self._asynchronous_checkpointing:
+            self._init_checkpoint_writes()
+
     def __iter__(self):
         self._iterator = iter(self._data_loader)
         return self
@@ -88,19 +157,31 @@ class GavelIterator:
         self._prev_time = cur_time
 
         # Update the lease if necessary.
-        if (self._steps_until_next_lease_update <= 0 or
-            self._time_until_next_lease_update <= 0):
-            self._update_lease()
+        (lease_update_steps, lease_update_duration) = self._lease_update_point
+        if (self._steps >= lease_update_steps or
+            self._duration >= lease_update_duration):
+            if self._background_lease_updates:
+                if self._lease_update_request is None:
+                    self._request_lease_update()
+            else:
+                self._update_lease(self._steps, self._duration)
 
         # Check if the lease has expired.
-        lease_expired = (self._duration >= self._lease.max_duration or
-                         self._steps >= self._lease.max_steps)
+        lease = self._lease
+        lease_expired = (self._duration >= lease.max_duration or
+                         self._steps >= lease.max_steps)
+        if lease_expired and self._lease_update_request is not None:
+            # Wait for the pending lease update instead of stopping early.
+            self._wait_for_lease_update()
+            lease = self._lease
+            lease_expired = (self._duration >= lease.max_duration or
+                             self._steps >= lease.max_steps)
         if lease_expired:
             self._done = True
             self._logger.info(
                 '{0} / {1} steps, {2:.4f} / {3:.4f} seconds'.format(
-                    self._steps, self._lease.max_steps,
-                    self._duration, self._lease.max_duration),
+                    self._steps, lease.max_steps,
+                    self._duration, lease.max_duration),
                 extra={'event': 'LEASE', 'status': 'EXPIRED'})
             if torch.distributed.is_initialized():
                 torch.distributed.barrier()
@@ -122,9 +203,6 @@ class GavelIterator:
         if self._synthetic_data and self._steps % len(self._data_loader) == 0:
             raise StopIteration
 
-        self._steps_until_next_lease_update -= 1
-        self._time_until_next_lease_update -= elapsed_time
-
         return val
 
     def __len__(self):
@@ -143,19 +221,229 @@ class GavelIterator:
     def load_checkpoint(self, *args, **kwargs):
         self._logger.info('', extra={'event': 'LOAD CHECKPOINT',
                                      'status': 'BEGIN'})
-        checkpoint = self._load_checkpoint_func(*args, **kwargs)
+        start_time = time.time()
+        if self._asynchronous_checkpointing:
+            self._wait_for_checkpoint_writes()
+        # Wait for the last checkpoint of the previous lease to be written.
+        lock_fd = self._lock_checkpoint()
+        try:
+            self._raise_checkpoint_error()
+            checkpoint = self._load_checkpoint_func(*args, **kwargs)
+        finally:
+            os.close(lock_fd)
+        self._logger.info('{0:.6f}'.format(time.time() - start_time),
+                          extra={'event': 'LOAD CHECKPOINT',
+                                 'status': 'DURATION'})
         self._logger.info('', extra={'event': 'LOAD CHECKPOINT',
                                      'status': 'END'})
         return checkpoint
 
     def save_checkpoint(self, *args, **kwargs):
+        """Saves a checkpoint using save_checkpoint_func.
+
+        With asynchronous checkpointing, the tensors in the arguments
+        (including those nested in dicts, lists, and tuples) are copied, and
+        save_checkpoint_func is called with the copies on a background
+        thread. If exactly one argument is a string, it is taken to be the
+        checkpoint path: the checkpoint is written to a temporary file that
+        is then renamed, so that a partially written checkpoint is never
+        loaded. Returns a Future for the write in this case; if an earlier
+        write failed, its exception is raised by the next save_checkpoint or
+        load_checkpoint call (or at exit) instead.
+
+        Once the lease has expired (or the job has completed), the checkpoint
+        is instead written by a detached process, so that this process can
+        exit without waiting for the write. The next load_checkpoint call
+        (e.g., in the job's next lease) waits for the write, and raises its
+        exception if it failed. Returns None in this case.
+        """
         self._logger.info('', extra={'event': 'SAVE CHECKPOINT',
                                      'status': 'BEGIN'})
-        retval = self._save_checkpoint_func(*args, **kwargs)
+        start_time = time.time()
+        if self._asynchronous_checkpointing and self._done:
+            self._wait_for_checkpoint_writes()
+            # The child process cannot use CUDA (or pinned memory), so the
+            # tensors are copied to new, pageable buffers.
+            (args, kwargs) = self._copy_to_buffers(
+                (args, kwargs), {}, (), pin_memory=False)
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            retval = self._write_checkpoint_detached(args, kwargs)
+        elif self._asynchronous_checkpointing:
+            buffer_id = self._checkpoint_buffer_id
+            self._checkpoint_buffer_id = 1 - buffer_id
+            # Raise the exception of the previous write if it failed, and
+            # wait until the buffers are no longer being written.
+            self._wait_for_checkpoint_write(1 - buffer_id, wait=False)
+            self._wait_for_checkpoint_write(buffer_id)
+            (args, kwargs) = self._copy_to_buffers(
+                (args, kwargs), self._checkpoint_buffers[buffer_id], ())
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            retval = self._checkpoint_executor.submit(
+                self._write_checkpoint, args, kwargs)
+            self._checkpoint_writes[buffer_id] = retval
+        else:
+            retval = self._save_checkpoint_func(*args, **kwargs)
+        self._logger.info('{0:.6f}'.format(time.time() - start_time),
+                          extra={'event': 'SAVE CHECKPOINT',
+                                 'status': 'DURATION'})
         self._logger.info('', extra={'event': 'SAVE CHECKPOINT',
                                      'status': 'END'})
         return retval
 
+    def _copy_to_buffers(self, obj, buffers, key, pin_memory=True):
+        """Returns a copy of obj whose tensors are copied to CPU buffers.
+
+        Args:
+          obj: The object to copy. Only tensors, dicts, lists, and tuples
+               are copied; other objects are returned as is.
+          buffers: Map from the key of each tensor to its buffer, reused
+                   across checkpoints.
+          key: The key of obj, i.e., the path to obj from the arguments.
+          pin_memory: Whether to pin new buffers if CUDA is available.
+        """
+        if isinstance(obj, torch.Tensor):
+            buffer = buffers.get(key)
+            if (buffer is None or buffer.shape != obj.shape or
+                buffer.dtype != obj.dtype):
+                buffer = torch.empty(
+                    obj.shape, dtype=obj.dtype,
+                    pin_memory=(pin_memory and torch.cuda.is_available()))
+                buffers[key] = buffer
+            buffer.copy_(obj.detach(), non_blocking=True)
+            return buffer
+        elif isinstance(obj, dict):
+            # Shallow copies preserve the type and attributes of the dict
+            # (e.g., the metadata of state_dicts).
+            obj_copy = copy.copy(obj)
+            for (k, v) in obj.items():
+                obj_copy[k] = self._copy_to_buffers(v, buffers, key + (k,),
+                                                    pin_memory=pin_memory)
+            return obj_copy
+        elif isinstance(obj, (list, tuple)):
+            obj_copy = [self._copy_to_buffers(v, buffers, key + (i,),
+                                              pin_memory=pin_memory)
+                        for (i, v) in enumerate(obj)]
+            if isinstance(obj, list):
+                return obj_copy
+            elif hasattr(obj, '_fields'):
+                return obj.__class__(*obj_copy)
+            return tuple(obj_copy)
+        return obj
+
+    def _write_checkpoint(self, args, kwargs):
+        start_time = time.time()
+        paths = [(i, arg) for (i, arg) in enumerate(args)
+                 if isinstance(arg, str)]
+        paths += [(k, arg) for (k, arg) in kwargs.items()
+                  if isinstance(arg, str)]
+        tmp_checkpoint_path = None
+        try:
+            if len(paths) == 1:
+                (key, checkpoint_path) = paths[0]
+                tmp_checkpoint_path = '{0}.tmp'.format(checkpoint_path)
+                if isinstance(key, int):
+                    args = args[:key] + (tmp_checkpoint_path,) + args[key+1:]
+                else:
+                    kwargs = dict(kwargs)
+                    kwargs[key] = tmp_checkpoint_path
+                self._save_checkpoint_func(*args, **kwargs)
+                os.replace(tmp_checkpoint_path, checkpoint_path)
+            else:
+                self._save_checkpoint_func(*args, **kwargs)
+        except Exception as e:
+            self._logger.error('{0}'.format(traceback.format_exc()),
+                               extra={'event': 'SAVE CHECKPOINT',
+                                      'status': 'ERROR'})
+            # Never leave a partially written checkpoint behind. The
+            # exception is raised by the Future's result(), i.e., by the
+            # next save_checkpoint or load_checkpoint call, or at exit.
+            if (tmp_checkpoint_path is not None and
+                os.path.exists(tmp_checkpoint_path)):
+                os.remove(tmp_checkpoint_path)
+            raise
+        self._logger.info('{0:.6f}'.format(time.time() - start_time),
+                          extra={'event': 'SAVE CHECKPOINT',
+                                 'status': 'WRITTEN'})
+
+    def _write_checkpoint_detached(self, args, kwargs):
+        """Writes a checkpoint in a detached grandchild process.
+
+        The grandchild holds the checkpoint lock until the checkpoint is
+        written, and records any error in the checkpoint error file. It is
+        in its own session, with its standard streams closed, so that the
+        dispatcher does not wait for it.
+        """
+        lock_fd = self._lock_checkpoint()
+        try:
+            self._raise_checkpoint_error()
+            pid = os.fork()
+            if pid == 0:
+                exit_code = 1
+                try:
+                    os.setsid()
+                    if os.fork() == 0:
+                        devnull = os.open(os.devnull, os.O_RDWR)
+                        for fd in range(3):
+                            os.dup2(devnull, fd)
+                        try:
+                            self._write_checkpoint(args, kwargs)
+                        except Exception:
+                            with open(self._checkpoint_error_file, 'w') as f:
+                                f.write(traceback.format_exc())
+                            os._exit(1)
+                    exit_code = 0
+                finally:
+                    os._exit(exit_code)
+            os.waitpid(pid, 0)
+        finally:
+            # The grandchild holds the lock until the checkpoint is written.
+            os.close(lock_fd)
+
+    def _lock_checkpoint(self):
+        """Waits for the checkpoint lock and returns a file descriptor that
+        holds it until closed."""
+        lock_fd = os.open(self._checkpoint_lock_file, os.O_RDWR | os.O_CREAT)
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        return lock_fd
+
+    def _raise_checkpoint_error(self):
+        # Requires the checkpoint lock to be held.
+        if os.path.exists(self._checkpoint_error_file):
+            with open(self._checkpoint_error_file, 'r') as f:
+                error = f.read()
+            os.remove(self._checkpoint_error_file)
+            raise RuntimeError('Checkpoint write failed:\n{0}'.format(error))
+
+    def _init_checkpoint_writes(self):
+        self._checkpoint_executor = futures.ThreadPoolExecutor(max_workers=1)
+        self._checkpoint_buffers = [{}, {}]
+        self._checkpoint_writes = [None, None]
+        self._checkpoint_buffer_id = 0
+        atexit.register(self._wait_for_checkpoint_writes)
+
+    def _wait_for_checkpoint_write(self, buffer_id, wait=True):
+        """Waits for the write from the given buffers, raising its exception
+        if it failed.
+
+        Args:
+          buffer_id: The ID of the buffers.
+          wait: If False, returns immediately if the write is still running.
+        """
+        checkpoint_write = self._checkpoint_writes[buffer_id]
+        if checkpoint_write is None:
+            return
+        elif not wait and not checkpoint_write.done():
+            return
+        # Each exception is only raised once.
+        self._checkpoint_writes[buffer_id] = None
+        checkpoint_write.result()
+
+    def _wait_for_checkpoint_writes(self):
+        for buffer_id in range(len(self._checkpoint_writes)):
+            self._wait_for_checkpoint_write(buffer_id)
+
     def _init_logger(self):
         self._logger = logging.getLogger('gavel_iterator')
         self._logger.propagate = False
@@ -176,62 +464,161 @@ class GavelIterator:
         self._logger.removeHandler(self._file_handler)
         self._file_handler.close()
 
-    def _update_lease(self, init=False):
+    def _start_lease_update_thread(self):
+        self._lease_update_thread = \
+            threading.Thread(target=self._lease_update_loop)
+        self._lease_update_thread.daemon = True
+        self._lease_update_thread.start()
+
+    def _request_lease_update(self):
+        with self._lease_update_cv:
+            self._raise_lease_update_error()
+            if self._lease_update_request is None:
+                self._lease_update_request = (self._steps, self._duration)
+                self._lease_update_cv.notify_all()
+
+    def _wait_for_lease_update(self):
+        with self._lease_update_cv:
+            while self._lease_update_request is not None:
+                self._lease_update_cv.wait()
+            self._raise_lease_update_error()
+
+    def _raise_lease_update_error(self):
+        # Requires self._lease_update_cv to be held.
+        if self._lease_update_error is not None:
+            error = self._lease_update_error
+            self._lease_update_error = None
+            raise error
+
+    def _lease_update_loop(self):
+        while True:
+            with self._lease_update_cv:
+                while self._lease_update_request is None:
+                    self._lease_update_cv.wait()
+                (steps, duration) = self._lease_update_request
+            try:
+                self._update_lease(steps, duration)
+            except Exception as e:
+                self._logger.error('{0}'.format(traceback.format_exc()),
+                                   extra={'event': 'LEASE',
+                                          'status': 'ERROR'})
+                with self._lease_update_cv:
+                    self._lease_update_error = e
+            finally:
+                with self._lease_update_cv:
+                    self._lease_update_request = None
+                    self._lease_update_cv.notify_all()
+
+    def _update_lease(self, steps, duration, init=False):
+        lease = self._lease
+        start_time = time.time()
         if init:
             (updated_max_steps, updated_max_duration, extra_time) = \
                 self._rpc_client.init()
+        elif self._gang_lease_updates:
+            (updated_max_steps, updated_max_duration) = \
+                self._update_gang_lease(steps, duration, lease)
+            extra_time = 0
         else:
             (updated_max_steps, updated_max_duration) = \
-                self._rpc_client.update_lease(self._steps,
-                                              self._duration,
-                                              self._lease.max_steps,
-                                              self._lease.max_duration)
+                self._rpc_client.update_lease(steps,
+                                              duration,
+                                              lease.max_steps,
+                                              lease.max_duration)
             extra_time = 0
+        latency = time.time() - start_time
+        self._logger.info('{0:.6f}'.format(latency),
+                          extra={'event': 'LEASE', 'status': 'LATENCY'})
+        if self._lease_update_latency is None:
+            self._lease_update_latency = latency
+        else:
+            self._lease_update_latency = \
+                (LEASE_UPDATE_LATENCY_EMA_ALPHA * latency +
+                 (1 - LEASE_UPDATE_LATENCY_EMA_ALPHA) *
+                 self._lease_update_latency)
+
         # Update when the next lease update will be. If the lease max steps or
         # max duration has not increased, then assume this will be the final
         # max steps or max duration.
-        if updated_max_steps == self._lease.max_steps:
-            self._steps_until_next_lease_update = INFINITY
+        if updated_max_steps == lease.max_steps:
+            lease_update_steps = INFINITY
         else:
-            additional_lease_steps = \
-                updated_max_steps - self._lease.max_steps
-            steps_left_on_current_lease = \
-                self._lease.max_steps - self._steps
-            self._steps_until_next_lease_update = \
-                (steps_left_on_current_lease +
+            additional_lease_steps = updated_max_steps - lease.max_steps
+            lease_update_steps = \
+                (lease.max_steps +
                  additional_lease_steps * LEASE_UPDATE_FRACTION)
 
-        if updated_max_duration <= self._lease.max_duration:
-            self._time_until_next_lease_update = INFINITY
+        if updated_max_duration <= lease.max_duration:
+            lease_update_duration = INFINITY
         else:
             additional_lease_time = \
-                updated_max_duration - self._lease.max_duration
-            time_left_on_current_lease = \
-                self._lease.max_duration - self._duration
-            self._time_until_next_lease_update = \
-                (time_left_on_current_lease +
+                updated_max_duration - lease.max_duration
+            lease_update_duration = \
+                (lease.max_duration +
                  additional_lease_time * LEASE_UPDATE_FRACTION +
                  extra_time)
             self._logger.debug('Progress: steps={0}, duration={1}'.format(
-                self._steps, self._duration),
+                steps, duration),
                 extra={'event': 'LEASE', 'status': 'DEBUG'})
             self._logger.debug(
                     'Current lease: max_steps={0}, max_duration={1}'.format(
-                        self._lease.max_steps, self._lease.max_duration),
+                        lease.max_steps, lease.max_duration),
                     extra={'event': 'LEASE', 'status': 'DEBUG'})
             self._logger.debug(
                 'New lease: max_steps={0}, max_duration={1}, '
                 'extra_time={2}'.format(
                     updated_max_steps, updated_max_duration, extra_time),
                 extra={'event': 'LEASE', 'status': 'DEBUG'})
-            self._logger.debug('Steps until next lease update={0}'.format(
-                self._steps_until_next_lease_update),
+            self._logger.debug('Next lease update at steps={0}'.format(
+                lease_update_steps),
                 extra={'event': 'LEASE', 'status': 'DEBUG'})
-            self._logger.debug('Time until next lease update={0}'.format(
-                self._time_until_next_lease_update),
+            self._logger.debug('Next lease update at duration={0}'.format(
+                lease_update_duration),
                 extra={'event': 'LEASE', 'status': 'DEBUG'})
 
+        if self._background_lease_updates:
+            # Request the next update early enough that it is expected to
+            # complete before the lease update point.
+            lookahead_time = \
+                LEASE_UPDATE_LATENCY_MARGIN * self._lease_update_latency
+            lease_update_duration -= lookahead_time
+            if duration > 0:
+                lease_update_steps -= lookahead_time * steps / duration
 
-        # Update the lease.
-        self._lease.max_steps = updated_max_steps
-        self._lease.max_duration = updated_max_duration + extra_time
+        # Update the lease. The lease is replaced rather than modified so
+        # that it is never observed partially updated.
+        self._lease = Lease(updated_max_steps,
+                            updated_max_duration + extra_time)
+        self._lease_update_point = (lease_update_steps, lease_update_duration)
+
+    def _update_gang_lease(self, steps, duration, lease):
+        with self._lock:
+            gang_lease = None
+            if os.path.exists(self._gang_lease_file):
+                with open(self._gang_lease_file, 'r') as f:
+                    gang_lease = json.load(f)
+            if (gang_lease is not None and
+                gang_lease['update_id'] > self._num_gang_lease_updates):
+                self._logger.debug(
+                    'Using lease renewed by worker {0}'.format(
+                        gang_lease['worker_id']),
+                    extra={'event': 'LEASE', 'status': 'DEBUG'})
+            else:
+                (max_steps, max_duration) = \
+                    self._rpc_client.update_lease(steps,
+                                                  duration,
+                                                  lease.max_steps,
+                                                  lease.max_duration,
+                                                  gang=True)
+                gang_lease = {
+                    'update_id': self._num_gang_lease_updates + 1,
+                    'worker_id': self._worker_id,
+                    'max_steps': max_steps,
+                    'max_duration': max_duration,
+                }
+                tmp_file = '{0}.tmp'.format(self._gang_lease_file)
+                with open(tmp_file, 'w') as f:
+                    json.dump(gang_lease, f)
+                os.replace(tmp_file, self._gang_lease_file)
+        self._num_gang_lease_updates = gang_lease['update_id']
+        return (gang_lease['max_steps'], gang_lease['max_duration'])
@@ -1,40 +1,56 @@
-import hashlib
+import weakref
 
 class JobIdPair():
+    """Immutable ID of a single job or of a pair of co-located jobs.
 
-    def __init__(self, job0, job1):
+    Only the job IDs and the hash value are stored; the singletons, tuple,
+    set and string forms are computed on demand. Single job IDs are
+    interned, so constructing the ID of a job returns the existing instance
+    and every job pair shares the IDs of its jobs. Single job IDs are only
+    interned while they are referenced elsewhere. Instances must not be
+    modified.
+    """
+
+    __slots__ = ('_job0', '_job1', '_hash_value', '_singletons',
+                 '__weakref__')
+
+    # Map from job ID to the interned single job JobIdPair.
+    _singles = weakref.WeakValueDictionary()
+
+    def __new__(cls, job0, job1):
         if job0 is None and job1 is None:
             raise ValueError('Cannot form JobIdPair with both ids None')
         elif job0 is None and job1 is not None:
             raise ValueError('First job id in a JobIdPair cannot be None')
-        elif job0 is not None and job1 is not None:
-            self._job0 = min(job0, job1)
-            self._job1 = max(job0, job1)
-        else:
-            self._job0 = job0
-            self._job1 = None
+        elif job1 is None:
+            job_id = cls._singles.get(job0)
+            if job_id is None:
+                job_id = object.__new__(cls)
+                job_id._job0 = job0
+                job_id._job1 = None
+                job_id._hash_value = job0
+                job_id._singletons = None
+                cls._singles[job0] = job_id
+            return job_id
+        elif job1 < job0:
+            job0, job1 = job1, job0
 
-        a = self._job0
-        b = self._job1
-        if b is None:
-            self._hash_value = a
-        else:
-            self._hash_value = a * a + a + b if a > b else a + b * b
+        job_id = object.__new__(cls)
+        job_id._job0 = job0
+        job_id._job1 = job1
+        job_id._hash_value = job0 + job1 * job1
+        job_id._singletons = None
+        return job_id
 
-        self._is_pair = self._job0 is not None and self._job1 is not None
-        self._as_tuple = (self._job0, self._job1)
-        if self._job1 is None:
-            self._singletons = (self,)
-        else:
-            self._singletons = (JobIdPair(self._job0, None),
-                                JobIdPair(self._job1, None))
-    
-        self._as_set = set([self._job0, self._job1])
+    def __reduce__(self):
+        # Unpickled single job IDs are re-interned.
+        return (JobIdPair, (self._job0, self._job1))
 
-        if self._job1 is None:
-            self._repr = '%d' % (self._job0)
-        else:
-            self._repr = '(%d, %d)' % (self._job0, self._job1)
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __getitem__(self, index):
         if index == 0:
@@ -56,28 +72,40 @@ class JobIdPair():
         return self._job0 < other._job0
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return self._job0 == other._job0 and self._job1 == other._job1
 
     def __hash__(self):
         return self._hash_value
 
     def __repr__(self):
-        return self._repr
-    
+        if self._job1 is None:
+            return '%d' % (self._job0)
+        else:
+            return '(%d, %d)' % (self._job0, self._job1)
+
     def as_tuple(self):
-        return self._as_tuple
+        return (self._job0, self._job1)
 
     def as_set(self):
-        return self._as_set
+        return set([self._job0, self._job1])
 
     def overlaps_with(self, other):
-        if self._is_pair:
+        if self._job1 is not None:
             raise ValueError('Can only call overlaps_with on a '
                              'single job id')
-        return self._job0 in other._as_set
+        return self._job0 == other._job0 or self._job0 == other._job1
 
     def is_pair(self):
-        return self._is_pair
+        return self._job1 is not None
 
     def singletons(self):
-        return self._singletons
+        if self._job1 is None:
+            return (self,)
+        singletons = self._singletons
+        if singletons is None:
+            singletons = (JobIdPair(self._job0, None),
+                          JobIdPair(self._job1, None))
+            self._singletons = singletons
+        return singletons
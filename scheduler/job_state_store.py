@@ -0,0 +1,220 @@
+import collections.abc
+import numpy as np
+
+# Number of slots to allocate when the store is first created.
+INITIAL_CAPACITY = 64
+
+class _JobTimeView(collections.abc.Mapping):
+    """Read-only map from job combination to map from worker type to time
+    received since the last reset."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, job_id):
+        return self._store._get_job_times(job_id)
+
+    def __iter__(self):
+        return iter(self._store._slots)
+
+    def __len__(self):
+        return len(self._store._slots)
+
+class JobStateStore:
+    """Columnar store of per-job-combination round-based scheduling state.
+
+    Every job combination is assigned a slot in a dense index, and freed
+    slots are reused by later job combinations. For each worker type, the
+    store keeps NumPy columns with the time the job combination has
+    received since the last reset and its accumulated deficit, so that a
+    reset updates every job combination with a few array expressions.
+    Columns are laid out as 2-D arrays indexed by worker type and slot.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._capacity = capacity
+        # Map from job combination to slot.
+        self._slots = {}
+        # Map from slot to job combination (None for free slots).
+        self._job_ids = [None] * capacity
+        self._free_slots = list(range(capacity - 1, -1, -1))
+        # Number of slots ever handed out; slots beyond this are untouched.
+        self._num_slots = 0
+        self._worker_types = []
+        self._worker_type_indices = {}
+        self._job_time = np.zeros((0, capacity), dtype=np.float64)
+        self._has_job_time = np.zeros((0, capacity), dtype=bool)
+        self._deficit = np.zeros((0, capacity), dtype=np.float64)
+        self._job_time_view = _JobTimeView(self)
+
+    def __contains__(self, job_id):
+        return job_id in self._slots
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def worker_types(self):
+        return self._worker_types
+
+    @property
+    def job_time_so_far(self):
+        """Read-only map from job combination to map from worker type to
+        time received since the last reset."""
+        return self._job_time_view
+
+    def add_worker_type(self, worker_type):
+        """Adds columns for worker_type; existing job combinations have no
+        time recorded and no deficit on it."""
+        if worker_type in self._worker_type_indices:
+            return
+        self._worker_type_indices[worker_type] = len(self._worker_types)
+        self._worker_types.append(worker_type)
+        self._job_time = np.vstack(
+            [self._job_time, np.zeros((1, self._capacity))])
+        self._has_job_time = np.vstack(
+            [self._has_job_time, np.zeros((1, self._capacity), dtype=bool)])
+        self._deficit = np.vstack(
+            [self._deficit, np.zeros((1, self._capacity))])
+
+    def add(self, job_ids, job_time=None):
+        """Assigns slots to job_ids.
+
+        Args:
+          job_ids: The job combinations to add.
+          job_time: If not None, the initial time received on every worker
+                    type; otherwise no time is recorded.
+        """
+        slots = []
+        for job_id in job_ids:
+            assert(job_id not in self._slots)
+            if len(self._free_slots) == 0:
+                self._grow()
+            slot = self._free_slots.pop()
+            self._slots[job_id] = slot
+            self._job_ids[slot] = job_id
+            self._num_slots = max(self._num_slots, slot + 1)
+            slots.append(slot)
+        self._deficit[:, slots] = 0.0
+        if job_time is None:
+            self._job_time[:, slots] = 0.0
+            self._has_job_time[:, slots] = False
+        else:
+            self._job_time[:, slots] = job_time
+            self._has_job_time[:, slots] = True
+
+    def remove(self, job_ids):
+        """Releases the slots assigned to job_ids."""
+        for job_id in job_ids:
+            slot = self._slots.pop(job_id)
+            self._job_ids[slot] = None
+            self._free_slots.append(slot)
+
+    def set_job_time(self, job_id, worker_type, job_time):
+        i = self._worker_type_indices[worker_type]
+        slot = self._slots[job_id]
+        self._job_time[i, slot] = job_time
+        self._has_job_time[i, slot] = True
+
+    def add_job_time(self, job_id, worker_type, elapsed_time):
+        i = self._worker_type_indices[worker_type]
+        slot = self._slots[job_id]
+        assert(self._has_job_time[i, slot])
+        self._job_time[i, slot] += elapsed_time
+
+    def get_deficit(self, job_id, worker_type):
+        i = self._worker_type_indices[worker_type]
+        return float(self._deficit[i, self._slots[job_id]])
+
+    def set_deficit(self, job_id, worker_type, deficit):
+        i = self._worker_type_indices[worker_type]
+        self._deficit[i, self._slots[job_id]] = deficit
+
+    def get_deficit_column(self, worker_type):
+        """Returns the deficits on worker_type as a list indexed by slot, and
+        the map from job combination to slot.
+
+        Cheaper than get_deficits for looking up the deficits of many job
+        combinations, since no per-job map is built. The map must not be
+        modified.
+        """
+        i = self._worker_type_indices[worker_type]
+        return (self._deficit[i, :self._num_slots].tolist(), self._slots)
+
+    def get_deficits(self, worker_type=None):
+        """Returns a map from job combination to deficit on worker_type, or
+        a map from worker type to such maps if worker_type is None."""
+        if worker_type is None:
+            return {
+                worker_type: self.get_deficits(worker_type)
+                for worker_type in self._worker_types
+            }
+        i = self._worker_type_indices[worker_type]
+        deficits = self._deficit[i, :self._num_slots].tolist()
+        return {job_id: deficits[slot] for job_id, slot in self._slots.items()}
+
+    def reset(self, allocation, elapsed_time, job_time):
+        """Adds the difference between the time each job combination should
+        have received and the time it actually received since the last
+        reset to its deficit, and resets the time received.
+
+        Args:
+          allocation: Map from job combination to map from worker type to
+                      fraction of time allocated.
+          elapsed_time: Time elapsed since the last reset.
+          job_time: The time received by every job combination after the
+                    reset. The same amount is treated as not received when
+                    computing deficits.
+        """
+        n = self._num_slots
+        allocations = np.zeros((len(self._worker_types), n),
+                               dtype=np.float64)
+        for job_id, slot in self._slots.items():
+            if job_id in allocation:
+                job_allocation = allocation[job_id]
+                allocations[:, slot] = [
+                    job_allocation[worker_type]
+                    for worker_type in self._worker_types
+                ]
+        time_received = np.where(self._has_job_time[:, :n],
+                                 self._job_time[:, :n] - job_time, 0.0)
+        self._deficit[:, :n] += allocations * elapsed_time - time_received
+        self._job_time[:, :n] = job_time
+        self._has_job_time[:, :n] = True
+
+    def load(self, job_time_so_far, deficits):
+        """Populates an empty store from the per-job maps of time received
+        since the last reset and per-worker-type maps of deficits."""
+        assert(len(self._slots) == 0)
+        for worker_type in deficits:
+            self.add_worker_type(worker_type)
+        self.add(job_time_so_far.keys())
+        for job_id in job_time_so_far:
+            for worker_type, job_time in job_time_so_far[job_id].items():
+                self.set_job_time(job_id, worker_type, job_time)
+        for worker_type in deficits:
+            for job_id, deficit in deficits[worker_type].items():
+                if job_id in self._slots:
+                    self.set_deficit(job_id, worker_type, deficit)
+
+    def _get_job_times(self, job_id):
+        slot = self._slots[job_id]
+        job_times = {}
+        for i, worker_type in enumerate(self._worker_types):
+            if self._has_job_time[i, slot]:
+                job_times[worker_type] = float(self._job_time[i, slot])
+        return job_times
+
+    def _grow(self):
+        new_capacity = 2 * self._capacity
+        self._job_ids += [None] * (new_capacity - self._capacity)
+        self._free_slots = \
+            list(range(new_capacity - 1, self._capacity - 1, -1)) + \
+            self._free_slots
+        for name in ['_job_time', '_has_job_time', '_deficit']:
+            column = getattr(self, name)
+            new_column = np.zeros((column.shape[0], new_capacity),
+                                  dtype=column.dtype)
+            new_column[:, :self._capacity] = column
+            setattr(self, name, new_column)
+        self._capacity = new_capacity
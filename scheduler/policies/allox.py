@@ -9,6 +9,10 @@ from scipy.optimize import linear_sum_assignment
 from policy import Policy, PolicyWithPacking
 
 class AlloXPolicy(Policy):
+
+    allocation_inputs = ('throughputs', 'scale_factors', 'times_since_start',
+                         'num_steps_remaining', 'cluster_spec')
+
     def __init__(self, alpha=1.0):
         self._name = 'AlloX_Perf'
         self._alpha = alpha
@@ -5,11 +5,15 @@ import copy
 import cvxpy as cp
 import numpy as np
 
-from policy import Policy, PolicyWithPacking
+from policy import Policy, PolicyWithPacking, ProblemTemplate, pad_rows
 from isolated import IsolatedPolicy
 
 class FinishTimeFairnessPolicy(Policy):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'priority_weights',
+                         'times_since_start', 'num_steps_remaining',
+                         'cluster_spec')
+
     def __init__(self, solver):
         self._name = 'FinishTimeFairness'
         self._finish_time_fairness_perf_policy = \
@@ -42,6 +46,10 @@ class FinishTimeFairnessPolicy(Policy):
 
 class FinishTimeFairnessPolicyWithPerf(Policy):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'priority_weights',
+                         'times_since_start', 'num_steps_remaining',
+                         'cluster_spec')
+
     def __init__(self, solver):
         Policy.__init__(self, solver)
         self._name = 'FinishTimeFairness_Perf'
@@ -73,11 +81,14 @@ class FinishTimeFairnessPolicyWithPerf(Policy):
             [1. / unflattened_priority_weights[job_id]
              for job_id in job_ids])
 
-        # Create allocation variable, and isolated allocation.
-        x = cp.Variable(throughputs.shape)
+        # Compute isolated allocation.
         isolated_throughputs = self._isolated_policy.get_throughputs(
             throughputs, index, scale_factors, cluster_spec)
-        expected_time_fractions = []
+        # The expected time fraction of job i is
+        # (times_since_start[i] + num_steps_remaining[i] /
+        #  allocation_throughput[i]) / expected_time_isolated[i].
+        steps_coefficients = np.zeros(m)
+        time_coefficients = np.zeros(m)
         for i in range(len(job_ids)):
             if job_ids[i] not in self._cumulative_isolated_time:
                 self._cumulative_isolated_time[job_ids[i]] = 0
@@ -87,41 +98,83 @@ class FinishTimeFairnessPolicyWithPerf(Policy):
                     num_steps_remaining[job_ids[i]]) / \
                     self._isolated_throughputs_prev_iteration[job_ids[i]]
 
-            allocation_throughput = cp.sum(cp.multiply(throughputs[i], x[i]))
             expected_time_isolated = self._cumulative_isolated_time[job_ids[i]] + \
-                (num_steps_remaining[job_ids[i]] / isolated_throughputs[i])
-            expected_time_allocation = times_since_start[job_ids[i]] + \
-                (num_steps_remaining[job_ids[i]] * cp.inv_pos(allocation_throughput))
-            expected_time_fraction = expected_time_allocation / expected_time_isolated
-            expected_time_fractions.append(expected_time_fraction)
-        if len(expected_time_fractions) == 1:
-            objective = cp.Minimize(expected_time_fractions[0])
-        else:
-            objective = cp.Minimize(cp.maximum(*expected_time_fractions))
-
-        # Make sure that the allocation can fit in the cluster.
-        constraints = self.get_base_constraints(x, scale_factors_array)
-
-        cvxprob = cp.Problem(objective, constraints)
-        result = cvxprob.solve(solver=self._solver)
-
-        if cvxprob.status != "optimal":
+                (num_steps_remaining[job_ids[i]] / isolated_throughputs[i, 0])
+            steps_coefficients[i] = \
+                num_steps_remaining[job_ids[i]] / expected_time_isolated
+            time_coefficients[i] = \
+                times_since_start[job_ids[i]] / expected_time_isolated
+
+        padded_m, template = self.get_problem_template(
+            m, worker_types, self._build_problem_template)
+        # Padded rows have unit throughputs, no remaining steps, and a
+        # scale factor of 0, so their expected time fraction is always 0.
+        with template.lock:
+            template.solve(self._solver, {
+                'throughputs': pad_rows(throughputs, padded_m, fill=1.0),
+                'steps_coefficients': pad_rows(steps_coefficients, padded_m),
+                'time_coefficients': pad_rows(time_coefficients, padded_m),
+                'scale_factors_array': pad_rows(scale_factors_array,
+                                                padded_m),
+                'num_workers': np.array(self._num_workers),
+            })
+            status = template.problem.status
+            x = template.variables['x'].value
+            if x is not None:
+                x = x[:m]
+
+        if status != "optimal":
             print('WARNING: Allocation returned by policy not optimal!')
 
         self._num_steps_remaining_prev_iteration = copy.copy(num_steps_remaining)
         self._isolated_throughputs_prev_iteration = {}
         for i in range(m):
             self._isolated_throughputs_prev_iteration[job_ids[i]] = \
-                isolated_throughputs[i]
+                isolated_throughputs[i, 0]
 
-        if x.value is None:
+        if x is None:
             return self._isolated_policy.get_allocation(
                 unflattened_throughputs, scale_factors, cluster_spec)
-        return super().unflatten(x.value.clip(min=0.0).clip(max=1.0), index)
+        return super().unflatten(x.clip(min=0.0).clip(max=1.0), index)
+
+    def _build_problem_template(self, m, n):
+        x = cp.Variable((m, n))
+        # Lower bound on the throughput each job receives under x; needed
+        # so that inv_pos is applied to a parameter-free expression.
+        allocation_throughputs = cp.Variable(m)
+        throughputs = cp.Parameter((m, n), nonneg=True)
+        steps_coefficients = cp.Parameter(m, nonneg=True)
+        time_coefficients = cp.Parameter(m)
+        scale_factors_array = cp.Parameter((m, n), nonneg=True)
+        num_workers = cp.Parameter(n, nonneg=True)
+        objective = cp.Minimize(cp.max(
+            time_coefficients + cp.multiply(
+                steps_coefficients, cp.inv_pos(allocation_throughputs))))
+
+        # Make sure that the allocation can fit in the cluster.
+        constraints = self.get_base_constraints(x, scale_factors_array,
+                                                num_workers=num_workers)
+        constraints.append(allocation_throughputs <=
+                           cp.sum(cp.multiply(throughputs, x), axis=1))
+        return ProblemTemplate(
+            cp.Problem(objective, constraints), {'x': x},
+            {'throughputs': throughputs,
+             'steps_coefficients': steps_coefficients,
+             'time_coefficients': time_coefficients,
+             'scale_factors_array': scale_factors_array,
+             'num_workers': num_workers})
 
 
 class FinishTimeFairnessPolicyWithPacking(PolicyWithPacking):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'priority_weights',
+                         'times_since_start', 'num_steps_remaining',
+                         'cluster_spec')
+    job_type_allocation_inputs = ('job_type_throughputs',
+                                  'job_id_to_job_type_key', 'scale_factors',
+                                  'priority_weights', 'times_since_start',
+                                  'num_steps_remaining', 'cluster_spec')
+
     def __init__(self, solver):
         PolicyWithPacking.__init__(self, solver)
         self._name = 'FinishTimeFairness_Packing'
@@ -143,7 +196,7 @@ class FinishTimeFairnessPolicyWithPacking(PolicyWithPacking):
             self._num_steps_remaining_prev_iteration = {}
             return None
 
-        (m, n) = all_throughputs[0].shape
+        (_, m, n) = all_throughputs.shape
         (job_ids, single_job_ids, worker_types, relevant_combinations) = index
         x = cp.Variable((m, n))
 
@@ -164,21 +217,14 @@ class FinishTimeFairnessPolicyWithPacking(PolicyWithPacking):
             cluster_spec)
 
         single_throughputs = np.zeros((len(single_job_ids), n))
+        self._update_cumulative_isolated_time(single_job_ids,
+                                              num_steps_remaining)
         expected_time_fractions = []
         for i in range(len(all_throughputs)):
-            if single_job_ids[i] not in self._cumulative_isolated_time:
-                self._cumulative_isolated_time[single_job_ids[i]] = 0
-            if single_job_ids[i] in self._num_steps_remaining_prev_iteration:
-                self._cumulative_isolated_time[single_job_ids[i]] += (
-                    self._num_steps_remaining_prev_iteration[single_job_ids[i]] -
-                    num_steps_remaining[single_job_ids[i]]) / \
-                    self._isolated_throughputs_prev_iteration[single_job_ids[i]]
-
             indexes = relevant_combinations[single_job_ids[i]]
             isolated_throughput = isolated_throughputs[i]
             allocation_throughput = cp.sum(cp.multiply(
-                all_throughputs[i][indexes],
-                x[indexes]))
+                all_throughputs[i], x[indexes]))
             expected_time_isolated = self._cumulative_isolated_time[single_job_ids[i]] + \
                 (num_steps_remaining[single_job_ids[i]] / isolated_throughput)
             expected_time_allocation = times_since_start[single_job_ids[i]] + \
@@ -210,10 +256,110 @@ class FinishTimeFairnessPolicyWithPacking(PolicyWithPacking):
         if cvxprob.status != "optimal":
             print('WARNING: Allocation returned by policy not optimal!')
 
+        self._record_iteration(single_job_ids, isolated_throughputs,
+                               num_steps_remaining)
+
+        return self.unflatten(x.value.clip(min=0.0).clip(max=1.0), index)
+
+    def get_allocation_using_job_type_throughputs(
+            self, unflattened_throughputs, job_id_to_job_type_key,
+            scale_factors, unflattened_priority_weights, times_since_start,
+            num_steps_remaining, cluster_spec):
+        throughputs, throughputs_no_packed_jobs, index = \
+            self.flatten_job_type_throughputs(unflattened_throughputs,
+                                              job_id_to_job_type_key,
+                                              cluster_spec)
+        if index is None:
+            self._isolated_throughputs_prev_iteration = {}
+            self._num_steps_remaining_prev_iteration = {}
+            return None
+        job_ids = index.job_ids
+        (n, num_columns) = throughputs.shape
+        # Priority weights are applied to throughputs, as in get_allocation.
+        priority_weights = np.array(
+            [unflattened_priority_weights[job_id] for job_id in job_ids],
+            dtype=np.float32).reshape((n, 1))
+        throughputs = throughputs / priority_weights
+
+        isolated_throughputs = self._isolated_policy.get_throughputs(
+            throughputs_no_packed_jobs, (job_ids, index.worker_types),
+            scale_factors, cluster_spec)
+        self._update_cumulative_isolated_time(job_ids, num_steps_remaining)
+        # The expected time fraction of job i is
+        # (times_since_start[i] + num_steps_remaining[i] /
+        #  allocation_throughput[i]) / expected_time_isolated[i].
+        steps_coefficients = np.zeros(n)
+        time_coefficients = np.zeros(n)
+        for i, job_id in enumerate(job_ids):
+            expected_time_isolated = self._cumulative_isolated_time[job_id] + \
+                (num_steps_remaining[job_id] / isolated_throughputs[i, 0])
+            steps_coefficients[i] = \
+                num_steps_remaining[job_id] / expected_time_isolated
+            time_coefficients[i] = \
+                times_since_start[job_id] / expected_time_isolated
+
+        # Normalize each job's throughputs by its largest throughput, which
+        # keeps the problem well-scaled for the solver.
+        normalizations = throughputs.max(axis=1).astype(np.float64)
+        normalizations[normalizations == 0] = 1.0
+        throughputs = throughputs / normalizations.reshape((n, 1))
+        steps_coefficients /= normalizations
+
+        x = cp.Variable((n, num_columns))
+        allocation_throughputs = cp.Variable(n)
+        objective = cp.Minimize(cp.max(
+            time_coefficients + cp.multiply(
+                steps_coefficients, cp.inv_pos(allocation_throughputs))))
+
+        # Make sure the allocation can fit in the cluster.
+        constraints = self.get_job_type_base_constraints(x, scale_factors,
+                                                         index)
+        constraints.append(allocation_throughputs <=
+                           cp.sum(cp.multiply(throughputs, x), axis=1))
+        cvxprob = cp.Problem(objective, constraints)
+        try:
+            result = cvxprob.solve(solver=self._solver)
+        except cp.error.SolverError:
+            print('WARNING: Solver failed, using isolated allocation!')
+
+        if cvxprob.status != "optimal":
+            print('WARNING: Allocation returned by policy not optimal!')
+
+        self._record_iteration(job_ids, isolated_throughputs,
+                               num_steps_remaining)
+
+        if x.value is None:
+            # Run every job alone with its isolated share of the cluster.
+            scale_factors_array = np.array(
+                [[scale_factors[job_id]] * len(index.worker_types)
+                 for job_id in job_ids], dtype=np.float64)
+            x_isolated = np.zeros((n, num_columns))
+            x_isolated[:, ::index.num_vars_per_worker_type] = \
+                self._isolated_policy._get_allocation(
+                    throughputs_no_packed_jobs,
+                    (job_ids, index.worker_types), scale_factors_array,
+                    cluster_spec)
+            return self.unflatten_job_type_allocation(x_isolated, index)
+        return self.unflatten_job_type_allocation(
+            x.value.clip(min=0.0).clip(max=1.0), index)
+
+    def _update_cumulative_isolated_time(self, single_job_ids,
+                                         num_steps_remaining):
+        """Adds the time each job would have taken in isolation to run the
+        steps completed since the previous iteration."""
+        for single_job_id in single_job_ids:
+            if single_job_id not in self._cumulative_isolated_time:
+                self._cumulative_isolated_time[single_job_id] = 0
+            if single_job_id in self._num_steps_remaining_prev_iteration:
+                self._cumulative_isolated_time[single_job_id] += (
+                    self._num_steps_remaining_prev_iteration[single_job_id] -
+                    num_steps_remaining[single_job_id]) / \
+                    self._isolated_throughputs_prev_iteration[single_job_id]
+
+    def _record_iteration(self, single_job_ids, isolated_throughputs,
+                          num_steps_remaining):
         self._num_steps_remaining_prev_iteration = copy.copy(num_steps_remaining)
         self._isolated_throughputs_prev_iteration = {}
-        for i in range(len(all_throughputs)):
+        for i in range(len(single_job_ids)):
             self._isolated_throughputs_prev_iteration[single_job_ids[i]] = \
-                isolated_throughputs[i]
-
-        return self.unflatten(x.value.clip(min=0.0).clip(max=1.0), index)
+                isolated_throughputs[i, 0]
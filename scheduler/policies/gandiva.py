@@ -66,7 +66,7 @@ class GandivaPolicy(PolicyWithPacking):
                                                  cluster_spec)
         if all_throughputs is None or len(all_throughputs) == 0: return None
 
-        (m, n) = all_throughputs[0].shape
+        (_, m, n) = all_throughputs.shape
         (job_ids, single_job_ids, worker_types, relevant_combinations) = index
 
         assigned_combination_keys = self._assigned_combinations.keys()
@@ -10,6 +10,9 @@ from proportional import ProportionalPolicy
 
 class MaxMinFairnessStrategyProofPolicy(Policy):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'priority_weights',
+                         'cluster_spec')
+
     def __init__(self, solver):
         self._name = 'MaxMinFairness'
         self._max_min_fairness_perf_policy = \
@@ -35,6 +38,9 @@ class MaxMinFairnessStrategyProofPolicy(Policy):
 
 class MaxMinFairnessStrategyProofPolicyWithPerf(Policy):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'priority_weights',
+                         'cluster_spec')
+
     def __init__(self, solver):
         Policy.__init__(self, solver)
         self._name = 'MaxMinFairness_Perf'
@@ -310,6 +310,9 @@ class WaterFillingAlgorithm:
 
 class MaxMinFairnessWaterFillingPolicy(Policy, WaterFillingAlgorithm):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'priority_weights',
+                         'cluster_spec')
+
     def __init__(self, priority_reweighting_policies=None):
         self._name = 'MaxMinFairnessWaterFilling'
         self._max_min_fairness_perf_policy = \
@@ -359,6 +362,9 @@ class MaxMinFairnessWaterFillingPolicy(Policy, WaterFillingAlgorithm):
 
 class MaxMinFairnessWaterFillingPolicyWithPerf(Policy, WaterFillingAlgorithm):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'priority_weights',
+                         'cluster_spec')
+
     def __init__(self, priority_reweighting_policies=None):
         WaterFillingAlgorithm.__init__(self, priority_reweighting_policies)
         Policy.__init__(self, solver=None)
@@ -430,6 +436,9 @@ class MaxMinFairnessWaterFillingPolicyWithPerf(Policy, WaterFillingAlgorithm):
 
 class MaxMinFairnessWaterFillingPolicyWithPacking(PolicyWithPacking, WaterFillingAlgorithm):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'priority_weights',
+                         'cluster_spec')
+
     def __init__(self, priority_reweighting_policies=None):
         WaterFillingAlgorithm.__init__(self, priority_reweighting_policies)
         PolicyWithPacking.__init__(self, solver=None)
@@ -448,7 +457,7 @@ class MaxMinFairnessWaterFillingPolicyWithPacking(PolicyWithPacking, WaterFillin
         for i, single_job_id in enumerate(single_job_ids):
             indexes = relevant_combinations[single_job_id]
             max_throughputs.append(np.max(
-                np.multiply(all_throughputs[i][indexes], scale_factors_array[indexes])))
+                np.multiply(all_throughputs[i], scale_factors_array[indexes])))
             max_throughputs[-1] /= proportional_throughputs[i]
         return np.max(np.array(max_throughputs))
 
@@ -458,8 +467,7 @@ class MaxMinFairnessWaterFillingPolicyWithPacking(PolicyWithPacking, WaterFillin
         for i, single_job_id in enumerate(single_job_ids):
             indexes = relevant_combinations[single_job_id]
             effective_throughputs.append(cp.sum(cp.multiply(
-                all_throughputs[i][indexes],
-                x[indexes])))
+                all_throughputs[i], x[indexes])))
         return cp.hstack(effective_throughputs)
 
     def get_allocation(self, unflattened_throughputs, scale_factors,
@@ -475,7 +483,7 @@ class MaxMinFairnessWaterFillingPolicyWithPacking(PolicyWithPacking, WaterFillin
         (job_ids, single_job_ids, worker_types, relevant_combinations) = index
         self._single_job_ids = single_job_ids
         self._relevant_combinations = relevant_combinations
-        (m, n) = all_throughputs[0].shape
+        (_, m, n) = all_throughputs.shape
 
         # Row i of scale_factors_array is the scale_factor of job i
         # repeated len(worker_types) times.
@@ -513,8 +521,7 @@ class MaxMinFairnessWaterFillingPolicyWithPacking(PolicyWithPacking, WaterFillin
         for i, single_job_id in enumerate(single_job_ids):
             indexes = relevant_combinations[single_job_id]
             effective_throughputs[i] = np.sum(np.multiply(
-                all_throughputs[i][indexes],
-                x[indexes]))
+                all_throughputs[i], x[indexes]))
         normalized_effective_throughputs = np.multiply(
             effective_throughputs,
             1.0 / proportional_throughputs.reshape(len(single_job_ids)))
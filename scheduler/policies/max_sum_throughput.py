@@ -4,7 +4,8 @@ sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 import cvxpy as cp
 import numpy as np
 
-from policy import Policy, PolicyWithPacking
+from policy import Policy, PolicyWithPacking, ProblemTemplate, pad_rows, \
+    padded_problem_size
 
 class ThroughputSumWithPerf(Policy):
 
@@ -19,6 +20,10 @@ class ThroughputSumWithPerf(Policy):
                                            cluster_spec)
 
 class ThroughputNormalizedByCostSumWithPerf(Policy):
+
+    allocation_inputs = ('throughputs', 'scale_factors', 'cluster_spec',
+                         'instance_costs')
+
     def __init__(self, solver):
         self._name = 'ThroughputNormalizedByCostSum_Perf'
         self._policy = ThroughputNormalizedByCostSumWithPerfSLOs(solver)
@@ -32,6 +37,9 @@ class ThroughputNormalizedByCostSumWithPerf(Policy):
 
 class ThroughputNormalizedByCostSumWithPerfSLOs(Policy):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'cluster_spec',
+                         'instance_costs', 'SLOs', 'num_steps_remaining')
+
     def __init__(self, solver):
         Policy.__init__(self, solver)
         self._name = 'ThroughputNormalizedByCostSum_PerfSLOs'
@@ -52,41 +60,94 @@ class ThroughputNormalizedByCostSumWithPerfSLOs(Policy):
         scale_factors_array = self.scale_factors_array(
              scale_factors, job_ids, m, n)
 
-        x = cp.Variable(throughputs.shape)
         instance_costs_array = np.ones((1, n))
         if instance_costs is not None:
             for i in range(n):
                 instance_costs_array[0, i] = instance_costs[worker_types[i]]
-        objective = \
-            cp.Maximize(cp.sum(cp.sum(cp.multiply(throughputs /
-                                                  instance_costs_array, x),
-                                      axis=1)))
 
-        # Make sure that a given job is not over-allocated resources.
-        constraints = self.get_base_constraints(x, scale_factors_array)
-        SLO_constraints = []
-        for job_id in SLOs:
-            i = job_ids.index(job_id)
-            assert(job_id in num_steps_remaining)
-            SLO_constraints.append(
-                cp.sum(cp.multiply(throughputs[i], x[i])) >=
-                    (num_steps_remaining[job_id] / SLOs[job_id])
-            )
-        cvxprob = cp.Problem(objective, constraints + SLO_constraints)
-        result = cvxprob.solve(solver=self._solver)
+        # Padded rows have no throughput and a scale factor of 0, so they
+        # do not contribute to the objective or use any workers.
+        padded_m = padded_problem_size(m)
+        parameter_values = {
+            'coefficients': pad_rows(throughputs / instance_costs_array,
+                                     padded_m),
+            'scale_factors_array': pad_rows(scale_factors_array,
+                                            padded_m),
+            'num_workers': np.array(self._num_workers),
+        }
+        if len(SLOs) > 0:
+            SLO_lower_bounds = np.zeros(m)
+            for job_id in SLOs:
+                i = job_ids.index(job_id)
+                assert(job_id in num_steps_remaining)
+                SLO_lower_bounds[i] = \
+                    num_steps_remaining[job_id] / SLOs[job_id]
+            parameter_values['throughputs'] = \
+                pad_rows(throughputs, padded_m)
+            parameter_values['SLO_lower_bounds'] = \
+                pad_rows(SLO_lower_bounds, padded_m)
+            status, x = self._solve(m, worker_types, parameter_values,
+                                    variant='SLOs')
+        else:
+            status, x = self._solve(m, worker_types, parameter_values)
 
-        if cvxprob.status != "optimal":
+        if status != "optimal":
             print('WARNING: Allocation returned by policy not optimal!')
 
-        if x.value is None:
+        if x is None:
             print('WARNING: No allocation possible with provided SLOs!')
-            cvxprob = cp.Problem(objective, constraints)
-            result = cvxprob.solve(solver=self._solver)
+            del parameter_values['throughputs']
+            del parameter_values['SLO_lower_bounds']
+            status, x = self._solve(m, worker_types, parameter_values)
+
+        return super().unflatten(x.clip(min=0.0).clip(max=1.0), index)
+
+    def _solve(self, m, worker_types, parameter_values, variant=None):
+        padded_m, template = self.get_problem_template(
+            m, worker_types,
+            lambda m, n: self._build_problem_template(m, n, variant),
+            variant=variant)
+        with template.lock:
+            template.solve(self._solver, parameter_values)
+            status = template.problem.status
+            x = template.variables['x'].value
+            if x is not None:
+                x = x[:m]
+        return status, x
+
+    def _build_problem_template(self, m, n, variant):
+        x = cp.Variable((m, n))
+        coefficients = cp.Parameter((m, n))
+        scale_factors_array = cp.Parameter((m, n), nonneg=True)
+        num_workers = cp.Parameter(n, nonneg=True)
+        parameters = {
+            'coefficients': coefficients,
+            'scale_factors_array': scale_factors_array,
+            'num_workers': num_workers,
+        }
+        objective = \
+            cp.Maximize(cp.sum(cp.sum(cp.multiply(coefficients, x), axis=1)))
 
-        return super().unflatten(x.value.clip(min=0.0).clip(max=1.0), index)
+        # Make sure that a given job is not over-allocated resources.
+        constraints = self.get_base_constraints(x, scale_factors_array,
+                                                num_workers=num_workers)
+        if variant == 'SLOs':
+            # Jobs without SLOs have a lower bound of 0.
+            throughputs = cp.Parameter((m, n))
+            SLO_lower_bounds = cp.Parameter(m)
+            constraints.append(
+                cp.sum(cp.multiply(throughputs, x), axis=1) >=
+                    SLO_lower_bounds)
+            parameters['throughputs'] = throughputs
+            parameters['SLO_lower_bounds'] = SLO_lower_bounds
+        return ProblemTemplate(cp.Problem(objective, constraints),
+                               {'x': x}, parameters)
 
 class ThroughputNormalizedByCostSumWithPackingSLOs(PolicyWithPacking):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'cluster_spec',
+                         'instance_costs', 'SLOs', 'num_steps_remaining')
+
     def __init__(self, solver):
         Policy.__init__(self, solver)
         self._name = 'ThroughputNormalizedByCostSum_PackingSLOs'
@@ -96,7 +157,7 @@ class ThroughputNormalizedByCostSumWithPackingSLOs(PolicyWithPacking):
         all_throughputs, index = super().flatten(unflattened_throughputs,
                                                  cluster_spec)
         if all_throughputs is None or len(all_throughputs) == 0: return None
-        (m, n) = all_throughputs[0].shape
+        (_, m, n) = all_throughputs.shape
         (job_ids, single_job_ids, worker_types, relevant_combinations) = index
 
         # Row i of scale_factors_array is the scale_factor of job
@@ -116,8 +177,8 @@ class ThroughputNormalizedByCostSumWithPackingSLOs(PolicyWithPacking):
         for i in range(len(single_job_ids)):
             indexes = relevant_combinations[single_job_ids[i]]
             objective_terms.append(cp.sum(cp.multiply(
-                all_throughputs[i][indexes] /\
-                    instance_costs_array[indexes], x[indexes])))
+                all_throughputs[i] / instance_costs_array[indexes],
+                x[indexes])))
 
         if len(objective_terms) == 1:
             objective = cp.Maximize(objective_terms[0])
@@ -137,7 +198,7 @@ class ThroughputNormalizedByCostSumWithPackingSLOs(PolicyWithPacking):
             assert(job_id in num_steps_remaining)
             indexes = relevant_combinations[single_job_ids[i]]
             throughput = cp.sum(cp.multiply(
-                all_throughputs[i][indexes], x[indexes]))
+                all_throughputs[i], x[indexes]))
             per_job_throughputs.append(throughput)
             per_job_SLOs.append(num_steps_remaining[job_id] / SLOs[job_id])
         if len(per_job_throughputs) > 0:
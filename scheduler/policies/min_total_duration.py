@@ -4,10 +4,16 @@ sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 import cvxpy as cp
 import numpy as np
 
-from policy import Policy, PolicyWithPacking
+from policy import Policy, PolicyWithPacking, ProblemTemplate, pad_rows
+
+# Smallest time (in seconds) that jobs are asked to finish in.
+MIN_T = 100.
 
 class MinTotalDurationPolicy(Policy):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'num_steps_remaining',
+                         'cluster_spec')
+
     def __init__(self, solver):
         self._name = 'MinTotalDuration'
         self._min_total_duration_perf_policy = \
@@ -34,24 +40,38 @@ class MinTotalDurationPolicy(Policy):
 
 class MinTotalDurationPolicyWithPerf(Policy):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'num_steps_remaining',
+                         'cluster_spec')
+
     def __init__(self, solver):
         Policy.__init__(self, solver)
         self._name = 'MinTotalDuration_Perf'
 
-    def get_allocation_helper(self, throughputs, scale_factors_array, T):
-        x = cp.Variable(throughputs.shape)
-        objective = cp.Maximize(1)
+    def _build_problem_template(self, m, n):
+        x = cp.Variable((m, n))
+        # Solving for 1/T instead of T keeps the problem linear.
+        inverse_T = cp.Variable(nonneg=True)
+        throughputs = cp.Parameter((m, n))
+        scale_factors_array = cp.Parameter((m, n), nonneg=True)
+        num_workers = cp.Parameter(n, nonneg=True)
+        num_steps_remaining = cp.Parameter(m, nonneg=True)
+        objective = cp.Maximize(inverse_T)
         # Make sure the allocation can fit in the cluster, and that the
         # currently active jobs can finish in time T.
-        constraints = self.get_base_constraints(x, scale_factors_array)
-        constraints.append(
-            cp.sum(cp.multiply(throughputs, x), axis=1) >= (
-                self._num_steps_remaining / T)
-        )
-        cvxprob = cp.Problem(objective, constraints)
-        result = cvxprob.solve(solver=self._solver)
-
-        return cvxprob.status, x
+        constraints = self.get_base_constraints(x, scale_factors_array,
+                                                num_workers=num_workers)
+        constraints += [
+            cp.sum(cp.multiply(throughputs, x), axis=1) >=
+                num_steps_remaining * inverse_T,
+            inverse_T <= 1. / MIN_T,
+        ]
+        return ProblemTemplate(
+            cp.Problem(objective, constraints),
+            {'x': x, 'inverse_T': inverse_T},
+            {'throughputs': throughputs,
+             'scale_factors_array': scale_factors_array,
+             'num_workers': num_workers,
+             'num_steps_remaining': num_steps_remaining})
 
     def get_allocation(self, unflattened_throughputs, scale_factors,
                        num_steps_remaining, cluster_spec):
@@ -59,73 +79,52 @@ class MinTotalDurationPolicyWithPerf(Policy):
         throughputs, index = super().flatten(unflattened_throughputs,
                                              cluster_spec)
         if index is None: return None
-        (m, n) = throughputs.shape
-        (job_ids, _) = index
-        self._num_steps_remaining = np.array([num_steps_remaining[job_id]
-                                              for job_id in job_ids])
         if throughputs is None: return None
+        (m, n) = throughputs.shape
+        (job_ids, worker_types) = index
+        num_steps_remaining = np.array([num_steps_remaining[job_id]
+                                        for job_id in job_ids])
 
         # Row i of scale_factors_array is the scale_factor of job i
         # repeated len(worker_types) times.
         scale_factors_array = self.scale_factors_array(
              scale_factors, job_ids, m, n)
 
-        # Units are in seconds.
-        max_T = 1000000.
-        min_T = 100.
-        last_max_T = max_T
-        status = None
-        last_feasible_x = None
-        while last_feasible_x is None:
-            # Binary search for the smallest T that gives an optimal solution.
-            while (1.05 * min_T) < max_T:  # TODO: Can tweak the 1.05 in this loop.
-                T = (min_T + max_T) / 2.
-                status, x = self.get_allocation_helper(throughputs,
-                                                       scale_factors_array, T)
-                if status == "optimal":
-                    last_feasible_x = x
-                    max_T = T
-                else:
-                    min_T = T
-            max_T = last_max_T * 10.
-            min_T = last_max_T
-            last_max_T *= 10
-
-        assert(last_feasible_x is not None)
-        return super().unflatten(
-            last_feasible_x.value.clip(min=0.0).clip(max=1.0), index)
+        # Padded rows have no throughput and no steps remaining, so they
+        # do not constrain the real jobs.
+        padded_m, template = self.get_problem_template(
+            m, worker_types, self._build_problem_template)
+        with template.lock:
+            template.solve(self._solver, {
+                'throughputs': pad_rows(throughputs, padded_m),
+                'scale_factors_array': pad_rows(scale_factors_array,
+                                                padded_m),
+                'num_workers': np.array(self._num_workers),
+                'num_steps_remaining': pad_rows(num_steps_remaining,
+                                                padded_m),
+            })
+            status = template.problem.status
+            x = template.variables['x'].value
+
+        if status != "optimal":
+            print('WARNING: Allocation returned by policy not optimal!')
+
+        assert(x is not None)
+        return super().unflatten(x[:m].clip(min=0.0).clip(max=1.0), index)
 
 
 class MinTotalDurationPolicyWithPacking(PolicyWithPacking):
 
+    allocation_inputs = ('throughputs', 'scale_factors', 'num_steps_remaining',
+                         'cluster_spec')
+    job_type_allocation_inputs = ('job_type_throughputs',
+                                  'job_id_to_job_type_key', 'scale_factors',
+                                  'num_steps_remaining', 'cluster_spec')
+
     def __init__(self, solver):
         PolicyWithPacking.__init__(self, solver)
         self._name = 'MinTotalDuration_Packing'
 
-    def get_allocation_helper(self, all_throughputs, job_ids,
-                              single_job_ids, scale_factors_array, T,
-                              relevant_combinations):
-        x = cp.Variable(all_throughputs[0].shape)
-        objective = cp.Maximize(1)
-        # Make sure the allocation can fit in the cluster.
-        constraints = self.get_base_constraints(x, single_job_ids,
-                                                scale_factors_array,
-                                                relevant_combinations)
-
-        # See if passed in T is feasible.
-        for i, (throughputs, num_steps_remaining) in \
-            enumerate(zip(all_throughputs, self._num_steps_remaining)):
-            indexes = relevant_combinations[single_job_ids[i]]
-            # Ensure that every job satisfies its throughput constraint,
-            # and can finish in time T.
-            constraints.append(
-                cp.sum(cp.multiply(throughputs[indexes], x[indexes])) >=
-                    (num_steps_remaining / T))
-        cvxprob = cp.Problem(objective, constraints)
-        result = cvxprob.solve(solver=self._solver)
-
-        return cvxprob.status, x
-
     def get_allocation(self, unflattened_throughputs, scale_factors,
                        num_steps_remaining, cluster_spec):
         all_throughputs, index = super().flatten(unflattened_throughputs,
@@ -133,38 +132,72 @@ class MinTotalDurationPolicyWithPacking(PolicyWithPacking):
         if all_throughputs is None or len(all_throughputs) == 0: return None
         if index is None: return None
         (job_ids, single_job_ids, worker_types, relevant_combinations) = index
-        self._num_steps_remaining = [num_steps_remaining[single_job_id]
-                                     for single_job_id in single_job_ids]
+        num_steps_remaining = np.array([num_steps_remaining[single_job_id]
+                                        for single_job_id in single_job_ids])
 
         # Row i of scale_factors_array is the scale_factor of job
         # combination i repeated len(worker_types) times.
-        (m, n) = all_throughputs[0].shape
+        (_, m, n) = all_throughputs.shape
         scale_factors_array = self.scale_factors_array(
             scale_factors, job_ids, m, n)
 
-        # Units are in seconds.
-        max_T = 1000000.
-        min_T = 100.
-        last_max_T = max_T
-        status = None
-        last_feasible_x = None
-        while last_feasible_x is None:
-            # Binary search for the smallest T that gives an optimal solution.
-            while (1.05 * min_T) < max_T:  # TODO: Can tweak the 1.05 in this loop.
-                T = (min_T + max_T) / 2.
-                status, x = self.get_allocation_helper(all_throughputs,
-                                                       job_ids, single_job_ids,
-                                                       scale_factors_array, T,
-                                                       relevant_combinations)
-                if status == "optimal":
-                    last_feasible_x = x
-                    max_T = T
-                else:
-                    min_T = T
-            max_T = last_max_T * 10.
-            min_T = last_max_T
-            last_max_T *= 10
-
-        assert(last_feasible_x is not None)
-        return super().unflatten(
-            last_feasible_x.value.clip(min=0.0).clip(max=1.0), index)
+        x = cp.Variable((m, n))
+        # Solving for 1/T instead of T keeps the problem linear.
+        inverse_T = cp.Variable(nonneg=True)
+        objective = cp.Maximize(inverse_T)
+        # Make sure the allocation can fit in the cluster.
+        constraints = self.get_base_constraints(x, single_job_ids,
+                                                scale_factors_array,
+                                                relevant_combinations)
+        # Ensure that every job satisfies its throughput constraint,
+        # and can finish in time T.
+        constraints += [
+            all_throughputs.weighted_sum_matrix() @
+                cp.reshape(x, (m * n,), order='C') >=
+                num_steps_remaining * inverse_T,
+            inverse_T <= 1. / MIN_T,
+        ]
+        cvxprob = cp.Problem(objective, constraints)
+        result = cvxprob.solve(solver=self._solver)
+
+        if cvxprob.status != "optimal":
+            print('WARNING: Allocation returned by policy not optimal!')
+
+        assert(x.value is not None)
+        return super().unflatten(x.value.clip(min=0.0).clip(max=1.0), index)
+
+    def get_allocation_using_job_type_throughputs(
+            self, unflattened_throughputs, job_id_to_job_type_key,
+            scale_factors, num_steps_remaining, cluster_spec):
+        throughputs, _, index = \
+            self.flatten_job_type_throughputs(unflattened_throughputs,
+                                              job_id_to_job_type_key,
+                                              cluster_spec)
+        if index is None:
+            return None
+        (n, num_columns) = throughputs.shape
+        num_steps_remaining = np.array([num_steps_remaining[job_id]
+                                        for job_id in index.job_ids])
+
+        x = cp.Variable((n, num_columns))
+        # Solving for 1/T instead of T keeps the problem linear.
+        inverse_T = cp.Variable(nonneg=True)
+        objective = cp.Maximize(inverse_T)
+        # Make sure the allocation can fit in the cluster, and that every
+        # job can finish in time T.
+        constraints = self.get_job_type_base_constraints(x, scale_factors,
+                                                         index)
+        constraints += [
+            cp.sum(cp.multiply(throughputs, x), axis=1) >=
+                num_steps_remaining * inverse_T,
+            inverse_T <= 1. / MIN_T,
+        ]
+        cvxprob = cp.Problem(objective, constraints)
+        result = cvxprob.solve(solver=self._solver)
+
+        if cvxprob.status != "optimal":
+            print('WARNING: Allocation returned by policy not optimal!')
+
+        assert(x.value is not None)
+        return self.unflatten_job_type_allocation(
+            x.value.clip(min=0.0).clip(max=1.0), index)
@@ -1,13 +1,30 @@
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
+import collections
 import cvxpy as cp
+import heapq
 import numpy as np
+import scipy.sparse as sp
+import threading
 
 import job_id_pair
 
+# Maximum number of problem templates kept in the shared cache.
+MAX_NUM_PROBLEM_TEMPLATES = 32
+# Smallest number of rows a problem template is built for; templates are
+# built for job counts rounded up to the next power of 2 above this.
+MIN_PROBLEM_TEMPLATE_SIZE = 4
+
 class Policy:
 
+    # Names of the AllocationState fields passed to get_allocation, in order.
+    allocation_inputs = ('throughputs', 'scale_factors', 'cluster_spec')
+    # Names of the AllocationState fields passed to
+    # get_allocation_using_job_type_throughputs, in order (None if the policy
+    # cannot allocate over job types).
+    job_type_allocation_inputs = None
+
     def __init__(self, solver='ECOS'):
         self._name = None
         self._solver = solver
@@ -53,15 +70,41 @@ class Policy:
                 d[job_ids[i]][worker_types[j]] = m[i][j]
         return d
 
-    def get_base_constraints(self, x, scale_factors_array):
+    def get_base_constraints(self, x, scale_factors_array, num_workers=None):
         """Return base constraints."""
+        if num_workers is None:
+            num_workers = self._num_workers
         return [
             x >= 0,
             cp.sum(cp.multiply(
-                scale_factors_array, x), axis=0) <= self._num_workers,
+                scale_factors_array, x), axis=0) <= num_workers,
             cp.sum(x, axis=1) <= 1,
         ]
 
+    def get_problem_template(self, m, worker_types, build_fn, variant=None):
+        """Returns a cached, parameterized problem for m jobs.
+
+        Templates are shared across policy instances and keyed by policy
+        name, variant, padded job count, and worker types, so that
+        re-solving with new data only requires updating parameter values.
+
+        Args:
+          m: Number of jobs.
+          worker_types: Sorted list of worker types.
+          build_fn: Function that takes the padded number of jobs and the
+                    number of worker types, and returns a ProblemTemplate.
+          variant: Optional hashable distinguishing different problem
+                   structures for the same policy.
+
+        Returns:
+          The padded number of jobs and the ProblemTemplate.
+        """
+        padded_m = padded_problem_size(m)
+        key = (self._name, variant, padded_m, tuple(worker_types))
+        template = _problem_template_cache.get(
+            key, lambda: build_fn(padded_m, len(worker_types)))
+        return padded_m, template
+
 
 class PolicyWithPacking(Policy):
 
@@ -84,80 +127,89 @@ class PolicyWithPacking(Policy):
 
     def flatten(self, d, cluster_spec, priority_weights=None):
         """
-        Converts a 2-level dict to a NumPy array.
+        Converts a 2-level dict to a JobCombinationThroughputs object.
 
         Job ID combinations in the input dict are either a tuple or an integer.
         If a tuple, represents a combination run on a GPU concurrently.
         If an integer, represents a single job / application run on the
         GPU.
 
-        Returns a list of each user's throughput matrix and an
-        index to reconstruct the allocation as a dict.
+        Returns each single job's throughputs in the job combinations it is
+        part of, and an index to reconstruct the allocation as a dict.
+        The index is reused if the job combinations are the same as on the
+        previous call, and otherwise rebuilt; throughputs are read from d on
+        every call since they can change between calls.
         """
-        job_ids = sorted(list(d.keys()))
-        if len(job_ids) == 0:
+        if len(d) == 0:
             return None, None
+        combination_index = self._update_combination_index(d)
+        job_ids = combination_index.job_ids
         worker_types = sorted(list(d[job_ids[0]].keys()))
         self._num_workers = \
             [cluster_spec[worker_type] for worker_type in worker_types]
+        if len(worker_types) == 0:
+            return None, None
 
-        # Stores which indexes in job_ids are relevant for each single job ID.
-        relevant_combinations = {}
-        single_job_ids = set()
-        sorted_single_job_ids = []
-        for i, job_id in enumerate(job_ids):
-            if not job_id.is_pair():
-                single_job_ids.add(job_id)
-                sorted_single_job_ids.append(job_id)
-                if job_id not in relevant_combinations:
-                    relevant_combinations[job_id] = []
-                relevant_combinations[job_id].append(i)
+        # Throughputs of the (up to two) jobs in each job combination.
+        combination_throughputs = []
+        for job_id in job_ids:
+            if job_id.is_pair():
+                combination_throughputs.append(
+                    [d[job_id][worker_type] for worker_type in worker_types])
             else:
-                for single_job_id in job_id.singletons():
-                    if single_job_id not in relevant_combinations:
-                        relevant_combinations[single_job_id] = []
-                    relevant_combinations[single_job_id].append(i)
+                combination_throughputs.append(
+                    [[d[job_id][worker_type], 0.0]
+                     for worker_type in worker_types])
+        combination_throughputs = np.array(combination_throughputs,
+                                           dtype=np.float32)
+        values = combination_throughputs[combination_index.rows, :,
+                                         combination_index.positions]
+        # Normalize.
+        if priority_weights is not None:
+            weights = np.array(
+                [priority_weights[single_job_id]
+                 for single_job_id in combination_index.single_job_ids],
+                dtype=np.float32)
+            values /= weights[combination_index.owners][:, None]
+        all_throughputs = JobCombinationThroughputs(
+            np.split(values, combination_index.offsets[1:-1]),
+            combination_index, len(worker_types))
+        return all_throughputs, (job_ids, combination_index.single_job_ids,
+                                 worker_types,
+                                 combination_index.relevant_combinations)
 
-        if len(worker_types) == 0:
-            return None, None
+    def _update_combination_index(self, d):
+        """Returns a JobCombinationIndex for the keys of d.
 
-        shape = (len(single_job_ids), len(job_ids), len(worker_types))
-        all_m = np.zeros(shape, dtype=np.float32)
-        # Compute the throughput matrix for each individual job.
-        for i, single_job_id in enumerate(sorted_single_job_ids):
-            # Each throughput matrix has dimension
-            # (num_app_combinations x num_worker_types).
-            for j in relevant_combinations[single_job_id]:
-                job_id = job_ids[j]
-                for k, worker_type in enumerate(worker_types):
-                    # If job ID of interest is not in this job_id_combination,
-                    # throughput should be 0.
-                    # Otherwise, use the right throughput from the input dict.
-                    if job_id in single_job_ids:
-                        if job_id == single_job_id:
-                            all_m[i][j][k] = d[job_id][worker_type]
-                    else:
-                        if single_job_id.overlaps_with(job_id):
-                            # Find the index of the job of interest in the job
-                            # combination tuple.
-                            index = job_id.as_tuple().index(single_job_id[0])
-                            throughputs = d[job_id][worker_type]
-                            all_m[i][j][k] = d[job_id][worker_type][index]
-            # Normalize.
-            if priority_weights is not None:
-                all_m[i] /= priority_weights[single_job_id]
-        return all_m, (job_ids, sorted_single_job_ids, worker_types,
-                       relevant_combinations)
+        The index computed on the previous call is returned if the keys of d
+        are unchanged. Otherwise, a new index is built, and only the sort
+        order of the job combinations is carried over.
+        """
+        combination_index = getattr(self, '_combination_index', None)
+        if combination_index is None:
+            job_ids = sorted(d.keys())
+        else:
+            previous_job_ids = combination_index.job_id_set
+            if (len(previous_job_ids) == len(d) and
+                all([job_id in previous_job_ids for job_id in d])):
+                return combination_index
+            # Merge newly added job combinations into the existing sorted
+            # order rather than re-sorting all job combinations.
+            added_job_ids = sorted([job_id for job_id in d
+                                    if job_id not in previous_job_ids])
+            job_ids = list(heapq.merge(
+                [job_id for job_id in combination_index.job_ids
+                 if job_id in d], added_job_ids))
+        self._combination_index = JobCombinationIndex(job_ids)
+        return self._combination_index
 
     def unflatten(self, m, index):
         """Converts a NumPy array to a 2-level dict."""
 
         (job_id_combinations, single_job_ids, worker_types, _) = index
         d = {}
-        for i in range(len(job_id_combinations)):
-            d[job_id_combinations[i]] = {}
-            for j in range(len(worker_types)):
-                d[job_id_combinations[i]][worker_types[j]] = m[i][j]
+        for job_id, row in zip(job_id_combinations, m):
+            d[job_id] = dict(zip(worker_types, row))
         return d
 
     def get_base_constraints(self, x, single_job_ids,
@@ -170,17 +222,192 @@ class PolicyWithPacking(Policy):
         ]
 
         # Every job cannot receive a total time share sum greater than 1.0.
-        idx = []
-        for single_job_id in single_job_ids:
-            indexes = relevant_combinations[single_job_id]
-            idx += indexes
-        index_var = x[idx]
-        index_var = cp.reshape(index_var,
-            (len(single_job_ids), int(np.prod(index_var.shape) /
-             len(single_job_ids))), order='C')
-        constraints.append(cp.sum(index_var, axis=1) <= 1)
+        membership = membership_matrix(single_job_ids, relevant_combinations,
+                                       x.shape[0])
+        constraints.append(cp.sum(membership @ x, axis=1) <= 1)
+        return constraints
+
+    def flatten_job_type_throughputs(self, unflattened_throughputs,
+                                     job_id_to_job_type_key, cluster_spec):
+        """Flattens job type throughputs for a job-type-aggregated solve.
+
+        Instead of one allocation variable per job combination, the
+        aggregated problem has one allocation variable per job and job type
+        that the job can be packed with, so its size grows with the number
+        of job types rather than the number of job pairs.
+
+        Args:
+          unflattened_throughputs: Map from job type to map from worker
+                                   type to map from other job type (or None
+                                   if running alone) to throughput.
+          job_id_to_job_type_key: Map from single job ID to job type.
+          cluster_spec: Map from worker type to number of workers.
+
+        Returns:
+          A (# jobs x (1 + # job types) * # worker types) array of each
+          job's throughputs, a (# jobs x # worker types) array of each job's
+          isolated throughputs, and a JobTypeIndex.
+        """
+        job_ids = sorted(job_id_to_job_type_key.keys())
+        if len(job_ids) == 0:
+            return None, None, None
+        job_type_keys = sorted(unflattened_throughputs.keys())
+        worker_types = sorted(cluster_spec.keys())
+        self._num_workers = \
+            [cluster_spec[worker_type] for worker_type in worker_types]
+        index = JobTypeIndex(job_ids, job_id_to_job_type_key, job_type_keys,
+                             worker_types)
+        num_vars_per_worker_type = index.num_vars_per_worker_type
+
+        job_type_throughputs = \
+            np.zeros((len(job_type_keys),
+                      num_vars_per_worker_type * len(worker_types)),
+                     dtype=np.float32)
+        for i, job_type_key in enumerate(job_type_keys):
+            for k, worker_type in enumerate(worker_types):
+                throughputs = unflattened_throughputs[job_type_key][worker_type]
+                for j, other_job_type_key in enumerate([None] + job_type_keys):
+                    # Jobs with different scale factors are never packed.
+                    if j > 0 and other_job_type_key[1] != job_type_key[1]:
+                        continue
+                    job_type_throughputs[i, k * num_vars_per_worker_type + j] = \
+                        throughputs[other_job_type_key]
+
+        isolated_throughputs = np.zeros((len(job_ids), len(worker_types)))
+        for i, job_id in enumerate(job_ids):
+            job_type_key = job_id_to_job_type_key[job_id]
+            for k, worker_type in enumerate(worker_types):
+                isolated_throughputs[i, k] = \
+                    unflattened_throughputs[job_type_key][worker_type][None]
+
+        return (job_type_throughputs[index.job_types], isolated_throughputs,
+                index)
+
+    def get_job_type_base_constraints(self, x, scale_factors, index):
+        """Returns base constraints for a job-type-aggregated allocation x.
+
+        Args:
+          x: Allocation variable, with the same shape as the throughputs
+             returned by flatten_job_type_throughputs.
+          scale_factors: Map from single job ID to scale factor.
+          index: JobTypeIndex returned by flatten_job_type_throughputs.
+        """
+        (n, num_columns) = x.shape
+        a = len(index.job_type_keys)
+        m = len(index.worker_types)
+        v = index.num_vars_per_worker_type
+        job_scale_factors = np.array(
+            [scale_factors[job_id] for job_id in index.job_ids],
+            dtype=np.float64)
+        job_type_scale_factors = np.array(
+            [job_type_key[1] for job_type_key in index.job_type_keys])
+
+        # Packed allocations are counted for both jobs in the pair, so they
+        # are weighted by 0.5 when computing the number of workers used.
+        # TODO: Change this if we ever consider combinations larger than pairs.
+        masks = np.full(v, 0.5)
+        masks[0] = 1.0
+        worker_type_usage = sp.csr_matrix(
+            (np.tile(masks, m), (np.repeat(np.arange(m), v),
+                                 np.arange(num_columns))),
+            shape=(m, num_columns))
+        constraints = [
+            # All allocation values must be >= 0.
+            x >= 0,
+            # The sum of allocation values for each job must be <= 1.
+            cp.sum(x, axis=1) <= 1,
+            # The sum of allocation values for each worker type must be <=
+            # the number of workers of that type.
+            worker_type_usage @ (job_scale_factors @ x) <=
+                np.array(self._num_workers),
+        ]
+
+        # Each row of the equality constraint matrix is a linear combination
+        # of allocation values that must be 0; entries are given as
+        # (row, job index, column, value) tuples.
+        rows = []
+        job_idxs = []
+        columns = []
+        values = []
+        num_rows = 0
+        job_type_jobs = [np.array(index.job_type_key_to_job_idx[job_type_key])
+                         for job_type_key in index.job_type_keys]
+        for i in range(a):
+            for k in range(m):
+                # Jobs are never packed with jobs of a different scale factor.
+                other_job_types = np.flatnonzero(
+                    job_type_scale_factors != job_type_scale_factors[i])
+                for j in other_job_types:
+                    count = len(job_type_jobs[i])
+                    rows.append(np.arange(num_rows, num_rows + count))
+                    job_idxs.append(job_type_jobs[i])
+                    columns.append(np.full(count, k * v + 1 + j))
+                    values.append(np.ones(count))
+                    num_rows += count
+
+                # The sum of allocation values of all jobs of type i packed
+                # with type j must equal the sum of allocation values of all
+                # jobs of type j packed with type i.
+                for j in range(i+1, a):
+                    if job_type_scale_factors[j] != job_type_scale_factors[i]:
+                        continue
+                    rows.append(np.full(len(job_type_jobs[i]) +
+                                        len(job_type_jobs[j]), num_rows))
+                    job_idxs += [job_type_jobs[i], job_type_jobs[j]]
+                    columns += [np.full(len(job_type_jobs[i]),
+                                        k * v + 1 + j),
+                                np.full(len(job_type_jobs[j]),
+                                        k * v + 1 + i)]
+                    values += [np.ones(len(job_type_jobs[i])),
+                               -np.ones(len(job_type_jobs[j]))]
+                    num_rows += 1
+
+                # All jobs of type i must receive the same allocation when
+                # packed with other jobs of type i, and a job cannot be
+                # packed with its own type if it is the only job of that type.
+                same_type_jobs = job_type_jobs[i]
+                if len(same_type_jobs) == 0:
+                    continue
+                elif len(same_type_jobs) == 1:
+                    rows.append(np.array([num_rows]))
+                    job_idxs.append(same_type_jobs)
+                    columns.append(np.array([k * v + 1 + i]))
+                    values.append(np.ones(1))
+                    num_rows += 1
+                else:
+                    count = len(same_type_jobs) - 1
+                    rows += [np.arange(num_rows, num_rows + count)] * 2
+                    job_idxs += [same_type_jobs[:-1], same_type_jobs[1:]]
+                    columns += [np.full(count, k * v + 1 + i)] * 2
+                    values += [np.ones(count), -np.ones(count)]
+                    num_rows += count
+        if num_rows > 0:
+            flattened_columns = \
+                np.concatenate(job_idxs) * num_columns + \
+                np.concatenate(columns)
+            equality_matrix = sp.csr_matrix(
+                (np.concatenate(values),
+                 (np.concatenate(rows), flattened_columns)),
+                shape=(num_rows, n * num_columns))
+            constraints.append(
+                equality_matrix @ cp.reshape(x, (n * num_columns,),
+                                             order='C') == 0)
         return constraints
 
+    def unflatten_job_type_allocation(self, x, index):
+        """Converts a job-type-aggregated allocation to a job-job
+        allocation."""
+        v = index.num_vars_per_worker_type
+        unflattened_allocation = {}
+        for i, job_id in enumerate(index.job_ids):
+            unflattened_allocation[job_id] = {}
+            for k, worker_type in enumerate(index.worker_types):
+                unflattened_allocation[job_id][worker_type] = \
+                    dict(zip([None] + index.job_type_keys,
+                             x[i, k * v:(k + 1) * v]))
+        return self.convert_job_type_allocation(
+            unflattened_allocation, index.job_id_to_job_type_key)
+
     def convert_job_type_allocation(self, allocation, job_id_to_job_type_key):
         """Converts a job-job_type allocation to a job-job allocation."""
         job_ids = sorted(allocation.keys())
@@ -239,3 +466,251 @@ class PolicyWithPacking(Policy):
                         converted_allocation[merged_job_id][worker_type] = 0.0
 
         return converted_allocation
+
+
+def membership_matrix(single_job_ids, relevant_combinations, m):
+    """Returns a sparse 0/1 matrix whose row i selects the job combinations
+    that single_job_ids[i] is part of."""
+    rows = []
+    owners = []
+    for i, single_job_id in enumerate(single_job_ids):
+        rows += relevant_combinations[single_job_id]
+        owners += [i] * len(relevant_combinations[single_job_id])
+    return sp.csr_matrix((np.ones(len(rows)), (owners, rows)),
+                         shape=(len(single_job_ids), m))
+
+
+class JobCombinationIndex:
+    """Maps single jobs to the job combinations they are part of.
+
+    Attributes:
+      job_ids: Sorted list of job combinations (single jobs sort first).
+      single_job_ids: Sorted list of single jobs.
+      relevant_combinations: Map from single job to the indexes in job_ids
+                             of the job combinations it is part of.
+      rows: Concatenation of relevant_combinations for every single job in
+            single_job_ids, as an array.
+      positions: Position of the single job within each job combination in
+                 rows (0 or 1).
+      owners: Index in single_job_ids of the single job for each entry in
+              rows.
+      offsets: Start of each single job's entries in rows (with a trailing
+               entry equal to len(rows)).
+    """
+
+    def __init__(self, job_ids):
+        self.job_ids = job_ids
+        self.job_id_set = set(job_ids)
+        self.single_job_ids = []
+        self.relevant_combinations = {}
+        positions = {}
+        for i, job_id in enumerate(job_ids):
+            if not job_id.is_pair():
+                self.single_job_ids.append(job_id)
+            for position, single_job_id in enumerate(job_id.singletons()):
+                if single_job_id not in self.relevant_combinations:
+                    self.relevant_combinations[single_job_id] = []
+                    positions[single_job_id] = []
+                self.relevant_combinations[single_job_id].append(i)
+                positions[single_job_id].append(position)
+
+        rows = []
+        all_positions = []
+        lengths = []
+        for single_job_id in self.single_job_ids:
+            rows += self.relevant_combinations[single_job_id]
+            all_positions += positions[single_job_id]
+            lengths.append(len(self.relevant_combinations[single_job_id]))
+        self.rows = np.array(rows, dtype=np.int64)
+        self.positions = np.array(all_positions, dtype=np.int64)
+        self.owners = np.repeat(np.arange(len(self.single_job_ids)), lengths)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(
+            np.int64)
+
+
+class JobCombinationThroughputs:
+    """Per-job throughputs for job combinations, stored as one block per
+    single job.
+
+    Block i has shape (len(relevant_combinations[single_job_ids[i]]),
+    num_worker_types) and holds the throughput of single_job_ids[i] in each
+    job combination it is part of. This takes O(num_combinations) memory,
+    rather than the O(num_single_jobs * num_combinations) of a dense
+    (single job x job combination x worker type) tensor.
+    """
+
+    def __init__(self, blocks, combination_index, num_worker_types):
+        self._blocks = blocks
+        self._combination_index = combination_index
+        self.shape = (len(combination_index.single_job_ids),
+                      len(combination_index.job_ids), num_worker_types)
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __getitem__(self, i):
+        return self._blocks[i]
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def weighted_sum_matrix(self, weights=None, normalizations=None):
+        """Returns a sparse matrix W such that W @ vec(x) (with x flattened
+        in row-major order) is the vector of per-job throughputs
+        sum(throughputs[i] * weights[rows_i] * x[rows_i]) / normalizations[i]
+        for the allocation x.
+
+        Args:
+          weights: Optional (num_combinations x num_worker_types) array that
+                   scales each job combination's throughputs.
+          normalizations: Optional per-single-job array to divide each job's
+                          throughputs by.
+        """
+        (num_single_job_ids, m, n) = self.shape
+        rows = self._combination_index.rows
+        owners = self._combination_index.owners
+        values = np.vstack(self._blocks).astype(np.float64)
+        if weights is not None:
+            values = np.multiply(values, weights[rows])
+        if normalizations is not None:
+            values /= np.asarray(normalizations,
+                                 dtype=np.float64).reshape(-1)[owners][:, None]
+        columns = (rows[:, None] * n + np.arange(n)[None, :]).ravel()
+        return sp.csr_matrix((values.ravel(),
+                              (np.repeat(owners, n), columns)),
+                             shape=(num_single_job_ids, m * n))
+
+    def toarray(self):
+        """Returns the equivalent dense (single job x job combination x
+        worker type) tensor."""
+        (num_single_job_ids, m, n) = self.shape
+        dense = np.zeros(self.shape, dtype=np.float32)
+        dense[self._combination_index.owners, self._combination_index.rows] = \
+            np.vstack(self._blocks)
+        return dense
+
+
+class JobTypeIndex:
+    """Maps jobs to job types for job-type-aggregated allocations.
+
+    Column k * num_vars_per_worker_type of a job-type-aggregated allocation
+    is the fraction of time a job runs alone on worker type k, and column
+    k * num_vars_per_worker_type + 1 + j is the fraction of time it runs on
+    worker type k packed with a job of type job_type_keys[j].
+
+    Attributes:
+      job_ids: Sorted list of single jobs.
+      job_id_to_job_type_key: Map from single job to job type.
+      job_type_keys: Sorted list of job types.
+      worker_types: Sorted list of worker types.
+      job_types: Index in job_type_keys of each job's type, as an array.
+      job_type_key_to_job_idx: Map from job type to the indexes in job_ids
+                               of the jobs of that type.
+    """
+
+    def __init__(self, job_ids, job_id_to_job_type_key, job_type_keys,
+                 worker_types):
+        self.job_ids = job_ids
+        self.job_id_to_job_type_key = job_id_to_job_type_key
+        self.job_type_keys = job_type_keys
+        self.worker_types = worker_types
+        job_type_key_to_idx = {
+            job_type_key: i for i, job_type_key in enumerate(job_type_keys)
+        }
+        self.job_types = np.array(
+            [job_type_key_to_idx[job_id_to_job_type_key[job_id]]
+             for job_id in job_ids], dtype=np.int64)
+        self.job_type_key_to_job_idx = {
+            job_type_key: [] for job_type_key in job_type_keys
+        }
+        for i, job_id in enumerate(job_ids):
+            self.job_type_key_to_job_idx[
+                job_id_to_job_type_key[job_id]].append(i)
+
+    @property
+    def num_vars_per_worker_type(self):
+        return 1 + len(self.job_type_keys)
+
+
+def padded_problem_size(m):
+    """Rounds m up to the job count that problem templates are built for."""
+    padded_m = MIN_PROBLEM_TEMPLATE_SIZE
+    while padded_m < m:
+        padded_m *= 2
+    return padded_m
+
+
+def pad_rows(array, padded_m, fill=0.0):
+    """Pads the first dimension of array to padded_m rows.
+
+    Args:
+      array: Array to pad.
+      padded_m: Number of rows in the returned array.
+      fill: Either a scalar or a row to use for the padded rows.
+    """
+    array = np.asarray(array, dtype=np.float64)
+    padded_array = np.empty((padded_m,) + array.shape[1:])
+    padded_array[:array.shape[0]] = array
+    padded_array[array.shape[0]:] = fill
+    return padded_array
+
+
+class ProblemTemplate:
+    """A parameterized cvxpy problem along with its variables and parameters.
+
+    Problems are expected to be DPP-compliant, so that after the first
+    solve, cvxpy re-uses the canonicalized problem and only re-computes the
+    problem data from the new parameter values.
+    """
+
+    def __init__(self, problem, variables, parameters):
+        self.problem = problem
+        self.variables = variables
+        self.parameters = parameters
+        self.lock = threading.Lock()
+
+    def solve(self, solver, parameter_values, **kwargs):
+        """Sets parameter values and solves the problem.
+
+        Requires self.lock to be held when calling this function (and
+        while reading variable values).
+        """
+        for name, value in parameter_values.items():
+            self.parameters[name].value = value
+        return self.problem.solve(solver=solver, **kwargs)
+
+
+class ProblemTemplateCache:
+    """LRU cache of ProblemTemplates."""
+
+    def __init__(self, max_size=MAX_NUM_PROBLEM_TEMPLATES):
+        self._max_size = max_size
+        self._templates = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.enabled = True
+
+    def get(self, key, build_fn):
+        if not self.enabled:
+            return build_fn()
+        with self._lock:
+            if key in self._templates:
+                self._templates.move_to_end(key)
+                return self._templates[key]
+        template = build_fn()
+        with self._lock:
+            self._templates[key] = template
+            while len(self._templates) > self._max_size:
+                self._templates.popitem(last=False)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+_problem_template_cache = ProblemTemplateCache()
+
+
+def get_problem_template_cache():
+    """Returns the problem template cache shared by all policies."""
+    return _problem_template_cache
@@ -7,6 +7,8 @@ from policy import Policy
 
 class ProportionalPolicy(Policy):
 
+    allocation_inputs = ('throughputs', 'cluster_spec')
+
     def __init__(self):
         self._name = 'Proportional'
 
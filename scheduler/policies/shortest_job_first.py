@@ -8,6 +8,10 @@ import job_id_pair
 from policy import Policy, PolicyWithPacking
 
 class ShortestJobFirstPolicy(Policy):
+
+    allocation_inputs = ('throughputs', 'scale_factors', 'num_steps_remaining',
+                         'cluster_spec')
+
     def __init__(self, solver):
         self._name = 'ShortestJobFirst'
         self._sjf_perf_policy = \
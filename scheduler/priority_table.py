@@ -0,0 +1,219 @@
+import numpy as np
+
+# Number of rows to allocate when the table is first created.
+INITIAL_CAPACITY = 64
+
+class _WorkerTypeColumns:
+    """Per-worker-type inputs and outputs of the priority computation."""
+
+    def __init__(self, capacity):
+        self.active = np.zeros(capacity, dtype=bool)
+        self.allocation = np.zeros(capacity, dtype=np.float64)
+        self.job_time = np.zeros(capacity, dtype=np.float64)
+        self.has_time = np.zeros(capacity, dtype=bool)
+        self.zero_throughput = np.zeros(capacity, dtype=bool)
+        self.priority = np.zeros(capacity, dtype=np.float64)
+
+    def grow(self, capacity):
+        for name, column in list(vars(self).items()):
+            new_column = np.zeros(capacity, dtype=column.dtype)
+            new_column[:len(column)] = column
+            setattr(self, name, new_column)
+
+class PriorityTable:
+    """NumPy-backed table of per-worker-type job priorities.
+
+    Every job combination in the scheduler's priority data structures is
+    assigned a row. For each worker type, the table caches the inputs to the
+    priority computation (allocation, time received since the last reset,
+    and whether the combination has zero throughput). Only rows that were
+    marked dirty since the last update are re-read from the scheduler's
+    dictionaries; a full re-read happens only after the table is invalidated,
+    which the scheduler does when time run so far is reset or a new
+    allocation is installed. Priorities for all rows are then recomputed
+    with a handful of vectorized operations, and only entries whose value
+    changed are written back to the priority dictionaries.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._capacity = capacity
+        # Map from job combination to row index.
+        self._rows = {}
+        # Map from row index to job combination (None for free rows).
+        self._job_ids = [None] * capacity
+        self._free_rows = list(range(capacity - 1, -1, -1))
+        # Number of rows ever handed out; rows beyond this are untouched.
+        self._num_rows = 0
+        self._columns = {}
+        self._dirty = set()
+        self._invalidated = True
+
+    def __contains__(self, job_id):
+        return job_id in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, job_id):
+        """Assigns a row to job_id (if needed) and marks it dirty."""
+        if job_id not in self._rows:
+            if len(self._free_rows) == 0:
+                self._grow()
+            row = self._free_rows.pop()
+            self._rows[job_id] = row
+            self._job_ids[row] = job_id
+            self._num_rows = max(self._num_rows, row + 1)
+            for columns in self._columns.values():
+                columns.active[row] = False
+        self._dirty.add(job_id)
+
+    def remove(self, job_id):
+        """Releases the row assigned to job_id."""
+        row = self._rows.pop(job_id, None)
+        if row is None:
+            return
+        self._job_ids[row] = None
+        self._free_rows.append(row)
+        self._dirty.discard(job_id)
+        for columns in self._columns.values():
+            columns.active[row] = False
+
+    def mark_dirty(self, job_id):
+        """Records that the allocation, throughput, or time received by
+        job_id changed since the last update."""
+        if job_id in self._rows:
+            self._dirty.add(job_id)
+
+    def invalidate(self):
+        """Forces every row to be re-read on the next update."""
+        self._invalidated = True
+
+    def get_num_allocated(self, worker_type):
+        """Returns the number of active job combinations with a positive
+        allocation on worker_type as of the last update."""
+        columns = self._columns.get(worker_type)
+        if columns is None:
+            return 0
+        n = self._num_rows
+        return int(np.count_nonzero(columns.active[:n] &
+                                    (columns.allocation[:n] > 0.0)))
+
+    def update(self, priorities, allocation, throughputs, job_time_so_far,
+               worker_time_so_far, elapsed_job_time=None,
+               elapsed_worker_time=None):
+        """Recomputes priorities and writes changed values to `priorities`.
+
+        Args:
+          priorities: Map from worker type to map from job combination to
+                      priority; updated in place.
+          allocation: Map from job combination to map from worker type to
+                      fraction of time allocated.
+          throughputs: Map from job combination to map from worker type to
+                       throughput.
+          job_time_so_far: Map from job combination to map from worker type
+                           to time received since the last reset.
+          worker_time_so_far: Map from worker type to total time spent
+                              running jobs since the last reset.
+          elapsed_job_time: Optional map from job combination to map from
+                            worker type to unaccounted time for in-flight
+                            microtasks.
+          elapsed_worker_time: Optional map from worker type to unaccounted
+                               time for in-flight microtasks.
+        """
+        new_worker_types = False
+        for worker_type in priorities:
+            if worker_type not in self._columns:
+                self._columns[worker_type] = \
+                    _WorkerTypeColumns(self._capacity)
+                new_worker_types = True
+        if self._invalidated or new_worker_types:
+            for worker_type in priorities:
+                for job_id in priorities[worker_type]:
+                    if job_id not in self._rows:
+                        self.add(job_id)
+            dirty_rows = list(self._rows.values())
+        else:
+            dirty_rows = [self._rows[job_id] for job_id in self._dirty]
+        for row in dirty_rows:
+            self._refresh_row(row, priorities, allocation, throughputs,
+                              job_time_so_far)
+        self._dirty = set()
+        self._invalidated = False
+
+        n = self._num_rows
+        for worker_type, columns in self._columns.items():
+            if worker_type not in priorities:
+                continue
+            worker_time = worker_time_so_far.get(worker_type, 0.0)
+            job_time = columns.job_time[:n]
+            if elapsed_worker_time is not None:
+                if worker_type in elapsed_worker_time:
+                    worker_time += elapsed_worker_time[worker_type]
+                job_time = job_time.copy()
+                for job_id in elapsed_job_time:
+                    if (job_id in self._rows and
+                        worker_type in elapsed_job_time[job_id]):
+                        job_time[self._rows[job_id]] += \
+                            elapsed_job_time[job_id][worker_type]
+
+            allocations = columns.allocation[:n]
+            if worker_time == 0.0:
+                fractions = np.zeros(n, dtype=np.float64)
+            else:
+                fractions = np.where(columns.has_time[:n],
+                                     job_time / worker_time, 0.0)
+            # Don't use inf so 2*new_priority > new_priority.
+            #
+            # Scale the default value by the allocation so that newly
+            # added jobs run according to their respective allocations.
+            new_priorities = allocations * 1e9
+            received_time = fractions > 0.0
+            new_priorities[received_time] = \
+                allocations[received_time] / fractions[received_time]
+            new_priorities[columns.zero_throughput[:n]] = 0.0
+
+            changed = new_priorities != columns.priority[:n]
+            changed[dirty_rows] = True
+            changed &= columns.active[:n]
+            columns.priority[:n] = new_priorities
+            worker_type_priorities = priorities[worker_type]
+            for row in np.flatnonzero(changed):
+                worker_type_priorities[self._job_ids[row]] = \
+                    float(new_priorities[row])
+
+    def _refresh_row(self, row, priorities, allocation, throughputs,
+                     job_time_so_far):
+        job_id = self._job_ids[row]
+        job_times = job_time_so_far.get(job_id)
+        job_allocation = allocation.get(job_id)
+        for worker_type, columns in self._columns.items():
+            columns.active[row] = (worker_type in priorities and
+                                   job_id in priorities[worker_type])
+            if job_times is not None and worker_type in job_times:
+                columns.has_time[row] = True
+                columns.job_time[row] = job_times[worker_type]
+            else:
+                columns.has_time[row] = False
+                columns.job_time[row] = 0.0
+            columns.zero_throughput[row] = False
+            if job_allocation is None or not columns.active[row]:
+                columns.allocation[row] = 0.0
+                continue
+            columns.allocation[row] = job_allocation[worker_type]
+            if columns.allocation[row] != 0.0:
+                throughput = throughputs[job_id][worker_type]
+                if job_id.is_pair():
+                    columns.zero_throughput[row] = \
+                        (throughput[0] == 0 or throughput[1] == 0)
+                else:
+                    columns.zero_throughput[row] = (throughput == 0)
+
+    def _grow(self):
+        new_capacity = 2 * self._capacity
+        self._job_ids += [None] * (new_capacity - self._capacity)
+        self._free_rows = \
+            list(range(new_capacity - 1, self._capacity - 1, -1)) + \
+            self._free_rows
+        for columns in self._columns.values():
+            columns.grow(new_capacity)
+        self._capacity = new_capacity
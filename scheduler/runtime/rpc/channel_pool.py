@@ -0,0 +1,112 @@
+import grpc
+import os
+import threading
+
+# Seconds between keepalive pings on idle channels, and seconds to wait for a
+# ping to be acknowledged before the connection is considered dead.
+KEEPALIVE_TIME = 30
+KEEPALIVE_TIMEOUT = 10
+# Backoff (in seconds) between attempts to re-establish a broken connection.
+# The maximum is kept well below the round duration so that a restarted
+# server is reachable again by the next round.
+INITIAL_RECONNECT_BACKOFF = 1
+MAX_RECONNECT_BACKOFF = 10
+
+CHANNEL_OPTIONS = [
+    ('grpc.keepalive_time_ms', KEEPALIVE_TIME * 1000),
+    ('grpc.keepalive_timeout_ms', KEEPALIVE_TIMEOUT * 1000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    ('grpc.initial_reconnect_backoff_ms', INITIAL_RECONNECT_BACKOFF * 1000),
+    ('grpc.min_reconnect_backoff_ms', INITIAL_RECONNECT_BACKOFF * 1000),
+    ('grpc.max_reconnect_backoff_ms', MAX_RECONNECT_BACKOFF * 1000),
+]
+
+# Options for servers that accept pooled channels: servers otherwise reject
+# keepalive pings on idle connections and close them.
+SERVER_OPTIONS = [
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.min_recv_ping_interval_without_data_ms',
+     KEEPALIVE_TIME * 1000),
+    ('grpc.http2.max_ping_strikes', 0),
+]
+
+class ChannelPool:
+    """Thread-safe pool of long-lived gRPC channels and stubs.
+
+    One channel is kept open per destination (an 'ip_addr:port' string) and
+    shared by all RPC clients in the process, so that connection setup is
+    paid once instead of on every call. Channels send keepalive pings and
+    reconnect with bounded backoff if the connection breaks. gRPC channels
+    cannot be used across fork(), so a forked child starts with an empty
+    pool.
+    """
+
+    def __init__(self, options=CHANNEL_OPTIONS):
+        self._options = options
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        # Map from destination to channel.
+        self._channels = {}
+        # Map from (destination, stub class) to stub.
+        self._stubs = {}
+
+    def get_channel(self, target):
+        with self._lock:
+            self._check_pid()
+            channel = self._channels.get(target)
+            if channel is None:
+                channel = grpc.insecure_channel(target, options=self._options)
+                self._channels[target] = channel
+            return channel
+
+    def get_stub(self, target, stub_class):
+        key = (target, stub_class)
+        stub = self._stubs.get(key)
+        if stub is not None and self._pid == os.getpid():
+            return stub
+        channel = self.get_channel(target)
+        with self._lock:
+            stub = self._stubs.get(key)
+            if stub is None:
+                stub = stub_class(channel)
+                self._stubs[key] = stub
+            return stub
+
+    def close_channel(self, target):
+        """Closes the channel to target, if any; later calls reconnect."""
+        with self._lock:
+            self._check_pid()
+            channel = self._channels.pop(target, None)
+            for key in [key for key in self._stubs if key[0] == target]:
+                del self._stubs[key]
+        if channel is not None:
+            channel.close()
+
+    def close(self):
+        with self._lock:
+            self._check_pid()
+            channels = list(self._channels.values())
+            self._channels = {}
+            self._stubs = {}
+        for channel in channels:
+            channel.close()
+
+    def _check_pid(self):
+        # Requires self._lock to be held.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._channels = {}
+            self._stubs = {}
+
+_channel_pool = None
+_channel_pool_lock = threading.Lock()
+
+def get_channel_pool():
+    """Returns the process-wide channel pool."""
+    global _channel_pool
+    if _channel_pool is None:
+        with _channel_pool_lock:
+            if _channel_pool is None:
+                _channel_pool = ChannelPool()
+    return _channel_pool
@@ -1,4 +1,7 @@
+import asyncio
+import collections
 from concurrent import futures
+import threading
 import time
 
 import grpc
@@ -16,11 +19,52 @@ import iterator_to_scheduler_pb2 as i2s_pb2
 import iterator_to_scheduler_pb2_grpc as i2s_pb2_grpc
 import common_pb2
 from job_id_pair import JobIdPair
+from runtime.rpc.channel_pool import SERVER_OPTIONS
 
 _ONE_DAY_IN_SECONDS = 60 * 60 * 24
 LOG_FORMAT = '{name}:{levelname} [{asctime}] {message}'
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+# Returned by callbacks invoked with wait=False instead of blocking until the
+# scheduler's state changes: event is a concurrent.futures.Future that is
+# completed on the next state change, after which resume() retries the
+# callback (again without blocking). If timeout (in seconds) is not None,
+# the callback is also retried once the timeout expires.
+PendingCallback = collections.namedtuple('PendingCallback',
+                                         ['event', 'resume', 'timeout'],
+                                         defaults=[None])
+
+class SchedulerCondition(threading.Condition):
+    """Condition variable that can also wake waiters that do not hold a thread.
+
+    add_waiter() returns a future that is completed by the next call to
+    notify_all(), which lets callbacks return a PendingCallback instead of
+    blocking in wait().
+    """
+
+    def __init__(self, lock=None):
+        super().__init__(lock)
+        self._future_waiters = []
+
+    def add_waiter(self):
+        # Requires the lock to be held.
+        future = futures.Future()
+        self._future_waiters.append(future)
+        return future
+
+    def notify_all(self):
+        super().notify_all()
+        future_waiters = self._future_waiters
+        self._future_waiters = []
+        for future in future_waiters:
+            try:
+                future.set_result(None)
+            except futures.InvalidStateError:
+                # The waiter timed out and was cancelled.
+                pass
+
+    notifyAll = notify_all
+
 class SchedulerRpcServer(w2s_pb2_grpc.WorkerToSchedulerServicer):
     def __init__(self, callbacks, logger):
         self._callbacks = callbacks
@@ -59,18 +103,7 @@ class SchedulerRpcServer(w2s_pb2_grpc.WorkerToSchedulerServicer):
     def Done(self, request, context):
         done_callback = self._callbacks['Done']
         try:
-            if len(request.job_id) > 1:
-                job_id = JobIdPair(request.job_id[0], request.job_id[1])
-            else:
-                job_id = JobIdPair(request.job_id[0], None)
-            self._logger.info(
-                'Received completion notification: '
-                'Job ID: {job_id}, Worker ID: {worker_id}, '
-                'Num steps: {num_steps}, '
-                'Execution time: {execution_time}'.format(
-                    job_id=job_id, worker_id=request.worker_id,
-                    num_steps=str(request.num_steps),
-                    execution_time=str(request.execution_time)))
+            job_id = self._log_done_request(request)
             done_callback(job_id, request.worker_id,
                           request.num_steps, request.execution_time,
                           request.iterator_log)
@@ -81,6 +114,21 @@ class SchedulerRpcServer(w2s_pb2_grpc.WorkerToSchedulerServicer):
 
         return common_pb2.Empty()
 
+    def _log_done_request(self, request):
+        if len(request.job_id) > 1:
+            job_id = JobIdPair(request.job_id[0], request.job_id[1])
+        else:
+            job_id = JobIdPair(request.job_id[0], None)
+        self._logger.info(
+            'Received completion notification: '
+            'Job ID: {job_id}, Worker ID: {worker_id}, '
+            'Num steps: {num_steps}, '
+            'Execution time: {execution_time}'.format(
+                job_id=job_id, worker_id=request.worker_id,
+                num_steps=str(request.num_steps),
+                execution_time=str(request.execution_time)))
+        return job_id
+
 class SchedulerIteratorRpcServer(i2s_pb2_grpc.IteratorToSchedulerServicer):
     def __init__(self, callbacks, logger):
         self._callbacks = callbacks
@@ -91,7 +139,11 @@ class SchedulerIteratorRpcServer(i2s_pb2_grpc.IteratorToSchedulerServicer):
         self._logger.info(
             'Received job initialization request from job {0}'.format(job_id))
         init_job_callback = self._callbacks['InitJob']
-        max_steps, max_duration, extra_time = init_job_callback(job_id=job_id)
+        lease = init_job_callback(job_id=job_id)
+        return self._init_job_response(job_id, lease)
+
+    def _init_job_response(self, job_id, lease):
+        (max_steps, max_duration, extra_time) = lease
         if max_steps > 0 and max_duration > 0:
             self._logger.info(
                 'Initialized job {job_id} with initial lease '
@@ -106,6 +158,22 @@ class SchedulerIteratorRpcServer(i2s_pb2_grpc.IteratorToSchedulerServicer):
                                            extra_time=extra_time)
 
     def UpdateLease(self, request, context):
+        job_id = self._log_update_lease_request(request)
+        update_lease_callback = self._callbacks['UpdateLease']
+        try:
+            lease = \
+                update_lease_callback(job_id=job_id,
+                                      worker_id=request.worker_id,
+                                      steps=request.steps,
+                                      duration=request.duration,
+                                      max_steps=request.max_steps,
+                                      max_duration=request.max_duration,
+                                      gang=request.gang)
+        except Exception as e:
+            lease = e
+        return self._update_lease_response(job_id, request, lease)
+
+    def _log_update_lease_request(self, request):
         job_id = JobIdPair(request.job_id, None)
         self._logger.info(
             'Received lease update request: '
@@ -116,40 +184,144 @@ class SchedulerIteratorRpcServer(i2s_pb2_grpc.IteratorToSchedulerServicer):
                 steps=request.steps, duration=request.duration,
                 max_steps=request.max_steps,
                 max_duration=request.max_duration))
+        return job_id
 
-        update_lease_callback = self._callbacks['UpdateLease']
-        try:
-            (max_steps, max_duration) = \
-                update_lease_callback(job_id=job_id,
-                                      worker_id=request.worker_id,
-                                      steps=request.steps,
-                                      duration=request.duration,
-                                      max_steps=request.max_steps,
-                                      max_duration=request.max_duration)
+    def _update_lease_response(self, job_id, request, lease):
+        # lease is either a (max_steps, max_duration) tuple or the exception
+        # raised by the callback, in which case the current lease is kept.
+        if isinstance(lease, Exception):
+            self._logger.error(
+                'Could not update lease for job {0}: {1}'.format(
+                    job_id, str(lease)))
+            max_steps = request.max_steps
+            max_duration = request.max_duration
+        else:
+            (max_steps, max_duration) = lease
             self._logger.info(
                 'Sending new lease to job {job_id} (worker {worker_id}) '
                 'with max_steps={max_steps}, '
                 'max_duration={max_duration:.2f}'.format(
                     job_id=job_id, worker_id=request.worker_id,
                     max_steps=max_steps, max_duration=max_duration))
-        except Exception as e:
-            self._logger.error(
-                'Could not update lease for job {0}: {1}'.format(
-                    job_id, str(e)))
-            max_steps = request.max_steps
-            max_duration = request.max_duration
 
         return i2s_pb2.UpdateLeaseResponse(max_steps=max_steps,
                                            max_duration=max_duration)
 
-def serve(port, callbacks):
+class _CallbackActor:
+    """Runs callbacks one at a time on a single dedicated thread.
+
+    Callbacks that would block return a PendingCallback; the calling
+    coroutine then awaits the state change without holding the thread, so
+    that other RPCs are served in the meantime.
+    """
+
+    def __init__(self):
+        self._executor = futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='scheduler_callbacks')
+
+    async def call(self, callback, **kwargs):
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+                self._executor, lambda: callback(**kwargs))
+        while isinstance(result, PendingCallback):
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(result.event),
+                                       result.timeout)
+            except asyncio.TimeoutError:
+                pass
+            result = await loop.run_in_executor(self._executor, result.resume)
+        return result
+
+class AsyncSchedulerRpcServer(SchedulerRpcServer):
+    def __init__(self, callbacks, logger, actor):
+        super().__init__(callbacks, logger)
+        self._actor = actor
+
+    async def RegisterWorker(self, request, context):
+        register_worker_callback = self._callbacks['RegisterWorker']
+        try:
+            worker_ids, round_duration = await self._actor.call(
+                register_worker_callback, worker_type=request.worker_type,
+                num_gpus=request.num_gpus, ip_addr=request.ip_addr,
+                port=request.port)
+            self._logger.info(
+                'Successfully registered {worker_type} worker '
+                'with id(s) {worker_ids}'.format(
+                    worker_type=request.worker_type,
+                    worker_ids=str(worker_ids)))
+            return w2s_pb2.RegisterWorkerResponse(success=True,
+                                                  worker_ids=worker_ids,
+                                                  round_duration=round_duration)
+        except Exception as e:
+            self._logger.error('Could not register worker: {0}'.format(e))
+            return w2s_pb2.RegisterWorkerResponse(success=False,
+                                                  error_message=str(e))
+
+    async def SendHeartbeat(self, request, context):
+        send_heartbeat_callback = self._callbacks['SendHeartbeat']
+        await self._actor.call(send_heartbeat_callback)
+        return common_pb2.Empty()
+
+    async def Done(self, request, context):
+        done_callback = self._callbacks['Done']
+        try:
+            job_id = self._log_done_request(request)
+            await self._actor.call(done_callback, job_id=job_id,
+                                   worker_id=request.worker_id,
+                                   all_num_steps=request.num_steps,
+                                   all_execution_times=request.execution_time,
+                                   all_iterator_logs=request.iterator_log,
+                                   wait=False)
+        except Exception as e:
+            self._logger.error('Could not process completion '
+                               'notification for job {0}'.format(job_id))
+            traceback.print_exc()
+
+        return common_pb2.Empty()
+
+class AsyncSchedulerIteratorRpcServer(SchedulerIteratorRpcServer):
+    def __init__(self, callbacks, logger, actor):
+        super().__init__(callbacks, logger)
+        self._actor = actor
+
+    async def InitJob(self, request, context):
+        job_id = JobIdPair(request.job_id, None)
+        self._logger.info(
+            'Received job initialization request from job {0}'.format(job_id))
+        init_job_callback = self._callbacks['InitJob']
+        lease = await self._actor.call(init_job_callback, job_id=job_id,
+                                       wait=False)
+        return self._init_job_response(job_id, lease)
+
+    async def UpdateLease(self, request, context):
+        job_id = self._log_update_lease_request(request)
+        update_lease_callback = self._callbacks['UpdateLease']
+        try:
+            lease = await self._actor.call(update_lease_callback,
+                                           job_id=job_id,
+                                           worker_id=request.worker_id,
+                                           steps=request.steps,
+                                           duration=request.duration,
+                                           max_steps=request.max_steps,
+                                           max_duration=request.max_duration,
+                                           gang=request.gang,
+                                           wait=False)
+        except Exception as e:
+            lease = e
+        return self._update_lease_response(job_id, request, lease)
+
+def _get_logger():
     logger = logging.getLogger(__name__)
     logger.setLevel(logging.DEBUG)
     ch = logging.StreamHandler()
     ch.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT,
                                       style='{'))
     logger.addHandler(ch)
-    server = grpc.server(futures.ThreadPoolExecutor())
+    return logger
+
+def serve(port, callbacks):
+    logger = _get_logger()
+    server = grpc.server(futures.ThreadPoolExecutor(), options=SERVER_OPTIONS)
     w2s_pb2_grpc.add_WorkerToSchedulerServicer_to_server(
             SchedulerRpcServer(callbacks, logger), server)
     i2s_pb2_grpc.add_IteratorToSchedulerServicer_to_server(
@@ -163,3 +335,38 @@ def serve(port, callbacks):
             time.sleep(_ONE_DAY_IN_SECONDS)
     except KeyboardInterrupt:
         server.stop(0)
+
+def create_async_server(address, callbacks, logger):
+    """Returns an unstarted asyncio server listening on address.
+
+    Callbacks run one at a time on a single thread. The InitJob,
+    UpdateLease, and Done callbacks are invoked with wait=False, and may
+    return a PendingCallback instead of blocking; the RPC then waits on the
+    event loop, so that waiting RPCs do not hold any threads.
+    """
+    server = grpc.aio.server(options=SERVER_OPTIONS)
+    actor = _CallbackActor()
+    w2s_pb2_grpc.add_WorkerToSchedulerServicer_to_server(
+            AsyncSchedulerRpcServer(callbacks, logger, actor), server)
+    i2s_pb2_grpc.add_IteratorToSchedulerServicer_to_server(
+            AsyncSchedulerIteratorRpcServer(callbacks, logger, actor), server)
+    server.add_insecure_port(address)
+    return server
+
+def serve_async(port, callbacks):
+    """Like serve, but runs an asyncio server (see create_async_server)."""
+    logger = _get_logger()
+    ip_address = socket.gethostbyname(socket.gethostname())
+
+    async def run_server():
+        server = create_async_server('%s:%d' % (ip_address, port), callbacks,
+                                     logger)
+        logger.info('Starting asynchronous server at {0}:{1}'.format(
+            ip_address, port))
+        await server.start()
+        await server.wait_for_termination()
+
+    try:
+        asyncio.run(run_server())
+    except KeyboardInterrupt:
+        pass
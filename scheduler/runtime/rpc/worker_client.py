@@ -7,6 +7,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '../rpc_stubs'))
 
 import worker_to_scheduler_pb2 as w2s_pb2
 import worker_to_scheduler_pb2_grpc as w2s_pb2_grpc
+from runtime.rpc.channel_pool import get_channel_pool
 
 LOG_FORMAT = '{name}:{levelname} [{asctime}] {message}'
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
@@ -31,27 +32,30 @@ class WorkerRpcClient:
         # TODO: Remove self._sched_ip_addr and self._sched_port?
         self._sched_loc = '%s:%d' % (sched_ip_addr, sched_port)
 
+    def _get_stub(self):
+        return get_channel_pool().get_stub(
+            self._sched_loc, w2s_pb2_grpc.WorkerToSchedulerStub)
+
     def register_worker(self, num_gpus):
         request = w2s_pb2.RegisterWorkerRequest(
             worker_type=self._worker_type,
             ip_addr=self._worker_ip_addr,
             port=self._worker_port,
             num_gpus=num_gpus)
-        with grpc.insecure_channel(self._sched_loc) as channel:
-            self._logger.debug('Trying to register worker...')
-            stub = w2s_pb2_grpc.WorkerToSchedulerStub(channel)
-            response = stub.RegisterWorker(request)
-            if response.success:
-                self._logger.info(
-                    'Succesfully registered worker with id(s) {worker_id}, '
-                    'round_duration={round_duration}'.format(
-                        worker_id=str(response.worker_ids),
-                        round_duration=response.round_duration))
-                return (response.worker_ids, response.round_duration, None)
-            else:
-                assert(response.HasField('error'))
-                self._logger.error('Failed to register worker!')
-                return (None, response.error)
+        self._logger.debug('Trying to register worker...')
+        stub = self._get_stub()
+        response = stub.RegisterWorker(request)
+        if response.success:
+            self._logger.info(
+                'Succesfully registered worker with id(s) {worker_id}, '
+                'round_duration={round_duration}'.format(
+                    worker_id=str(response.worker_ids),
+                    round_duration=response.round_duration))
+            return (response.worker_ids, response.round_duration, None)
+        else:
+            assert(response.HasField('error'))
+            self._logger.error('Failed to register worker!')
+            return (None, response.error)
 
     def notify_scheduler(self, worker_id, job_descriptions):
         # Send a Done message.
@@ -62,14 +66,13 @@ class WorkerRpcClient:
             request.execution_time.append(job_description[1])
             request.num_steps.append(job_description[2])
             request.iterator_log.append(job_description[3])
-        with grpc.insecure_channel(self._sched_loc) as channel:
-            stub = w2s_pb2_grpc.WorkerToSchedulerStub(channel)
-            response = stub.Done(request)
-            job_ids = \
-              [job_description[0] for job_description in job_descriptions]
-            if len(job_ids) == 1:
-              self._logger.debug('Notified scheduler that '
-                                 'job {0} has completed'.format(job_ids[0]))
-            else:
-              self._logger.debug('Notified scheduler that '
-                                 'jobs {0} have completed'.format(job_ids))
+        stub = self._get_stub()
+        response = stub.Done(request)
+        job_ids = \
+          [job_description[0] for job_description in job_descriptions]
+        if len(job_ids) == 1:
+          self._logger.debug('Notified scheduler that '
+                             'job {0} has completed'.format(job_ids[0]))
+        else:
+          self._logger.debug('Notified scheduler that '
+                             'jobs {0} have completed'.format(job_ids))
@@ -14,6 +14,7 @@ import common_pb2
 import enums_pb2
 
 import job
+from runtime.rpc.channel_pool import SERVER_OPTIONS
 
 _ONE_DAY_IN_SECONDS = 60 * 60 * 24
 LOG_FORMAT = '{name}:{levelname} [{asctime}] {message}'
@@ -65,7 +66,8 @@ def serve(port, callbacks):
                                       style='{'))
     logger.addHandler(ch)
     condition = threading.Condition()
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10),
+                         options=SERVER_OPTIONS)
     s2w_pb2_grpc.add_SchedulerToWorkerServicer_to_server(
             WorkerServer(callbacks, condition, logger), server)
 
@@ -3,12 +3,14 @@ from __future__ import print_function
 import collections
 import copy
 import faulthandler
+import functools
 import heapq
 import numpy as np
 import os
 # from preconditions import preconditions
 import queue
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import concurrent.futures
 import threading
 import time
 import datetime
@@ -16,17 +18,25 @@ import random
 import sched
 import math
 import matrix_completion
+import multiprocessing
 import warnings
 import logging
 
 # TODO: clean these up.
+from allocation_state import AllocationState, ThroughputSnapshots
+from arrival_queue import ArrivalQueue
 from job import Job
 import job_id_pair
+from job_state_store import JobStateStore
 from job_table import JobTable
+from priority_table import PriorityTable
 from runtime.rpc import scheduler_server, scheduler_client
 import set_queue
+from spot_price_index import SpotPriceIndex
 from custom_logging import SchedulerAdapter
+import event_log
 from throughput_estimator import ThroughputEstimator
+from throughput_oracle import ThroughputOracle
 import utils
 
 """ Constants """
@@ -52,6 +62,40 @@ JOB_COMPLETION_BUFFER_TIME = 60
 BASE_JOB_PORT = 60570
 # Maximum port number.
 MAX_PORT = 65535
+# Maximum number of rounds skipped by a single simulator fast-forward.
+MAX_FAST_FORWARD_ROUNDS = 1000
+# Maximum time (in seconds) the workers of a distributed job wait for the
+# first worker to compute their lease before computing it themselves.
+LEASE_AGREEMENT_TIMEOUT = 10
+
+def _solve_allocation(policy, aggregate_job_types, state):
+    """Computes an allocation using the passed-in policy and AllocationState.
+
+    Only depends on its arguments, so that it can run in a separate process
+    when allocations are computed asynchronously in simulation.
+
+    Returns:
+        The allocation (None if the policy did not return one), the
+        wall-clock time spent computing it (in seconds), and the policy,
+        whose internal state may have been updated.
+    """
+    start_time = time.time()
+    if aggregate_job_types:
+        # Solve over job types rather than job combinations, using the
+        # oracle job type throughputs.
+        allocation = policy.get_allocation_using_job_type_throughputs(
+            *state.get_inputs(policy.job_type_allocation_inputs))
+        if allocation is not None:
+            # Drop job pairs that are never co-located (e.g., pairs of jobs
+            # with different scale factors).
+            allocation = {
+                job_id: allocation[job_id] for job_id in allocation
+                if job_id in state.throughputs
+            }
+    else:
+        allocation = policy.get_allocation(
+            *state.get_inputs(policy.allocation_inputs))
+    return allocation, time.time() - start_time, policy
 
 class Scheduler:
 
@@ -65,7 +109,12 @@ class Scheduler:
                  enable_global_queue=False,
                  expected_num_workers=None,
                  minimum_time_between_allocation_resets=1920,
-                 max_rounds=None):
+                 max_rounds=None,
+                 aggregate_job_types=False,
+                 event_log_file=None,
+                 asynchronous_allocation=False,
+                 allocation_latency=None,
+                 asynchronous_rpc_server=False):
 
         # Flag to control whether scheduler runs in simulation mode.
         self._simulate = simulate
@@ -90,6 +139,15 @@ class Scheduler:
                              {'scheduler': self,
                               'start_timestamp': datetime.datetime.now()})
         self._logging_handler = ch
+        # Structured log of job and micro-task events. If enabled, replaces
+        # the per-micro-task text log lines.
+        self._event_log = None
+        if event_log_file is not None:
+            self._event_log = event_log.EventLog(
+                event_log_file,
+                metadata={'policy': policy.name, 'seed': seed,
+                          'simulate': simulate,
+                          'time_per_iteration': time_per_iteration})
 
         # Print config information.
         if simulate:
@@ -116,6 +174,33 @@ class Scheduler:
         # Sets whether to use a global queue across all worker types.
         self._enable_global_queue = enable_global_queue
 
+        # Sets whether to compute allocations over job types rather than
+        # job combinations (only supported by packed policies).
+        if aggregate_job_types:
+            assert(policy.job_type_allocation_inputs is not None)
+        self._aggregate_job_types = aggregate_job_types
+
+        # In simulation, optionally compute allocations in a separate
+        # process while the simulation proceeds, and only apply each
+        # allocation once its solve latency (the configured
+        # allocation_latency, or the measured solve time if None) has
+        # elapsed in simulated time.
+        self._allocation_executor = None
+        if asynchronous_allocation:
+            if not simulate:
+                raise ValueError('Asynchronous allocation computation is '
+                                 'only supported in simulation')
+            # The worker process is spawned rather than forked, since a
+            # child forked from the (multithreaded) scheduler can deadlock
+            # on a lock held by another thread at the time of the fork.
+            self._allocation_executor = \
+                ProcessPoolExecutor(max_workers=1,
+                                    mp_context=multiprocessing.get_context(
+                                        'spawn'))
+        self._allocation_latency = allocation_latency
+        # The in-progress asynchronous allocation computation, if any.
+        self._pending_allocation = None
+
         self._expected_num_workers = expected_num_workers
         self._minimum_time_between_allocation_resets = \
             minimum_time_between_allocation_resets
@@ -151,7 +236,8 @@ class Scheduler:
         # Synchronization primitives to ensure thread-safe updates of
         # scheduler metadata.
         self._scheduler_lock = threading.Lock()
-        self._scheduler_cv = threading.Condition(self._scheduler_lock)
+        self._scheduler_cv = \
+            scheduler_server.SchedulerCondition(self._scheduler_lock)
         # List of available worker IDs.
         self._available_worker_ids = set_queue.SetQueue()
         # Allocations for all current incomplete applications.
@@ -171,6 +257,12 @@ class Scheduler:
         self._num_lease_extensions = 0
         # The total number of instances where leasees could have been extended.
         self._num_lease_extension_opportunities = 0
+        # The number of allocations computed and the total wall-clock time
+        # (in seconds) spent computing them.
+        self._num_allocation_computations = 0
+        self._allocation_computation_time = 0.0
+        # The number of rounds skipped by fast-forwarding in simulation.
+        self._num_fast_forwarded_rounds = 0
         # Event scheduler to trigger round completions for jobs with
         # extended leases.
         self._completion_event_scheduler = \
@@ -187,9 +279,9 @@ class Scheduler:
         # Total number of iterations run for each incomplete job across
         # all worker types.
         self._total_steps_run = {}
-        # Time run so far on each worker_id, for all current incomplete
-        # applications.
-        self._job_time_so_far = {}
+        # Time run so far on each worker_id and deficits, for all current
+        # incomplete applications.
+        self._job_state = JobStateStore()
         # Total cost of each job so far.
         self._job_cost_so_far = {}
         # Time spent running any application on each worker, for all current
@@ -203,7 +295,8 @@ class Scheduler:
         self._jobs = {}
         # Priority queues for each worker_type.
         self._priorities = {}
-        self._deficits = {}
+        # Array-backed cache of the inputs used to compute priorities.
+        self._priority_table = PriorityTable()
         # Number of failures per job.
         self._num_failures_per_job = {}
         # Timestamp when data structures recording elapsed time was last reset.
@@ -216,6 +309,8 @@ class Scheduler:
         # Measured and predicted throughputs for all current incomplete
         # applications.
         self._throughputs = {}
+        # Copy-on-write snapshots of self._throughputs passed to the policy.
+        self._throughput_snapshots = ThroughputSnapshots()
         # Throughputs measured with respect to job types rather than
         # individual jobs.
         # TODO: Use this to replace self._throughputs.
@@ -224,10 +319,13 @@ class Scheduler:
         self._job_id_to_job_type = {}
         # Map from application to set of job IDs.
         self._job_type_to_job_ids = {}
+        # Map from single job ID to the job pairs containing it, in the
+        # order the job pairs were added to self._throughputs (values are
+        # unused).
+        self._job_pairs = {}
         # Throughputs for all job types (pre-measured).
         if throughputs_file is not None:
-            self._oracle_throughputs = utils.read_all_throughputs_json_v2(
-                throughputs_file)
+            self._oracle_throughputs = ThroughputOracle.load(throughputs_file)
         else:
             self._oracle_throughputs = None
         # Flag to indicate whether throughputs should be estimated online.
@@ -242,23 +340,30 @@ class Scheduler:
             self._reference_throughputs = \
                 self._throughput_estimator.get_reference_throughputs()
             self._reference_job_map = {}
+            # Profiles of jobs whose reference job types are provisional,
+            # which are matched in batches (by a background thread if not
+            # in simulation, and at the start of each round otherwise).
+            self._pending_reference_job_profiles = {}
         if per_instance_type_prices_dir is not None:
-            self._per_instance_type_spot_prices = \
+            self._spot_prices = SpotPriceIndex(
                 utils.read_per_instance_type_spot_prices_json(
-                    per_instance_type_prices_dir)
+                    per_instance_type_prices_dir),
+                set(available_clouds))
             self._per_worker_type_prices = {}
-            self._available_clouds = set(available_clouds)
             if assign_SLOs:
                 self._SLOs = {}
             else:
                 self._SLOs = None
         else:
             self._SLOs = None
-            self._per_instance_type_spot_prices = None
+            self._spot_prices = None
             self._per_worker_type_prices = None
         # The per-round maximum number of steps to run for distributed jobs.
         # Indexed by single job IDs.
         self._max_steps = {}
+        # Condition variables notified when the per-round maximum number of
+        # steps of a distributed job is computed. Indexed by single job IDs.
+        self._lease_agreement_cvs = {}
         # All per-round lease update requests for distributed jobs.
         # Indexed by single job IDs.
         self._lease_update_requests = {}
@@ -301,9 +406,20 @@ class Scheduler:
             self._allocation_thread.daemon = True
             self._allocation_thread.start()
 
+            if self._estimate_throughputs:
+                self._throughput_estimation_thread = \
+                    threading.Thread(target=self._throughput_estimation_thread)
+                self._throughput_estimation_thread.daemon = True
+                self._throughput_estimation_thread.start()
+
+            # The asynchronous server serves RPCs that wait for the
+            # scheduler's state to change without holding a thread each.
+            if asynchronous_rpc_server:
+                serve = scheduler_server.serve_async
+            else:
+                serve = scheduler_server.serve
             self.server_thread = threading.Thread(
-                target=scheduler_server.serve,
-                args=(port, callbacks))
+                target=serve, args=(port, callbacks))
             self.server_thread.daemon = True
             self.server_thread.start()
 
@@ -346,11 +462,8 @@ class Scheduler:
         assert(self._per_worker_type_prices is not None)
         current_time = self.get_current_timestamp(in_seconds=True)
         for worker_type in self._per_worker_type_prices:
-            latest_price = \
-                utils.get_latest_price_for_worker_type(
-                    worker_type, current_time,
-                    self._per_instance_type_spot_prices,
-                    self._available_clouds)
+            latest_price = self._spot_prices.get_latest_price(worker_type,
+                                                              current_time)
             if self._per_worker_type_prices[worker_type] != latest_price:
                 self._per_worker_type_prices[worker_type] = latest_price
                 self._scheduler_cv.acquire()
@@ -363,19 +476,21 @@ class Scheduler:
         # Job might have already completed.
         if job_id not in self._throughputs:
             return
+        self._priority_table.mark_dirty(job_id)
+        self._throughput_snapshots.mark_dirty(job_id)
         if self._simulate and self._estimate_throughputs:
             if not job_id.is_pair():
                 # Assume single job throughputs are already populated.
                 return
             else:
-                oracle_throughputs = self._oracle_throughputs[worker_type]
                 scale_factor = self._jobs[job_id.singletons()[0]].scale_factor
                 job_types = []
                 for single_job_id in job_id.singletons():
                     job_types.append((self._jobs[single_job_id].job_type,
                                       scale_factor))
                 self._throughputs[job_id][worker_type] = \
-                    oracle_throughputs[job_types[0]][job_types[1]]
+                    self._oracle_throughputs.get_colocated_throughputs(
+                        worker_type, job_types[0], job_types[1])
         elif not self._simulate:
             # Adjust the job throughput using an exponential moving average
             # between the old value and the new measurement.
@@ -421,10 +536,10 @@ class Scheduler:
         self._job_type_throughputs[job_type_key] = {}
         other_job_type_keys = list(self._job_type_throughputs.keys())
         for worker_type in self._worker_types:
-            oracle_throughputs = self._oracle_throughputs[worker_type]
             self._job_type_throughputs[job_type_key][worker_type] = {}
             self._job_type_throughputs[job_type_key][worker_type][None] = \
-                oracle_throughputs[job_type_key]['null']
+                self._oracle_throughputs.get_isolated_throughput(
+                    worker_type, job_type_key)
             if self._job_packing:
                 for other_job_type_key in other_job_type_keys:
                     # Don't store throughputs for jobs with different scale
@@ -432,7 +547,8 @@ class Scheduler:
                     if other_job_type_key[1] != job_type_key[1]:
                         continue
                     colocated_throughputs = \
-                        oracle_throughputs[job_type_key][other_job_type_key]
+                        self._oracle_throughputs.get_colocated_throughputs(
+                            worker_type, job_type_key, other_job_type_key)
                     self._job_type_throughputs[job_type_key][worker_type][other_job_type_key] = \
                         colocated_throughputs[0]
                     self._job_type_throughputs[other_job_type_key][worker_type][job_type_key] = \
@@ -469,17 +585,26 @@ class Scheduler:
             job._job_id = job_id
             self._jobs[job_id] = job
             self._steps_run_so_far[job_id] = {}
-            self._job_time_so_far[job_id] = {}
+            self._job_state.add([job_id],
+                                job_time=(self._time_per_iteration / 2.0))
             self._job_cost_so_far[job_id] = 0.0
             self._job_timelines[job_id] = [[] for _ in range(job.scale_factor)]
             self._throughputs[job_id] = {}
+            self._throughput_snapshots.mark_dirty(job_id)
             job_type = self._jobs[job_id].job_type
             scale_factor = job.scale_factor
             job_type_key = (job_type, scale_factor)
             self._job_id_to_job_type[job_id] = job_type_key
+            self._job_pairs[job_id] = {}
             if self._estimate_throughputs:
+                # Start with a provisional reference job type to avoid
+                # running matrix completion for every job that arrives.
+                profile = self._throughput_estimator.profile_job(job_type_key)
                 self._reference_job_map[job_id] = \
-                    self._throughput_estimator.match_job_to_reference_job(job_type_key)
+                    self._throughput_estimator.get_provisional_reference_job(
+                        profile)
+                self._pending_reference_job_profiles[job_id] = profile
+                self._scheduler_cv.notifyAll()
             if job_type_key not in self._job_type_throughputs:
                 self._job_type_to_job_ids[job_type_key] = set()
                 self._read_throughputs_for_job_type(job_type_key)
@@ -498,8 +623,6 @@ class Scheduler:
                 if self._job_packing:
                     self._populate_job_combination_metadata(job_id,
                                                             worker_type)
-                self._job_time_so_far[job_id][worker_type] = \
-                        (self._time_per_iteration / 2.0)
             self._per_job_start_timestamps[job_id] = current_timestamp
             self._per_job_latest_timestamps[job_id] = None
             self._add_to_priorities(job_id)
@@ -510,6 +633,10 @@ class Scheduler:
             self._per_job_start_timestamps[job_id] = timestamp
             self._logger.info(
                 '[Job dispatched]\tJob ID: {job_id}'.format(job_id=job_id))
+            if self._event_log is not None:
+                self._record_event(event_log.JOB_ARRIVAL, job_id,
+                                   value0=job.scale_factor,
+                                   value1=job.total_steps)
             self._scheduler_cv.notifyAll()
 
         return job_id
@@ -548,29 +675,37 @@ class Scheduler:
         job_type_key = self._job_id_to_job_type[job_id]
         self._job_type_to_job_ids[job_type_key].remove(job_id)
         del self._steps_run_so_far[job_id]
-        del self._job_time_so_far[job_id]
+        self._job_state.remove([job_id])
         del self._throughputs[job_id]
+        self._throughput_snapshots.mark_dirty(job_id)
         del self._job_id_to_job_type[job_id]
         del self._num_failures_per_job[job_id]
+        if self._estimate_throughputs:
+            del self._reference_job_map[job_id]
+            if job_id in self._pending_reference_job_profiles:
+                del self._pending_reference_job_profiles[job_id]
         if job_id in self._in_progress_updates:
             del self._in_progress_updates[job_id]
         if job_id in self._lease_update_requests:
             del self._lease_update_requests[job_id]
         if job_id in self._max_steps:
             del self._max_steps[job_id]
+        if job_id in self._lease_agreement_cvs:
+            self._lease_agreement_cvs[job_id].notifyAll()
+            del self._lease_agreement_cvs[job_id]
         if job_id in self._jobs_with_extended_lease:
             self._jobs_with_extended_lease.remove(job_id)
         if self._job_packing:
-            to_delete = []
-            for other_job_id in self._throughputs:
-                if (other_job_id.is_pair() and
-                    job_id.overlaps_with(other_job_id)):
-                    to_delete.append(other_job_id)
+            to_delete = list(self._job_pairs[job_id])
+            self._job_state.remove(to_delete)
             for other_job_id in to_delete:
+                for single_job_id in other_job_id.singletons():
+                    if single_job_id != job_id:
+                        del self._job_pairs[single_job_id][other_job_id]
                 other_job_is_active = \
                     any([x in self._jobs for x in other_job_id.singletons()])
                 del self._throughputs[other_job_id]
-                del self._job_time_so_far[other_job_id]
+                self._throughput_snapshots.mark_dirty(other_job_id)
                 if not other_job_is_active:
                     if other_job_id in self._in_progress_updates:
                         del self._in_progress_updates[other_job_id]
@@ -578,6 +713,9 @@ class Scheduler:
                         del self._lease_update_requests[other_job_id]
                     if other_job_id in self._max_steps:
                         del self._max_steps[other_job_id]
+                    if other_job_id in self._lease_agreement_cvs:
+                        self._lease_agreement_cvs[other_job_id].notifyAll()
+                        del self._lease_agreement_cvs[other_job_id]
                     if other_job_id in self._jobs_with_extended_lease:
                         self._jobs_with_extended_lease.remove(other_job_id)
 
@@ -589,6 +727,7 @@ class Scheduler:
                         if job_type_key in self._job_type_throughputs[other_job_type_key][worker_type]:
                             del self._job_type_throughputs[other_job_type_key][worker_type][job_type_key]
         self._remove_from_priorities(job_id)
+        del self._job_pairs[job_id]
         # TODO: Add a flag to choose whether to update allocation here.
         # NOTE: Scheduler cv will be notified by calling function.
         self._need_to_update_allocation = True
@@ -614,6 +753,28 @@ class Scheduler:
             else:
                 return False
 
+    def set_policy(self, policy):
+        """Switches the policy used to compute allocations.
+
+        Used to evaluate several policies from a shared simulation prefix.
+        The next allocation is computed with the new policy.
+
+        Args:
+          policy: The new policy. Must use job packing if and only if the
+                  current policy does, since job combination metadata is
+                  only populated when packing.
+        """
+        if ('Packing' in policy.name) != self._job_packing:
+            raise ValueError('Cannot switch from policy {0} to policy {1}: '
+                             'job packing must either be enabled or disabled '
+                             'for both'.format(self._policy.name,
+                                                policy.name))
+        if self._aggregate_job_types:
+            assert(policy.job_type_allocation_inputs is not None)
+        with self._scheduler_lock:
+            self._policy = policy
+            self._need_to_update_allocation = True
+
     def reset_workers(self):
         """Sends a shutdown signal to every worker and ends the scheduler."""
         with self._scheduler_lock:
@@ -628,6 +789,12 @@ class Scheduler:
                     rpc_client.shutdown()
         self._orig_logger.removeHandler(self._logging_handler)
         self._logging_handler.close()
+        if self._event_log is not None:
+            self._event_log.close()
+        if self._allocation_executor is not None:
+            self._allocation_executor.shutdown(wait=False,
+                                               cancel_futures=True)
+            self._pending_allocation = None
         # TODO: Any other cleanup?
 
     """
@@ -641,17 +808,38 @@ class Scheduler:
             state_snapshot = {
                 'allocation': copy.deepcopy(self._allocation),
                 'priorities': copy.deepcopy(self._priorities),
-                'deficits': copy.deepcopy(self._deficits),
+                'deficits': self._job_state.get_deficits(),
             }
         else:
             state_snapshot = {
                 'allocation': self._allocation,
                 'priorities': self._priorities,
-                'deficits': self._deficits,
+                'deficits': self._job_state.get_deficits(),
             }
         return state_snapshot
 
+    def _record_event(self, event_type, job_id, worker_type=None,
+                      worker_ids=None, value0=0.0, value1=0.0):
+        """Records an event in the event log at the current time.
+
+        Must only be called if the event log is enabled."""
+        self._event_log.record(self.get_current_timestamp(in_seconds=True),
+                               event_type, job_id, worker_type=worker_type,
+                               worker_ids=worker_ids, value0=value0,
+                               value1=value1)
+
+    def _record_allocation_change(self):
+        """Records the current allocation in the event log."""
+        for job_id in self._allocation:
+            for worker_type in self._allocation[job_id]:
+                self._record_event(event_log.ALLOCATION_CHANGE, job_id,
+                                   worker_type=worker_type,
+                                   value0=self._allocation[job_id][worker_type])
+
     def _print_schedule_summary(self, state_snapshot=None):
+        # Only the deficits of the scheduled job combinations are read, so
+        # they are looked up in the job state store directly.
+        deficits = None
         if state_snapshot is not None:
             allocation = state_snapshot['allocation']
             priorities = state_snapshot['priorities']
@@ -659,16 +847,19 @@ class Scheduler:
         else:
             allocation = self._allocation
             priorities = self._priorities
-            deficits = self._deficits
 
         completed_jobs = set()
         worker_types = sorted(self._cluster_spec.keys())
         for job_id, worker_ids in self._current_worker_assignments.items():
             worker_type = self._worker_id_to_worker_type_mapping[worker_ids[0]]
+            if deficits is None:
+                has_deficit = job_id in self._job_state
+            else:
+                has_deficit = job_id in deficits[worker_type]
             if (job_id in self._completed_jobs_in_current_round or
                 job_id not in allocation or
                 job_id not in priorities[worker_type] or
-                job_id not in deficits[worker_type]):
+                not has_deficit):
                 completed_jobs.add(job_id)
 
             if not self._simulate and job_id in completed_jobs:
@@ -677,6 +868,17 @@ class Scheduler:
                                        job_id=job_id, num_gpus=len(worker_ids),
                                        worker_type=worker_type))
                 continue
+            if deficits is None:
+                deficit = self._job_state.get_deficit(job_id, worker_type)
+            else:
+                deficit = deficits[worker_type][job_id]
+            if self._event_log is not None:
+                self._record_event(event_log.MICRO_TASK_SCHEDULED, job_id,
+                                   worker_type=worker_type,
+                                   worker_ids=worker_ids,
+                                   value0=priorities[worker_type][job_id],
+                                   value1=deficit)
+                continue
             allocation_str = ''
             for x in worker_types:
                 allocation_str += ' [%4s %.2f]' % (x, allocation[job_id][x])
@@ -688,7 +890,7 @@ class Scheduler:
                     job_id=job_id, worker_type=worker_type,
                     worker_ids=",".join([str(x) for x in worker_ids]),
                     priority=priorities[worker_type][job_id],
-                    deficit=deficits[worker_type][job_id],
+                    deficit=deficit,
                     allocation=allocation_str))
         num_workers_assigned = {}
         for job_id, worker_ids in self._current_worker_assignments.items():
@@ -784,72 +986,82 @@ class Scheduler:
             num_workers = self._cluster_spec[worker_type]
             num_workers_left[worker_type] = num_workers
 
-        sorted_job_queue = []
+        # Jobs are selected lazily from min-heaps keyed by the negated
+        # (priority, deficit, allocation) tuple, so that jobs are popped in
+        # the same order as a stable descending sort (the insertion index
+        # breaks ties). Selection stops as soon as all workers are filled,
+        # so only O(num_workers * log(num_jobs)) work is done after the
+        # O(num_jobs) heapify.
+        job_queues = []
+        num_entries = 0
         for worker_type in worker_types:
             per_worker_type_entries = []
-            for job_id in self._priorities[worker_type]:
+            (deficits, slots) = \
+                self._job_state.get_deficit_column(worker_type)
+            for job_id, priority in self._priorities[worker_type].items():
                 allocation = 0.0
                 if self._allocation is not None and job_id in self._allocation:
                     allocation = self._allocation[job_id][worker_type]
                 per_worker_type_entries.append(
-                        (job_id, worker_type,
-                         self._priorities[worker_type][job_id],
-                         self._deficits[worker_type][job_id],
-                         allocation))
+                        (-priority, -deficits[slots[job_id]], -allocation,
+                         num_entries, job_id, worker_type))
+                num_entries += 1
             if not self._enable_global_queue:
-                sorted_job_queue += sorted(per_worker_type_entries,
-                                           key=lambda x: (x[2], x[3], x[4]),
-                                           reverse=True)
+                job_queues.append(([worker_type], per_worker_type_entries))
+            elif len(job_queues) == 0:
+                job_queues.append((worker_types, per_worker_type_entries))
             else:
-                sorted_job_queue += per_worker_type_entries
-
-        if self._enable_global_queue:
-            sorted_job_queue.sort(key=lambda x: (x[2], x[3], x[4]),
-                                  reverse=True)
-
-        for job_id, worker_type, *_ in sorted_job_queue:
-            if num_workers_left[worker_type] == 0:
-                continue
+                job_queues[0][1].extend(per_worker_type_entries)
+
+        for queue_worker_types, job_queue in job_queues:
+            heapq.heapify(job_queue)
+            num_queue_workers_left = \
+                sum([num_workers_left[x] for x in queue_worker_types])
+            while num_queue_workers_left > 0 and len(job_queue) > 0:
+                *_, job_id, worker_type = heapq.heappop(job_queue)
+                if num_workers_left[worker_type] == 0:
+                    continue
 
-            # Don't schedule jobs that have already been scheduled.
-            if ((not job_id.is_pair() and job_id in already_scheduled_jobs) or
-                (job_id.is_pair() and
-                 (job_id.singletons()[0] in already_scheduled_jobs or
-                  job_id.singletons()[1] in already_scheduled_jobs))):
-                continue
+                # Don't schedule jobs that have already been scheduled.
+                if ((not job_id.is_pair() and job_id in already_scheduled_jobs) or
+                    (job_id.is_pair() and
+                     (job_id.singletons()[0] in already_scheduled_jobs or
+                      job_id.singletons()[1] in already_scheduled_jobs))):
+                    continue
 
-            # Don't schedule jobs with 0 throughput.
-            if ((job_id.is_pair() and
-                (self._throughputs[job_id][worker_type][0] <= 0 or
-                 self._throughputs[job_id][worker_type][1] <= 0)) or
-                (not job_id.is_pair() and
-                 self._throughputs[job_id][worker_type] <= 0)):
-                continue
+                # Don't schedule jobs with 0 throughput.
+                if ((job_id.is_pair() and
+                    (self._throughputs[job_id][worker_type][0] <= 0 or
+                     self._throughputs[job_id][worker_type][1] <= 0)) or
+                    (not job_id.is_pair() and
+                     self._throughputs[job_id][worker_type] <= 0)):
+                    continue
 
-            # For FIFO jobs, don't schedule jobs with 0 priority.
-            if (self._policy.name.startswith("FIFO") and
-                self._priorities[worker_type][job_id] <= 0.0):
-                continue
+                # For FIFO jobs, don't schedule jobs with 0 priority.
+                if (self._policy.name.startswith("FIFO") and
+                    self._priorities[worker_type][job_id] <= 0.0):
+                    continue
 
-            # Make sure job fits in remaining number of workers.
-            # If not, move onto next job.
-            if job_id.is_pair():
-                scale_factor = \
-                    self._jobs[job_id.singletons()[0]].scale_factor
-                other_scale_factor = \
-                    self._jobs[job_id.singletons()[1]].scale_factor
-                # Only pack jobs with the same scale_factor.
-                if scale_factor != other_scale_factor:
+                # Make sure job fits in remaining number of workers.
+                # If not, move onto next job.
+                if job_id.is_pair():
+                    scale_factor = \
+                        self._jobs[job_id.singletons()[0]].scale_factor
+                    other_scale_factor = \
+                        self._jobs[job_id.singletons()[1]].scale_factor
+                    # Only pack jobs with the same scale_factor.
+                    if scale_factor != other_scale_factor:
+                        continue
+                else:
+                    scale_factor = self._jobs[job_id].scale_factor
+                if scale_factor > num_workers_left[worker_type]:
                     continue
-            else:
-                scale_factor = self._jobs[job_id].scale_factor
-            if scale_factor > num_workers_left[worker_type]:
-                continue
-            num_workers_left[worker_type] -= scale_factor
+                num_workers_left[worker_type] -= scale_factor
+                num_queue_workers_left -= scale_factor
 
-            for single_job_id in job_id.singletons():
-                already_scheduled_jobs.add(single_job_id)
-            scheduled_jobs[worker_type].append((job_id, scale_factor))
+                for single_job_id in job_id.singletons():
+                    already_scheduled_jobs.add(single_job_id)
+                scheduled_jobs[worker_type].append((job_id, scale_factor))
 
         return scheduled_jobs
 
@@ -958,7 +1170,6 @@ class Scheduler:
 
     def _get_num_steps(self, job_id, worker_type, single_job_id=None):
         if self._simulate:
-            oracle_throughputs = self._oracle_throughputs[worker_type]
             if job_id.is_pair():
                 assert(single_job_id is not None)
                 index = job_id.as_tuple().index(single_job_id[0])
@@ -967,7 +1178,8 @@ class Scheduler:
                 for x in job_id.singletons():
                     job_types.append((self._jobs[x].job_type, scale_factor))
                 colocated_throughputs = \
-                    oracle_throughputs[job_types[0]][job_types[1]]
+                    self._oracle_throughputs.get_colocated_throughputs(
+                        worker_type, job_types[0], job_types[1])
                 single_job_throughput = colocated_throughputs[index]
                 num_steps = int(single_job_throughput *
                                 self._time_per_iteration)
@@ -999,14 +1211,14 @@ class Scheduler:
         all_num_steps = []
         single_job_ids = job_id.singletons()
         if job_id.is_pair() and self._estimate_throughputs and self._simulate:
-            oracle_throughputs = self._oracle_throughputs[worker_type]
             scale_factor = self._jobs[job_id.singletons()[0]].scale_factor
             job_types = []
             for single_job_id in single_job_ids:
                 job_types.append((self._jobs[single_job_id].job_type,
                                   scale_factor))
-            oracle_throughput =\
-                oracle_throughputs[job_types[0]][job_types[1]]
+            oracle_throughput = \
+                self._oracle_throughputs.get_colocated_throughputs(
+                    worker_type, job_types[0], job_types[1])
         for i, single_job_id in enumerate(single_job_ids):
             num_steps = self._get_num_steps(job_id, worker_type, single_job_id)
             all_num_steps.append(num_steps)
@@ -1021,7 +1233,7 @@ class Scheduler:
                 throughput = self._throughputs[job_id][worker_type]
             if throughput <= 0:
                 if self._estimate_throughputs:
-                    all_num_steps.append(0)
+                    all_num_steps[-1] = 0
                     finish_time = max_finish_time
                 else:
                     print(single_job_id)
@@ -1040,6 +1252,248 @@ class Scheduler:
             self._running_jobs.add(single_job_id)
         return all_num_steps, max_finish_time
 
+    def _is_schedule_stable(self):
+        """Returns whether every subsequent round is guaranteed to repeat
+        the current worker assignments until a job arrives or completes.
+
+        This is the case if the allocation is not going to be recomputed and
+        the current round runs exactly the job combinations with a positive
+        allocation, each on the worker type it is allocated: these are then
+        scheduled ahead of all other job combinations whatever their
+        priorities, and keep their workers. This holds for fractional
+        allocations as well, as long as no job combination is allocated more
+        than one worker type.
+
+        Unless the policy is FIFO-based (FIFO never runs job combinations
+        with zero priority), idle workers are filled with job combinations
+        with zero priority on their worker type. Job combinations that did
+        not run and share no job with one that did cannot fit on them (they
+        would have run otherwise). Others could if the worker type of the
+        job combination they share a job with is scheduled later, which
+        depends on the shuffled worker types; the schedule is then not
+        considered stable.
+
+        Requires self._scheduler_lock to be held when calling this function.
+        """
+        if (self._need_to_update_allocation or self._allocation is None or
+            self._enable_global_queue or self._estimate_throughputs or
+            self._per_worker_type_prices is not None or
+            self._allocation_executor is not None or
+            self._event_log is not None):
+            return False
+        num_job_ids_assigned = {}
+        num_workers_assigned = {}
+        assigned_worker_types = {}
+        for job_id, worker_ids in self._current_worker_assignments.items():
+            worker_type = self._worker_id_to_worker_type_mapping[worker_ids[0]]
+            if (job_id not in self._allocation or
+                self._allocation[job_id][worker_type] <= 0.0):
+                return False
+            if worker_type not in num_job_ids_assigned:
+                num_job_ids_assigned[worker_type] = 0
+                num_workers_assigned[worker_type] = 0
+            num_job_ids_assigned[worker_type] += 1
+            num_workers_assigned[worker_type] += len(worker_ids)
+            assigned_worker_types[job_id] = worker_type
+        for worker_type in self._cluster_spec:
+            if (self._priority_table.get_num_allocated(worker_type) !=
+                num_job_ids_assigned.get(worker_type, 0)):
+                return False
+        if self._policy.name.startswith("FIFO"):
+            return True
+
+        # Worker types are scheduled in this order unless shuffled.
+        worker_type_order = ["v100", "p100", "k80"]
+        shuffled = ('Perf' not in self._policy.name and
+                    'Packing' not in self._policy.name)
+        running_worker_types = {}
+        for job_id, worker_type in assigned_worker_types.items():
+            for single_job_id in job_id.singletons():
+                running_worker_types[single_job_id] = worker_type
+        for worker_type in self._cluster_spec:
+            num_idle_workers = (self._cluster_spec[worker_type] -
+                                num_workers_assigned.get(worker_type, 0))
+            if num_idle_workers == 0:
+                continue
+            for job_id in self._priorities[worker_type]:
+                scheduled_later = False
+                for single_job_id in job_id.singletons():
+                    if single_job_id not in running_worker_types:
+                        continue
+                    running_worker_type = running_worker_types[single_job_id]
+                    if running_worker_type == worker_type:
+                        continue
+                    if (shuffled or
+                        worker_type_order.index(running_worker_type) >
+                        worker_type_order.index(worker_type)):
+                        scheduled_later = True
+                if not scheduled_later:
+                    continue
+                if job_id.is_pair():
+                    scale_factor = \
+                        self._jobs[job_id.singletons()[0]].scale_factor
+                    can_run = min(self._throughputs[job_id][worker_type]) > 0
+                else:
+                    scale_factor = self._jobs[job_id].scale_factor
+                    can_run = self._throughputs[job_id][worker_type] > 0
+                if can_run and scale_factor <= num_idle_workers:
+                    return False
+        return True
+
+    def _fast_forward_rounds(self, running_jobs, next_arrival_time):
+        """Skips the rounds following the round that was just dispatched
+        that would repeat its schedule.
+
+        Rounds are skipped while the schedule is stable (see
+        _is_schedule_stable) and no job arrives or completes. The updates
+        each skipped round would have made to the steps and time received by
+        every job, the time spent on every worker, and the lease extension
+        counts are applied directly, with the same floating-point operations
+        in the same order as when scheduling round by round, so that the
+        simulation is bit-identical. Skipped rounds are not logged
+        individually; their number is logged at the debug level and added
+        to self._num_fast_forwarded_rounds, which simulate prints.
+
+        Requires the previous round to have ended when the dispatched round
+        started, and self._scheduler_lock to be held when calling this
+        function.
+
+        Args:
+          running_jobs: Heap of (negated finish time, job_id, worker_ids,
+                        all_num_steps) tuples for the dispatched round,
+                        replaced in place with the entries of the last
+                        round dispatched.
+          next_arrival_time: The arrival time of the next job, or None if no
+                             more jobs will arrive.
+
+        Returns:
+          The number of rounds skipped and the start time of the last
+          completed round (None if no round was skipped).
+        """
+        if len(running_jobs) == 0 or not self._is_schedule_stable():
+            return 0, None
+        current_time = self.get_current_timestamp()
+        entries = sorted(running_jobs, key=lambda x: x[1])
+        worker_types = []
+        durations = []
+        max_num_rounds = MAX_FAST_FORWARD_ROUNDS
+        for (_, job_id, worker_ids, all_num_steps) in entries:
+            worker_type = self._worker_id_to_worker_type_mapping[worker_ids[0]]
+            duration = 0.0
+            for i, single_job_id in enumerate(job_id.singletons()):
+                num_steps = all_num_steps[i]
+                if num_steps <= 0:
+                    return 0, None
+                # Every skipped round must run as many steps as the
+                # dispatched round without completing the job.
+                remaining_steps = self._get_remaining_steps(single_job_id)
+                max_num_rounds = min(max_num_rounds,
+                                     remaining_steps // num_steps - 1)
+                if job_id.is_pair():
+                    throughput = self._throughputs[job_id][worker_type][i]
+                else:
+                    throughput = self._throughputs[job_id][worker_type]
+                duration = max(duration, num_steps / throughput)
+            worker_types.append(worker_type)
+            durations.append(duration)
+
+        # Rounds are as long as the longest-running job combination.
+        # Rounding is monotonic, so the start time plus the maximum duration
+        # is the maximum finish time.
+        max_duration = max(durations)
+        round_start_times = [current_time]
+        round_end_time = current_time + max_duration
+        assert(round_end_time == -running_jobs[0][0])
+        while (len(round_start_times) <= max_num_rounds and
+               (next_arrival_time is None or
+                next_arrival_time > round_end_time)):
+            round_start_times.append(round_end_time)
+            round_end_time = round_end_time + max_duration
+        num_rounds = len(round_start_times) - 1
+        if num_rounds == 0:
+            return 0, None
+
+        # Finish times of each job combination in the dispatched and skipped
+        # rounds (one row per round), and the execution times recorded when
+        # each of the first num_rounds rounds completes.
+        start_times = np.array(round_start_times, dtype=np.float64)
+        finish_times = \
+            start_times[:, np.newaxis] + np.array(durations, dtype=np.float64)
+        execution_times = finish_times[:-1] - start_times[:-1, np.newaxis]
+        # Time is accumulated sequentially, round after round.
+        job_times = [self._job_state.job_time_so_far[entry[1]][worker_type]
+                     for entry, worker_type in zip(entries, worker_types)]
+        job_times = np.add.accumulate(
+            np.vstack([job_times, execution_times]), axis=0)[-1]
+        worker_columns = [(worker_id, i) for i, entry in enumerate(entries)
+                          for worker_id in entry[2]]
+        worker_times = np.add.accumulate(np.vstack(
+            [[self._cumulative_worker_time_so_far[worker_id]
+              for worker_id, _ in worker_columns],
+             execution_times[:, [i for _, i in worker_columns]]]),
+            axis=0)[-1]
+        for (worker_id, _), worker_time in zip(worker_columns, worker_times):
+            self._cumulative_worker_time_so_far[worker_id] = worker_time
+        # Within a round, job combinations complete in order of decreasing
+        # finish time, with ties broken by job ID (entries are sorted by job
+        # ID).
+        for worker_type in set(worker_types):
+            columns = [i for i, x in enumerate(worker_types)
+                       if x == worker_type]
+            order = np.lexsort(
+                (np.broadcast_to(np.arange(len(columns)),
+                                 (num_rounds, len(columns))),
+                 -finish_times[:-1, columns]), axis=-1)
+            worker_type_execution_times = np.take_along_axis(
+                execution_times[:, columns], order, axis=1)
+            self._worker_time_so_far[worker_type] = np.add.accumulate(
+                np.concatenate([[self._worker_time_so_far[worker_type]],
+                                worker_type_execution_times.ravel()]))[-1]
+
+        for i, (_, job_id, worker_ids, all_num_steps) in enumerate(entries):
+            worker_type = worker_types[i]
+            finish_time = float(finish_times[-2, i])
+            for single_job_id, num_steps in zip(job_id.singletons(),
+                                                all_num_steps):
+                self._steps_run_so_far[single_job_id][worker_type] += \
+                    num_rounds * num_steps
+                self._total_steps_run[single_job_id] += \
+                    num_rounds * num_steps
+                self._per_job_latest_timestamps[single_job_id] = finish_time
+                self._lease_update_requests[single_job_id] = []
+                self._max_steps[single_job_id] = None
+            self._in_progress_updates[job_id] = []
+            self._completed_jobs_in_current_round.add(job_id)
+            self._num_failures_per_job[job_id] = 0
+            self._job_state.set_job_time(job_id, worker_type, job_times[i])
+            self._priority_table.mark_dirty(job_id)
+            execution_time = float(execution_times[-1, i])
+            self._update_throughput(job_id, worker_type, all_num_steps,
+                                    [execution_time] * len(all_num_steps))
+
+        num_job_ids = len(self._current_worker_assignments)
+        self._num_lease_extension_opportunities += num_rounds * num_job_ids
+        self._num_lease_extensions += num_rounds * num_job_ids
+        # Keep the worker type shuffles of the skipped rounds.
+        if ('Perf' not in self._policy.name and
+            'Packing' not in self._policy.name):
+            shuffled_worker_types = \
+                list(self._worker_type_to_worker_id_mapping.keys())
+            for _ in range(num_rounds):
+                self._worker_type_shuffler.shuffle(shuffled_worker_types)
+
+        running_jobs[:] = [(-float(finish_times[-1, i]), job_id, worker_ids,
+                            all_num_steps)
+                           for i, (_, job_id, worker_ids, all_num_steps) in
+                           enumerate(entries)]
+        heapq.heapify(running_jobs)
+        self._current_timestamp = round_start_times[-1]
+        self._num_fast_forwarded_rounds += num_rounds
+        self._logger.debug(
+            'Fast-forwarded {0} rounds to {1:.2f}'.format(
+                num_rounds, self._current_timestamp))
+        return num_rounds, round_start_times[-2]
+
 
     def _save_checkpoint(self, checkpoint_file,
                          last_job_arrival_time,
@@ -1061,13 +1515,13 @@ class Scheduler:
             pickle.dump(self._allocation, f)
             pickle.dump(self._steps_run_so_far, f)
             pickle.dump(self._total_steps_run, f)
-            pickle.dump(self._job_time_so_far, f)
+            pickle.dump(dict(self._job_state.job_time_so_far), f)
             pickle.dump(self._worker_start_times, f)
             pickle.dump(self._worker_time_so_far, f)
             pickle.dump(self._cumulative_worker_time_so_far, f)
             pickle.dump(self._num_jobs, f)
             pickle.dump(self._priorities, f)
-            pickle.dump(self._deficits, f)
+            pickle.dump(self._job_state.get_deficits(), f)
             pickle.dump(self._last_reset_time, f)
             pickle.dump(self._need_to_update_allocation, f)
             pickle.dump(self._job_generator, f)
@@ -1091,16 +1545,26 @@ class Scheduler:
 
             self._jobs = pickle.load(f)
             self._throughputs = pickle.load(f)
+            self._throughput_snapshots = ThroughputSnapshots()
+            self._job_pairs = {job_id: {} for job_id in self._jobs}
+            for job_id in self._throughputs:
+                self._throughput_snapshots.mark_dirty(job_id)
+                if job_id.is_pair():
+                    for single_job_id in job_id.singletons():
+                        self._job_pairs[single_job_id][job_id] = None
             self._allocation = pickle.load(f)
             self._steps_run_so_far = pickle.load(f)
             self._total_steps_run = pickle.load(f)
-            self._job_time_so_far = pickle.load(f)
+            job_time_so_far = pickle.load(f)
             self._worker_start_times = pickle.load(f)
             self._worker_time_so_far = pickle.load(f)
             self._cumulative_worker_time_so_far = pickle.load(f)
             self._num_jobs = pickle.load(f)
             self._priorities = pickle.load(f)
-            self._deficits = pickle.load(f)
+            deficits = pickle.load(f)
+            self._job_state = JobStateStore()
+            self._job_state.load(job_time_so_far, deficits)
+            self._priority_table = PriorityTable()
             self._last_reset_time = pickle.load(f)
             self._need_to_update_allocation = pickle.load(f)
             self._job_generator = pickle.load(f)
@@ -1134,7 +1598,10 @@ class Scheduler:
                  checkpoint_file=None,
                  num_gpus_per_server=None,
                  ideal=False,
-                 output_trace_file_name=None):
+                 output_trace_file_name=None,
+                 trace=None,
+                 window_start_callback=None,
+                 fast_forward=False):
         """Simulates the scheduler execution.
 
            Simulation can be performed using a trace or with continuously
@@ -1166,14 +1633,33 @@ class Scheduler:
             simulate_steady_state: If set, adds as many jobs as there are
                                    workers before beginning the simulation.
             debug: If set, pauses the simulation at the start of every loop.
+            trace: An iterable of (job, arrival_time) tuples sorted by
+                   arrival time (e.g., from utils.read_trace), used instead
+                   of arrival_times and jobs. Jobs are read from the trace
+                   as they arrive.
+            window_start_callback: If set, called without arguments once the
+                                   first job in `jobs_to_complete` has been
+                                   added, before the round it arrived in is
+                                   scheduled (e.g., to fork the simulation
+                                   or switch policies with `set_policy`).
+                                   The simulation stops if it returns False.
+            fast_forward: If set, rounds that would repeat the schedule of the
+                          previous round (because the allocation is
+                          unchanged and no job arrives or completes) are
+                          skipped by applying their updates directly. The
+                          simulation is otherwise unchanged, but skipped
+                          rounds are not logged.
         """
 
-        from_trace = arrival_times is not None and jobs is not None
+        if arrival_times is not None and jobs is not None:
+            trace = zip(jobs, arrival_times)
+        from_trace = trace is not None
         if num_total_jobs is not None:
             remaining_jobs = num_total_jobs
         if from_trace:
-            remaining_jobs = len(jobs)
-            queued_jobs = []
+            # Number of jobs that have arrived but not yet completed.
+            remaining_jobs = 0
+            queued_jobs = ArrivalQueue(trace)
         else:
             if self._oracle_throughputs is None:
                 raise ValueError('Scheduler must be initialized with a '
@@ -1189,21 +1675,38 @@ class Scheduler:
             raise ValueError('Checkpointing only intended to be used '
                              'when generating trace on-the-fly.')
 
+        if (window_start_callback is not None and
+            output_trace_file_name is not None):
+            raise ValueError('Cannot output a trace when the simulation '
+                             'might be stopped or forked at the window '
+                             'start.')
+
         if not from_trace and output_trace_file_name is not None:
             output_trace_file = open(output_trace_file_name, 'w')
         else:
             output_trace_file = None
 
+        if ideal and self._allocation_executor is not None:
+            raise ValueError('Asynchronous allocation computation is not '
+                             'supported in ideal mode.')
+
         running_jobs = []
+        # In ideal mode, the active jobs, the rate (in steps per second) at
+        # which each runs and its finish time at that rate.
+        ideal_job_ids = []
+        ideal_rates = None
+        ideal_finish_times = None
+        ideal_start_time = None
         num_jobs_generated = 0
         last_job_arrival_time = None
         next_job_arrival_time = 0
-        if arrival_times is not None and len(arrival_times) > 0:
-            next_job_arrival_time = arrival_times[0]
+        if from_trace and len(queued_jobs) > 0:
+            next_job_arrival_time = queued_jobs.peek()[0]
         no_dispatched_or_running_jobs = False
         current_round_start_time = 0
         current_round_end_time = None
         window_start_time = None
+        window_start_callback_done = False
         SLO_generator = self._SLO_generator if self._SLOs is not None else None
 
         # Set up the cluster according to the provided spec.
@@ -1224,13 +1727,7 @@ class Scheduler:
              running_jobs) = self._load_checkpoint(checkpoint_file)
 
         if from_trace:
-            # Add all jobs to the queue.
-            for i in range(1, len(arrival_times)):
-                assert(arrival_times[i] >= arrival_times[i-1])
-
-            for (arrival_time, job) in zip(arrival_times, jobs):
-                queued_jobs.append((arrival_time, job))
-            self._current_timestamp = arrival_times[0]
+            self._current_timestamp = next_job_arrival_time
         elif simulate_steady_state:
             for worker_type in worker_types:
                 num_remaining_workers = cluster_spec[worker_type]
@@ -1263,20 +1760,20 @@ class Scheduler:
                     'Number of completed jobs: {0}'.format(num_completed_jobs))
                 if self.is_done(jobs_to_complete):
                     break
-            elif (num_total_jobs is not None and
-                    remaining_jobs <= 0):
-                break
             elif from_trace:
-                if remaining_jobs == 0:
+                if len(queued_jobs) == 0 and remaining_jobs == 0:
                     break
                 elif len(queued_jobs) > 0:
-                    next_job_arrival_time = queued_jobs[0][0]
+                    next_job_arrival_time = queued_jobs.peek()[0]
                 else:
                     next_job_arrival_time = None
                     # If no jobs are currently running and we are not yet done,
                     # force a reset.
                     if len(running_jobs) == 0:
                         self._last_reset_time = 0
+            elif (num_total_jobs is not None and
+                    remaining_jobs <= 0):
+                break
 
             # Jump to the next event's timestamp.
             # Find the time when the latest job completes, which signals
@@ -1291,14 +1788,44 @@ class Scheduler:
             if max_timestamp > 0:
                 self._current_timestamp = max_timestamp
             else:
-                if next_job_arrival_time is not None:
-                    self._current_timestamp = next_job_arrival_time
+                next_event_time = next_job_arrival_time
+                # In ideal mode, jump to the next arrival or completion.
+                if ideal and len(ideal_job_ids) > 0:
+                    if (num_total_jobs is not None and
+                        num_jobs_generated >= num_total_jobs):
+                        # No more jobs will be generated.
+                        next_event_time = None
+                    next_finish_time = np.min(ideal_finish_times)
+                    if (next_event_time is None or
+                        next_finish_time < next_event_time):
+                        next_event_time = next_finish_time
+                # If no jobs are running, jump to when the pending
+                # asynchronous allocation computation completes if that is
+                # sooner than the next arrival.
+                allocation_ready_time = \
+                    self._get_pending_allocation_ready_time()
+                if (allocation_ready_time is not None and
+                    (next_event_time is None or
+                     allocation_ready_time < next_event_time)):
+                    next_event_time = max(allocation_ready_time,
+                                          self._current_timestamp)
+                if next_event_time is not None:
+                    self._current_timestamp = next_event_time
 
             # Update per-instance type prices.
             if self._per_worker_type_prices is not None:
                 self._update_per_worker_type_prices()
 
             # Check if any jobs have completed.
+            if ideal and len(ideal_job_ids) > 0:
+                num_completed_jobs = \
+                    self._run_jobs_ideally(ideal_job_ids, ideal_rates,
+                                           ideal_finish_times,
+                                           ideal_start_time,
+                                           self._current_timestamp)
+                if from_trace or num_total_jobs is not None:
+                    remaining_jobs -= num_completed_jobs
+                ideal_job_ids = []
             while len(running_jobs) > 0:
                 (finish_time, job_id, worker_ids, all_num_steps) = \
                         running_jobs[0]
@@ -1350,14 +1877,15 @@ class Scheduler:
             last_added_job_id = None
             if from_trace:
                 while len(queued_jobs) > 0:
-                    (arrival_time, job) = queued_jobs[0]
+                    (arrival_time, job) = queued_jobs.peek()
                     if arrival_time <= self._current_timestamp:
                         job_id = self.add_job(job, timestamp=arrival_time)
                         if (jobs_to_complete is not None and
                             job_id == min(jobs_to_complete)):
                             window_start_time = self._current_timestamp
                         last_added_job_id = job_id
-                        queued_jobs.pop(0)
+                        remaining_jobs += 1
+                        queued_jobs.pop()
                     else:
                         break
             else:
@@ -1415,45 +1943,26 @@ class Scheduler:
                     next_job_arrival_time = \
                             arrival_time_delta + last_job_arrival_time
 
+            if (window_start_callback is not None and
+                window_start_time is not None and
+                not window_start_callback_done):
+                window_start_callback_done = True
+                if not window_start_callback():
+                    return
+
             # Schedule jobs until there are no available workers or no jobs
             # with non-zero allocations on available workers.
             if ideal:
-                time_to_next_event = next_job_arrival_time - self._current_timestamp
-                all_num_steps = {}
-                self._update_priorities()
-                for job_id in self._allocation:
-                    for worker_type in self._allocation[job_id]:
-                        time_spent_on_worker_type = self._allocation[job_id][worker_type] * \
-                            time_to_next_event
-                        if job_id.is_pair():
-                            for i, single_job_id in enumerate(job_id.singletons()):
-                                if job_id not in self._throughputs:
-                                    continue
-                                num_steps = time_spent_on_worker_type * \
-                                    self._throughputs[job_id][worker_type][i]
-                                if single_job_id not in all_num_steps:
-                                    all_num_steps[single_job_id] = 0
-                                all_num_steps[single_job_id] += int(num_steps)
-                        else:
-                            if job_id in self._throughputs:
-                                num_steps = time_spent_on_worker_type * \
-                                    self._throughputs[job_id][worker_type]
-                                if job_id not in all_num_steps:
-                                    all_num_steps[job_id] = 0
-                                all_num_steps[job_id] += int(num_steps)
-                for job_id in all_num_steps:
-                    allocation_str = ''
-                    for x in worker_types:
-                        allocation_str += \
-                            ' [%4s %f]' % (x, self._allocation[job_id][x])
-                    self._logger.info(
-                        '[Micro-task scheduled]\tJob ID: {job_id}\t'
-                           'Allocation: {allocation}'.format(
-                               job_id=job_id, allocation=allocation_str))
-                    heapq.heappush(running_jobs, (-next_job_arrival_time, job_id,
-                                                  (0,),
-                                                  [all_num_steps[job_id]]))
-                    self._running_jobs.add(job_id)
+                ideal_job_ids, ideal_rates = self._get_ideal_rates()
+                ideal_start_time = self._current_timestamp
+                remaining_steps = np.array(
+                    [self._get_remaining_steps(job_id)
+                     for job_id in ideal_job_ids], dtype=np.float64)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    ideal_finish_times = np.where(
+                        ideal_rates > 0,
+                        ideal_start_time + remaining_steps / ideal_rates,
+                        np.inf)
             else:
                 with self._scheduler_lock:
                     scheduled_jobs = self._schedule_jobs_on_workers()
@@ -1469,6 +1978,10 @@ class Scheduler:
                             next_worker_ids = set(scheduled_jobs[job_id])
                             if current_worker_ids == next_worker_ids:
                                 self._num_lease_extensions += 1
+                                if self._event_log is not None:
+                                    self._record_event(
+                                        event_log.LEASE_EXTENSION, job_id,
+                                        worker_ids=scheduled_jobs[job_id])
                     self._current_worker_assignments = scheduled_jobs
                     self._print_schedule_summary()
                 for (job_id, worker_ids) in scheduled_jobs.items():
@@ -1483,6 +1996,29 @@ class Scheduler:
                                                   worker_ids,
                                                   all_num_steps))
 
+                # Skip the following rounds if they would repeat this
+                # round's schedule (and the simulation is not about to end).
+                if (fast_forward and
+                    current_round_end_time == self._current_timestamp and
+                    (jobs_to_complete is None or
+                     not self.is_done(jobs_to_complete))):
+                    if from_trace:
+                        next_arrival_time = None
+                        if len(queued_jobs) > 0:
+                            next_arrival_time = queued_jobs.peek()[0]
+                    elif (num_total_jobs is not None and
+                          num_jobs_generated >= num_total_jobs):
+                        next_arrival_time = None
+                    else:
+                        next_arrival_time = next_job_arrival_time
+                    with self._scheduler_lock:
+                        num_rounds, round_start_time = \
+                            self._fast_forward_rounds(running_jobs,
+                                                      next_arrival_time)
+                    if num_rounds > 0:
+                        current_round_start_time = round_start_time
+                        current_round_end_time = self._current_timestamp
+
             if checkpoint_threshold is not None and last_added_job_id is not None \
                 and last_added_job_id[0] >= checkpoint_threshold \
                 and not checkpoint_complete:
@@ -1507,6 +2043,101 @@ class Scheduler:
         print('Total duration: %.3f seconds '
               '(%.2f hours)' % (self._current_timestamp,
                                 self._current_timestamp / 3600.0))
+        if fast_forward:
+            print('Fast-forwarded rounds: %d' % (
+                self._num_fast_forwarded_rounds))
+
+    def _get_ideal_rates(self):
+        """Returns the IDs of the active jobs and the rate (in steps per
+        second) at which each runs if the allocation is followed exactly,
+        i.e., if every job combination runs for its allocated fraction of
+        time on each worker type.
+
+        Recomputes the allocation first if needed (i.e., on every arrival
+        and completion).
+        """
+        if self._need_to_update_allocation:
+            self._allocation = self._compute_allocation()
+            if self._event_log is not None:
+                self._record_allocation_change()
+            self._priority_table.invalidate()
+            self._need_to_update_allocation = False
+
+        job_ids = sorted(self._jobs.keys())
+        job_id_to_idx = {job_id: i for i, job_id in enumerate(job_ids)}
+        worker_types = sorted(self._worker_types)
+        # One row per single job in each job combination, with the
+        # combination's allocation and the single job's throughputs.
+        idxs = []
+        allocations = []
+        throughputs = []
+        for job_id in self._allocation:
+            if job_id not in self._throughputs:
+                continue
+            allocation = [self._allocation[job_id].get(worker_type, 0.0)
+                          for worker_type in worker_types]
+            for i, single_job_id in enumerate(job_id.singletons()):
+                if single_job_id not in job_id_to_idx:
+                    continue
+                idxs.append(job_id_to_idx[single_job_id])
+                allocations.append(allocation)
+                if job_id.is_pair():
+                    throughputs.append(
+                        [self._throughputs[job_id][worker_type][i]
+                         for worker_type in worker_types])
+                else:
+                    throughputs.append(
+                        [self._throughputs[job_id][worker_type]
+                         for worker_type in worker_types])
+        rates = np.zeros(len(job_ids), dtype=np.float64)
+        if len(idxs) > 0:
+            np.add.at(rates, idxs,
+                      np.sum(np.multiply(allocations, throughputs), axis=1))
+        return job_ids, rates
+
+    def _run_jobs_ideally(self, job_ids, rates, finish_times, start_time,
+                          end_time):
+        """Runs jobs at the given rates from start_time to end_time, and
+        removes the jobs that complete.
+
+        Args:
+          job_ids: The IDs of the jobs.
+          rates: A NumPy array of the rate (in steps per second) of each job.
+          finish_times: A NumPy array of the finish time of each job.
+          start_time: The time the jobs started running at these rates.
+          end_time: The current time (no later than the earliest finish
+                    time).
+
+        Returns:
+          The number of jobs that completed.
+        """
+        all_num_steps = rates * (end_time - start_time)
+        completed = finish_times <= end_time
+        for i in np.nonzero(rates > 0)[0]:
+            job_id = job_ids[i]
+            if completed[i]:
+                self._total_steps_run[job_id] = self._jobs[job_id].total_steps
+            else:
+                self._total_steps_run[job_id] += all_num_steps[i]
+        completed_idxs = np.nonzero(completed)[0]
+        for i in completed_idxs:
+            job_id = job_ids[i]
+            start_time = self._per_job_start_timestamps[job_id]
+            finish_time = float(finish_times[i])
+            self._per_job_latest_timestamps[job_id] = finish_time
+            duration = finish_time - start_time
+            if self._event_log is not None:
+                self._record_event(event_log.JOB_SUCCEEDED, job_id,
+                                   value0=start_time, value1=duration)
+            self._logger.info(
+                '[Job succeeded]\tJob ID: {job_id}\t'
+                'Start timestamp: {start_timestamp:.2f}\t'
+                'End timestamp: {end_timestamp:.2f}\t'
+                'Duration: {duration:.2f}'.format(
+                    job_id=job_id, start_timestamp=start_time,
+                    end_timestamp=finish_time, duration=duration))
+            self._remove_job(job_id)
+        return len(completed_idxs)
 
     def _is_final_round(self):
         return (self._max_rounds is not None and
@@ -1587,8 +2218,13 @@ class Scheduler:
                     # Job will be scheduled on the same workers in
                     # upcoming round; extend its lease.
                     self._jobs_with_extended_lease.add(job_id)
-                    self._logger.info(
-                        'Extending lease for job {0}'.format(job_id))
+                    if self._event_log is not None:
+                        self._record_event(
+                            event_log.LEASE_EXTENSION, job_id,
+                            worker_ids=self._next_worker_assignments[job_id])
+                    else:
+                        self._logger.info(
+                            'Extending lease for job {0}'.format(job_id))
                     self._num_lease_extensions += 1
                 elif job_id in self._jobs_with_extended_lease:
                     # Job will not be scheduled on the same workers
@@ -1960,6 +2596,16 @@ class Scheduler:
 
         return percentage
 
+    def get_allocation_computation_time(self, verbose=True):
+        """Returns the total wall-clock time (in seconds) spent computing
+        allocations."""
+        if verbose:
+            print('Allocation computation time: {0:.3f} seconds '
+                  '({1} allocations)'.format(
+                      self._allocation_computation_time,
+                      self._num_allocation_computations))
+        return self._allocation_computation_time
+
     def save_job_timelines(self, timeline_dir):
         if not os.path.isdir(timeline_dir):
             try:
@@ -2043,48 +2689,77 @@ class Scheduler:
         for job_id in sorted(list(self._jobs.keys())):
             deficit_str = 'Job ID %s:' % (job_id)
             for worker_type in sorted(self._worker_types):
-                deficit = self._deficits[worker_type][job_id]
+                deficit = self._job_state.get_deficit(job_id, worker_type)
                 deficit_str += ' [%s: %f]' % (worker_type, deficit)
             print(deficit_str)
         print('=' * 80)
         print('')
 
     def _get_allocation_state(self):
-        """Prepare all relevant scheduler state for computing the allocation."""
+        """Prepare the scheduler state needed by the policy to compute the
+        allocation.
+
+        Only the inputs declared by the policy (see
+        Policy.allocation_inputs) are populated. Throughputs are snapshotted
+        copy-on-write, so only job combinations whose throughputs changed
+        since the previous snapshot are copied.
+        """
+        if self._aggregate_job_types:
+            inputs = set(self._policy.job_type_allocation_inputs)
+            # Used to filter the job type allocation.
+            inputs.add('throughputs')
+        else:
+            inputs = set(self._policy.allocation_inputs)
         state = {}
-        state['scale_factors'] = {
-            job_id: self._jobs[job_id].scale_factor
-            for job_id in self._jobs
-        }
-        state['priority_weights'] = {
-            job_id: self._jobs[job_id].priority_weight
-            for job_id in self._jobs
-        }
-        state['num_steps_remaining'] = {
-            job_id: self._get_remaining_steps(job_id)
-            for job_id in self._jobs
-        }
-        state['times_since_start'] = {
-            job_id: self.get_current_timestamp() - \
-                        self._per_job_start_timestamps[job_id]
-            for job_id in self._jobs
-        }
-        state['throughputs'] = copy.deepcopy(self._throughputs)
-        state['cluster_spec'] = copy.deepcopy(self._cluster_spec)
-
-        if self._policy.name.startswith("ThroughputNormalizedByCostSum"):
-            state['instance_costs'] = copy.deepcopy(self._per_worker_type_prices)
-            if 'SLO' in self._policy.name:
-                SLOs = {}
-                if self._SLOs is not None:
-                    for job_id in self._jobs:
-                        SLOs[job_id] = \
-                            (self._SLOs[job_id] -
-                             self.get_current_timestamp(in_seconds=True))
-                    state['SLOs'] = SLOs
-                else:
-                    state['num_steps_remaining'] = {}
-        return state
+        if 'throughputs' in inputs:
+            state['throughputs'] = \
+                self._throughput_snapshots.snapshot(self._throughputs)
+        if 'scale_factors' in inputs:
+            state['scale_factors'] = {
+                job_id: self._jobs[job_id].scale_factor
+                for job_id in self._jobs
+            }
+        if 'priority_weights' in inputs:
+            state['priority_weights'] = {
+                job_id: self._jobs[job_id].priority_weight
+                for job_id in self._jobs
+            }
+        if 'num_steps_remaining' in inputs:
+            if 'SLOs' in inputs and self._SLOs is None:
+                state['num_steps_remaining'] = {}
+            else:
+                state['num_steps_remaining'] = {
+                    job_id: self._get_remaining_steps(job_id)
+                    for job_id in self._jobs
+                }
+        if 'times_since_start' in inputs:
+            current_timestamp = self.get_current_timestamp()
+            state['times_since_start'] = {
+                job_id: current_timestamp - \
+                            self._per_job_start_timestamps[job_id]
+                for job_id in self._jobs
+            }
+        if 'cluster_spec' in inputs:
+            state['cluster_spec'] = dict(self._cluster_spec)
+        if ('instance_costs' in inputs and
+            self._per_worker_type_prices is not None):
+            state['instance_costs'] = dict(self._per_worker_type_prices)
+        if 'SLOs' in inputs:
+            state['SLOs'] = {}
+            if self._SLOs is not None:
+                current_timestamp = self.get_current_timestamp(in_seconds=True)
+                for job_id in self._jobs:
+                    state['SLOs'][job_id] = \
+                        self._SLOs[job_id] - current_timestamp
+        if 'job_type_throughputs' in inputs:
+            state['job_type_throughputs'] = \
+                copy.deepcopy(self._job_type_throughputs)
+        if 'job_id_to_job_type_key' in inputs:
+            state['job_id_to_job_type_key'] = {
+                job_id: self._job_id_to_job_type[job_id]
+                for job_id in self._jobs
+            }
+        return AllocationState(**state)
 
     # @preconditions(lambda self: self._simulate or self._scheduler_lock.locked())
     def _compute_allocation(self, state=None):
@@ -2105,55 +2780,126 @@ class Scheduler:
         """
         if state is None:
             state = self._get_allocation_state()
-        throughputs = state['throughputs']
-        scale_factors = state['scale_factors']
-        times_since_start = state['times_since_start']
-        num_steps_remaining = state['num_steps_remaining']
-        priority_weights = state['priority_weights']
-        cluster_spec = state['cluster_spec']
-
-        # Compute the allocation.
-        if self._policy.name == "AlloX_Perf":
-            allocation = self._policy.get_allocation(
-                throughputs, scale_factors,
-                times_since_start, num_steps_remaining,
-                cluster_spec)
-        elif self._policy.name.startswith("FinishTimeFairness"):
-            allocation = self._policy.get_allocation(
-                throughputs, scale_factors, priority_weights,
-                times_since_start, num_steps_remaining,
-                cluster_spec)
-        elif self._policy.name == "Isolated":
-            allocation = self._policy.get_allocation(
-                throughputs, scale_factors, cluster_spec)
-        elif self._policy.name.startswith("MaxMinFairness"):
-            allocation = self._policy.get_allocation(
-                throughputs, scale_factors, priority_weights,
-                cluster_spec)
-        elif self._policy.name.startswith("MinTotalDuration"):
-            allocation = self._policy.get_allocation(
-                throughputs, scale_factors, num_steps_remaining,
-                cluster_spec)
-        elif self._policy.name.startswith("ThroughputNormalizedByCostSum"):
-            instance_costs = state['instance_costs']
-            if 'SLO' in self._policy.name:
-                SLOs = state['SLOs']
-                allocation = self._policy.get_allocation(
-                    throughputs, scale_factors, cluster_spec,
-                    instance_costs=instance_costs,
-                    SLOs=SLOs,
-                    num_steps_remaining=num_steps_remaining)
-            else:
-                allocation = self._policy.get_allocation(
-                    throughputs, scale_factors, self._cluster_spec,
-                    instance_costs=instance_costs)
-        else:
-            allocation = self._policy.get_allocation(
-                throughputs, scale_factors, self._cluster_spec)
+
+        allocation, solve_time, _ = \
+            _solve_allocation(self._policy, self._aggregate_job_types, state)
+        self._num_allocation_computations += 1
+        self._allocation_computation_time += solve_time
         if allocation is None:
             allocation = {}
         return allocation
 
+    def _redistribute_inactive_allocations(self, allocation):
+        """Re-distributes the allocation of job combinations that are no
+        longer active in a stale allocation (computed before some jobs
+        completed)."""
+        for job_id in list(allocation.keys()):
+            still_active = []
+            for single_job_id in job_id.singletons():
+                if single_job_id in self._jobs:
+                    still_active.append(True)
+                else:
+                    still_active.append(False)
+            if not all(still_active):
+                worker_types = list(allocation[job_id].keys())
+                for i, single_job_id in enumerate(job_id.singletons()):
+                    if still_active[i]:
+                        # If only one job in a job combination is still
+                        # active, re-distribute the job combination's
+                        # allocation to the still-active job's isolated
+                        # allocation.
+                        for worker_type in worker_types:
+                            allocation[single_job_id][worker_type] += \
+                                allocation[job_id][worker_type]
+                            del allocation[job_id][worker_type]
+                        del allocation[job_id]
+
+    def _get_pending_allocation_ready_time(self, deadline=None):
+        """Returns the simulated time at which the pending asynchronous
+        allocation computation completes, or None if there is none.
+
+        Waits for the computation to complete if its latency is measured
+        rather than configured. If deadline is specified, only waits as long
+        as the computation could complete by deadline (in simulated time),
+        and returns None if it does not.
+        """
+        pending_allocation = self._pending_allocation
+        if pending_allocation is None:
+            return None
+        if self._allocation_latency is not None:
+            return pending_allocation['start_time'] + self._allocation_latency
+        future = pending_allocation['future']
+        if not future.done() and deadline is not None:
+            # Simulated time is assumed to pass at least as quickly as
+            # wall-clock time; if the computation has already taken longer
+            # (in wall-clock time) than the simulated time until the
+            # deadline, it cannot complete by the deadline.
+            timeout = max(0.0, (deadline - pending_allocation['start_time']) -
+                               (time.time() -
+                                pending_allocation['start_wall_time']))
+            try:
+                future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                return None
+        _, solve_time, _ = future.result()
+        return pending_allocation['start_time'] + solve_time
+
+    def _apply_pending_allocation_if_ready(self, current_time):
+        """Applies the pending asynchronous allocation computation if it has
+        completed by current_time (in simulated time)."""
+        ready_time = self._get_pending_allocation_ready_time(
+            deadline=current_time)
+        if ready_time is None or ready_time > current_time:
+            return
+        pending_allocation = self._pending_allocation
+        self._pending_allocation = None
+        allocation, solve_time, policy = pending_allocation['future'].result()
+        self._num_allocation_computations += 1
+        self._allocation_computation_time += solve_time
+        if self._policy is pending_allocation['policy']:
+            # Carry over any internal state updated by the policy.
+            self._policy = policy
+        if allocation is None:
+            allocation = {}
+        self._redistribute_inactive_allocations(allocation)
+        self._reset_time_run_so_far()
+        self._allocation = allocation
+        if self._event_log is not None:
+            self._record_allocation_change()
+        self._priority_table.invalidate()
+
+    def _update_allocation_asynchronously(self):
+        """Applies the pending asynchronous allocation computation if it
+        has completed in simulated time, and starts a new one if needed.
+
+        Allocations are requested under the same conditions as when they
+        are computed synchronously in simulation, but are only applied
+        (resetting the time each job has run so far) once their latency has
+        elapsed; in the meantime, the simulation proceeds with the previous
+        allocation. With a latency of 0, this matches synchronous
+        computation.
+        """
+        current_time = self.get_current_timestamp()
+        self._apply_pending_allocation_if_ready(current_time)
+
+        time_since_last_reset = current_time - self._last_reset_time
+        if (self._pending_allocation is None and
+            self._need_to_update_allocation and
+            (time_since_last_reset >=
+             self._minimum_time_between_allocation_resets or
+             self._last_reset_time == 0)):
+            state = self._get_allocation_state()
+            self._pending_allocation = {
+                'future': self._allocation_executor.submit(
+                    _solve_allocation, self._policy,
+                    self._aggregate_job_types, state),
+                'policy': self._policy,
+                'start_time': current_time,
+                'start_wall_time': time.time(),
+            }
+            self._need_to_update_allocation = False
+            self._apply_pending_allocation_if_ready(current_time)
+
     def _allocation_thread(self):
         """Computes the allocation asynchronously."""
         while True:
@@ -2167,32 +2913,98 @@ class Scheduler:
 
             # Update allocation and clean up.
             self._scheduler_cv.acquire()
-            for job_id in allocation:
-                still_active = []
-                for single_job_id in job_id.singletons():
-                    if single_job_id in self._jobs:
-                        still_active.append(True)
-                    else:
-                        still_active.append(False)
-                if not all(still_active):
-                    worker_types = allocation[job_id].keys()
-                    for i, single_job_id in enumerate(job_id.singletons()):
-                        if still_active[i]:
-                            # If only one job in a job combination is still
-                            # active, re-distribute the job combination's
-                            # allocation to the still-active job's isolated
-                            # allocation.
-                            for worker_type in worker_types:
-                                allocation[single_job_id][worker_type] += \
-                                    allocation[job_id][worker_type]
-                                del allocation[job_id][worker_type]
-                            del allocation[job_id]
+            self._redistribute_inactive_allocations(allocation)
             self._allocation = allocation
+            if self._event_log is not None:
+                self._record_allocation_change()
+            self._priority_table.invalidate()
             self._need_to_update_allocation = False
             self._allocation_changed_since_last_time_reset = True
             self._scheduler_cv.notifyAll()
             self._scheduler_cv.release()
 
+    def _throughput_estimation_thread(self):
+        """Matches jobs to reference job types asynchronously."""
+        while True:
+            self._scheduler_cv.acquire()
+            while len(self._pending_reference_job_profiles) == 0:
+                self._scheduler_cv.wait()
+            pending_reference_job_profiles = \
+                self._pending_reference_job_profiles
+            self._pending_reference_job_profiles = {}
+            self._scheduler_cv.release()
+            job_ids = list(pending_reference_job_profiles.keys())
+            reference_job_types = \
+                self._throughput_estimator.match_jobs_to_reference_jobs(
+                    [pending_reference_job_profiles[job_id]
+                     for job_id in job_ids])
+
+            self._scheduler_cv.acquire()
+            self._update_reference_job_map(dict(zip(job_ids,
+                                                    reference_job_types)))
+            self._scheduler_cv.notifyAll()
+            self._scheduler_cv.release()
+
+    def _refine_reference_job_map(self):
+        """Matches every job with a provisional reference job type to a
+        reference job type in a single batch."""
+        job_ids = list(self._pending_reference_job_profiles.keys())
+        reference_job_types = \
+            self._throughput_estimator.match_jobs_to_reference_jobs(
+                [self._pending_reference_job_profiles[job_id]
+                 for job_id in job_ids])
+        self._pending_reference_job_profiles = {}
+        self._update_reference_job_map(dict(zip(job_ids, reference_job_types)))
+
+    # @preconditions(lambda self: self._simulate or self._scheduler_lock.locked())
+    def _update_reference_job_map(self, reference_job_map):
+        """Updates the reference job types of jobs, along with the estimated
+        throughputs of the job combinations containing them.
+
+        Args:
+          reference_job_map: Map from job ID to reference job type. Jobs
+                             that have since completed are ignored.
+        """
+        for job_id, reference_job_type in reference_job_map.items():
+            if (job_id not in self._reference_job_map or
+                self._reference_job_map[job_id] == reference_job_type):
+                continue
+            self._reference_job_map[job_id] = reference_job_type
+            for merged_job_id in self._job_pairs[job_id]:
+                single_job_ids = merged_job_id.singletons()
+                other_job_id = single_job_ids[0]
+                if other_job_id == job_id:
+                    other_job_id = single_job_ids[1]
+                for worker_type in self._throughputs[merged_job_id]:
+                    self._throughputs[merged_job_id][worker_type] = \
+                        self._get_estimated_colocated_throughputs(
+                            job_id, other_job_id, worker_type)
+                self._priority_table.mark_dirty(merged_job_id)
+                self._throughput_snapshots.mark_dirty(merged_job_id)
+            self._need_to_update_allocation = True
+
+    def _get_estimated_colocated_throughputs(self, job_id, other_job_id,
+                                             worker_type):
+        """Estimates the throughputs of two co-located jobs on worker_type
+        using their reference job types, ordered by job ID."""
+        reference_throughputs = self._reference_throughputs[worker_type]
+        reference_job_types = \
+            [self._reference_job_map[job_id],
+             self._reference_job_map[other_job_id]]
+        isolated_throughputs = \
+            [self._oracle_throughputs.get_isolated_throughput(
+                worker_type, self._job_id_to_job_type[job_id]),
+             self._oracle_throughputs.get_isolated_throughput(
+                worker_type, self._job_id_to_job_type[other_job_id])]
+        if job_id < other_job_id:
+            return np.multiply(
+                reference_throughputs[reference_job_types[0]][reference_job_types[1]],
+                isolated_throughputs)
+        else:
+            return np.multiply(
+                reference_throughputs[reference_job_types[1]][reference_job_types[0]],
+                isolated_throughputs[::-1])
+
     # @preconditions(lambda self: self._simulate or self._scheduler_lock.locked())
     def _populate_job_combination_metadata(self, job_id, worker_type):
         """Populate metadata for job combinations involving passed-in job_id."""
@@ -2201,7 +3013,6 @@ class Scheduler:
         job_type_key = (job.job_type, job.scale_factor)
         if self._estimate_throughputs:
             assert(job.scale_factor == 1)
-            reference_throughputs = self._reference_throughputs[worker_type]
         for other_job_id in self._jobs:
             if other_job_id != job_id:
                 other_job = self._jobs[other_job_id]
@@ -2213,51 +3024,41 @@ class Scheduler:
                         job_id_pair.JobIdPair(job_id[0], other_job_id[0])
                 if merged_job_id not in self._throughputs:
                     self._throughputs[merged_job_id] = {}
-                    self._job_time_so_far[merged_job_id] = {}
+                    self._job_pairs[job_id][merged_job_id] = None
+                    self._job_pairs[other_job_id][merged_job_id] = None
+                    self._job_state.add([merged_job_id])
                     self._priorities[worker_type][job_id] = 0.0
-                    self._deficits[worker_type][job_id] = 0.0
-                self._job_time_so_far[merged_job_id][worker_type] = 0.0
+                    self._job_state.set_deficit(job_id, worker_type, 0.0)
+                self._job_state.set_job_time(merged_job_id, worker_type, 0.0)
+                self._priority_table.mark_dirty(merged_job_id)
+                self._throughput_snapshots.mark_dirty(merged_job_id)
                 if self._estimate_throughputs:
-                    reference_job_types = \
-                        [self._reference_job_map[job_id],
-                         self._reference_job_map[other_job_id]]
-                    isolated_throughputs = \
-                        [self._oracle_throughputs[worker_type][job_type_key]['null'],
-                         self._oracle_throughputs[worker_type][other_job_type_key]['null']]
-                    if job_id < other_job_id:
-                        self._throughputs[merged_job_id][worker_type] = \
-                            np.multiply(
-                                reference_throughputs[reference_job_types[0]][reference_job_types[1]],
-                                isolated_throughputs)
-                    else:
-                        self._throughputs[merged_job_id][worker_type] = \
-                            np.multiply(
-                                reference_throughputs[reference_job_types[1]][reference_job_types[0]],
-                                isolated_throughputs[::-1])
+                    self._throughputs[merged_job_id][worker_type] = \
+                        self._get_estimated_colocated_throughputs(
+                            job_id, other_job_id, worker_type)
                 elif (self._oracle_throughputs is None or
                     job.scale_factor != other_job.scale_factor):
                     self._throughputs[merged_job_id][worker_type] = [0.0, 0.0]
                 else:
-                    oracle_throughputs = self._oracle_throughputs[worker_type]
                     # The single-job IDs for job pairs are stored in sorted
                     # order so make sure the co-located throughputs match this
                     # order.
-                    scale_factor = job.scale_factor
-                    if job_id < other_job_id:
-                        self._throughputs[merged_job_id][worker_type] = \
-                            oracle_throughputs[job_type_keys[0]][job_type_keys[1]]
-                    else:
-                        self._throughputs[merged_job_id][worker_type] = \
-                            oracle_throughputs[job_type_keys[1]][job_type_keys[0]]
+                    if job_id > other_job_id:
+                        job_type_keys.reverse()
+                    self._throughputs[merged_job_id][worker_type] = \
+                        self._oracle_throughputs.get_colocated_throughputs(
+                            worker_type, *job_type_keys)
 
     def _set_initial_throughput(self, job_id, worker_type):
         assert(not job_id.is_pair())
+        self._throughput_snapshots.mark_dirty(job_id)
         if self._oracle_throughputs is not None:
             job_type = self._jobs[job_id].job_type
             scale_factor = self._jobs[job_id].scale_factor
             key = (job_type, scale_factor)
             self._throughputs[job_id][worker_type] = \
-                self._oracle_throughputs[worker_type][key]['null']
+                self._oracle_throughputs.get_isolated_throughput(
+                    worker_type, key)
         else:
             self._throughputs[job_id][worker_type] = DEFAULT_THROUGHPUT
 
@@ -2271,43 +3072,22 @@ class Scheduler:
         self._logger.debug('Resetting time run so far')
         current_time = self.get_current_timestamp()
         elapsed_time_since_last_reset = current_time - self._last_reset_time
+        # The deficit of each job combination is the difference between the
+        # time it should have received since the last reset event (given its
+        # allocation), and how much it actually received (ignoring the
+        # initial time recorded for the job).
+        initial_job_time = self._time_per_iteration / 2.0
+        self._job_state.reset(self._allocation,
+                              elapsed_time_since_last_reset,
+                              initial_job_time)
         for worker_type in self._worker_types:
-            self._worker_time_so_far[worker_type] = 0.0
-            for job_id in self._job_time_so_far:
-                # _job_time_so_far keeps track of how long job_id has run on
-                # worker_type since the last reset event.
-                if worker_type not in self._job_time_so_far[job_id]:
-                    time_received = 0.0
-                else:
-                    # Ignore the initial time recorded for the job.
-                    time_received = \
-                            (self._job_time_so_far[job_id][worker_type] -
-                             (self._time_per_iteration / 2.0))
-
-                # Compute the time this job_id should have received since the
-                # last reset event.
-                if job_id not in self._allocation:
-                    time_should_have_received = 0
-                else:
-                    time_should_have_received = \
-                        self._allocation[job_id][worker_type] *\
-                            elapsed_time_since_last_reset
-
-                # deficit is now just the difference between the time job_id
-                # should have received, and how much it actually received.
-                deficit = time_should_have_received - time_received
-                if job_id not in self._deficits[worker_type]:
-                    self._deficits[worker_type][job_id] = 0.0
-                self._deficits[worker_type][job_id] += deficit
-
-                self._job_time_so_far[job_id][worker_type] = \
-                        (self._time_per_iteration / 2.0)
-                self._worker_time_so_far[worker_type] += \
-                        self._job_time_so_far[job_id][worker_type]
+            self._worker_time_so_far[worker_type] = \
+                len(self._job_state) * initial_job_time
         # Prints deficits every time allocation is reset.
         # self._print_deficits()
         self._last_reset_time = current_time
         self._allocation_changed_since_last_time_reset = False
+        self._priority_table.invalidate()
 
     # @preconditions(lambda self: self._simulate or self._scheduler_lock.locked())
     def _add_to_priorities(self, job_id, worker_type=None):
@@ -2325,12 +3105,12 @@ class Scheduler:
             worker_types = [worker_type]
         for worker_type in worker_types:
             self._priorities[worker_type][job_id] = 0.0
-            self._deficits[worker_type][job_id] = 0.0
-            for other_job_id in self._throughputs:
-                if (other_job_id.is_pair() and
-                    job_id.overlaps_with(other_job_id)):
-                    self._priorities[worker_type][other_job_id] = 0.0
-                    self._deficits[worker_type][other_job_id] = 0.0
+            self._job_state.set_deficit(job_id, worker_type, 0.0)
+            self._priority_table.add(job_id)
+            for other_job_id in self._job_pairs[job_id]:
+                self._priorities[worker_type][other_job_id] = 0.0
+                self._job_state.set_deficit(other_job_id, worker_type, 0.0)
+                self._priority_table.add(other_job_id)
 
     # @preconditions(lambda self: self._simulate or self._scheduler_lock.locked())
     def _remove_from_priorities(self, job_id):
@@ -2342,17 +3122,12 @@ class Scheduler:
         Args:
            job_id: The job_id to remove from the workers' priority data structures.
         """
+        to_remove = [job_id] + list(self._job_pairs[job_id])
         for worker_type in self._worker_types:
-            while True:
-                found = False
-                for other_job_id in self._priorities[worker_type]:
-                    if job_id.overlaps_with(other_job_id):
-                        del self._priorities[worker_type][other_job_id]
-                        del self._deficits[worker_type][other_job_id]
-                        found = True
-                        break
-                if not found:
-                    break
+            for other_job_id in to_remove:
+                if other_job_id in self._priorities[worker_type]:
+                    del self._priorities[worker_type][other_job_id]
+                    self._priority_table.remove(other_job_id)
 
     # @preconditions(lambda self: self._simulate or self._scheduler_lock.locked())
     def _update_priorities(self):
@@ -2366,13 +3141,20 @@ class Scheduler:
 
         NOTE: Used when scheduling is performed in rounds.
         """
+        if (self._simulate and self._estimate_throughputs and
+            len(self._pending_reference_job_profiles) > 0):
+            self._refine_reference_job_map()
+
         current_time = self.get_current_timestamp()
         time_since_last_reset = current_time - self._last_reset_time
         reset_interval_elapsed = time_since_last_reset >= \
             self._minimum_time_between_allocation_resets
         need_to_reset_time_run_so_far = \
             reset_interval_elapsed or self._last_reset_time == 0
-        if self._simulate:
+        if self._allocation_executor is not None:
+            self._update_allocation_asynchronously()
+            need_to_reset_time_run_so_far = False
+        elif self._simulate:
             need_to_reset_time_run_so_far = \
                 (self._need_to_update_allocation and
                  need_to_reset_time_run_so_far)
@@ -2386,13 +3168,18 @@ class Scheduler:
             # before proceeding.
             if self._simulate:
                 self._allocation = self._compute_allocation()
+                if self._event_log is not None:
+                    self._record_allocation_change()
+                self._priority_table.invalidate()
                 self._need_to_update_allocation = False
 
         # Account for time elapsed since job was dispatched if running on a
         # physical cluster. Note that the total time for each job is the
         # sum of a) the time for all microtasks that have finished
-        # (accounted for by self._job_time_so_far), and b) the unaccounted time
+        # (accounted for by self._job_state), and b) the unaccounted time
         # for all microtasks that are currently running (elapsed_job_time).
+        elapsed_job_time = None
+        elapsed_worker_time = None
         if not self._simulate:
             elapsed_job_time = {}
             elapsed_worker_time = {}
@@ -2416,51 +3203,16 @@ class Scheduler:
                 elapsed_job_time[job_id][worker_type] += elapsed_time
                 elapsed_worker_time[worker_type] += elapsed_time
 
-        # Stores the fraction of time spent running a job for each worker.
-        fractions = {}
-
-        # Compute priorities.
-        for worker_type in self._worker_types:
-            fractions[worker_type] = {}
-            worker_time_so_far = self._worker_time_so_far[worker_type]
-            for job_id in self._job_time_so_far:
-                worker_time_so_far = self._worker_time_so_far[worker_type]
-                if not self._simulate and worker_type in elapsed_worker_time:
-                    worker_time_so_far += elapsed_worker_time[worker_type]
-                if (worker_time_so_far == 0.0 or
-                    worker_type not in self._job_time_so_far[job_id]):
-                    fraction = 0.0
-                else:
-                    job_time_so_far = \
-                        self._job_time_so_far[job_id][worker_type]
-                    if not self._simulate:
-                        if (job_id in elapsed_job_time and
-                            worker_type in elapsed_job_time[job_id]):
-                            job_time_so_far += \
-                                elapsed_job_time[job_id][worker_type]
-                    fraction = job_time_so_far / worker_time_so_far
-                fractions[worker_type][job_id] = fraction
-            for job_id in self._priorities[worker_type]:
-                # Don't use inf so 2*new_priority > new_priority.
-                #
-                # Scale the default value by the allocation so that newly
-                # added jobs run according to their respective allocations.
-                if job_id not in self._allocation:
-                    self._priorities[worker_type][job_id] = 0.0
-                else:
-                    new_priority = self._allocation[job_id][worker_type] * 1e9
-                    if self._allocation[job_id][worker_type] == 0.0:
-                        assert(new_priority == 0)
-                    elif ((job_id.is_pair() and
-                           (self._throughputs[job_id][worker_type][0] == 0 or
-                            self._throughputs[job_id][worker_type][1] == 0)) or
-                          (not job_id.is_pair() and
-                           self._throughputs[job_id][worker_type] == 0)):
-                        new_priority = 0
-                    elif fractions[worker_type][job_id] > 0.0:
-                        new_priority = self._allocation[job_id][worker_type] /\
-                                fractions[worker_type][job_id]
-                    self._priorities[worker_type][job_id] = new_priority
+        # Compute priorities. Only job combinations whose allocation,
+        # throughput, or time received changed since the last call are
+        # re-read; the priority of a job combination on a given worker type is
+        # its allocation divided by the fraction of time it has received.
+        self._priority_table.update(self._priorities, self._allocation,
+                                    self._throughputs,
+                                    self._job_state.job_time_so_far,
+                                    self._worker_time_so_far,
+                                    elapsed_job_time=elapsed_job_time,
+                                    elapsed_worker_time=elapsed_worker_time)
 
     def _add_available_worker_id(self, worker_id):
         """Adds a worker_id to the list of available workers."""
@@ -2551,18 +3303,16 @@ class Scheduler:
 
             if not found:
                 self._priorities[worker_type] = {}
-                self._deficits[worker_type] = {}
+                self._job_state.add_worker_type(worker_type)
                 if self._per_worker_type_prices is not None:
                     self._per_worker_type_prices[worker_type] = \
-                        utils.get_latest_price_for_worker_type(
+                        self._spot_prices.get_latest_price(
                             worker_type,
-                            self.get_current_timestamp(in_seconds=True),
-                            self._per_instance_type_spot_prices,
-                            self._available_clouds)
+                            self.get_current_timestamp(in_seconds=True))
                 for job_id in self._jobs:
                     self._steps_run_so_far[job_id][worker_type] = 0
-                    self._job_time_so_far[job_id][worker_type] = \
-                            (self._time_per_iteration / 2.0)
+                    self._job_state.set_job_time(
+                        job_id, worker_type, self._time_per_iteration / 2.0)
                     self._set_initial_throughput(job_id, worker_type)
                     if self._job_packing:
                         self._populate_job_combination_metadata(job_id,
@@ -2599,11 +3349,33 @@ class Scheduler:
 
         return (per_worker_ids, self._time_per_iteration)
 
-    def _init_job_callback(self, job_id):
+    def _resume_later(self, callback, *args, condition=None, timeout=None):
+        """Returns a PendingCallback that retries callback without blocking
+        once the scheduler's state next changes.
+
+        Requires self._scheduler_lock to be held when calling this function.
+
+        Args:
+          callback: The callback to retry.
+          args: The arguments to retry the callback with.
+          condition: The condition variable notified of the state change;
+                     defaults to self._scheduler_cv.
+          timeout: If not None, the callback is also retried after timeout
+                   seconds.
+        """
+        if condition is None:
+            condition = self._scheduler_cv
+        return scheduler_server.PendingCallback(
+            condition.add_waiter(),
+            functools.partial(callback, *args, wait=False), timeout)
+
+    def _init_job_callback(self, job_id, wait=True):
         """Initializes a job.
 
            Args:
              job_id: The ID for the (single) job to initialize.
+             wait: If False, returns a PendingCallback instead of blocking
+                   while the job is still running in the current round.
         """
         with self._scheduler_cv:
             # Job could have completed in previous round.
@@ -2648,6 +3420,9 @@ class Scheduler:
                             break
 
                 if currently_active and next_job_combination is not None:
+                    if not wait:
+                        return self._resume_later(self._init_job_callback,
+                                                  job_id)
                     self._scheduler_cv.wait()
                 else:
                     break
@@ -2681,27 +3456,37 @@ class Scheduler:
                 return (remaining_steps, remaining_time_in_current_round, 0)
 
     def _update_lease_callback(self, job_id, worker_id, steps, duration,
-                               max_steps, max_duration):
+                               max_steps, max_duration, gang=False,
+                               wait=True):
+        """Computes a new lease for a job.
 
+        Args:
+          job_id: The ID of the (single) job.
+          worker_id: The ID of the worker requesting the update.
+          steps: The number of steps run so far in the current lease.
+          duration: The time run so far in the current lease.
+          max_steps: The maximum number of steps of the current lease.
+          max_duration: The maximum duration of the current lease.
+          gang: If True, the update is on behalf of all of the job's workers.
+          wait: If False, returns a PendingCallback instead of blocking
+                while waiting for another worker's update.
+        """
         with self._scheduler_lock:
             if job_id not in self._lease_update_requests:
                 self._lease_update_requests[job_id] = []
-            update_id = len(self._lease_update_requests[job_id])
-            self._lease_update_requests[job_id].append((steps, duration,
-                                                        max_steps,
-                                                        max_duration))
-
-            # Round the remaining steps to the nearest multiple of scale_factor.
+            requests = self._lease_update_requests[job_id]
+            update_id = len(requests)
             scale_factor = self._jobs[job_id].scale_factor
-            remaining_steps = self._get_remaining_steps(job_id)
-            remaining_steps = int(math.ceil(remaining_steps / scale_factor))
-            current_time = self.get_current_timestamp()
-            current_round_end_time = \
-                self._current_round_start_time + self._time_per_iteration
-            remaining_time_in_current_round = \
-                current_round_end_time - current_time
-            remaining_time_in_current_round = \
-                max(0, remaining_time_in_current_round)
+            # A gang update stands in for the requests of all workers that
+            # have not yet requested an update themselves.
+            num_requests = 1
+            if gang:
+                num_requests = max(1, scale_factor - update_id)
+            for _ in range(num_requests):
+                requests.append((steps, duration, max_steps, max_duration))
+
+            (remaining_steps, remaining_time_in_current_round) = \
+                self._get_remaining_lease(job_id)
 
         if steps == 0 or duration == 0:
             return (remaining_steps, remaining_time_in_current_round)
@@ -2719,34 +3504,105 @@ class Scheduler:
 
         if scale_factor == 1:
             return (max_steps, duration + remaining_time_in_current_round)
+        elif update_id == 0 or gang:
+            # The first worker to request a lease update (the leader)
+            # computes the new lease for all workers.
+            with self._scheduler_lock:
+                if not gang:
+                    assert self._max_steps[job_id] is None
+                return self._agree_on_max_steps(
+                    job_id, steps, duration, remaining_steps,
+                    remaining_time_in_current_round)
         else:
-            if update_id == 0:
-                assert self._max_steps[job_id] is None
+            deadline = time.time() + LEASE_AGREEMENT_TIMEOUT
+            return self._wait_for_max_steps(job_id, worker_id, steps,
+                                            duration, deadline, wait=wait)
 
-            # The first worker to request a lease update computes the new
-            # lease for all workers.
-            if update_id == 0:
-                with self._scheduler_lock:
-                    throughput = steps / duration
-                    self._max_steps[job_id] = \
-                        min(remaining_steps,
-                            steps + int(remaining_time_in_current_round *
-                                        throughput))
-                    return (self._max_steps[job_id], INFINITY)
-            else:
-                # Wait for the first update to complete.
-                while True:
-                    with self._scheduler_lock:
-                        max_steps = self._max_steps[job_id]
-                        if max_steps is not None:
-                            break
-                    # TODO: Sleep for less time?
-                    self._logger.debug(
-                        'Job {0} (worker {1}) waiting for '
-                        'lease...'.format(job_id, worker_id))
-                    time.sleep(1)
-                assert max_steps is not None
-                return (max_steps, INFINITY)
+    # @preconditions(lambda self: self._simulate or self._scheduler_lock.locked())
+    def _get_remaining_lease(self, job_id):
+        """Returns the remaining steps (per worker) and the remaining time
+        in the current round for a job.
+
+        Requires self._scheduler_lock to be held when calling this function.
+        """
+        # Round the remaining steps to the nearest multiple of scale_factor.
+        scale_factor = self._jobs[job_id].scale_factor
+        remaining_steps = self._get_remaining_steps(job_id)
+        remaining_steps = int(math.ceil(remaining_steps / scale_factor))
+        current_time = self.get_current_timestamp()
+        current_round_end_time = \
+            self._current_round_start_time + self._time_per_iteration
+        remaining_time_in_current_round = \
+            current_round_end_time - current_time
+        remaining_time_in_current_round = \
+            max(0, remaining_time_in_current_round)
+        return (remaining_steps, remaining_time_in_current_round)
+
+    # @preconditions(lambda self: self._simulate or self._scheduler_lock.locked())
+    def _agree_on_max_steps(self, job_id, steps, duration, remaining_steps,
+                            remaining_time_in_current_round):
+        """Computes the lease of all workers of a distributed job for the
+        rest of the round, and wakes up the workers waiting for it.
+
+        Requires self._scheduler_lock to be held when calling this function.
+        """
+        throughput = steps / duration
+        self._max_steps[job_id] = \
+            min(remaining_steps,
+                steps + int(remaining_time_in_current_round * throughput))
+        if job_id in self._lease_agreement_cvs:
+            self._lease_agreement_cvs[job_id].notifyAll()
+        return (self._max_steps[job_id], INFINITY)
+
+    def _wait_for_max_steps(self, job_id, worker_id, steps, duration,
+                            deadline, wait=True):
+        """Waits for the first worker of a distributed job to compute the
+        new lease for all of the job's workers, and returns it.
+
+        If the lease has not been computed by the deadline (e.g., because
+        the first worker failed), this worker computes it instead. If the
+        job is removed while waiting, returns an empty lease.
+
+        Args:
+          job_id: The ID of the distributed job.
+          worker_id: The ID of the worker waiting for the lease.
+          steps: The number of steps run so far by the worker.
+          duration: The time run so far by the worker.
+          deadline: The time (as returned by time.time()) to stop waiting.
+          wait: If False, returns a PendingCallback instead of blocking.
+        """
+        with self._scheduler_lock:
+            if job_id not in self._max_steps:
+                return (0, 0)
+            if job_id not in self._lease_agreement_cvs:
+                self._lease_agreement_cvs[job_id] = \
+                    scheduler_server.SchedulerCondition(self._scheduler_lock)
+            lease_agreement_cv = self._lease_agreement_cvs[job_id]
+            while self._max_steps[job_id] is None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    self._logger.warning(
+                        'Job {0} (worker {1}) timed out waiting for '
+                        'lease; computing lease instead'.format(
+                            job_id, worker_id))
+                    (remaining_steps, remaining_time_in_current_round) = \
+                        self._get_remaining_lease(job_id)
+                    return self._agree_on_max_steps(
+                        job_id, steps, duration, remaining_steps,
+                        remaining_time_in_current_round)
+                if not wait:
+                    return self._resume_later(
+                        self._wait_for_max_steps, job_id, worker_id, steps,
+                        duration, deadline, condition=lease_agreement_cv,
+                        timeout=timeout)
+                self._logger.debug(
+                    'Job {0} (worker {1}) waiting for '
+                    'lease...'.format(job_id, worker_id))
+                lease_agreement_cv.wait(timeout)
+                if job_id not in self._max_steps:
+                    # The job was removed (see _remove_job).
+                    return (0, 0)
+            return (self._max_steps[job_id], INFINITY)
 
     def _kill_job(self, job_id):
         with self._scheduler_cv:
@@ -2866,7 +3722,8 @@ class Scheduler:
             self._kill_job(job_id)
 
     def _done_callback(self, job_id, worker_id, all_num_steps,
-                       all_execution_times, all_iterator_logs=None):
+                       all_execution_times, all_iterator_logs=None,
+                       wait=True):
         """Handles completion of a scheduled job.
 
         Updates the running total of completed steps and time spent on each
@@ -2880,6 +3737,8 @@ class Scheduler:
             all_num_steps: List of the number of steps each job ran for.
             all_execution_times: List of the duration each job ran for.
             all_iterator_logs: List of the GavelIterator logs for each job.
+            wait: If False, returns a PendingCallback instead of blocking
+                  until the job's previous round is done.
         """
 
         to_remove = []
@@ -2897,6 +3756,11 @@ class Scheduler:
                             'Discarding completion notification for job {0} '
                             'as it is not currently scheduled'.format(job_id))
                         return
+                    if not wait:
+                        return self._resume_later(
+                            self._done_callback, job_id, worker_id,
+                            all_num_steps, all_execution_times,
+                            all_iterator_logs)
                     self._logger.debug(
                         'Waiting to complete job {0}...'.format(job_id))
                     self._scheduler_cv.wait()
@@ -2985,9 +3849,14 @@ class Scheduler:
 
             if not micro_task_succeeded:
                 # Micro-task failed.
-                self._logger.info(
-                    '[Micro-task failed]\tJob ID: {job_id}'.format(
-                        job_id=job_id))
+                if self._event_log is not None:
+                    self._record_event(event_log.MICRO_TASK_FAILED, job_id,
+                                       worker_type=worker_type,
+                                       worker_ids=all_worker_ids)
+                else:
+                    self._logger.info(
+                        '[Micro-task failed]\tJob ID: {job_id}'.format(
+                            job_id=job_id))
                 if not job_id.is_pair() and is_active[job_id]:
                     self._num_failures_per_job[job_id] += 1
                     if (self._num_failures_per_job[job_id] >=
@@ -2995,6 +3864,10 @@ class Scheduler:
                         start_time = self._per_job_start_timestamps[job_id]
                         finish_time = self._per_job_latest_timestamps[job_id]
                         duration = finish_time - start_time
+                        if self._event_log is not None:
+                            self._record_event(event_log.JOB_FAILED, job_id,
+                                               value0=start_time,
+                                               value1=duration)
                         self._logger.info(
                             '[Job failed]\tJob ID: {job_id}\t'
                             'Start timestamp: {start_timestamp:.2f}\t'
@@ -3008,16 +3881,24 @@ class Scheduler:
                 self._need_to_update_allocation = True
 
             else:
-                self._logger.info(
-                    '[Micro-task succeeded]\t'
-                    'Job ID: {job_id}\tWorker type: {worker_type}\t'
-                    'Worker ID(s): {worker_ids}'.format(
-                        job_id=job_id, worker_type=worker_type,
-                        worker_ids=str(all_worker_ids)))
+                if self._event_log is None:
+                    self._logger.info(
+                        '[Micro-task succeeded]\t'
+                        'Job ID: {job_id}\tWorker type: {worker_type}\t'
+                        'Worker ID(s): {worker_ids}'.format(
+                            job_id=job_id, worker_type=worker_type,
+                            worker_ids=str(all_worker_ids)))
                 self._num_failures_per_job[job_id] = 0
                 for single_job_id, num_steps, execution_time in \
                         zip(job_id.singletons(), all_num_steps,
                             all_execution_times):
+                    if self._event_log is not None:
+                        self._record_event(event_log.MICRO_TASK_SUCCEEDED,
+                                           single_job_id,
+                                           worker_type=worker_type,
+                                           worker_ids=all_worker_ids,
+                                           value0=num_steps,
+                                           value1=execution_time)
                     if not is_active[single_job_id]:
                         self._logger.debug('Job {0} is not active, not '
                                            'updating metadata'.format(
@@ -3054,6 +3935,11 @@ class Scheduler:
                             finish_time = \
                                 self._per_job_latest_timestamps[single_job_id]
                             duration = finish_time - start_time
+                            if self._event_log is not None:
+                                self._record_event(event_log.JOB_SUCCEEDED,
+                                                   single_job_id,
+                                                   value0=start_time,
+                                                   value1=duration)
                             self._logger.info(
                                 '[Job succeeded]\tJob ID: {job_id}\t'
                                 'Start timestamp: {start_timestamp:.2f}\t'
@@ -3070,9 +3956,10 @@ class Scheduler:
                 max_execution_time = np.max(all_execution_times)
                 # Job may be multi-GPU, and have already been marked complete
                 # by another worker.
-                if job_id in self._job_time_so_far:
-                    self._job_time_so_far[job_id][worker_type] += \
-                        max_execution_time
+                if job_id in self._job_state:
+                    self._job_state.add_job_time(job_id, worker_type,
+                                                 max_execution_time)
+                    self._priority_table.mark_dirty(job_id)
                     self._worker_time_so_far[worker_type] += \
                         max_execution_time
                 for worker_id in all_worker_ids:
@@ -36,7 +36,9 @@ def main(args):
                                 throughputs_file=args.throughputs_file,
                                 time_per_iteration=args.time_per_iteration,
                                 expected_num_workers=args.expected_num_workers,
-                                max_rounds=args.max_rounds)
+                                max_rounds=args.max_rounds,
+                                asynchronous_rpc_server=\
+                                    args.asynchronous_rpc_server)
 
     try:
         # Submit jobs to the scheduler.
@@ -99,4 +101,8 @@ if __name__=='__main__':
                         help='Maximum number of rounds to run')
     parser.add_argument('--timeline_dir', type=str, default=None,
                         help='Directory to save timelnes to')
+    parser.add_argument('--asynchronous_rpc_server', action='store_true',
+                        default=False,
+                        help=('Serve RPCs with an asyncio server that does '
+                              'not hold a thread per waiting RPC'))
     main(parser.parse_args())
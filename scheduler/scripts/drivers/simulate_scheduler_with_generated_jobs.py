@@ -21,7 +21,9 @@ def simulate(policy_name, throughputs_file, cluster_spec,
              checkpoint_threshold, checkpoint_file,
              profiling_percentage, per_instance_type_prices_dir,
              available_clouds, assign_SLOs, enable_global_queue,
-             num_gpus_per_server, output_trace_file_name):
+             num_gpus_per_server, output_trace_file_name,
+             aggregate_job_types, event_log_file,
+             asynchronous_allocation, allocation_latency, fast_forward):
     policy = utils.get_policy(policy_name, solver=solver, seed=seed)
     sched = scheduler.Scheduler(
                     policy,
@@ -33,7 +35,11 @@ def simulate(policy_name, throughputs_file, cluster_spec,
                     per_instance_type_prices_dir=per_instance_type_prices_dir,
                     available_clouds=available_clouds,
                     assign_SLOs=assign_SLOs,
-                    enable_global_queue=enable_global_queue)
+                    enable_global_queue=enable_global_queue,
+                    aggregate_job_types=aggregate_job_types,
+                    event_log_file=event_log_file,
+                    asynchronous_allocation=asynchronous_allocation,
+                    allocation_latency=allocation_latency)
 
     cluster_spec_str = 'v100:%d|p100:%d|k80:%d' % (cluster_spec['v100'],
                                                    cluster_spec['p100'],
@@ -60,7 +66,8 @@ def simulate(policy_name, throughputs_file, cluster_spec,
                    checkpoint_threshold=checkpoint_threshold,
                    checkpoint_file=checkpoint_file,
                    num_gpus_per_server=num_gpus_per_server,
-                   output_trace_file_name=output_trace_file_name)
+                   output_trace_file_name=output_trace_file_name,
+                   fast_forward=fast_forward)
     average_jct = sched.get_average_jct(jobs_to_complete)
     utilization = sched.get_cluster_utilization()
     total_cost = sched.get_total_cost()
@@ -116,7 +123,12 @@ def main(args):
                  args.assign_SLOs,
                  args.enable_global_queue,
                  num_gpus_per_server,
-                 args.output_trace_file_name)
+                 args.output_trace_file_name,
+                 args.aggregate_job_types,
+                 args.event_log_file,
+                 args.asynchronous_allocation,
+                 args.allocation_latency,
+                 args.fast_forward)
 
     else:
         with open('/dev/null', 'w') as f:
@@ -137,7 +149,12 @@ def main(args):
                          args.assign_SLOs,
                          args.enable_global_queue,
                          num_gpus_per_server,
-                         args.output_trace_file_name)
+                         args.output_trace_file_name,
+                         args.aggregate_job_types,
+                         args.event_log_file,
+                         args.asynchronous_allocation,
+                         args.allocation_latency,
+                         args.fast_forward)
 
 if __name__=='__main__':
     parser = argparse.ArgumentParser(
@@ -209,6 +226,27 @@ if __name__=='__main__':
                               'worker type'))
     parser.add_argument('--output_trace_file_name', type=str, default=None,
                         help='File to output generated trace to')
+    parser.add_argument('--aggregate_job_types', action='store_true',
+                        default=False,
+                        help=('If set, computes packed allocations over job '
+                              'types rather than job combinations'))
+    parser.add_argument('--event_log_file', type=str, default=None,
+                        help=('If set, records job and micro-task events in '
+                              'this binary event log instead of logging them '
+                              'as text'))
+    parser.add_argument('--asynchronous_allocation', action='store_true',
+                        default=False,
+                        help=('If set, computes allocations in a separate '
+                              'process and applies each once its solve '
+                              'latency has elapsed in simulated time'))
+    parser.add_argument('--allocation_latency', type=float, default=None,
+                        help=('Solve latency (in seconds of simulated time) '
+                              'of asynchronous allocation computations '
+                              '(the measured solve time if not specified)'))
+    parser.add_argument('--fast_forward', action='store_true', default=False,
+                        help=('If set, skips rounds that would repeat the '
+                              'previous round\'s schedule instead of '
+                              'simulating them one by one'))
 
     args = parser.parse_args()
     main(args)
@@ -15,14 +15,18 @@ import utils
 
 
 def main(args):
-    jobs, arrival_times = utils.parse_trace(args.trace_file)
     policy = utils.get_policy(args.policy, solver=args.solver, seed=args.seed)
 
     sched = scheduler.Scheduler(policy,
                                 throughputs_file=args.throughputs_file,
                                 simulate=True,
                                 seed=args.seed,
-                                time_per_iteration=args.time_per_iteration)
+                                time_per_iteration=args.time_per_iteration,
+                                aggregate_job_types=args.aggregate_job_types,
+                                event_log_file=args.event_log_file,
+                                asynchronous_allocation=\
+                                    args.asynchronous_allocation,
+                                allocation_latency=args.allocation_latency)
 
     num_gpus = args.cluster_spec.split(':')
     cluster_spec = {
@@ -43,12 +47,14 @@ def main(args):
     else:
         jobs_to_complete = None
 
-    sched.simulate(cluster_spec, arrival_times, jobs,
+    sched.simulate(cluster_spec,
+                   trace=utils.read_trace(args.trace_file),
                    debug=args.debug,
                    checkpoint_threshold=args.checkpoint_threshold,
                    checkpoint_file=args.checkpoint_file,
                    num_gpus_per_server=num_gpus_per_server,
-                   jobs_to_complete=jobs_to_complete)
+                   jobs_to_complete=jobs_to_complete,
+                   fast_forward=args.fast_forward)
     sched.get_average_jct(jobs_to_complete)
     sched.get_cluster_utilization()
     sched.get_num_lease_extensions()
@@ -58,7 +64,8 @@ def main(args):
 if __name__=='__main__':
     parser = argparse.ArgumentParser(description='Run scheduler with trace')
     parser.add_argument('-t', '--trace_file', type=str, required=True,
-                        help='Trace file')
+                        help=('Trace file (in the binary trace format if it '
+                              'ends in %s)' % (utils.BINARY_TRACE_SUFFIX)))
     parser.add_argument('-p', '--policy', type=str, default='fifo',
                         choices=utils.get_available_policies(),
                         help='Scheduler policy')
@@ -88,4 +95,25 @@ if __name__=='__main__':
                         help='measurement window start (job id)')
     parser.add_argument('-e', '--window-end', type=int, default=None,
                         help='Measurement window end (job ID)')
+    parser.add_argument('--aggregate_job_types', action='store_true',
+                        default=False,
+                        help=('If set, computes packed allocations over job '
+                              'types rather than job combinations'))
+    parser.add_argument('--event_log_file', type=str, default=None,
+                        help=('If set, records job and micro-task events in '
+                              'this binary event log instead of logging them '
+                              'as text'))
+    parser.add_argument('--asynchronous_allocation', action='store_true',
+                        default=False,
+                        help=('If set, computes allocations in a separate '
+                              'process and applies each once its solve '
+                              'latency has elapsed in simulated time'))
+    parser.add_argument('--allocation_latency', type=float, default=None,
+                        help=('Solve latency (in seconds of simulated time) '
+                              'of asynchronous allocation computations '
+                              '(the measured solve time if not specified)'))
+    parser.add_argument('--fast_forward', action='store_true', default=False,
+                        help=('If set, skips rounds that would repeat the '
+                              'previous round\'s schedule instead of '
+                              'simulating them one by one'))
     main(parser.parse_args())
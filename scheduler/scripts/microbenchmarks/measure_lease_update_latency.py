@@ -0,0 +1,130 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+import argparse
+from concurrent import futures
+import grpc
+import logging
+import numpy as np
+import threading
+import time
+
+from runtime.rpc import scheduler_server
+from runtime.rpc.channel_pool import ChannelPool, SERVER_OPTIONS
+from runtime.rpc.iterator_client import IteratorRpcClient
+import iterator_to_scheduler_pb2 as i2s_pb2
+import iterator_to_scheduler_pb2_grpc as i2s_pb2_grpc
+
+class PerCallChannelIteratorRpcClient(IteratorRpcClient):
+    """Iterator client that opens a new channel for every lease update, as
+       all RPC clients did before channels were pooled."""
+
+    def update_lease(self, steps, duration, max_steps, max_duration):
+        request = i2s_pb2.UpdateLeaseRequest(job_id=self._job_id,
+                                             worker_id=self._worker_id,
+                                             steps=steps,
+                                             duration=duration,
+                                             max_steps=max_steps,
+                                             max_duration=max_duration)
+        with grpc.insecure_channel(self._sched_loc) as channel:
+            stub = i2s_pb2_grpc.IteratorToSchedulerStub(channel)
+            response = stub.UpdateLease(request)
+            return (response.max_steps, response.max_duration)
+
+def start_server(port, service_time):
+    """Starts a scheduler iterator server on localhost whose UpdateLease
+       callback extends every lease after service_time seconds."""
+    def update_lease_callback(job_id, worker_id, steps, duration, max_steps,
+                              max_duration, gang=False):
+        if service_time > 0:
+            time.sleep(service_time)
+        return (max_steps + 100, max_duration + 60.0)
+
+    logger = logging.getLogger('measure_lease_update_latency')
+    logger.setLevel(logging.WARNING)
+    callbacks = {
+        'UpdateLease': update_lease_callback,
+    }
+    server = grpc.server(futures.ThreadPoolExecutor(), options=SERVER_OPTIONS)
+    i2s_pb2_grpc.add_IteratorToSchedulerServicer_to_server(
+            scheduler_server.SchedulerIteratorRpcServer(callbacks, logger),
+            server)
+    server.add_insecure_port('127.0.0.1:%d' % (port))
+    server.start()
+    return server
+
+def run_iterators(port, num_iterators, num_lease_updates, pooled):
+    """Runs num_iterators simulated iterators concurrently, each issuing
+       num_lease_updates lease updates back to back, and returns the
+       latency of every lease update and the total wall-clock time."""
+    logger = logging.getLogger('measure_lease_update_latency')
+    clients = []
+    for i in range(num_iterators):
+        if pooled:
+            # Every iterator runs in its own process, and so has its own
+            # channel pool.
+            clients.append(IteratorRpcClient(i, i, '127.0.0.1', port, logger,
+                                             channel_pool=ChannelPool()))
+        else:
+            clients.append(PerCallChannelIteratorRpcClient(
+                i, i, '127.0.0.1', port, logger))
+    latencies = [[] for _ in range(num_iterators)]
+    barrier = threading.Barrier(num_iterators + 1)
+
+    def run_iterator(i):
+        max_steps, max_duration = 0, 0.0
+        barrier.wait()
+        for j in range(num_lease_updates):
+            start_time = time.time()
+            max_steps, max_duration = \
+                clients[i].update_lease(j, float(j), max_steps, max_duration)
+            latencies[i].append(time.time() - start_time)
+
+    threads = [threading.Thread(target=run_iterator, args=(i,))
+               for i in range(num_iterators)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start_time = time.time()
+    for thread in threads:
+        thread.join()
+    total_time = time.time() - start_time
+    for client in clients:
+        if client._channel_pool is not None:
+            client._channel_pool.close()
+    return np.concatenate(latencies), total_time
+
+def main(args):
+    server = start_server(args.port, args.service_time)
+    header_str = ('Channels,# Iterators,Mean (ms),Median (ms),'
+                  '99th percentile (ms),Lease updates/s')
+    print(header_str)
+    try:
+        for num_iterators in args.num_iterators:
+            for pooled in [False, True]:
+                latencies, total_time = \
+                    run_iterators(args.port, num_iterators,
+                                  args.num_lease_updates, pooled)
+                print('%s,%d,%.3f,%.3f,%.3f,%.1f' % (
+                    'pooled' if pooled else 'per-call', num_iterators,
+                    np.mean(latencies) * 1000, np.median(latencies) * 1000,
+                    np.percentile(latencies, 99) * 1000,
+                    len(latencies) / total_time))
+    finally:
+        server.stop(0)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description=('Measure UpdateLease latency with per-call and '
+                         'pooled gRPC channels'))
+    parser.add_argument('--port', type=int, default=50070,
+                        help='Port of the scheduler server on localhost')
+    parser.add_argument('-n', '--num_iterators', type=int, nargs='+',
+                        default=[1, 8, 64],
+                        help='List of numbers of concurrent iterators')
+    parser.add_argument('-m', '--num_lease_updates', type=int, default=100,
+                        help='Number of lease updates issued by each iterator')
+    parser.add_argument('--service_time', type=float, default=0.0,
+                        help=('Time (in seconds) the scheduler takes to '
+                              'process each lease update'))
+    main(parser.parse_args())
@@ -0,0 +1,120 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+import argparse
+import numpy as np
+import time
+import tracemalloc
+
+from job_id_pair import JobIdPair
+
+class EagerJobIdPair():
+    """Reference implementation that eagerly builds the tuple, set,
+       singletons and string forms of every ID."""
+
+    def __init__(self, job0, job1):
+        if job1 is not None:
+            self._job0 = min(job0, job1)
+            self._job1 = max(job0, job1)
+        else:
+            self._job0 = job0
+            self._job1 = None
+        a = self._job0
+        b = self._job1
+        if b is None:
+            self._hash_value = a
+        else:
+            self._hash_value = a * a + a + b if a > b else a + b * b
+        self._is_pair = self._job1 is not None
+        self._as_tuple = (self._job0, self._job1)
+        if self._job1 is None:
+            self._singletons = (self,)
+        else:
+            self._singletons = (EagerJobIdPair(self._job0, None),
+                                EagerJobIdPair(self._job1, None))
+        self._as_set = set([self._job0, self._job1])
+        if self._job1 is None:
+            self._repr = '%d' % (self._job0)
+        else:
+            self._repr = '(%d, %d)' % (self._job0, self._job1)
+
+    def __eq__(self, other):
+        return self._job0 == other._job0 and self._job1 == other._job1
+
+    def __hash__(self):
+        return self._hash_value
+
+def create_pairs(cls, num_jobs):
+    """Creates every job pair as jobs arrive one at a time, as is done
+       when populating job combination metadata under packing."""
+    pairs = {}
+    for i in range(num_jobs):
+        for j in range(i):
+            pairs[cls(j, i)] = None
+    return pairs
+
+def measure(cls, num_jobs, num_trials):
+    creation_runtimes = []
+    lookup_runtimes = []
+    for _ in range(num_trials):
+        start_time = time.time()
+        pairs = create_pairs(cls, num_jobs)
+        creation_runtimes.append(time.time() - start_time)
+
+        # Look up each pair with a freshly constructed ID, as is done when
+        # handling RPCs from workers.
+        start_time = time.time()
+        for i in range(num_jobs):
+            for j in range(i):
+                assert(cls(i, j) in pairs)
+        lookup_runtimes.append(time.time() - start_time)
+        del pairs
+
+    tracemalloc.start()
+    pairs = create_pairs(cls, num_jobs)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    num_pairs = len(pairs)
+    return (num_pairs, np.mean(creation_runtimes),
+            num_pairs / np.mean(lookup_runtimes), memory / num_pairs)
+
+def main(args):
+    if args.output_file is not None:
+        output_file = open(args.output_file, 'w')
+    else:
+        output_file = None
+
+    header_str = ('# Jobs,# Pairs,Eager creation time,Creation time,'
+                  'Eager lookups/s,Lookups/s,Eager bytes/pair,Bytes/pair')
+    if output_file is not None:
+        output_file.write('%s\n' % (header_str))
+    print(header_str)
+
+    for num_jobs in args.num_jobs:
+        num_pairs, eager_creation, eager_lookups, eager_memory = \
+            measure(EagerJobIdPair, num_jobs, args.num_trials)
+        _, creation, lookups, memory = \
+            measure(JobIdPair, num_jobs, args.num_trials)
+        results = '%d,%d,%f,%f,%.0f,%.0f,%.0f,%.0f' % (
+            num_jobs, num_pairs, eager_creation, creation, eager_lookups,
+            lookups, eager_memory, memory)
+        if output_file is not None:
+            output_file.write('%s\n' % (results))
+        print(results)
+
+    if output_file is not None:
+        output_file.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Measure JobIdPair creation and lookup throughput')
+    parser.add_argument('-n', '--num_jobs', type=int, nargs='+',
+                        default=[2**i for i in range(6, 12)],
+                        help='List of number of jobs to sweep')
+    parser.add_argument('--num_trials', type=int, default=3,
+                        help='Number of trials to run for each experiment')
+    parser.add_argument('--output_file', type=str, default=None,
+                        help='File to output results to')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,204 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+import argparse
+import numpy as np
+import random
+import time
+
+import scheduler
+import utils
+from job_id_pair import JobIdPair
+from job_state_store import JobStateStore
+from throughput_oracle import ThroughputOracle
+
+def generate_input(sched, num_active_jobs, cluster_spec, oracle_throughputs,
+                   job_packing, generate_multi_gpu_jobs, seed):
+    """Populates the scheduler's round-based data structures with random
+       priorities, deficits, and allocations for num_active_jobs jobs."""
+    rng = random.Random()
+    rng.seed(seed)
+    jobs = {}
+    throughputs = {}
+    for i in range(num_active_jobs):
+        job_id = JobIdPair(i, None)
+        jobs[job_id] = utils.generate_job(
+            throughputs=oracle_throughputs, rng=rng,
+            generate_multi_gpu_jobs=generate_multi_gpu_jobs)
+        job_type_key = (jobs[job_id].job_type, jobs[job_id].scale_factor)
+        throughputs[job_id] = {}
+        for worker_type in cluster_spec:
+            throughputs[job_id][worker_type] = \
+                oracle_throughputs[worker_type][job_type_key]['null']
+    if job_packing:
+        for i in range(num_active_jobs):
+            job_id = JobIdPair(i, None)
+            job_type_key = (jobs[job_id].job_type, jobs[job_id].scale_factor)
+            for j in range(i+1, num_active_jobs):
+                other_job_id = JobIdPair(j, None)
+                if (jobs[job_id].scale_factor !=
+                    jobs[other_job_id].scale_factor):
+                    continue
+                other_job_type_key = (jobs[other_job_id].job_type,
+                                      jobs[other_job_id].scale_factor)
+                merged_job_id = JobIdPair(i, j)
+                throughputs[merged_job_id] = {}
+                for worker_type in cluster_spec:
+                    throughputs[merged_job_id][worker_type] = \
+                        oracle_throughputs[worker_type][job_type_key][other_job_type_key]
+
+    priorities = {}
+    job_state = JobStateStore()
+    job_state.add(throughputs.keys())
+    allocation = {}
+    for worker_type in cluster_spec:
+        priorities[worker_type] = {}
+        job_state.add_worker_type(worker_type)
+        for job_id in throughputs:
+            priorities[worker_type][job_id] = rng.random()
+            job_state.set_deficit(job_id, worker_type, rng.random())
+    for job_id in throughputs:
+        allocation[job_id] = {
+            worker_type: rng.random() for worker_type in cluster_spec
+        }
+    sched._cluster_spec = cluster_spec
+    sched._jobs = jobs
+    sched._throughputs = throughputs
+    sched._priorities = priorities
+    sched._job_state = job_state
+    sched._allocation = allocation
+
+def full_sort_selection(sched, worker_types):
+    """Reference implementation that sorts every (job combination,
+       worker type) entry before greedily selecting jobs."""
+    already_scheduled_jobs = set()
+    scheduled_jobs = {}
+    num_workers_left = {}
+    for worker_type in worker_types:
+        scheduled_jobs[worker_type] = []
+        num_workers_left[worker_type] = sched._cluster_spec[worker_type]
+
+    sorted_job_queue = []
+    for worker_type in worker_types:
+        per_worker_type_entries = []
+        deficits = sched._job_state.get_deficits(worker_type)
+        for job_id in sched._priorities[worker_type]:
+            per_worker_type_entries.append(
+                    (job_id, worker_type,
+                     sched._priorities[worker_type][job_id],
+                     deficits[job_id],
+                     sched._allocation[job_id][worker_type]))
+        sorted_job_queue += sorted(per_worker_type_entries,
+                                   key=lambda x: (x[2], x[3], x[4]),
+                                   reverse=True)
+
+    for job_id, worker_type, *_ in sorted_job_queue:
+        if num_workers_left[worker_type] == 0:
+            continue
+        if any([x in already_scheduled_jobs for x in job_id.singletons()]):
+            continue
+        if job_id.is_pair():
+            if (sched._throughputs[job_id][worker_type][0] <= 0 or
+                sched._throughputs[job_id][worker_type][1] <= 0):
+                continue
+            scale_factor = sched._jobs[job_id.singletons()[0]].scale_factor
+        else:
+            if sched._throughputs[job_id][worker_type] <= 0:
+                continue
+            scale_factor = sched._jobs[job_id].scale_factor
+        if scale_factor > num_workers_left[worker_type]:
+            continue
+        num_workers_left[worker_type] -= scale_factor
+        for single_job_id in job_id.singletons():
+            already_scheduled_jobs.add(single_job_id)
+        scheduled_jobs[worker_type].append((job_id, scale_factor))
+    return scheduled_jobs
+
+def measure_runtime(sched, num_active_jobs, num_workers_per_type,
+                    oracle_throughputs, job_packing, generate_multi_gpu_jobs,
+                    num_trials):
+    worker_types = ['v100', 'p100', 'k80']
+    cluster_spec = {
+        worker_type: num_workers_per_type for worker_type in worker_types
+    }
+    full_sort_runtimes = []
+    lazy_runtimes = []
+    for trial in range(num_trials):
+        generate_input(sched, num_active_jobs, cluster_spec,
+                       oracle_throughputs, job_packing,
+                       generate_multi_gpu_jobs, seed=trial+2)
+        start_time = time.time()
+        expected = full_sort_selection(sched, worker_types)
+        full_sort_runtimes.append(time.time() - start_time)
+        start_time = time.time()
+        actual = sched._schedule_jobs_on_workers_helper(worker_types)
+        lazy_runtimes.append(time.time() - start_time)
+        assert(expected == actual)
+    num_job_combinations = len(sched._throughputs)
+    return '%d,%d,%d,%f,%f' % (num_active_jobs, num_job_combinations,
+                               num_workers_per_type,
+                               np.mean(full_sort_runtimes),
+                               np.mean(lazy_runtimes))
+
+def main(args):
+    oracle_throughputs = ThroughputOracle.load(args.throughputs_file)
+    policy_name = 'max_min_fairness'
+    if args.job_packing:
+        policy_name = 'max_min_fairness_packed'
+    policy = utils.get_policy(policy_name)
+    sched = scheduler.Scheduler(policy, simulate=True)
+    sched._orig_logger.removeHandler(sched._logging_handler)
+
+    if args.output_file is not None:
+        output_file = open(args.output_file, 'w')
+    else:
+        output_file = None
+
+    header_str = ('# Jobs,# Job combinations,# Workers per type,'
+                  'Full sort,Lazy selection')
+    if output_file is not None:
+        output_file.write('%s\n' % (header_str))
+    print(header_str)
+
+    for num_active_jobs in args.num_active_jobs:
+        num_workers_per_type = args.num_workers_per_type
+        if num_workers_per_type is None:
+            num_workers_per_type = max(num_active_jobs // 4, 1)
+        results = measure_runtime(sched, num_active_jobs,
+                                  num_workers_per_type, oracle_throughputs,
+                                  args.job_packing,
+                                  args.generate_multi_gpu_jobs,
+                                  args.num_trials)
+        if output_file is not None:
+            output_file.write('%s\n' % (results))
+        print(results)
+
+    if output_file is not None:
+        output_file.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Measure runtime of per-round job selection')
+    parser.add_argument('--throughputs-file', type=str,
+                        default='simulation_throughputs.json',
+                        help='Oracle throughputs file')
+    parser.add_argument('--job-packing', action='store_true', default=False,
+                        help='If set, includes job pairs in the priorities')
+    parser.add_argument('--generate-multi-gpu-jobs', action='store_true',
+                        default=False,
+                        help=('If set, generates multi-GPU jobs according to '
+                              'a pre-defined distribution'))
+    parser.add_argument('-n', '--num_active_jobs', type=int, nargs='+',
+                        default=[2**i for i in range(4, 12)],
+                        help='List of number of active jobs to sweep')
+    parser.add_argument('-w', '--num_workers_per_type', type=int,
+                        default=None,
+                        help=('Number of workers of each type (defaults to '
+                              'a quarter of the number of active jobs)'))
+    parser.add_argument('--num_trials', type=int, default=1,
+                        help='Number of trials to run for each experiment')
+    parser.add_argument('--output_file', type=str, default=None,
+                        help='File to output results to')
+    args = parser.parse_args()
+
+    main(args)
@@ -11,6 +11,7 @@ import utils
 from job import Job
 from job_id_pair import JobIdPair
 from job_table import JobTable
+from throughput_oracle import ThroughputOracle
 
 def generate_input(num_active_jobs,
                    cluster_spec,
@@ -123,8 +124,7 @@ def measure_runtime(num_active_jobs, policy_name,
 def main(args):
     all_num_active_jobs = args.num_active_jobs
     all_policies = args.policies
-    oracle_throughputs =\
-        utils.read_all_throughputs_json_v2(args.throughputs_file)
+    oracle_throughputs = ThroughputOracle.load(args.throughputs_file)
 
     if args.output_file is not None:
         output_file = open(args.output_file, 'w')
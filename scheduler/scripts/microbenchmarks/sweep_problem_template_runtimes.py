@@ -0,0 +1,154 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+import argparse
+import contextlib
+import numpy as np
+import time
+
+import utils
+from job_id_pair import JobIdPair
+from policy import get_problem_template_cache
+from sweep_policy_runtimes import generate_input
+from throughput_oracle import ThroughputOracle
+
+def get_allocation(policy, throughputs, jobs, scale_factors, cluster_spec):
+    num_active_jobs = len(jobs)
+    num_steps_remaining = {
+        JobIdPair(i, None): jobs[i].total_steps
+        for i in range(num_active_jobs)
+    }
+    with open('/dev/null', 'w') as f:
+        with contextlib.redirect_stdout(f):
+            if policy.name.startswith('MaxMinFairness'):
+                priority_weights = {
+                    JobIdPair(i, None): jobs[i].priority_weight
+                    for i in range(num_active_jobs)
+                }
+                policy.get_allocation(throughputs, scale_factors,
+                                      priority_weights, cluster_spec)
+            elif policy.name.startswith('FinishTimeFairness'):
+                priority_weights = {
+                    JobIdPair(i, None): jobs[i].priority_weight
+                    for i in range(num_active_jobs)
+                }
+                times_since_start = {
+                    JobIdPair(i, None): 0 for i in range(num_active_jobs)
+                }
+                policy.get_allocation(throughputs, scale_factors,
+                                      priority_weights, times_since_start,
+                                      num_steps_remaining, cluster_spec)
+            elif policy.name.startswith('MinTotalDuration'):
+                policy.get_allocation(throughputs, scale_factors,
+                                      num_steps_remaining, cluster_spec)
+            elif 'SLOs' in policy.name:
+                SLOs = {
+                    JobIdPair(i, None): 10 * jobs[i].duration
+                    for i in range(0, num_active_jobs, 4)
+                }
+                policy.get_allocation(throughputs, scale_factors,
+                                      cluster_spec, SLOs=SLOs,
+                                      num_steps_remaining=num_steps_remaining)
+            else:
+                policy.get_allocation(throughputs, scale_factors,
+                                      cluster_spec)
+
+def measure_runtime(num_active_jobs, policy_name, oracle_throughputs,
+                    generate_multi_gpu_jobs, num_calls, solver):
+    """Measures the average latency of a get_allocation call with and
+       without cached problem templates.
+
+       Each call uses a freshly generated set of jobs, as would be the case
+       across scheduling rounds."""
+    cluster_spec = {
+        'v100': max(num_active_jobs // 4, 1),
+        'p100': max(num_active_jobs // 4, 1),
+        'k80': max(num_active_jobs // 4, 1),
+    }
+    inputs = []
+    for call in range(num_calls + 1):
+        inputs.append(generate_input(num_active_jobs, cluster_spec,
+                                     policy_name, oracle_throughputs,
+                                     generate_multi_gpu_jobs, False,
+                                     seed=call+2))
+
+    cache = get_problem_template_cache()
+    runtimes = {}
+    for enabled in [False, True]:
+        cache.clear()
+        cache.enabled = enabled
+        # The first call builds the template when caching is enabled, so
+        # it is excluded from both measurements.
+        throughputs, jobs, scale_factors = inputs[0]
+        policy = utils.get_policy(policy_name, solver=solver)
+        get_allocation(policy, throughputs, jobs, scale_factors,
+                       cluster_spec)
+        runtimes[enabled] = []
+        for throughputs, jobs, scale_factors in inputs[1:]:
+            # Policies can keep state across calls for the same jobs (e.g.,
+            # finish time fairness), so each call uses a new policy.
+            policy = utils.get_policy(policy_name, solver=solver)
+            start_time = time.time()
+            get_allocation(policy, throughputs, jobs, scale_factors,
+                           cluster_spec)
+            runtimes[enabled].append(time.time() - start_time)
+    cache.enabled = True
+    return '%s,%d,%f,%f' % (policy_name, num_active_jobs,
+                            np.mean(runtimes[False]),
+                            np.mean(runtimes[True]))
+
+def main(args):
+    oracle_throughputs = ThroughputOracle.load(args.throughputs_file)
+
+    if args.output_file is not None:
+        output_file = open(args.output_file, 'w')
+    else:
+        output_file = None
+
+    header_str = 'Policy,# Jobs,Without templates,With templates'
+    if output_file is not None:
+        output_file.write('%s\n' % (header_str))
+    print(header_str)
+
+    for policy_name in args.policies:
+        for num_active_jobs in args.num_active_jobs:
+            results = measure_runtime(num_active_jobs, policy_name,
+                                      oracle_throughputs,
+                                      args.generate_multi_gpu_jobs,
+                                      args.num_calls, args.solver)
+            if output_file is not None:
+                output_file.write('%s\n' % (results))
+            print(results)
+
+    if output_file is not None:
+        output_file.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description=('Measure per-call policy latency with and without '
+                         'cached problem templates'))
+    parser.add_argument('--throughputs-file', type=str,
+                        default='simulation_throughputs.json',
+                        help='Oracle throughputs file')
+    parser.add_argument('--generate-multi-gpu-jobs', action='store_true',
+                        default=False,
+                        help=('If set, generates multi-GPU jobs according to '
+                              'a pre-defined distribution'))
+    parser.add_argument('-n', '--num_active_jobs', type=int, nargs='+',
+                        default=[2**i for i in range(4, 10)],
+                        help='List of number of active jobs to sweep')
+    parser.add_argument('-p', '--policies', type=str, nargs='+',
+                        default=['max_min_fairness_perf',
+                                 'finish_time_fairness_perf',
+                                 'min_total_duration_perf',
+                                 'max_sum_throughput_normalized_by_cost_perf_SLOs'],
+                        help='List of policies to sweep')
+    parser.add_argument('--num_calls', type=int, default=5,
+                        help='Number of timed calls per configuration')
+    parser.add_argument('--solver', type=str, choices=['ECOS', 'GUROBI', 'SCS'],
+                        default='ECOS', help='CVXPY solver')
+    parser.add_argument('--output_file', type=str, default=None,
+                        help='File to output results to')
+    args = parser.parse_args()
+
+    main(args)
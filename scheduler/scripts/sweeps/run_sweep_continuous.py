@@ -2,18 +2,21 @@ import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
 
 import argparse
+import collections
 import datetime
 import json
 import contextlib
 from func_timeout import func_timeout, FunctionTimedOut
-import multiprocessing
 import numpy as np
 import os
+import select
+import signal
 import sys
 
 from job_id_pair import JobIdPair
 from job_table import JobTable
 import scheduler
+import sweep_runner
 import utils
 
 
@@ -70,10 +73,8 @@ def simulate_with_timeout(experiment_id, policy_name,
                                checkpoint_threshold=checkpoint_threshold,
                                num_gpus_per_server=num_gpus_per_server,
                                ideal=ideal)
-                average_jct = sched.get_average_jct(jobs_to_complete)
-                utilization = 1.0
-                if not ideal:
-                    utilization = sched.get_cluster_utilization()
+                results = sweep_runner.get_results(
+                    sched, jobs_to_complete, compute_utilization=not ideal)
             else:
                 try:
                     func_timeout(timeout, sched.simulate,
@@ -90,22 +91,173 @@ def simulate_with_timeout(experiment_id, policy_name,
                                     'num_gpus_per_server': num_gpus_per_server,
                                     'ideal': ideal
                                  })
-                    average_jct = sched.get_average_jct(jobs_to_complete)
-                    utilization = sched.get_cluster_utilization()
+                    results = sweep_runner.get_results(sched, jobs_to_complete)
                 except FunctionTimedOut:
-                    average_jct = float('inf')
-                    utilization = 1.0
+                    results = sweep_runner.get_timed_out_results()
 
     if verbose:
         current_time = datetime.datetime.now()
         print('[%s] [Experiment ID: %2d] '
-              'Results: average JCT=%f, utilization=%f' % (current_time,
-                                                           experiment_id,
-                                                           average_jct,
-                                                           utilization))
+              'Results: average JCT=%f, utilization=%f' % (
+                  current_time, experiment_id, results['average_jct'],
+                  results['utilization']))
     sched.shutdown()
 
-    return average_jct, utilization
+    return results
+
+def simulate_with_forks(experiment_id, warmup_policy_name, policy_log_dirs,
+                        throughputs_file, cluster_spec, lam, seed, interval,
+                        jobs_to_complete, fixed_job_duration, solver,
+                        generate_multi_gpu_jobs,
+                        generate_multi_priority_jobs, simulate_steady_state,
+                        warmup_log_dir, timeout, verbose,
+                        profiling_percentage, num_reference_models,
+                        num_gpus_per_server, ideal, max_forked_processes):
+    """Simulates the jobs before the measurement window once with the warm-up
+       policy, then forks a process for each policy in `policy_log_dirs` at
+       the start of the window that switches to that policy and simulates
+       the rest of the window. Forked processes share the warm-up state
+       copy-on-write and send their results back through a pipe. At most
+       `max_forked_processes` forked processes run at the same time.
+
+       Returns a list with the results of each policy in `policy_log_dirs`."""
+    lam_str = 'lambda=%f.log' % (lam)
+    cluster_spec_str = 'v100:%d|p100:%d|k80:%d' % (cluster_spec['v100'],
+                                                   cluster_spec['p100'],
+                                                   cluster_spec['k80'])
+    warmup_policy = utils.get_policy(warmup_policy_name, solver=solver,
+                                     seed=seed)
+    if verbose:
+        current_time = datetime.datetime.now()
+        print('[%s] [Experiment ID: %2d] '
+              'Configuration: cluster_spec=%s, warm-up policy=%s, '
+              'policies=%s, seed=%d, lam=%f, '
+              'profiling_percentage=%f, '
+              'num_reference_models=%d' % (current_time,
+                                           experiment_id,
+                                           cluster_spec_str,
+                                           warmup_policy.name,
+                                           ','.join([x[0] for x in
+                                                     policy_log_dirs]),
+                                           seed, lam,
+                                           profiling_percentage,
+                                           num_reference_models))
+
+    # List of (PID, read end of results pipe, experiment ID, policy name,
+    # index in `policy_log_dirs`) for each running forked process.
+    children = []
+    # Results of each policy in `policy_log_dirs`, by index.
+    all_results = {}
+
+    def wait_for_child():
+        """Waits for the first of the running forked processes to finish
+           and records its results."""
+        ready_fds, _, _ = select.select([child[1] for child in children],
+                                        [], [])
+        for child in children:
+            if child[1] in ready_fds:
+                break
+        children.remove(child)
+        all_results[child[4]] = _get_forked_results(*child[:4], verbose)
+
+    # Experiment ID, policy name and write end of results pipe if running in
+    # a forked process.
+    forked_experiment = []
+    with open(os.path.join(warmup_log_dir, lam_str), 'w') as f:
+        with contextlib.redirect_stderr(f), contextlib.redirect_stdout(f):
+            sched = scheduler.Scheduler(
+                            warmup_policy,
+                            throughputs_file=throughputs_file,
+                            seed=seed,
+                            time_per_iteration=interval,
+                            simulate=True,
+                            profiling_percentage=profiling_percentage,
+                            num_reference_models=num_reference_models)
+
+            def fork_policies():
+                for i, (policy_name, log_dir) in enumerate(policy_log_dirs):
+                    while len(children) >= max_forked_processes:
+                        wait_for_child()
+                    # Flush buffered warm-up output so that it is not
+                    # duplicated in the forked processes.
+                    f.flush()
+                    sys.__stdout__.flush()
+                    read_fd, write_fd = os.pipe()
+                    pid = os.fork()
+                    if pid == 0:
+                        os.close(read_fd)
+                        # Redirect the rest of the simulation's output (and
+                        # the scheduler's log handler, which writes to f)
+                        # to the policy's own log.
+                        log_fd = os.open(os.path.join(log_dir, lam_str),
+                                         os.O_WRONLY | os.O_CREAT |
+                                         os.O_TRUNC, 0o644)
+                        os.dup2(log_fd, f.fileno())
+                        os.close(log_fd)
+                        if timeout is not None:
+                            signal.alarm(timeout)
+                        sched.set_policy(utils.get_policy(policy_name,
+                                                          solver=solver,
+                                                          seed=seed))
+                        forked_experiment.extend([experiment_id + i,
+                                                  policy_name, write_fd])
+                        return True
+                    os.close(write_fd)
+                    children.append((pid, read_fd, experiment_id + i,
+                                     policy_name, i))
+                return False
+
+            sched.simulate(cluster_spec, lam=lam,
+                           jobs_to_complete=jobs_to_complete,
+                           fixed_job_duration=fixed_job_duration,
+                           generate_multi_gpu_jobs=generate_multi_gpu_jobs,
+                           generate_multi_priority_jobs=generate_multi_priority_jobs,
+                           simulate_steady_state=simulate_steady_state,
+                           num_gpus_per_server=num_gpus_per_server,
+                           ideal=ideal,
+                           window_start_callback=fork_policies)
+            if len(forked_experiment) > 0:
+                results = sweep_runner.get_results(
+                    sched, jobs_to_complete, compute_utilization=not ideal)
+    sched.shutdown()
+
+    if len(forked_experiment) > 0:
+        if verbose:
+            current_time = datetime.datetime.now()
+            print('[%s] [Experiment ID: %2d] '
+                  'Results: policy=%s, average JCT=%f, '
+                  'utilization=%f' % (current_time, forked_experiment[0],
+                                      forked_experiment[1],
+                                      results['average_jct'],
+                                      results['utilization']))
+        sys.stdout.flush()
+        with os.fdopen(forked_experiment[2], 'w') as results_pipe:
+            json.dump(results, results_pipe)
+        # Do not return control to the parent's multiprocessing pool.
+        os._exit(0)
+
+    while len(children) > 0:
+        wait_for_child()
+    return [all_results[i] for i in range(len(policy_log_dirs))]
+
+def _get_forked_results(pid, read_fd, experiment_id, policy_name, verbose):
+    """Reads the results of a forked process and waits for it to exit."""
+    with os.fdopen(read_fd, 'r') as results_pipe:
+        serialized_results = results_pipe.read()
+    _, status = os.waitpid(pid, 0)
+    if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+        return json.loads(serialized_results)
+    # The forked process timed out (the alarm's default action
+    # terminates the process) or failed.
+    results = sweep_runner.get_timed_out_results()
+    if verbose:
+        current_time = datetime.datetime.now()
+        print('[%s] [Experiment ID: %2d] '
+              'Results: policy=%s, average JCT=%f, '
+              'utilization=%f' % (current_time, experiment_id,
+                                  policy_name, results['average_jct'],
+                                  results['utilization']))
+    return results
 
 def main(args):
     if args.window_start >= args.window_end:
@@ -138,7 +290,29 @@ def main(args):
     for i in range(job_range[0], job_range[1]):
         jobs_to_complete.add(JobIdPair(i, None))
 
-    all_args_list = []
+    if args.fork_at_window_start:
+        if args.checkpoint_threshold is not None:
+            raise ValueError('Checkpointing cannot be used when forking at '
+                             'the window start.')
+        warmup_policy_name = args.warmup_policy
+        if warmup_policy_name is None:
+            warmup_policy_name = policy_names[0]
+        # Forked processes can only switch to policies that populate the
+        # same job combination metadata as the warm-up policy.
+        warmup_job_packing = \
+            'Packing' in utils.get_policy(warmup_policy_name).name
+        for policy_name in policy_names:
+            if (('Packing' in utils.get_policy(policy_name).name) !=
+                warmup_job_packing):
+                raise ValueError('Policy %s cannot be forked from warm-up '
+                                 'policy %s: job packing must either be '
+                                 'enabled or disabled for both' % (
+                                     policy_name, warmup_policy_name))
+    # Map from (cluster spec, profiling percentage, number of reference
+    # models, lambda, seed) to the experiments forked from a shared warm-up.
+    fork_groups = collections.OrderedDict()
+
+    experiments = []
     for cluster_spec_str in args.cluster_spec:
         cluster_spec_str_split = cluster_spec_str.split(':')
         if len(cluster_spec_str_split) != 3:
@@ -213,42 +387,125 @@ def main(args):
 
                         lam = 3600.0 / throughput
                         for seed in args.seeds:
+                            config = {
+                                'sweep': 'continuous',
+                                'policy': policy_name,
+                                'cluster_spec': cluster_spec_str,
+                                'num_gpus_per_server': args.num_gpus_per_server,
+                                'lam': lam,
+                                'seed': seed,
+                                'window_start': args.window_start,
+                                'window_end': args.window_end,
+                                'interval': args.interval,
+                                'fixed_job_duration': args.fixed_job_duration,
+                                'solver': args.solver,
+                                'generate_multi_gpu_jobs':
+                                    args.generate_multi_gpu_jobs,
+                                'generate_multi_priority_jobs':
+                                    args.generate_multi_priority_jobs,
+                                'simulate_steady_state':
+                                    args.simulate_steady_state,
+                                'profiling_percentage': profiling_percentage,
+                                'num_reference_models': num_reference_models,
+                                'ideal': args.ideal,
+                            }
                             seed_str = 'seed=%d' % (seed)
                             raw_logs_seed_subdir = os.path.join(
                                     raw_logs_num_reference_models_subdir,
                                     seed_str)
                             if not os.path.isdir(raw_logs_seed_subdir):
                                 os.mkdir(raw_logs_seed_subdir)
-                            all_args_list.append((experiment_id, policy_name,
-                                                  throughputs_file,
-                                                  cluster_spec,
-                                                  lam, seed, args.interval,
-                                                  jobs_to_complete,
-                                                  args.fixed_job_duration,
-                                                  args.solver,
-                                                  args.generate_multi_gpu_jobs,
-                                                  args.generate_multi_priority_jobs,
-                                                  args.simulate_steady_state,
-                                                  raw_logs_seed_subdir,
-                                                  args.timeout,
-                                                  args.verbose,
-                                                  args.checkpoint_threshold,
-                                                  profiling_percentage,
-                                                  num_reference_models,
-                                                  num_gpus_per_server,
-                                                  args.ideal))
+                            if args.fork_at_window_start:
+                                key = (cluster_spec_str, profiling_percentage,
+                                       num_reference_models, lam, seed)
+                                if key not in fork_groups:
+                                    warmup_log_dir = os.path.join(
+                                        raw_logs_cluster_spec_subdir,
+                                        'warmup_policy=%s' % (
+                                            warmup_policy_name),
+                                        os.path.relpath(raw_logs_seed_subdir,
+                                                        raw_logs_policy_subdir))
+                                    os.makedirs(warmup_log_dir, exist_ok=True)
+                                    fork_groups[key] = \
+                                        (cluster_spec, num_gpus_per_server,
+                                         warmup_log_dir, [], [])
+                                config['warmup_policy'] = warmup_policy_name
+                                fork_groups[key][3].append(
+                                    (policy_name, raw_logs_seed_subdir))
+                                fork_groups[key][4].append(config)
+                                continue
+                            experiment_args = (experiment_id, policy_name,
+                                               throughputs_file,
+                                               cluster_spec,
+                                               lam, seed, args.interval,
+                                               jobs_to_complete,
+                                               args.fixed_job_duration,
+                                               args.solver,
+                                               args.generate_multi_gpu_jobs,
+                                               args.generate_multi_priority_jobs,
+                                               args.simulate_steady_state,
+                                               raw_logs_seed_subdir,
+                                               args.timeout,
+                                               args.verbose,
+                                               args.checkpoint_threshold,
+                                               profiling_percentage,
+                                               num_reference_models,
+                                               num_gpus_per_server,
+                                               args.ideal)
+                            # Runs with higher throughputs (lower lambdas)
+                            # take longer to simulate.
+                            experiments.append(sweep_runner.Experiment(
+                                configs=[config], size=throughput,
+                                simulate_fn=simulate_with_timeout,
+                                args=experiment_args))
                             experiment_id += 1
-    if len(all_args_list) > 0:
-        current_time = datetime.datetime.now()
-        print('[%s] Running %d total experiment(s)...' % (current_time,
-                                                          len(all_args_list)))
-        with multiprocessing.Pool(args.processes) as p:
-            # Sort args in order of decreasing lambda to prioritize
-            # short-running jobs.
-            all_args_list.sort(key=lambda x: x[4], reverse=True)
-            results = [p.apply_async(simulate_with_timeout, args_list)
-                       for args_list in all_args_list]
-            results = [result.get() for result in results]
+    # Forked processes count against the process budget: every experiment
+    # running in the pool gets an equal share of it.
+    max_forked_processes = args.max_forked_processes
+    if max_forked_processes is None and len(fork_groups) > 0:
+        processes = args.processes
+        if processes is None:
+            processes = os.cpu_count()
+        num_concurrent_experiments = \
+            min(processes, len(experiments) + len(fork_groups))
+        max_forked_processes = \
+            max(1, processes // num_concurrent_experiments)
+    for key, (cluster_spec, num_gpus_per_server, warmup_log_dir,
+              policy_log_dirs, configs) in fork_groups.items():
+        (_, profiling_percentage, num_reference_models, lam, seed) = key
+        experiment_args = (experiment_id, warmup_policy_name,
+                           policy_log_dirs,
+                           throughputs_file,
+                           cluster_spec,
+                           lam, seed, args.interval,
+                           jobs_to_complete,
+                           args.fixed_job_duration,
+                           args.solver,
+                           args.generate_multi_gpu_jobs,
+                           args.generate_multi_priority_jobs,
+                           args.simulate_steady_state,
+                           warmup_log_dir,
+                           args.timeout,
+                           args.verbose,
+                           profiling_percentage,
+                           num_reference_models,
+                           num_gpus_per_server,
+                           args.ideal,
+                           max_forked_processes)
+        experiments.append(sweep_runner.Experiment(
+            configs=configs, size=3600.0 / lam,
+            simulate_fn=simulate_with_forks, args=experiment_args))
+        experiment_id += len(policy_log_dirs)
+
+    if len(experiments) > 0:
+        results_dir = args.results_dir
+        if results_dir is None:
+            results_dir = os.path.join(args.log_dir, 'results')
+        result_store = sweep_runner.ResultStore(results_dir, throughputs_file)
+        sweep_runner.run_experiments(
+            experiments, result_store,
+            os.path.join(args.log_dir, 'summary.jsonl'),
+            processes=args.processes)
     else:
         raise ValueError('No work to be done!')
 
@@ -259,6 +516,10 @@ if __name__=='__main__':
 
     parser.add_argument('-l', '--log-dir', type=str, default='logs',
                         help='Log directory')
+    parser.add_argument('--results-dir', type=str, default=None,
+                        help=('Directory of stored results, used to skip '
+                              'completed configurations (<log_dir>/results '
+                              'if not specified)'))
     parser.add_argument('-s', '--window-start', type=int, default=0,
                         help='Measurement window start (job ID)')
     parser.add_argument('-e', '--window-end', type=int, default=5000,
@@ -321,6 +582,25 @@ if __name__=='__main__':
                               'estimating throughputs'))
     parser.add_argument('--ideal', action='store_true', default=False,
                         help='Run allocations 100%% ideally')
+    parser.add_argument('--fork-at-window-start', action='store_true',
+                        default=False,
+                        help=('If set, simulates the jobs before the '
+                              'measurement window once per cluster spec, '
+                              'lambda and seed with the warm-up policy, and '
+                              'forks a process per policy at the window '
+                              'start to simulate the window. The timeout '
+                              'only applies to the forked processes.'))
+    parser.add_argument('--max-forked-processes', type=int, default=None,
+                        help=('Maximum number of forked processes per '
+                              'warm-up to run at the same time when forking '
+                              'at the window start (the number of processes '
+                              'divided by the number of experiments running '
+                              'at the same time if not specified)'))
+    parser.add_argument('--warmup-policy', type=str, default=None,
+                        help=('Policy to simulate the jobs before the '
+                              'measurement window with when forking at the '
+                              'window start (first policy if not '
+                              'specified)'))
     fixed_range.add_argument('-a', '--throughput-lower-bound', type=float,
                              default=None,
                              help=('Lower bound for throughput interval to '
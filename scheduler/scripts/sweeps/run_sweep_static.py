@@ -6,7 +6,6 @@ import datetime
 import json
 import contextlib
 from func_timeout import func_timeout, FunctionTimedOut
-import multiprocessing
 import numpy as np
 import os
 import random
@@ -15,6 +14,7 @@ import time
 
 from job_id_pair import JobIdPair
 import scheduler
+import sweep_runner
 import utils
 
 
@@ -68,10 +68,7 @@ def simulate_with_timeout(experiment_id, policy_name,
                                num_total_jobs=num_total_jobs,
                                num_gpus_per_server=num_gpus_per_server,
                                ideal=ideal)
-                average_jct = sched.get_average_jct()
-                utilization = sched.get_cluster_utilization()
-                makespan = sched.get_current_timestamp()
-                total_cost = sched.get_total_cost()
+                results = sweep_runner.get_results(sched)
             else:
                 try:
                     func_timeout(timeout, sched.simulate,
@@ -84,15 +81,9 @@ def simulate_with_timeout(experiment_id, policy_name,
                                     'num_gpus_per_server': num_gpus_per_server,
                                     'ideal': ideal
                                  })
-                    average_jct = sched.get_average_jct()
-                    utilization = sched.get_cluster_utilization()
-                    makespan = sched.get_current_timestamp()
-                    total_cost = sched.get_total_cost()
+                    results = sweep_runner.get_results(sched)
                 except FunctionTimedOut:
-                    average_jct = float('inf')
-                    utilization = 1.0
-                    makespan = float('inf')
-                    total_cost = float('inf')
+                    results = sweep_runner.get_timed_out_results()
 
     if verbose:
         current_time = datetime.datetime.now()
@@ -101,14 +92,14 @@ def simulate_with_timeout(experiment_id, policy_name,
               'makespan=%f, total_cost=$%.2f' % (
                   current_time,
                   experiment_id,
-                  average_jct,
-                  utilization,
-                  makespan,
-                  total_cost))
+                  results['average_jct'],
+                  results['utilization'],
+                  results['makespan'],
+                  results['total_cost']))
 
     sched.shutdown()
 
-    return average_jct, utilization
+    return results
 
 def main(args):
     if ((args.num_total_jobs_lower_bound is None and
@@ -128,7 +119,7 @@ def main(args):
     if not os.path.isdir(raw_logs_dir):
         os.mkdir(raw_logs_dir)
 
-    all_args_list = []
+    experiments = []
     for cluster_spec_str in args.cluster_spec:
         cluster_spec_str_split = cluster_spec_str.split(':')
         if len(cluster_spec_str_split) != 3:
@@ -145,11 +136,11 @@ def main(args):
             'k80': int(num_gpus_per_server_split[2]),
         }
 
-        cluster_spec_str = 'v100=%d.p100=%d.k80=%d' % (cluster_spec['v100'],
-                                                       cluster_spec['p100'],
-                                                       cluster_spec['k80'])
-        raw_logs_cluster_spec_subdir = os.path.join(raw_logs_dir,
-                                                    cluster_spec_str)
+        raw_logs_cluster_spec_subdir = \
+            os.path.join(raw_logs_dir,
+                         'v100=%d.p100=%d.k80=%d' % (cluster_spec['v100'],
+                                                     cluster_spec['p100'],
+                                                     cluster_spec['k80']))
         if not os.path.isdir(raw_logs_cluster_spec_subdir):
             os.mkdir(raw_logs_cluster_spec_subdir)
 
@@ -173,34 +164,55 @@ def main(args):
                             os.path.join(raw_logs_policy_subdir, seed_str)
                     if not os.path.isdir(raw_logs_seed_subdir):
                         os.mkdir(raw_logs_seed_subdir)
-                    all_args_list.append((experiment_id, policy_name,
-                                          throughputs_file,
-                                          args.per_instance_type_prices_dir,
-                                          args.available_clouds,
-                                          args.assign_SLOs,
-                                          cluster_spec,
-                                          lam, seed, args.interval,
-                                          args.fixed_job_duration,
-                                          args.generate_multi_gpu_jobs,
-                                          args.enable_global_queue,
-                                          num_total_jobs,
-                                          args.solver,
-                                          raw_logs_seed_subdir,
-                                          args.timeout, args.verbose,
-                                          num_gpus_per_server,
-                                          args.ideal))
+                    config = {
+                        'sweep': 'static',
+                        'policy': policy_name,
+                        'cluster_spec': cluster_spec_str,
+                        'num_gpus_per_server': args.num_gpus_per_server,
+                        'num_total_jobs': num_total_jobs,
+                        'seed': seed,
+                        'interval': args.interval,
+                        'fixed_job_duration': args.fixed_job_duration,
+                        'solver': args.solver,
+                        'generate_multi_gpu_jobs':
+                            args.generate_multi_gpu_jobs,
+                        'enable_global_queue': args.enable_global_queue,
+                        'per_instance_type_prices_dir':
+                            args.per_instance_type_prices_dir,
+                        'available_clouds': args.available_clouds,
+                        'assign_SLOs': args.assign_SLOs,
+                        'ideal': args.ideal,
+                    }
+                    experiment_args = (experiment_id, policy_name,
+                                       throughputs_file,
+                                       args.per_instance_type_prices_dir,
+                                       args.available_clouds,
+                                       args.assign_SLOs,
+                                       cluster_spec,
+                                       lam, seed, args.interval,
+                                       args.fixed_job_duration,
+                                       args.generate_multi_gpu_jobs,
+                                       args.enable_global_queue,
+                                       num_total_jobs,
+                                       args.solver,
+                                       raw_logs_seed_subdir,
+                                       args.timeout, args.verbose,
+                                       num_gpus_per_server,
+                                       args.ideal)
+                    experiments.append(sweep_runner.Experiment(
+                        configs=[config], size=num_total_jobs,
+                        simulate_fn=simulate_with_timeout,
+                        args=experiment_args))
                     experiment_id += 1
-    if len(all_args_list) > 0:
-        current_time = datetime.datetime.now()
-        print('[%s] Running %d total experiment(s)...' % (current_time,
-                                                          len(all_args_list)))
-        with multiprocessing.Pool(args.processes) as p:
-            # Sort args in order of increasing num_total_jobs to prioritize
-            # short-running jobs.
-            all_args_list.sort(key=lambda x: x[13])
-            results = [p.apply_async(simulate_with_timeout, args_list)
-                       for args_list in all_args_list]
-            results = [result.get() for result in results]
+    if len(experiments) > 0:
+        results_dir = args.results_dir
+        if results_dir is None:
+            results_dir = os.path.join(args.log_dir, 'results')
+        result_store = sweep_runner.ResultStore(results_dir, throughputs_file)
+        sweep_runner.run_experiments(
+            experiments, result_store,
+            os.path.join(args.log_dir, 'summary.jsonl'),
+            processes=args.processes)
     else:
         raise ValueError('No work to be done!')
 
@@ -211,6 +223,10 @@ if __name__=='__main__':
 
     parser.add_argument('-l', '--log-dir', type=str, default='logs',
                         help='Log directory')
+    parser.add_argument('--results-dir', type=str, default=None,
+                        help=('Directory of stored results, used to skip '
+                              'completed configurations (<log_dir>/results '
+                              'if not specified)'))
     parser.add_argument('-t', '--timeout', type=int, default=None,
                         help='Timeout (in seconds) for each run')
     parser.add_argument('-j', '--processes', type=int, default=None,
@@ -0,0 +1,251 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+import collections
+import datetime
+import glob
+import hashlib
+import json
+import multiprocessing
+import time
+
+SCHEDULER_DIR = \
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# An experiment runs simulate_fn(*args), which returns a dict of results for
+# each configuration in configs (or a single dict if there is only one).
+# size is the sweep's own estimate of how long the experiment takes relative
+# to others with the same policy (e.g., the number of jobs), used until there
+# are previous runs to estimate from.
+Experiment = collections.namedtuple('Experiment',
+                                    ['configs', 'size', 'simulate_fn', 'args'])
+
+def get_code_version():
+    """Returns a hash of the scheduler's source code (excluding scripts)."""
+    code_hash = hashlib.sha256()
+    for pattern in ['*.py', os.path.join('policies', '*.py')]:
+        for filename in sorted(glob.glob(os.path.join(SCHEDULER_DIR,
+                                                      pattern))):
+            with open(filename, 'rb') as f:
+                code_hash.update(f.read())
+    return code_hash.hexdigest()
+
+def get_results(sched, job_ids=None, compute_utilization=True):
+    """Returns a dict with the summary metrics of a completed simulation.
+
+    Args:
+      sched: The Scheduler that ran the simulation.
+      job_ids: If specified, computes the average JCT using only these jobs.
+      compute_utilization: If False, reports a utilization of 1.0 (e.g., for
+                           ideal simulations, which do not track worker time).
+    """
+    average_jct = sched.get_average_jct(job_ids)
+    utilization = 1.0
+    if compute_utilization:
+        utilization = sched.get_cluster_utilization()
+    return {
+        'average_jct': average_jct,
+        'utilization': utilization,
+        'makespan': sched.get_current_timestamp(),
+        'total_cost': sched.get_total_cost(),
+        'num_SLO_violations': sched.get_num_SLO_violations(),
+        'allocation_computation_time':
+            sched.get_allocation_computation_time(),
+        'timed_out': False,
+    }
+
+def get_timed_out_results():
+    return {
+        'average_jct': float('inf'),
+        'utilization': 1.0,
+        'makespan': float('inf'),
+        'total_cost': float('inf'),
+        'num_SLO_violations': None,
+        'allocation_computation_time': None,
+        'timed_out': True,
+    }
+
+def get_file_hash(filename):
+    file_hash = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        file_hash.update(f.read())
+    return file_hash.hexdigest()
+
+class ResultStore:
+    """Persistent store of sweep results.
+
+    Each result is stored in its own JSON file, named by a content hash of
+    the experiment's configuration, the throughputs file and the scheduler's
+    code version, so that a sweep can skip configurations that already
+    completed (e.g., after a crash or when adding a policy) and results from
+    stale code are never reused.
+    """
+
+    def __init__(self, directory, throughputs_file):
+        self._directory = directory
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory, exist_ok=True)
+        self._throughputs_file_hash = get_file_hash(throughputs_file)
+        self._code_version = get_code_version()
+
+    def get_key(self, config):
+        key_config = {
+            'config': config,
+            'throughputs_file_hash': self._throughputs_file_hash,
+            'code_version': self._code_version,
+        }
+        return hashlib.sha256(
+            json.dumps(key_config, sort_keys=True).encode()).hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self._directory, '%s.json' % (key))
+
+    def get(self, config):
+        """Returns the stored record for config, or None."""
+        try:
+            with open(self._get_path(self.get_key(config)), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, config, size, results, runtime):
+        key = self.get_key(config)
+        record = {
+            'key': key,
+            'config': config,
+            'size': size,
+            'results': results,
+            'runtime': runtime,
+            'throughputs_file_hash': self._throughputs_file_hash,
+            'code_version': self._code_version,
+            'timestamp': str(datetime.datetime.now()),
+        }
+        # Write to a temporary file first so that a crash never leaves a
+        # partially written result.
+        path = self._get_path(key)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, sort_keys=True)
+        os.replace(tmp_path, path)
+        return record
+
+    def records(self):
+        for path in glob.glob(os.path.join(self._directory, '*.json')):
+            try:
+                with open(path, 'r') as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def get_runtime_estimator(self):
+        """Returns a function that estimates the runtime of an experiment from
+        previous runs, including runs with other code versions.
+
+        The estimate is the mean runtime of previous runs of the same
+        configuration if there are any, and otherwise the mean runtime per
+        unit of size of previous runs of the same policy, scaled by the
+        experiment's size. Returns None if there are no such runs.
+        """
+        per_config_runtimes = collections.defaultdict(list)
+        per_policy_runtimes_per_size = collections.defaultdict(list)
+        for record in self.records():
+            config = record['config']
+            per_config_runtimes[json.dumps(config, sort_keys=True)].append(
+                record['runtime'])
+            if record['size'] > 0:
+                per_policy_runtimes_per_size[config['policy']].append(
+                    record['runtime'] / record['size'])
+
+        def estimate_runtime(config, size):
+            runtimes = per_config_runtimes.get(json.dumps(config,
+                                                          sort_keys=True))
+            if runtimes is not None:
+                return sum(runtimes) / len(runtimes)
+            runtimes_per_size = per_policy_runtimes_per_size.get(
+                config['policy'])
+            if runtimes_per_size is not None:
+                return size * sum(runtimes_per_size) / len(runtimes_per_size)
+            return None
+
+        return estimate_runtime
+
+def _run_experiment(experiment_idx, experiment):
+    start_time = time.time()
+    all_results = experiment.simulate_fn(*experiment.args)
+    runtime = time.time() - start_time
+    if isinstance(all_results, dict):
+        all_results = [all_results]
+    return experiment_idx, all_results, runtime
+
+def _run_experiment_star(args):
+    return _run_experiment(*args)
+
+def run_experiments(experiments, result_store, summary_file, processes=None):
+    """Runs experiments in a process pool and stores their results.
+
+    Experiments with every configuration already in the result store are
+    skipped. The rest are run longest-first according to the result store's
+    runtime estimates, with experiments that cannot be estimated first (in
+    order of decreasing size), so that long experiments do not straggle at
+    the end of the sweep. Pool workers pick up the next experiment as soon
+    as they finish one. Results are stored as experiments complete, except
+    for those that timed out. Once all experiments complete, the results of
+    every configuration are written to summary_file as JSON lines.
+
+    Args:
+      experiments: A list of Experiments.
+      result_store: A ResultStore.
+      summary_file: Path of the JSON lines summary to write.
+      processes: Number of processes in the pool (as many as available if
+                 None).
+    """
+    records = {}
+    pending_experiments = []
+    for i, experiment in enumerate(experiments):
+        for config in experiment.configs:
+            record = result_store.get(config)
+            if record is not None:
+                records[result_store.get_key(config)] = record
+        if any([result_store.get_key(config) not in records
+                for config in experiment.configs]):
+            pending_experiments.append((i, experiment))
+
+    current_time = datetime.datetime.now()
+    print('[%s] Running %d total experiment(s) (%d already '
+          'completed)...' % (current_time, len(pending_experiments),
+                             len(experiments) - len(pending_experiments)))
+
+    estimate_runtime = result_store.get_runtime_estimator()
+    def get_priority(experiment):
+        estimates = [estimate_runtime(config, experiment.size)
+                     for config in experiment.configs]
+        if any([estimate is None for estimate in estimates]):
+            return (1, experiment.size)
+        return (0, max(estimates))
+    pending_experiments.sort(key=lambda x: get_priority(x[1]), reverse=True)
+
+    if len(pending_experiments) > 0:
+        with multiprocessing.Pool(processes) as p:
+            # Store results in order of completion so that they survive the
+            # sweep crashing or being interrupted.
+            for i, all_results, runtime in \
+                p.imap_unordered(_run_experiment_star, pending_experiments,
+                                 chunksize=1):
+                experiment = experiments[i]
+                for config, results in zip(experiment.configs, all_results):
+                    if results.get('timed_out', False):
+                        continue
+                    record = result_store.put(config, experiment.size,
+                                              results, runtime)
+                    records[record['key']] = record
+
+    with open(summary_file, 'w') as f:
+        for experiment in experiments:
+            for config in experiment.configs:
+                record = records.get(result_store.get_key(config))
+                if record is None:
+                    continue
+                summary = dict(config)
+                summary.update(record['results'])
+                summary['runtime'] = record['runtime']
+                f.write('%s\n' % (json.dumps(summary, sort_keys=True)))
@@ -0,0 +1,20 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+import argparse
+
+import utils
+
+def main(args):
+    utils.write_binary_trace(utils.read_trace(args.input_trace),
+                             args.output_trace)
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(
+            description='Convert a trace to the binary columnar format')
+    parser.add_argument('-i', '--input_trace', type=str, required=True,
+                        help='Input trace file')
+    parser.add_argument('-o', '--output_trace', type=str, required=True,
+                        help=('Output trace file (must end in %s)' % (
+                            utils.BINARY_TRACE_SUFFIX)))
+    main(parser.parse_args())
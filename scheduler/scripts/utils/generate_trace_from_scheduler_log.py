@@ -3,8 +3,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath
 
 import argparse
 import datetime
+import numpy as np
 import re
 
+import event_log
 import utils
 
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
@@ -21,7 +23,24 @@ def main(args):
         in_progress_steps[i] = []
 
     offset = 0
-    if args.log is not None:
+    if args.log is not None and event_log.is_event_log(args.log):
+        # Binary event logs do not record steps run by in-progress
+        # micro-tasks, so only completed micro-tasks are accounted for.
+        records = event_log.read_event_log(args.log)
+        for record in records[np.isin(records['event_type'],
+                                      [event_log.MICRO_TASK_SUCCEEDED,
+                                       event_log.JOB_SUCCEEDED,
+                                       event_log.JOB_FAILED])].tolist():
+            event_type, job_id, steps = record[1], record[5], record[7]
+            if job_id not in remaining_steps:
+                continue
+            if event_type == event_log.MICRO_TASK_SUCCEEDED:
+                remaining_steps[job_id] -= int(steps)
+            else:
+                del remaining_steps[job_id]
+        if len(records) > 0:
+            offset = records['timestamp'][-1] - records['timestamp'][0]
+    elif args.log is not None:
         start_timestamp = None
         end_timestamp = None
         with open(args.log, 'r') as f:
@@ -93,7 +112,8 @@ if __name__=='__main__':
     parser.add_argument('--input_trace', type=str, required=True,
                         help='Input trace')
     parser.add_argument('--log', type=str, default=None,
-                        help='Execution log before failure')
+                        help=('Execution log (text or binary event log) '
+                              'before failure'))
     parser.add_argument('--output_trace', type=str, required=True,
                         help='Output trace')
     args = parser.parse_args()
@@ -28,6 +28,23 @@ def get_job_overhead(timeline):
         total_time = 0.0
     return (computation_time, total_time)
 
+def get_checkpoint_overhead(timeline):
+    """Returns the total time spent saving and loading checkpoints.
+
+    With asynchronous checkpointing, the time spent saving a checkpoint only
+    includes the time the job was blocked (i.e., not the time spent writing
+    the checkpoint in the background)."""
+    save_time = 0.0
+    load_time = 0.0
+    for (_, event, status, message) in timeline:
+        if status != 'DURATION':
+            continue
+        if event == 'SAVE CHECKPOINT':
+            save_time += float(message)
+        elif event == 'LOAD CHECKPOINT':
+            load_time += float(message)
+    return (save_time, load_time)
+
 def parse_timeline_file(timeline_file):
     with open(timeline_file, 'r') as f:
         lines = f.read().strip().split('\n')
@@ -62,11 +79,14 @@ def main(args):
                     timeline_file = os.path.join(job_dir, worker)
                     timeline = parse_timeline_file(timeline_file)
                     (computation_time, total_time) = get_job_overhead(timeline)
+                    (save_time, load_time) = get_checkpoint_overhead(timeline)
                     overhead = (total_time - computation_time) / total_time
                     print('Job {0}, worker {1}: computation time={2:.2f}, '
-                          'total time={3:.2f}, overhead={4:.2f}%'.format(
+                          'total time={3:.2f}, overhead={4:.2f}%, '
+                          'checkpoint save time={5:.2f}, '
+                          'checkpoint load time={6:.2f}'.format(
                             i, j, computation_time, total_time,
-                            100.0 * overhead))
+                            100.0 * overhead, save_time, load_time))
             print()
 
 if __name__=='__main__':
@@ -1,8 +1,13 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
 import argparse
 import datetime
 import numpy as np
 import matplotlib.pyplot as plt
 
+import event_log
+
 NUM_SECONDS_PER_DAY = (24 * 60 * 60)
 
 
@@ -147,6 +152,52 @@ def process_log(log_file, job_types):
 
     return jobs
 
+def process_event_log(event_log_file, job_types):
+    """Equivalent of process_log for binary event logs."""
+    jobs = {}
+    # Map from job ID to the job's latest allocation.
+    allocations = {}
+    records = event_log.read_event_log(
+        event_log_file, event_types=[event_log.JOB_ARRIVAL,
+                                     event_log.MICRO_TASK_SCHEDULED,
+                                     event_log.MICRO_TASK_SUCCEEDED,
+                                     event_log.MICRO_TASK_FAILED,
+                                     event_log.ALLOCATION_CHANGE])
+    for record in records.tolist():
+        (timestamp, event_type, worker_type, _, worker_id, job_id,
+         other_job_id, value0, _) = record
+        worker_type = worker_type.decode()
+        if event_type == event_log.JOB_ARRIVAL:
+            jobs[job_id] = Job(job_id, job_types[job_id], timestamp)
+        elif event_type == event_log.ALLOCATION_CHANGE:
+            key = (job_id, other_job_id)
+            if key not in allocations:
+                allocations[key] = {}
+            allocations[key][worker_type] = value0
+        elif event_type == event_log.MICRO_TASK_SCHEDULED:
+            allocation = allocations.get((job_id, other_job_id), {})
+            allocation_str = ''.join(
+                [' [%4s %.2f]' % (x, allocation[x])
+                 for x in sorted(allocation)])
+            for single_job_id in (job_id, other_job_id):
+                if single_job_id < 0:
+                    continue
+                jobs[single_job_id].add_start_time(timestamp)
+                jobs[single_job_id].add_worker_id(worker_id)
+                jobs[single_job_id].add_worker_type(worker_type)
+                jobs[single_job_id].add_allocation(allocation_str)
+        elif event_type == event_log.MICRO_TASK_SUCCEEDED:
+            jobs[job_id].add_end_time(timestamp)
+        elif event_type == event_log.MICRO_TASK_FAILED:
+            for single_job_id in (job_id, other_job_id):
+                if single_job_id >= 0:
+                    jobs[single_job_id].add_end_time(timestamp)
+
+    for job_id in jobs:
+        assert jobs[job_id].verify()
+
+    return jobs
+
 def get_overall_execution_time(jobs, max_end_time=None):
     earliest_dispatch_time = None
     latest_end_time = None
@@ -284,7 +335,10 @@ def plot_worker_utilization(jobs, xstart=None, xend=None):
 
 def main(args):
     job_types = get_job_types(args.trace_file)
-    jobs = process_log(args.log_files[0], job_types)
+    if event_log.is_event_log(args.log_files[0]):
+        jobs = process_event_log(args.log_files[0], job_types)
+    else:
+        jobs = process_log(args.log_files[0], job_types)
     print_job_summary(jobs, args.num_jobs)
     #plot_worker_utilization(jobs)
     #jobs = {}
@@ -295,7 +349,7 @@ def main(args):
 if __name__=='__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-l', '--log_files', type=str, nargs='+', required=True,
-                        help='Log file')
+                        help='Log file (text or binary event log)')
     parser.add_argument('-t', '--trace_file', type=str, required=True,
                         help='Trace file')
     parser.add_argument('-n', '--num_jobs', type=int, default=None,
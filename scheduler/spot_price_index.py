@@ -0,0 +1,176 @@
+from datetime import datetime
+import numpy as np
+
+AWS_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+# Instance types used to price each worker type on each cloud.
+AWS_INSTANCE_TYPES = {
+    'v100': 'p3.2xlarge',
+    # NOTE: AWS does not have single P100 instances, use 1.5x K80 price
+    # as a proxy.
+    'p100': 'p2.xlarge',
+    'k80': 'p2.xlarge',
+}
+AWS_PRICE_MULTIPLIERS = {
+    'p100': 1.5,
+}
+AZURE_INSTANCE_TYPES = {
+    'k80': 'NC6',
+    'p100': 'NC6s v2',
+    'v100': 'NC6s v3',
+}
+
+class PriceSeries:
+    """Spot price as a step function of time.
+
+    The price at time t is the price of the latest record with a timestamp
+    at or before t, or the price of the earliest record if there is none.
+    """
+
+    def __init__(self, timestamps, prices):
+        """
+        Args:
+          timestamps: A list of record timestamps, in seconds.
+          prices: A list of record prices, one per timestamp. Records with
+                  equal timestamps are ordered as passed in.
+        """
+        assert(len(timestamps) == len(prices))
+        assert(len(timestamps) > 0)
+        order = np.argsort(timestamps, kind='stable')
+        self._timestamps = np.asarray(timestamps, dtype=np.float64)[order]
+        self._prices = np.asarray(prices, dtype=np.float64)[order]
+
+    def get_price(self, current_time):
+        i = np.searchsorted(self._timestamps, current_time, side='right') - 1
+        return float(self._prices[max(i, 0)])
+
+    def get_prices(self, timestamps):
+        """Returns a NumPy array with the price at each passed-in time."""
+        i = np.searchsorted(self._timestamps, timestamps, side='right') - 1
+        return self._prices[np.maximum(i, 0)]
+
+    def scale(self, factor):
+        return PriceSeries(self._timestamps, self._prices * factor)
+
+    @staticmethod
+    def minimum(all_series):
+        """Returns the pointwise minimum of the passed-in price series."""
+        timestamps = np.unique(
+            np.concatenate([series._timestamps for series in all_series]))
+        prices = np.min([series.get_prices(timestamps)
+                         for series in all_series], axis=0)
+        return PriceSeries(timestamps, prices)
+
+def _get_aws_price_series(spot_price_history):
+    """Returns a map from availability zone to price series for an AWS
+    instance type.
+
+    Timestamps are in seconds since the earliest record across zones.
+    """
+    timestamps = [datetime.strptime(x['Timestamp'], AWS_TIMESTAMP_FORMAT)
+                  for x in spot_price_history]
+    earliest_timestamp = min(timestamps)
+    per_zone_records = {}
+    for timestamp, x in zip(timestamps, spot_price_history):
+        zone = x['AvailabilityZone']
+        if zone not in per_zone_records:
+            per_zone_records[zone] = ([], [])
+        per_zone_records[zone][0].append(
+            (timestamp - earliest_timestamp).total_seconds())
+        per_zone_records[zone][1].append(float(x['SpotPrice']))
+    return {zone: PriceSeries(*records)
+            for zone, records in per_zone_records.items()}
+
+def _get_azure_price_series(per_zone_spot_prices):
+    """Returns a map from zone to price series for an Azure instance type.
+
+    Timestamps are in seconds since the earliest record across zones; records
+    without a price are skipped, as are zones without any priced records.
+    """
+    earliest_timestamp = min([x[0] for zone in per_zone_spot_prices
+                              for x in per_zone_spot_prices[zone]])
+    per_zone_series = {}
+    for zone, spot_prices in per_zone_spot_prices.items():
+        timestamps = []
+        prices = []
+        for (timestamp, price) in spot_prices:
+            if price == '':
+                continue
+            timestamps.append(
+                (timestamp - earliest_timestamp).total_seconds())
+            # Remove '$' character.
+            prices.append(float(price[1:]))
+        if len(prices) > 0:
+            per_zone_series[zone] = PriceSeries(timestamps, prices)
+    return per_zone_series
+
+class SpotPriceIndex:
+    """Index of spot prices for each worker type.
+
+    Raw spot price records (as returned by
+    utils.read_per_instance_type_spot_prices_json) are parsed once into a
+    price series per cloud, worker type and zone, and the minimum across
+    zones and available clouds is precomputed as a single series per worker
+    type, so that looking up the latest price is a binary search.
+    """
+
+    def __init__(self, per_instance_type_spot_prices, available_clouds):
+        """
+        Args:
+          per_instance_type_spot_prices: A map from cloud to raw spot price
+                                         records for each instance type.
+          available_clouds: The clouds to rent workers from.
+        """
+        assert(len(available_clouds) > 0)
+        # Map from cloud to map from worker type to map from zone to price
+        # series.
+        self._per_cloud_series = {}
+        if 'aws' in available_clouds:
+            aws_spot_prices = per_instance_type_spot_prices['aws']
+            per_instance_type_series = {}
+            self._per_cloud_series['aws'] = {}
+            for worker_type, instance_type in AWS_INSTANCE_TYPES.items():
+                if instance_type not in per_instance_type_series:
+                    per_instance_type_series[instance_type] = \
+                        _get_aws_price_series(aws_spot_prices[instance_type])
+                self._per_cloud_series['aws'][worker_type] = \
+                    per_instance_type_series[instance_type]
+        if 'gcp' in available_clouds:
+            gcp_spot_prices = per_instance_type_spot_prices['gcp']
+            self._per_cloud_series['gcp'] = {}
+            for worker_type, price in gcp_spot_prices.items():
+                self._per_cloud_series['gcp'][worker_type] = \
+                    {None: PriceSeries([0.0], [price])}
+        if 'azure' in available_clouds:
+            azure_spot_prices = per_instance_type_spot_prices['azure']
+            self._per_cloud_series['azure'] = {}
+            for worker_type, instance_type in AZURE_INSTANCE_TYPES.items():
+                self._per_cloud_series['azure'][worker_type] = \
+                    _get_azure_price_series(azure_spot_prices[instance_type])
+
+        # Map from worker type to the minimum price series across zones and
+        # clouds.
+        self._series = {}
+        worker_types = set()
+        for cloud in self._per_cloud_series:
+            worker_types.update(self._per_cloud_series[cloud].keys())
+        for worker_type in worker_types:
+            all_series = []
+            for cloud in sorted(self._per_cloud_series):
+                per_zone_series = \
+                    self._per_cloud_series[cloud].get(worker_type)
+                if per_zone_series is None or len(per_zone_series) == 0:
+                    continue
+                series = PriceSeries.minimum(list(per_zone_series.values()))
+                if cloud == 'aws' and worker_type in AWS_PRICE_MULTIPLIERS:
+                    series = series.scale(AWS_PRICE_MULTIPLIERS[worker_type])
+                all_series.append(series)
+            self._series[worker_type] = PriceSeries.minimum(all_series)
+
+    def get_price_series(self, cloud, worker_type, zone):
+        return self._per_cloud_series[cloud][worker_type][zone]
+
+    def get_latest_price(self, worker_type, current_time):
+        """Returns the minimum price for worker_type across zones and
+        available clouds at current_time (in seconds)."""
+        return self._series[worker_type].get_price(current_time)
@@ -0,0 +1,53 @@
+import sys; sys.path.append("..")
+from allocation_state import AllocationState, ThroughputSnapshots
+from job_id_pair import JobIdPair
+
+import unittest
+
+class TestAllocationState(unittest.TestCase):
+
+    def test_get_inputs(self):
+        state = AllocationState(throughputs={}, cluster_spec={'v100': 1})
+        self.assertEqual(state.get_inputs(('cluster_spec', 'throughputs')),
+                         [{'v100': 1}, {}])
+        self.assertIsNone(state.scale_factors)
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            AllocationState(throughput={})
+
+class TestThroughputSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.throughputs = {
+            JobIdPair(0, None): {'v100': 4.0, 'k80': 1.0},
+            JobIdPair(1, None): {'v100': 3.0, 'k80': 1.0},
+            JobIdPair(0, 1): {'v100': [2.0, 1.5], 'k80': [0.0, 0.5]},
+        }
+        self.snapshots = ThroughputSnapshots()
+        for job_id in self.throughputs:
+            self.snapshots.mark_dirty(job_id)
+
+    def test_snapshot_is_isolated(self):
+        snapshot = self.snapshots.snapshot(self.throughputs)
+        self.assertEqual(snapshot, self.throughputs)
+        self.throughputs[JobIdPair(0, 1)]['v100'][0] = 3.0
+        self.snapshots.mark_dirty(JobIdPair(0, 1))
+        # Earlier snapshots are not affected by later updates.
+        self.assertEqual(snapshot[JobIdPair(0, 1)]['v100'], [2.0, 1.5])
+        new_snapshot = self.snapshots.snapshot(self.throughputs)
+        self.assertEqual(new_snapshot[JobIdPair(0, 1)]['v100'], [3.0, 1.5])
+        self.assertIs(new_snapshot[JobIdPair(0, None)],
+                      snapshot[JobIdPair(0, None)])
+
+    def test_remove(self):
+        self.snapshots.snapshot(self.throughputs)
+        del self.throughputs[JobIdPair(0, 1)]
+        del self.throughputs[JobIdPair(1, None)]
+        self.snapshots.mark_dirty(JobIdPair(0, 1))
+        self.snapshots.mark_dirty(JobIdPair(1, None))
+        snapshot = self.snapshots.snapshot(self.throughputs)
+        self.assertEqual(snapshot, self.throughputs)
+
+if __name__=='__main__':
+    unittest.main()
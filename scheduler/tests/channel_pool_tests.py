@@ -0,0 +1,56 @@
+import sys; sys.path.append("..")
+from runtime.rpc.channel_pool import ChannelPool, get_channel_pool
+import iterator_to_scheduler_pb2_grpc as i2s_pb2_grpc
+import worker_to_scheduler_pb2_grpc as w2s_pb2_grpc
+
+import unittest
+
+TARGET = '127.0.0.1:50070'
+OTHER_TARGET = '127.0.0.1:50071'
+
+class TestChannelPool(unittest.TestCase):
+
+    def test_reuse(self):
+        pool = ChannelPool()
+        channel = pool.get_channel(TARGET)
+        self.assertIs(pool.get_channel(TARGET), channel)
+        self.assertIsNot(pool.get_channel(OTHER_TARGET), channel)
+
+        stub = pool.get_stub(TARGET, i2s_pb2_grpc.IteratorToSchedulerStub)
+        self.assertIs(
+            pool.get_stub(TARGET, i2s_pb2_grpc.IteratorToSchedulerStub), stub)
+        # Stubs for different services share the destination's channel.
+        self.assertIsNot(
+            pool.get_stub(TARGET, w2s_pb2_grpc.WorkerToSchedulerStub), stub)
+        self.assertIs(pool.get_channel(TARGET), channel)
+        pool.close()
+
+    def test_close_channel(self):
+        pool = ChannelPool()
+        channel = pool.get_channel(TARGET)
+        other_channel = pool.get_channel(OTHER_TARGET)
+        stub = pool.get_stub(TARGET, i2s_pb2_grpc.IteratorToSchedulerStub)
+        pool.close_channel(TARGET)
+        self.assertIsNot(pool.get_channel(TARGET), channel)
+        self.assertIsNot(
+            pool.get_stub(TARGET, i2s_pb2_grpc.IteratorToSchedulerStub), stub)
+        self.assertIs(pool.get_channel(OTHER_TARGET), other_channel)
+        pool.close()
+
+    def test_fork(self):
+        pool = ChannelPool()
+        channel = pool.get_channel(TARGET)
+        stub = pool.get_stub(TARGET, i2s_pb2_grpc.IteratorToSchedulerStub)
+        # Channels created before a fork are not reused by the child.
+        pool._pid = -1
+        self.assertIsNot(
+            pool.get_stub(TARGET, i2s_pb2_grpc.IteratorToSchedulerStub), stub)
+        self.assertIsNot(pool.get_channel(TARGET), channel)
+        channel.close()
+        pool.close()
+
+    def test_get_channel_pool(self):
+        self.assertIs(get_channel_pool(), get_channel_pool())
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import sys; sys.path.append("..")
+import event_log
+from job_id_pair import JobIdPair
+
+import os
+import tempfile
+import unittest
+
+class TestEventLog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.event_log_file = os.path.join(self.directory.name, 'test.events')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_event_log(self):
+        # Flush after every few records.
+        log = event_log.EventLog(self.event_log_file, buffer_size=100,
+                                 metadata={'policy': 'FIFO'})
+        log.record(0.0, event_log.JOB_ARRIVAL, JobIdPair(0, None),
+                   value0=1, value1=1000)
+        log.record(1.5, event_log.MICRO_TASK_SCHEDULED, JobIdPair(0, 1),
+                   worker_type='v100', worker_ids=[3, 4], value0=0.5,
+                   value1=-2.0)
+        log.record(361.5, event_log.MICRO_TASK_SUCCEEDED, JobIdPair(1, None),
+                   worker_type='v100', worker_ids=[3, 4], value0=200,
+                   value1=360.0)
+        log.close()
+
+        header, _ = event_log.read_event_log_header(self.event_log_file)
+        self.assertEqual(header['metadata'], {'policy': 'FIFO'})
+        self.assertTrue(event_log.is_event_log(self.event_log_file))
+        records = event_log.read_event_log(self.event_log_file)
+        self.assertEqual(records.tolist(), [
+            (0.0, event_log.JOB_ARRIVAL, b'', 0, -1, 0, -1, 1.0, 1000.0),
+            (1.5, event_log.MICRO_TASK_SCHEDULED, b'v100', 2, 3, 0, 1, 0.5,
+             -2.0),
+            (361.5, event_log.MICRO_TASK_SUCCEEDED, b'v100', 2, 3, 1, -1,
+             200.0, 360.0),
+        ])
+        records = event_log.read_event_log(
+            self.event_log_file, event_types=[event_log.MICRO_TASK_SUCCEEDED])
+        self.assertEqual(list(records['job_id']), [1])
+
+        # A truncated trailing record is ignored.
+        with open(self.event_log_file, 'ab') as f:
+            f.write(b'\0' * 10)
+        self.assertEqual(len(event_log.read_event_log(self.event_log_file)),
+                         3)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,277 @@
+import sys; sys.path.append("..")
+try:
+    import torch
+    import gavel_iterator
+    from runtime.rpc import iterator_client
+except ImportError:
+    torch = None
+try:
+    import dill
+except ImportError:
+    dill = None
+
+import collections
+from concurrent import futures
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+STEP_TIME = 0.002
+LEASE_STEPS = 200
+LEASE_DURATION = 100.0
+NUM_LEASE_EXTENSIONS = 2
+
+Point = collections.namedtuple('Point', ['x', 'y'])
+
+def get_fake_rpc_client(latency=0.0, error=None):
+    """Returns an IteratorRpcClient stand-in that extends the lease by
+    LEASE_STEPS steps NUM_LEASE_EXTENSIONS times, taking latency seconds
+    per lease update."""
+    class FakeIteratorRpcClient:
+        def __init__(self, job_id, worker_id, sched_ip_addr, sched_port,
+                     logger):
+            self.update_steps = []
+
+        def init(self):
+            return (LEASE_STEPS, LEASE_DURATION, 0)
+
+        def update_lease(self, steps, duration, max_steps, max_duration,
+                         gang=False):
+            time.sleep(latency)
+            if error is not None:
+                raise error
+            self.update_steps.append(steps)
+            if len(self.update_steps) > NUM_LEASE_EXTENSIONS:
+                return (max_steps, max_duration)
+            return (max_steps + LEASE_STEPS, max_duration + LEASE_DURATION)
+    return FakeIteratorRpcClient
+
+@unittest.skipIf(torch is None, 'requires torch')
+class TestGavelIterator(unittest.TestCase):
+
+    def setUp(self):
+        self._checkpoint_dir = tempfile.TemporaryDirectory()
+        environ = {
+            'GAVEL_JOB_ID': '0',
+            'GAVEL_WORKER_ID': '0',
+            'GAVEL_ROUND_ID': '0',
+            'GAVEL_SCHED_ADDR': '127.0.0.1',
+            'GAVEL_SCHED_PORT': '50060',
+        }
+        patcher = mock.patch.dict(os.environ, environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._checkpoint_dir.cleanup)
+
+    def _get_iterator(self, rpc_client_class, load_checkpoint_func=None,
+                      save_checkpoint_func=None, **kwargs):
+        with mock.patch.object(iterator_client, 'IteratorRpcClient',
+                               rpc_client_class):
+            iterator = gavel_iterator.GavelIterator(
+                list(range(10 * LEASE_STEPS)), self._checkpoint_dir.name,
+                load_checkpoint_func, save_checkpoint_func,
+                write_on_close=False, **kwargs)
+        self.addCleanup(iterator._close_file_handler)
+        return iterator
+
+    def _run(self, iterator):
+        """Iterates until the lease expires, and returns the number of
+        steps and the longest time spent in __next__."""
+        num_steps = 0
+        max_next_time = 0.0
+        it = iter(iterator)
+        while True:
+            start_time = time.time()
+            try:
+                next(it)
+            except StopIteration:
+                break
+            max_next_time = max(max_next_time, time.time() - start_time)
+            num_steps += 1
+            time.sleep(STEP_TIME)
+        return (num_steps, max_next_time)
+
+    def test_background_lease_updates(self):
+        latency = 0.05
+        total_steps = LEASE_STEPS * (NUM_LEASE_EXTENSIONS + 1)
+        iterator = self._get_iterator(get_fake_rpc_client(latency),
+                                      background_lease_updates=False)
+        (num_steps, max_next_time) = self._run(iterator)
+        self.assertEqual(num_steps, total_steps)
+        self.assertGreaterEqual(max_next_time, latency)
+
+        iterator = self._get_iterator(get_fake_rpc_client(latency))
+        (num_steps, max_next_time) = self._run(iterator)
+        self.assertEqual(num_steps, total_steps)
+        # Iteration does not block on lease updates.
+        self.assertLess(max_next_time, latency)
+
+    def test_lease_update_requested_early(self):
+        iterator = self._get_iterator(get_fake_rpc_client(0.05))
+        self._run(iterator)
+        update_steps = iterator._rpc_client.update_steps
+        self.assertEqual(update_steps[0],
+                         LEASE_STEPS * gavel_iterator.LEASE_UPDATE_FRACTION)
+        # Later updates are requested ahead of the lease update point by the
+        # measured lease update latency.
+        self.assertLess(update_steps[1],
+                        LEASE_STEPS * (1 + gavel_iterator.LEASE_UPDATE_FRACTION))
+
+    def test_wait_for_lease_update_at_expiry(self):
+        # Lease updates take longer than the rest of the lease.
+        iterator = self._get_iterator(get_fake_rpc_client(0.5))
+        initial_lease = iterator._lease
+        (num_steps, _) = self._run(iterator)
+        self.assertEqual(num_steps, LEASE_STEPS * (NUM_LEASE_EXTENSIONS + 1))
+        # The lease is replaced rather than modified.
+        self.assertIsNot(iterator._lease, initial_lease)
+        self.assertEqual(initial_lease.max_steps, LEASE_STEPS)
+
+    def test_lease_update_error(self):
+        iterator = self._get_iterator(
+            get_fake_rpc_client(error=OSError('Lease update failed')))
+        with self.assertRaises(OSError):
+            self._run(iterator)
+
+    def test_checkpoint_write_error(self):
+        def save_checkpoint(state, checkpoint_path):
+            with open(checkpoint_path, 'w') as f:
+                f.write('partial')
+            raise OSError('Checkpoint write failed')
+        iterator = self._get_iterator(get_fake_rpc_client(),
+                                      load_checkpoint_func=torch.load,
+                                      save_checkpoint_func=save_checkpoint,
+                                      asynchronous_checkpointing=True)
+        checkpoint_path = os.path.join(self._checkpoint_dir.name,
+                                       'model.chkpt')
+        checkpoint_write = iterator.save_checkpoint({}, checkpoint_path)
+        with self.assertRaises(OSError):
+            checkpoint_write.result()
+        # The temporary checkpoint is removed, and the error is raised by the
+        # next checkpoint operation.
+        self.assertFalse(os.path.exists(checkpoint_path))
+        self.assertFalse(os.path.exists(checkpoint_path + '.tmp'))
+        with self.assertRaises(OSError):
+            iterator.load_checkpoint(checkpoint_path)
+        checkpoint_write = iterator.save_checkpoint({}, checkpoint_path)
+        futures.wait([checkpoint_write])
+        with self.assertRaises(OSError):
+            iterator.save_checkpoint({}, checkpoint_path)
+
+    def _get_checkpointing_iterator(self, save_checkpoint_func):
+        return self._get_iterator(get_fake_rpc_client(),
+                                  load_checkpoint_func=torch.load,
+                                  save_checkpoint_func=save_checkpoint_func,
+                                  asynchronous_checkpointing=True)
+
+    def test_checkpoint_buffers(self):
+        write_allowed = threading.Event()
+        def save_checkpoint(state, checkpoint_path):
+            write_allowed.wait()
+            torch.save(state, checkpoint_path)
+        iterator = self._get_checkpointing_iterator(save_checkpoint)
+        checkpoint_path = os.path.join(self._checkpoint_dir.name,
+                                       'model.chkpt')
+        weight = torch.ones(4)
+        state = {'layers': [weight, Point(torch.zeros(2), 3)], 'epoch': 1}
+        checkpoint_writes = [iterator.save_checkpoint(state, checkpoint_path)]
+        # The checkpoint is copied, so it can be modified during the write.
+        weight.add_(1)
+        write_allowed.set()
+        checkpoint_writes[0].result()
+        checkpoint = torch.load(checkpoint_path, weights_only=False)
+        self.assertTrue(torch.equal(checkpoint['layers'][0], torch.ones(4)))
+        self.assertIsInstance(checkpoint['layers'][1], Point)
+        self.assertEqual(checkpoint['epoch'], 1)
+
+        # Alternate saves use the same buffers.
+        buffers = dict(iterator._checkpoint_buffers[0])
+        for _ in range(2):
+            checkpoint_writes.append(
+                iterator.save_checkpoint(state, checkpoint_path))
+        futures.wait(checkpoint_writes)
+        self.assertEqual(len(buffers), 2)
+        for (key, buffer) in buffers.items():
+            self.assertIs(iterator._checkpoint_buffers[0][key], buffer)
+        self.assertTrue(torch.equal(buffers[(0, 0, 'layers', 0)], weight))
+        self.assertIsNot(buffers[(0, 0, 'layers', 0)], weight)
+
+    def test_checkpoint_rename(self):
+        write_allowed = threading.Event()
+        def save_checkpoint(state, checkpoint_path):
+            torch.save(state, checkpoint_path)
+            write_allowed.wait()
+        iterator = self._get_checkpointing_iterator(save_checkpoint)
+        checkpoint_path = os.path.join(self._checkpoint_dir.name,
+                                       'model.chkpt')
+        checkpoint_write = iterator.save_checkpoint({'epoch': 1},
+                                                    checkpoint_path)
+        # A partially written checkpoint is never at the checkpoint path.
+        time.sleep(0.1)
+        self.assertFalse(os.path.exists(checkpoint_path))
+        self.assertTrue(os.path.exists(checkpoint_path + '.tmp'))
+        write_allowed.set()
+        checkpoint_write.result()
+        self.assertTrue(os.path.exists(checkpoint_path))
+        self.assertFalse(os.path.exists(checkpoint_path + '.tmp'))
+
+    def test_load_waits_for_checkpoint_write(self):
+        def save_checkpoint(state, checkpoint_path):
+            time.sleep(0.2)
+            torch.save(state, checkpoint_path)
+        iterator = self._get_checkpointing_iterator(save_checkpoint)
+        checkpoint_path = os.path.join(self._checkpoint_dir.name,
+                                       'model.chkpt')
+        iterator.save_checkpoint({'epoch': 1}, checkpoint_path)
+        self.assertEqual(iterator.load_checkpoint(checkpoint_path),
+                         {'epoch': 1})
+
+    def test_detached_checkpoint_write(self):
+        def save_checkpoint(state, checkpoint_path):
+            time.sleep(0.5)
+            torch.save(state, checkpoint_path)
+        iterator = self._get_checkpointing_iterator(save_checkpoint)
+        checkpoint_path = os.path.join(self._checkpoint_dir.name,
+                                       'model.chkpt')
+        self._run(iterator)
+        self.assertTrue(iterator.done)
+        start_time = time.time()
+        # The last checkpoint of the lease does not delay the exit.
+        self.assertIsNone(iterator.save_checkpoint(
+            {'weight': torch.ones(4)}, checkpoint_path))
+        self.assertEqual(iterator._checkpoint_writes, [None, None])
+        self.assertLess(time.time() - start_time, 0.5)
+
+        # The next lease waits for the checkpoint.
+        next_iterator = self._get_checkpointing_iterator(save_checkpoint)
+        checkpoint = next_iterator.load_checkpoint(checkpoint_path)
+        self.assertTrue(torch.equal(checkpoint['weight'], torch.ones(4)))
+
+    def test_detached_checkpoint_write_error(self):
+        def save_checkpoint(state, checkpoint_path):
+            raise OSError('Checkpoint write failed')
+        iterator = self._get_checkpointing_iterator(save_checkpoint)
+        checkpoint_path = os.path.join(self._checkpoint_dir.name,
+                                       'model.chkpt')
+        iterator.complete()
+        iterator.save_checkpoint({'epoch': 1}, checkpoint_path)
+        next_iterator = self._get_checkpointing_iterator(save_checkpoint)
+        with self.assertRaisesRegex(RuntimeError, 'Checkpoint write failed'):
+            next_iterator.load_checkpoint(checkpoint_path)
+
+    @unittest.skipIf(dill is None, 'requires dill')
+    def test_pickle(self):
+        iterator = self._get_checkpointing_iterator(torch.save)
+        iterator = dill.loads(dill.dumps(iterator))
+        (num_steps, _) = self._run(iterator)
+        self.assertEqual(num_steps, LEASE_STEPS * (NUM_LEASE_EXTENSIONS + 1))
+        checkpoint_path = os.path.join(self._checkpoint_dir.name,
+                                       'model.chkpt')
+        iterator._done = False
+        iterator.save_checkpoint({'epoch': 1}, checkpoint_path).result()
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import sys; sys.path.append("..")
+from job_id_pair import JobIdPair
+
+import copy
+import gc
+import pickle
+import unittest
+
+class TestJobIdPair(unittest.TestCase):
+
+    def test_pair(self):
+        job_id = JobIdPair(3, 1)
+        self.assertEqual(job_id, JobIdPair(1, 3))
+        self.assertEqual(hash(job_id), hash(JobIdPair(1, 3)))
+        self.assertEqual(job_id.as_tuple(), (1, 3))
+        self.assertEqual(job_id.as_set(), set([1, 3]))
+        self.assertEqual(repr(job_id), '(1, 3)')
+        self.assertTrue(job_id.is_pair())
+        self.assertEqual(job_id.singletons(),
+                         (JobIdPair(1, None), JobIdPair(3, None)))
+        self.assertTrue(JobIdPair(3, None).overlaps_with(job_id))
+        self.assertFalse(JobIdPair(2, None).overlaps_with(job_id))
+
+    def test_interning(self):
+        job_id = JobIdPair(5, None)
+        self.assertIs(job_id, JobIdPair(5, None))
+        self.assertIs(job_id.singletons()[0], job_id)
+        self.assertIs(JobIdPair(5, 6).singletons()[0], job_id)
+        self.assertIs(pickle.loads(pickle.dumps(job_id)), job_id)
+        self.assertIs(copy.deepcopy(job_id), job_id)
+        self.assertEqual(pickle.loads(pickle.dumps(JobIdPair(5, 6))),
+                         JobIdPair(5, 6))
+
+    def test_interned_ids_are_released(self):
+        job_id = JobIdPair(7, 8)
+        job_id.singletons()
+        self.assertIn(7, JobIdPair._singles)
+        del job_id
+        gc.collect()
+        self.assertNotIn(7, JobIdPair._singles)
+        self.assertNotIn(8, JobIdPair._singles)
+        self.assertEqual(JobIdPair(7, None).as_tuple(), (7, None))
+
+    def test_ordering(self):
+        job_ids = [JobIdPair(0, 5), JobIdPair(2, None), JobIdPair(0, 3),
+                   JobIdPair(1, None), JobIdPair(1, 2)]
+        self.assertEqual(sorted(job_ids),
+                         [JobIdPair(1, None), JobIdPair(2, None),
+                          JobIdPair(0, 3), JobIdPair(0, 5), JobIdPair(1, 2)])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            JobIdPair(None, None)
+        with self.assertRaises(ValueError):
+            JobIdPair(None, 1)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import sys; sys.path.append("..")
+from job_id_pair import JobIdPair
+from job_state_store import JobStateStore
+
+import unittest
+
+class TestJobStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.worker_types = ['v100', 'k80']
+        self.job_ids = [JobIdPair(0, None), JobIdPair(1, None)]
+        self.store = JobStateStore(capacity=2)
+        for worker_type in self.worker_types:
+            self.store.add_worker_type(worker_type)
+        self.store.add(self.job_ids, job_time=180.0)
+
+    def test_job_time_so_far(self):
+        self.store.add([JobIdPair(0, 1)])
+        self.store.set_job_time(JobIdPair(0, 1), 'v100', 0.0)
+        self.store.add_job_time(JobIdPair(0, None), 'k80', 360.0)
+        job_time_so_far = self.store.job_time_so_far
+        self.assertEqual(len(job_time_so_far), 3)
+        self.assertEqual(job_time_so_far[JobIdPair(0, None)],
+                         {'v100': 180.0, 'k80': 540.0})
+        # Time is only recorded for worker types it was set on.
+        self.assertEqual(job_time_so_far[JobIdPair(0, 1)], {'v100': 0.0})
+        self.assertIsNone(job_time_so_far.get(JobIdPair(1, 2)))
+
+    def test_reset(self):
+        self.store.add_job_time(JobIdPair(0, None), 'v100', 360.0)
+        self.store.add_job_time(JobIdPair(1, None), 'k80', 720.0)
+        allocation = {
+            JobIdPair(0, None): {'v100': 0.5, 'k80': 0.25},
+            JobIdPair(1, None): {'v100': 0.25, 'k80': 0.75},
+        }
+        self.store.reset(allocation, 1080.0, 180.0)
+        deficits = self.store.get_deficits()
+        self.assertAlmostEqual(deficits['v100'][JobIdPair(0, None)],
+                               0.5 * 1080.0 - 360.0)
+        self.assertAlmostEqual(deficits['k80'][JobIdPair(0, None)],
+                               0.25 * 1080.0)
+        self.assertAlmostEqual(deficits['k80'][JobIdPair(1, None)],
+                               0.75 * 1080.0 - 720.0)
+        self.assertEqual(self.store.job_time_so_far[JobIdPair(1, None)],
+                         {'v100': 180.0, 'k80': 180.0})
+        # Deficits accumulate across resets.
+        self.store.reset({}, 1080.0, 180.0)
+        self.assertAlmostEqual(
+            self.store.get_deficit(JobIdPair(0, None), 'v100'),
+            0.5 * 1080.0 - 360.0)
+
+    def test_remove_and_grow(self):
+        self.store.set_deficit(JobIdPair(1, None), 'v100', 5.0)
+        self.store.remove([JobIdPair(1, None)])
+        self.assertNotIn(JobIdPair(1, None), self.store)
+        new_job_ids = [JobIdPair(i, None) for i in range(2, 5)]
+        self.store.add(new_job_ids)
+        self.assertEqual(len(self.store), 4)
+        # Reused slots do not keep the state of removed job combinations.
+        for job_id in new_job_ids:
+            self.assertEqual(self.store.get_deficit(job_id, 'v100'), 0.0)
+            self.assertEqual(self.store.job_time_so_far[job_id], {})
+        self.assertEqual(self.store.job_time_so_far[JobIdPair(0, None)],
+                         {'v100': 180.0, 'k80': 180.0})
+
+    def test_get_deficit_column(self):
+        self.store.set_deficit(JobIdPair(1, None), 'k80', -3.0)
+        (deficits, slots) = self.store.get_deficit_column('k80')
+        self.assertEqual({job_id: deficits[slots[job_id]]
+                          for job_id in self.job_ids},
+                         self.store.get_deficits('k80'))
+
+    def test_load(self):
+        self.store.add_worker_type('p100')
+        self.store.set_job_time(JobIdPair(0, None), 'p100', 90.0)
+        self.store.set_deficit(JobIdPair(1, None), 'k80', -3.0)
+        store = JobStateStore()
+        store.load(dict(self.store.job_time_so_far),
+                   self.store.get_deficits())
+        self.assertEqual(dict(store.job_time_so_far),
+                         dict(self.store.job_time_so_far))
+        self.assertEqual(store.get_deficits(), self.store.get_deficits())
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import sys; sys.path.append("..")
+from job import Job
+from runtime.rpc import scheduler_server
+import scheduler
+import utils
+
+import threading
+import time
+import unittest
+
+THROUGHPUTS_FILE = '../simulation_throughputs.json'
+TOTAL_STEPS = 100000
+SCALE_FACTOR = 4
+
+class TestLeaseAgreement(unittest.TestCase):
+
+    def setUp(self):
+        self._sched = scheduler.Scheduler(utils.get_policy('fifo'),
+                                          throughputs_file=THROUGHPUTS_FILE,
+                                          simulate=True)
+        job = Job(None, 'ResNet-18 (batch size 64)', 'python3 main.py',
+                  'image_classification/cifar10', '--num_steps', TOTAL_STEPS,
+                  None, scale_factor=SCALE_FACTOR)
+        self._job_id = self._sched.add_job(job, timestamp=0)
+        self._sched._lease_update_requests[self._job_id] = []
+        self._sched._max_steps[self._job_id] = None
+        self._sched._current_round_start_time = 0
+        # 10 steps in 1 second with 360 seconds left in the round.
+        self._expected_lease = (10 + 3600, scheduler.INFINITY)
+
+    def tearDown(self):
+        self._sched.shutdown()
+
+    def _update_lease(self, worker_id, **kwargs):
+        return self._sched._update_lease_callback(
+            self._job_id, worker_id, steps=10, duration=1.0, max_steps=50,
+            max_duration=10.0, **kwargs)
+
+    def test_followers_wait_for_leader(self):
+        leases = {}
+        def follower(worker_id):
+            leases[worker_id] = self._update_lease(worker_id)
+        # Register the leader's request first, so the followers wait.
+        self._sched._lease_update_requests[self._job_id].append(None)
+        followers = [threading.Thread(target=follower, args=(i,))
+                     for i in range(1, SCALE_FACTOR)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.1)
+        self.assertEqual(len(leases), 0)
+
+        start_time = time.time()
+        with self._sched._scheduler_lock:
+            self._sched._agree_on_max_steps(self._job_id, 10, 1.0,
+                                            TOTAL_STEPS, 360)
+        for thread in followers:
+            thread.join()
+        # Followers are woken up as soon as the lease is computed.
+        self.assertLess(time.time() - start_time, 0.5)
+        for worker_id in range(1, SCALE_FACTOR):
+            self.assertEqual(leases[worker_id], self._expected_lease)
+
+    def test_leader_failover(self):
+        original_timeout = scheduler.LEASE_AGREEMENT_TIMEOUT
+        scheduler.LEASE_AGREEMENT_TIMEOUT = 0.1
+        try:
+            # The leader registers its request but never computes the lease.
+            self._sched._lease_update_requests[self._job_id].append(None)
+            self.assertEqual(self._update_lease(1), self._expected_lease)
+            self.assertEqual(self._update_lease(2), self._expected_lease)
+        finally:
+            scheduler.LEASE_AGREEMENT_TIMEOUT = original_timeout
+
+    def test_nonblocking_follower(self):
+        self._sched._lease_update_requests[self._job_id].append(None)
+        pending = self._update_lease(1, wait=False)
+        self.assertIsInstance(pending, scheduler_server.PendingCallback)
+        self.assertGreater(pending.timeout, 0)
+        self.assertFalse(pending.event.done())
+        with self._sched._scheduler_lock:
+            self._sched._agree_on_max_steps(self._job_id, 10, 1.0,
+                                            TOTAL_STEPS, 360)
+        self.assertTrue(pending.event.done())
+        self.assertEqual(pending.resume(), self._expected_lease)
+
+    def test_job_removed_while_waiting(self):
+        leases = {}
+        def follower():
+            leases[1] = self._update_lease(1)
+        self._sched._lease_update_requests[self._job_id].append(None)
+        thread = threading.Thread(target=follower)
+        thread.start()
+        time.sleep(0.1)
+        pending = self._update_lease(2, wait=False)
+        self._sched._per_job_latest_timestamps[self._job_id] = 0
+        with self._sched._scheduler_lock:
+            self._sched._remove_job(self._job_id)
+        thread.join()
+        # Waiting workers get an empty lease instead of failing.
+        self.assertEqual(leases[1], (0, 0))
+        self.assertTrue(pending.event.done())
+        self.assertEqual(pending.resume(), (0, 0))
+
+    def test_gang(self):
+        self.assertEqual(self._update_lease(0, gang=True),
+                         self._expected_lease)
+        # The single request stands in for all of the job's workers.
+        self.assertEqual(
+            len(self._sched._lease_update_requests[self._job_id]),
+            SCALE_FACTOR)
+
+if __name__=='__main__':
+    unittest.main()
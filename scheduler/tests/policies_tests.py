@@ -1,7 +1,11 @@
 import sys; sys.path.append("..")
 from job_id_pair import JobIdPair
 from policies import allox, finish_time_fairness, gandiva, isolated, \
-    max_min_fairness, max_min_fairness_water_filling, max_sum_throughput
+    max_min_fairness, max_min_fairness_water_filling, max_sum_throughput, \
+    min_total_duration
+# Policies import their base module as `policy`, so the shared problem
+# template cache lives there (not in `policies.policy`).
+from policy import get_problem_template_cache
 
 import itertools
 import numpy as np
@@ -163,6 +167,51 @@ class TestPolicies(unittest.TestCase):
                               unflattened_priority_weights,
                               cluster_spec)
 
+    def test_problem_template_reuse(self):
+        cache = get_problem_template_cache()
+        cache.clear()
+        policy = max_min_fairness.MaxMinFairnessPolicyWithPerf(
+            solver='ECOS')
+        cluster_spec = {
+            'v100': 1,
+            'p100': 2,
+            'k80': 3
+        }
+        all_throughputs = {
+            0: {'v100': 2.0, 'p100': 1.0, 'k80': 0.5},
+            1: {'v100': 3.0, 'p100': 2.0, 'k80': 1.0},
+            2: {'v100': 4.0, 'p100': 3.0, 'k80': 2.0},
+        }
+        all_scale_factors = {0: 1, 1: 2, 2: 1}
+        allocations = []
+        for enabled in [True, False]:
+            cache.enabled = enabled
+            for job_ids in [[0, 1], [0, 1, 2]]:
+                unflattened_throughputs = {
+                    job_id: all_throughputs[job_id] for job_id in job_ids
+                }
+                scale_factors = {
+                    job_id: all_scale_factors[job_id] for job_id in job_ids
+                }
+                unflattened_priority_weights = {
+                    job_id: 1 for job_id in job_ids
+                }
+                allocations.append(
+                    policy.get_allocation(unflattened_throughputs,
+                                          scale_factors,
+                                          unflattened_priority_weights,
+                                          cluster_spec))
+        cache.enabled = True
+        # Both job counts are padded to the same size, so only one template
+        # is built.
+        self.assertEqual(len(cache._templates), 1)
+        for cached, uncached in zip(allocations[:2], allocations[2:]):
+            for job_id in uncached:
+                for worker_type in cluster_spec:
+                    self.assertAlmostEqual(cached[job_id][worker_type],
+                                           uncached[job_id][worker_type],
+                                           places=5)
+
     def test_max_min_fairness_with_packing(self):
         policy = max_min_fairness.MaxMinFairnessPolicyWithPacking(
             solver='ECOS')
@@ -187,6 +236,94 @@ class TestPolicies(unittest.TestCase):
                               unflattened_priority_weights,
                               cluster_spec)
 
+    def test_flatten_with_packing(self):
+        policy = max_min_fairness.MaxMinFairnessPolicyWithPacking(
+            solver='ECOS')
+        unflattened_throughputs = {
+            JobIdPair(0, None): {'v100': 2.0, 'k80': 0.5},
+            JobIdPair(1, None): {'v100': 3.0, 'k80': 1.0},
+            JobIdPair(2, None): {'v100': 4.0, 'k80': 2.0},
+            JobIdPair(0, 1): {'v100': (1.5, 2.5), 'k80': (0.25, 0.75)},
+        }
+        cluster_spec = {'v100': 1, 'k80': 1}
+        priority_weights = {JobIdPair(0, None): 1, JobIdPair(1, None): 2,
+                            JobIdPair(2, None): 1}
+        all_throughputs, index = policy.flatten(
+            unflattened_throughputs, cluster_spec,
+            priority_weights=priority_weights)
+        (job_ids, single_job_ids, worker_types, relevant_combinations) = index
+        self.assertEqual(job_ids, [JobIdPair(0, None), JobIdPair(1, None),
+                                   JobIdPair(2, None), JobIdPair(0, 1)])
+        self.assertEqual(worker_types, ['k80', 'v100'])
+        self.assertEqual(all_throughputs.shape, (3, 4, 2))
+        self.assertEqual(relevant_combinations[JobIdPair(1, None)], [1, 3])
+        expected = np.zeros((3, 4, 2))
+        expected[0, 0] = [0.5, 2.0]
+        expected[0, 3] = [0.25, 1.5]
+        expected[1, 1] = [0.5, 1.5]
+        expected[1, 3] = [0.375, 1.25]
+        expected[2, 2] = [2.0, 4.0]
+        self.assertTrue(np.allclose(all_throughputs.toarray(), expected))
+        self.assertTrue(np.allclose(all_throughputs[1], [[0.5, 1.5],
+                                                         [0.375, 1.25]]))
+
+        # The index is updated when job combinations are added and removed.
+        del unflattened_throughputs[JobIdPair(0, None)]
+        del unflattened_throughputs[JobIdPair(0, 1)]
+        unflattened_throughputs[JobIdPair(1, 2)] = \
+            {'v100': (2.0, 3.0), 'k80': (0.5, 1.0)}
+        all_throughputs, index = policy.flatten(
+            unflattened_throughputs, cluster_spec)
+        (job_ids, single_job_ids, worker_types, relevant_combinations) = index
+        self.assertEqual(job_ids, [JobIdPair(1, None), JobIdPair(2, None),
+                                   JobIdPair(1, 2)])
+        self.assertEqual(relevant_combinations[JobIdPair(2, None)], [1, 2])
+        self.assertTrue(np.allclose(all_throughputs[1], [[2.0, 4.0],
+                                                         [1.0, 3.0]]))
+
+        # The index is reused when the job combinations are unchanged, but
+        # throughputs are read again.
+        combination_index = policy._combination_index
+        unflattened_throughputs[JobIdPair(2, None)]['k80'] = 3.0
+        all_throughputs, index = policy.flatten(
+            unflattened_throughputs, cluster_spec)
+        self.assertIs(policy._combination_index, combination_index)
+        self.assertTrue(np.allclose(all_throughputs[1], [[3.0, 4.0],
+                                                         [1.0, 3.0]]))
+
+    def test_max_min_fairness_with_packing_mixed_scale_factors(self):
+        policy = max_min_fairness.MaxMinFairnessPolicyWithPacking(
+            solver='ECOS')
+        unflattened_throughputs = {
+            JobIdPair(0, None): {'v100': 2.0, 'p100': 1.0, 'k80': 0.5},
+            JobIdPair(1, None): {'v100': 3.0, 'p100': 2.0, 'k80': 1.0},
+            JobIdPair(2, None): {'v100': 4.0, 'p100': 3.0, 'k80': 2.0},
+            JobIdPair(0, 1): {'v100': (2.0, 3.0), 'p100': (1.0, 2.0),
+                              'k80': (0.5, 1.0)},
+        }
+        scale_factors = {
+            JobIdPair(0, None): 1,
+            JobIdPair(1, None): 1,
+            JobIdPair(2, None): 2,
+        }
+        unflattened_priority_weights = {JobIdPair(0, None): 1,
+                                        JobIdPair(1, None): 1,
+                                        JobIdPair(2, None): 1}
+        cluster_spec = {
+            'v100': 2,
+            'p100': 2,
+            'k80': 2
+        }
+        allocation = policy.get_allocation(unflattened_throughputs,
+                                           scale_factors,
+                                           unflattened_priority_weights,
+                                           cluster_spec)
+        for single_job_id in scale_factors:
+            total_allocation = sum(
+                [sum(allocation[job_id].values()) for job_id in allocation
+                 if single_job_id.overlaps_with(job_id)])
+            self.assertLessEqual(total_allocation, 1.0 + 1e-6)
+
     def test_max_min_fairness_water_filling_with_packing(self):
         policy = max_min_fairness_water_filling.MaxMinFairnessWaterFillingPolicyWithPacking()
         unflattened_throughputs = {
@@ -268,6 +405,125 @@ class TestPolicies(unittest.TestCase):
                 unflattened_job_type_throughputs, job_id_to_job_type,
                 scale_factors, unflattened_priority_weights, cluster_spec)
 
+    def test_packed_policies_using_job_type_throughputs(self):
+        job_type_throughputs = {
+            ('A', 1): {
+                'v100': {None: 2.0, ('A', 1): 0.0, ('B', 1): 1.5},
+                'k80': {None: 0.5, ('A', 1): 0.0, ('B', 1): 0.25},
+            },
+            ('B', 1): {
+                'v100': {None: 10.0, ('A', 1): 8.0, ('B', 1): 0.0},
+                'k80': {None: 2.5, ('A', 1): 1.25, ('B', 1): 0.0},
+            },
+        }
+        job_id_to_job_type = {
+            JobIdPair(0, None): ('A', 1),
+            JobIdPair(1, None): ('B', 1),
+            JobIdPair(2, None): ('B', 1),
+        }
+        job_ids = sorted(job_id_to_job_type.keys())
+        # Equivalent throughputs for every job combination.
+        unflattened_throughputs = {}
+        for i, job_id in enumerate(job_ids):
+            job_type_key = job_id_to_job_type[job_id]
+            unflattened_throughputs[job_id] = {
+                worker_type: job_type_throughputs[job_type_key][worker_type][None]
+                for worker_type in job_type_throughputs[job_type_key]
+            }
+            for other_job_id in job_ids[i+1:]:
+                other_job_type_key = job_id_to_job_type[other_job_id]
+                unflattened_throughputs[JobIdPair(job_id[0], other_job_id[0])] = {
+                    worker_type: (
+                        job_type_throughputs[job_type_key][worker_type][other_job_type_key],
+                        job_type_throughputs[other_job_type_key][worker_type][job_type_key])
+                    for worker_type in job_type_throughputs[job_type_key]
+                }
+        scale_factors = {job_id: 1 for job_id in job_ids}
+        priority_weights = {job_id: 1 for job_id in job_ids}
+        times_since_start = {job_id: 0 for job_id in job_ids}
+        num_steps_remaining = {JobIdPair(0, None): 1000,
+                               JobIdPair(1, None): 4000,
+                               JobIdPair(2, None): 2000}
+        cluster_spec = {'v100': 1, 'k80': 1}
+
+        def completion_time(allocation):
+            return max([
+                num_steps_remaining[job_id] / sum([
+                    allocation[other_job_id][worker_type] *
+                    unflattened_throughputs[other_job_id][worker_type][
+                        other_job_id.as_tuple().index(job_id[0])]
+                    if other_job_id.is_pair() else
+                    allocation[other_job_id][worker_type] *
+                    unflattened_throughputs[other_job_id][worker_type]
+                    for other_job_id in allocation if job_id.overlaps_with(other_job_id)
+                    for worker_type in cluster_spec])
+                for job_id in job_ids])
+
+        policy = min_total_duration.MinTotalDurationPolicyWithPacking(
+            solver='ECOS')
+        allocation = policy.get_allocation(
+            unflattened_throughputs, scale_factors, num_steps_remaining,
+            cluster_spec)
+        job_type_allocation = policy.get_allocation_using_job_type_throughputs(
+            job_type_throughputs, job_id_to_job_type, scale_factors,
+            num_steps_remaining, cluster_spec)
+        self.assertEqual(set(allocation.keys()),
+                         set(job_type_allocation.keys()))
+        self.assertAlmostEqual(completion_time(allocation),
+                               completion_time(job_type_allocation),
+                               delta=1e-3 * completion_time(allocation))
+
+        policy = finish_time_fairness.FinishTimeFairnessPolicyWithPacking(
+            solver='ECOS')
+        job_type_allocation = policy.get_allocation_using_job_type_throughputs(
+            job_type_throughputs, job_id_to_job_type, scale_factors,
+            priority_weights, times_since_start, num_steps_remaining,
+            cluster_spec)
+        for worker_type in cluster_spec:
+            num_workers_used = sum([
+                job_type_allocation[job_id][worker_type]
+                for job_id in job_type_allocation])
+            self.assertLessEqual(num_workers_used,
+                                 cluster_spec[worker_type] + 1e-6)
+
+    def test_min_total_duration_with_perf(self):
+        policy = min_total_duration.MinTotalDurationPolicyWithPerf(
+            solver='ECOS')
+        unflattened_throughputs = {
+            0: {'v100': 1.0},
+            1: {'v100': 1.0}
+        }
+        scale_factors = {0: 1, 1: 1}
+        num_steps_remaining = {0: 1000, 1: 3000}
+        cluster_spec = {'v100': 1}
+        allocation = policy.get_allocation(unflattened_throughputs,
+                                           scale_factors,
+                                           num_steps_remaining,
+                                           cluster_spec)
+        # Both jobs finish at the same time, in 4000 seconds.
+        self.assertAlmostEqual(allocation[0]['v100'], 0.25, places=5)
+        self.assertAlmostEqual(allocation[1]['v100'], 0.75, places=5)
+
+    def test_min_total_duration_with_packing(self):
+        policy = min_total_duration.MinTotalDurationPolicyWithPacking(
+            solver='ECOS')
+        unflattened_throughputs = {
+            JobIdPair(0, None): {'v100': 1.0},
+            JobIdPair(1, None): {'v100': 1.0},
+            JobIdPair(0, 1): {'v100': (0.75, 0.75)},
+        }
+        scale_factors = {JobIdPair(0, None): 1, JobIdPair(1, None): 1}
+        num_steps_remaining = {JobIdPair(0, None): 1000,
+                               JobIdPair(1, None): 1000}
+        cluster_spec = {'v100': 1}
+        allocation = policy.get_allocation(unflattened_throughputs,
+                                           scale_factors,
+                                           num_steps_remaining,
+                                           cluster_spec)
+        # Packing the two jobs together is faster than time-sharing.
+        self.assertAlmostEqual(allocation[JobIdPair(0, 1)]['v100'], 1.0,
+                               places=5)
+
     def test_finish_time_fairness(self):
         policy = finish_time_fairness.FinishTimeFairnessPolicy(
             solver='ECOS')
@@ -0,0 +1,95 @@
+import sys; sys.path.append("..")
+from job_id_pair import JobIdPair
+from priority_table import PriorityTable
+
+import unittest
+
+class TestPriorityTable(unittest.TestCase):
+
+    def setUp(self):
+        self.worker_types = ['v100', 'k80']
+        self.job_ids = [JobIdPair(0, None), JobIdPair(1, None),
+                        JobIdPair(0, 1)]
+        self.priorities = {
+            worker_type: {job_id: 0.0 for job_id in self.job_ids}
+            for worker_type in self.worker_types
+        }
+        self.allocation = {
+            JobIdPair(0, None): {'v100': 0.5, 'k80': 0.25},
+            JobIdPair(1, None): {'v100': 0.25, 'k80': 0.0},
+            JobIdPair(0, 1): {'v100': 0.25, 'k80': 0.5},
+        }
+        self.throughputs = {
+            JobIdPair(0, None): {'v100': 4.0, 'k80': 1.0},
+            JobIdPair(1, None): {'v100': 3.0, 'k80': 1.0},
+            JobIdPair(0, 1): {'v100': [2.0, 1.5], 'k80': [0.0, 0.5]},
+        }
+        self.job_time_so_far = {
+            JobIdPair(0, None): {'v100': 180.0, 'k80': 180.0},
+            JobIdPair(1, None): {'v100': 540.0, 'k80': 180.0},
+            JobIdPair(0, 1): {'v100': 0.0, 'k80': 0.0},
+        }
+        self.worker_time_so_far = {'v100': 720.0, 'k80': 360.0}
+        self.table = PriorityTable(capacity=2)
+        for job_id in self.job_ids:
+            self.table.add(job_id)
+
+    def _update(self):
+        self.table.update(self.priorities, self.allocation, self.throughputs,
+                          self.job_time_so_far, self.worker_time_so_far)
+
+    def test_priorities(self):
+        self._update()
+        v100 = self.priorities['v100']
+        k80 = self.priorities['k80']
+        self.assertAlmostEqual(v100[JobIdPair(0, None)], 0.5 / 0.25)
+        self.assertAlmostEqual(v100[JobIdPair(1, None)], 0.25 / 0.75)
+        # Job combinations that have not run yet get a large priority
+        # scaled by their allocation.
+        self.assertAlmostEqual(v100[JobIdPair(0, 1)], 0.25 * 1e9)
+        self.assertAlmostEqual(k80[JobIdPair(0, None)], 0.25 / 0.5)
+        self.assertEqual(k80[JobIdPair(1, None)], 0.0)
+        # Job combinations with zero throughput are never prioritized.
+        self.assertEqual(k80[JobIdPair(0, 1)], 0.0)
+
+    def test_incremental_update(self):
+        self._update()
+        self.job_time_so_far[JobIdPair(0, 1)]['v100'] += 360.0
+        self.worker_time_so_far['v100'] += 360.0
+        # Without marking the job combination dirty, the cached time
+        # received is used.
+        self._update()
+        self.assertAlmostEqual(self.priorities['v100'][JobIdPair(0, 1)],
+                               0.25 * 1e9)
+        self.assertAlmostEqual(self.priorities['v100'][JobIdPair(0, None)],
+                               0.5 / (180.0 / 1080.0))
+        self.table.mark_dirty(JobIdPair(0, 1))
+        self._update()
+        self.assertAlmostEqual(self.priorities['v100'][JobIdPair(0, 1)],
+                               0.25 / (360.0 / 1080.0))
+
+    def test_invalidate(self):
+        self._update()
+        self.allocation[JobIdPair(1, None)]['k80'] = 0.5
+        self.table.invalidate()
+        self._update()
+        self.assertAlmostEqual(self.priorities['k80'][JobIdPair(1, None)],
+                               0.5 / 0.5)
+
+    def test_remove(self):
+        self._update()
+        for worker_type in self.worker_types:
+            del self.priorities[worker_type][JobIdPair(0, 1)]
+        self.table.remove(JobIdPair(0, 1))
+        self.assertNotIn(JobIdPair(0, 1), self.table)
+        self.table.add(JobIdPair(2, None))
+        for worker_type in self.worker_types:
+            self.priorities[worker_type][JobIdPair(2, None)] = 0.0
+        self.job_time_so_far[JobIdPair(2, None)] = {'v100': 0.0, 'k80': 0.0}
+        self._update()
+        self.assertEqual(len(self.table), 3)
+        self.assertNotIn(JobIdPair(0, 1), self.priorities['v100'])
+        self.assertEqual(self.priorities['v100'][JobIdPair(2, None)], 0.0)
+
+if __name__=='__main__':
+    unittest.main()
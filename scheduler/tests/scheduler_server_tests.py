@@ -0,0 +1,119 @@
+import sys; sys.path.append("..")
+from runtime.rpc import scheduler_server
+import iterator_to_scheduler_pb2 as i2s_pb2
+import iterator_to_scheduler_pb2_grpc as i2s_pb2_grpc
+
+import asyncio
+import functools
+import grpc
+import logging
+import threading
+import unittest
+
+ADDRESS = '127.0.0.1:50072'
+NUM_WAITING_JOBS = 200
+
+class FakeScheduler:
+    """Holds every InitJob request until release() is called."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cv = scheduler_server.SchedulerCondition(self._lock)
+        self.released = False
+        self.callback_threads = set()
+
+    def release(self):
+        with self.cv:
+            self.released = True
+            self.cv.notifyAll()
+
+    def init_job(self, job_id, wait=True):
+        self.callback_threads.add(threading.get_ident())
+        with self.cv:
+            while not self.released:
+                if not wait:
+                    return scheduler_server.PendingCallback(
+                        self.cv.add_waiter(),
+                        functools.partial(self.init_job, job_id, wait=False))
+                self.cv.wait()
+            return (100, 60.0, 0.0)
+
+    def update_lease(self, job_id, worker_id, steps, duration, max_steps,
+                     max_duration, gang=False, wait=True):
+        self.callback_threads.add(threading.get_ident())
+        return (max_steps + 100, max_duration + 60.0)
+
+class TestSchedulerCondition(unittest.TestCase):
+
+    def test_add_waiter(self):
+        cv = scheduler_server.SchedulerCondition()
+        with cv:
+            waiter = cv.add_waiter()
+        self.assertFalse(waiter.done())
+        with cv:
+            cv.notifyAll()
+        self.assertTrue(waiter.done())
+        # Waiters are only woken once.
+        with cv:
+            self.assertIsNot(cv.add_waiter(), waiter)
+
+class TestAsyncSchedulerServer(unittest.TestCase):
+
+    def test_pending_callback_timeout(self):
+        cv = scheduler_server.SchedulerCondition()
+        def callback(wait=True):
+            with cv:
+                return scheduler_server.PendingCallback(
+                    cv.add_waiter(), lambda: 'timed out', timeout=0.05)
+        actor = scheduler_server._CallbackActor()
+        # The callback is retried once the timeout expires, even if the
+        # condition variable is never notified.
+        self.assertEqual(asyncio.run(actor.call(callback, wait=False)),
+                         'timed out')
+        with cv:
+            cv.notifyAll()
+
+    def test_waiting_rpcs(self):
+        fake_scheduler = FakeScheduler()
+        callbacks = {
+            'InitJob': fake_scheduler.init_job,
+            'UpdateLease': fake_scheduler.update_lease,
+        }
+        logger = logging.getLogger('scheduler_server_tests')
+        logger.setLevel(logging.WARNING)
+
+        async def run():
+            server = scheduler_server.create_async_server(ADDRESS, callbacks,
+                                                          logger)
+            await server.start()
+            async with grpc.aio.insecure_channel(ADDRESS) as channel:
+                stub = i2s_pb2_grpc.IteratorToSchedulerStub(channel)
+                init_job_calls = [
+                    asyncio.ensure_future(stub.InitJob(
+                        i2s_pb2.InitJobRequest(job_id=i)))
+                    for i in range(NUM_WAITING_JOBS)]
+                while len(fake_scheduler.cv._future_waiters) < \
+                        NUM_WAITING_JOBS:
+                    await asyncio.sleep(0.01)
+
+                # Other RPCs are served while the InitJob RPCs wait.
+                response = await stub.UpdateLease(
+                    i2s_pb2.UpdateLeaseRequest(job_id=0, worker_id=0, steps=10,
+                                               duration=1.0, max_steps=100,
+                                               max_duration=60.0))
+                self.assertEqual(response.max_steps, 200)
+                self.assertFalse(any(call.done() for call in init_job_calls))
+
+                threading.Thread(target=fake_scheduler.release).start()
+                responses = await asyncio.gather(*init_job_calls)
+            await server.stop(0)
+            return responses
+
+        responses = asyncio.run(run())
+        self.assertEqual([response.max_steps for response in responses],
+                         [100] * NUM_WAITING_JOBS)
+        # All callbacks ran on a single thread.
+        self.assertEqual(len(fake_scheduler.callback_threads), 1)
+
+if __name__=='__main__':
+    unittest.main()
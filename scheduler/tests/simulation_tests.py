@@ -0,0 +1,195 @@
+import sys; sys.path.append("..")
+import event_log
+from job_id_pair import JobIdPair
+import scheduler
+import utils
+
+import os
+import tempfile
+import unittest
+
+THROUGHPUTS_FILE = '../simulation_throughputs.json'
+CLUSTER_SPEC = {'v100': 2, 'p100': 2, 'k80': 2}
+
+class TestSimulation(unittest.TestCase):
+
+    def _get_scheduler(self, policy_name, **kwargs):
+        return scheduler.Scheduler(utils.get_policy(policy_name, seed=0),
+                                   throughputs_file=THROUGHPUTS_FILE,
+                                   seed=0, simulate=True, **kwargs)
+
+    def _simulate(self, sched, window_start_callback=None, ideal=False,
+                  fast_forward=False, cluster_spec=CLUSTER_SPEC):
+        jobs_to_complete = set([JobIdPair(i, None) for i in range(4, 6)])
+        sched.simulate(cluster_spec, lam=7200, fixed_job_duration=3600,
+                       jobs_to_complete=jobs_to_complete,
+                       window_start_callback=window_start_callback,
+                       ideal=ideal, fast_forward=fast_forward)
+        if window_start_callback is None or sched.is_done(jobs_to_complete):
+            return sched.get_average_jct(jobs_to_complete, verbose=False)
+        return None
+
+    def test_stop_at_window_start(self):
+        sched = self._get_scheduler('fifo')
+        self.assertIsNone(self._simulate(sched, lambda: False))
+        self.assertEqual(max(sched._jobs.keys()), JobIdPair(4, None))
+        sched.shutdown()
+
+    def test_set_policy_at_window_start(self):
+        sched = self._get_scheduler('max_min_fairness')
+        average_jct = self._simulate(sched)
+        sched.shutdown()
+
+        # Switching to a new instance of the same (deterministic) policy does
+        # not change the simulation.
+        sched = self._get_scheduler('max_min_fairness')
+        def set_policy():
+            sched.set_policy(utils.get_policy('max_min_fairness'))
+            return True
+        self.assertEqual(self._simulate(sched, set_policy), average_jct)
+        sched.shutdown()
+
+    def test_set_policy_with_different_job_packing(self):
+        sched = self._get_scheduler('max_min_fairness')
+        with self.assertRaises(ValueError):
+            sched.set_policy(utils.get_policy('max_min_fairness_packed'))
+        sched.shutdown()
+
+    def _assert_job_pairs_consistent(self, sched):
+        pairs = set([job_id for job_id in sched._throughputs
+                     if job_id.is_pair()])
+        self.assertEqual(set(sched._job_pairs.keys()),
+                         set(sched._jobs.keys()))
+        for job_id in sched._jobs:
+            self.assertEqual(set(sched._job_pairs[job_id]),
+                             set([pair for pair in pairs
+                                  if job_id in pair.singletons()]))
+
+    def test_job_pairs(self):
+        sched = self._get_scheduler('max_min_fairness_packed')
+        self._simulate(sched)
+        # Some jobs have completed and been removed.
+        self.assertLess(len(sched._jobs), max(sched._jobs.keys())[0] + 1)
+        self.assertGreater(len(sched._jobs), 1)
+        self.assertTrue(any(sched._job_pairs.values()))
+        self._assert_job_pairs_consistent(sched)
+        for job_id in sorted(sched._jobs.keys()):
+            sched.remove_job(job_id)
+            self._assert_job_pairs_consistent(sched)
+        self.assertEqual(sched._job_pairs, {})
+        self.assertEqual(len(sched._throughputs), 0)
+        sched.shutdown()
+
+    def test_event_log(self):
+        sched = self._get_scheduler('max_min_fairness')
+        average_jct = self._simulate(sched)
+        sched.shutdown()
+
+        with tempfile.TemporaryDirectory() as directory:
+            event_log_file = os.path.join(directory, 'simulation.events')
+            sched = self._get_scheduler('max_min_fairness',
+                                        event_log_file=event_log_file)
+            # Recording events does not change the simulation.
+            self.assertEqual(self._simulate(sched), average_jct)
+            sched.shutdown()
+
+            records = event_log.read_event_log(event_log_file)
+            job_ids = records[records['event_type'] ==
+                              event_log.JOB_ARRIVAL]['job_id']
+            self.assertEqual(list(job_ids), list(range(len(job_ids))))
+            for event_type in [event_log.MICRO_TASK_SCHEDULED,
+                               event_log.MICRO_TASK_SUCCEEDED,
+                               event_log.ALLOCATION_CHANGE]:
+                self.assertGreater(
+                    (records['event_type'] == event_type).sum(), 0)
+            durations = {}
+            for record in records[records['event_type'] ==
+                                  event_log.JOB_SUCCEEDED]:
+                durations[int(record['job_id'])] = record['value1']
+            self.assertAlmostEqual((durations[4] + durations[5]) / 2.0,
+                                   average_jct)
+
+    def test_asynchronous_allocation(self):
+        sched = self._get_scheduler('max_min_fairness')
+        average_jct = self._simulate(sched)
+        sched.shutdown()
+
+        # Without latency, computing allocations asynchronously does not
+        # change the simulation.
+        sched = self._get_scheduler('max_min_fairness',
+                                    asynchronous_allocation=True,
+                                    allocation_latency=0.0)
+        self.assertEqual(self._simulate(sched), average_jct)
+        sched.shutdown()
+
+        # With a configured latency, allocations are applied later, but the
+        # simulation is still deterministic.
+        average_jcts = []
+        for _ in range(2):
+            sched = self._get_scheduler('max_min_fairness',
+                                        asynchronous_allocation=True,
+                                        allocation_latency=60.0)
+            average_jcts.append(self._simulate(sched))
+            sched.shutdown()
+        self.assertNotEqual(average_jcts[0], average_jct)
+        self.assertEqual(average_jcts[0], average_jcts[1])
+
+    def test_asynchronous_allocation_requires_simulation(self):
+        with self.assertRaises(ValueError):
+            scheduler.Scheduler(utils.get_policy('max_min_fairness'),
+                                throughputs_file=THROUGHPUTS_FILE,
+                                simulate=False, asynchronous_allocation=True)
+
+    def test_ideal(self):
+        # Jobs run continuously at the rate given by their allocation, so
+        # with FIFO every job takes exactly its (fixed) duration.
+        sched = self._get_scheduler('fifo')
+        self.assertAlmostEqual(self._simulate(sched, ideal=True), 3600.0)
+        self.assertEqual(len(sched._running_jobs), 0)
+        sched.shutdown()
+
+        sched = self._get_scheduler('max_min_fairness',
+                                    asynchronous_allocation=True)
+        with self.assertRaises(ValueError):
+            self._simulate(sched, ideal=True)
+        sched.shutdown()
+
+    def test_fast_forward(self):
+        # Policies with fractional allocations fast-forward rounds while
+        # every allocated job combination is running, e.g., on a homogeneous
+        # cluster with fewer jobs than workers.
+        for (policy_name, cluster_spec) in [
+                ('fifo', CLUSTER_SPEC),
+                ('max_min_fairness', {'v100': 4}),
+                ('max_min_fairness_packed', CLUSTER_SPEC),
+                ('finish_time_fairness_perf', CLUSTER_SPEC)]:
+            results = []
+            for fast_forward in [False, True]:
+                sched = self._get_scheduler(policy_name)
+                average_jct = self._simulate(sched, fast_forward=fast_forward,
+                                             cluster_spec=cluster_spec)
+                results.append((average_jct, sched.get_current_timestamp(),
+                                sched.get_cluster_utilization(),
+                                sched._num_lease_extensions,
+                                sched._num_lease_extension_opportunities,
+                                sched._worker_type_shuffler.random()))
+                num_fast_forwarded_rounds = sched._num_fast_forwarded_rounds
+                sched.shutdown()
+            # Skipping rounds does not change the simulation.
+            self.assertEqual(results[0], results[1])
+            self.assertGreater(num_fast_forwarded_rounds, 0)
+
+    def test_throughput_estimation(self):
+        sched = self._get_scheduler('max_min_fairness_packed',
+                                    profiling_percentage=0.5,
+                                    num_reference_models=16)
+        self.assertIsNotNone(self._simulate(sched))
+        # Reference job types are refined at the start of every round.
+        self.assertEqual(len(sched._pending_reference_job_profiles), 0)
+        for job_id in sched._jobs:
+            self.assertIn(sched._reference_job_map[job_id],
+                          sched._throughput_estimator._reference_job_types)
+        sched.shutdown()
+
+if __name__=='__main__':
+    unittest.main()
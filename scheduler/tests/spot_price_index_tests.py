@@ -0,0 +1,87 @@
+import sys; sys.path.append("..")
+from spot_price_index import PriceSeries, SpotPriceIndex
+
+from datetime import datetime
+import unittest
+
+def aws_record(instance_type, zone, timestamp, price):
+    return {
+        'InstanceType': instance_type,
+        'AvailabilityZone': zone,
+        'Timestamp': timestamp,
+        'SpotPrice': price,
+    }
+
+class TestSpotPriceIndex(unittest.TestCase):
+
+    def setUp(self):
+        aws_spot_prices = {
+            'p3.2xlarge': [
+                aws_record('p3.2xlarge', 'a', '2019-01-01T00:10:00.000Z',
+                           '0.9'),
+                aws_record('p3.2xlarge', 'a', '2019-01-01T00:00:00.000Z',
+                           '1.0'),
+                aws_record('p3.2xlarge', 'b', '2019-01-01T00:05:00.000Z',
+                           '0.95'),
+            ],
+            'p2.xlarge': [
+                aws_record('p2.xlarge', 'a', '2019-01-01T00:00:00.000Z',
+                           '0.3'),
+                aws_record('p2.xlarge', 'a', '2019-01-01T01:00:00.000Z',
+                           '0.2'),
+            ],
+        }
+        azure_spot_prices = {}
+        for instance_type in ['NC6', 'NC6s v2', 'NC6s v3']:
+            azure_spot_prices[instance_type] = {
+                'east': [(datetime(2019, 1, 1), '$0.5'),
+                         (datetime(2019, 1, 2), '$0.7')],
+                'west': [(datetime(2019, 1, 1), ''),
+                         (datetime(2019, 1, 3), '$0.4')],
+            }
+        self.per_instance_type_spot_prices = {
+            'aws': aws_spot_prices,
+            'azure': azure_spot_prices,
+            'gcp': {'v100': 0.74, 'p100': 0.43, 'k80': 0.135},
+        }
+
+    def test_price_series(self):
+        series = PriceSeries([10.0, 0.0, 10.0, 20.0], [3.0, 1.0, 2.0, 4.0])
+        self.assertEqual(series.get_price(-5.0), 1.0)
+        self.assertEqual(series.get_price(5.0), 1.0)
+        # Later records with equal timestamps take precedence.
+        self.assertEqual(series.get_price(10.0), 2.0)
+        self.assertEqual(series.get_price(100.0), 4.0)
+
+        other_series = PriceSeries([5.0, 15.0], [1.5, 0.5])
+        minimum = PriceSeries.minimum([series, other_series])
+        for current_time in [0.0, 5.0, 10.0, 15.0, 20.0, 25.0]:
+            self.assertEqual(minimum.get_price(current_time),
+                             min(series.get_price(current_time),
+                                 other_series.get_price(current_time)))
+
+    def test_aws(self):
+        index = SpotPriceIndex(self.per_instance_type_spot_prices, ['aws'])
+        self.assertEqual(index.get_latest_price('v100', 0), 0.95)
+        self.assertEqual(index.get_latest_price('v100', 600), 0.9)
+        self.assertEqual(index.get_latest_price('k80', 0), 0.3)
+        self.assertEqual(index.get_latest_price('k80', 3600), 0.2)
+        self.assertAlmostEqual(index.get_latest_price('p100', 3600), 0.3)
+
+    def test_azure(self):
+        index = SpotPriceIndex(self.per_instance_type_spot_prices, ['azure'])
+        self.assertEqual(index.get_latest_price('k80', 0), 0.4)
+        self.assertEqual(index.get_latest_price('k80', 86400), 0.4)
+        self.assertEqual(index.get_latest_price('k80', 2 * 86400), 0.4)
+        self.assertEqual(
+            index.get_price_series('azure', 'k80', 'east').get_price(86400),
+            0.7)
+
+    def test_multiple_clouds(self):
+        index = SpotPriceIndex(self.per_instance_type_spot_prices,
+                               ['aws', 'gcp'])
+        self.assertEqual(index.get_latest_price('v100', 0), 0.74)
+        self.assertEqual(index.get_latest_price('k80', 3600), 0.135)
+
+if __name__=='__main__':
+    unittest.main()
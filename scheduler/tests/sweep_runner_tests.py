@@ -0,0 +1,98 @@
+import sys; sys.path.append("..")
+sys.path.append("../scripts/sweeps")
+import sweep_runner
+
+import json
+import os
+import tempfile
+import unittest
+
+def _simulate(value, timed_out=False):
+    return {'average_jct': value, 'timed_out': timed_out}
+
+class TestSweepRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.throughputs_file = os.path.join(self.directory.name,
+                                             'throughputs.json')
+        with open(self.throughputs_file, 'w') as f:
+            json.dump({}, f)
+        self.results_dir = os.path.join(self.directory.name, 'results')
+        self.summary_file = os.path.join(self.directory.name, 'summary.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _get_config(self, policy='fifo', lam=3600.0, seed=0):
+        return {'policy': policy, 'cluster_spec': '1:1:1', 'lam': lam,
+                'seed': seed}
+
+    def _read_summary(self):
+        with open(self.summary_file, 'r') as f:
+            return [json.loads(line) for line in f]
+
+    def test_key(self):
+        result_store = sweep_runner.ResultStore(self.results_dir,
+                                                self.throughputs_file)
+        key = result_store.get_key(self._get_config())
+        self.assertEqual(key, result_store.get_key(self._get_config()))
+        self.assertNotEqual(key,
+                            result_store.get_key(self._get_config(seed=1)))
+        # Results are keyed by the contents of the throughputs file.
+        with open(self.throughputs_file, 'w') as f:
+            json.dump({'v100': {}}, f)
+        other_result_store = sweep_runner.ResultStore(self.results_dir,
+                                                      self.throughputs_file)
+        self.assertNotEqual(key,
+                            other_result_store.get_key(self._get_config()))
+
+    def test_runtime_estimates(self):
+        result_store = sweep_runner.ResultStore(self.results_dir,
+                                                self.throughputs_file)
+        config = self._get_config()
+        estimate_runtime = result_store.get_runtime_estimator()
+        self.assertIsNone(estimate_runtime(config, 1.0))
+        result_store.put(config, 1.0, _simulate(1.0), 10.0)
+        estimate_runtime = result_store.get_runtime_estimator()
+        self.assertEqual(estimate_runtime(config, 1.0), 10.0)
+        # Scaled by size for unseen configurations of the same policy.
+        self.assertEqual(estimate_runtime(self._get_config(lam=1800.0), 2.0),
+                         20.0)
+        self.assertIsNone(estimate_runtime(self._get_config(policy='max_min'),
+                                           1.0))
+
+    def test_run_experiments(self):
+        result_store = sweep_runner.ResultStore(self.results_dir,
+                                                self.throughputs_file)
+        experiments = [
+            sweep_runner.Experiment(configs=[self._get_config(seed=seed)],
+                                    size=1.0, simulate_fn=_simulate,
+                                    args=(float(seed),))
+            for seed in range(3)
+        ]
+        experiments.append(
+            sweep_runner.Experiment(configs=[self._get_config(seed=3)],
+                                    size=1.0, simulate_fn=_simulate,
+                                    args=(float('inf'), True)))
+        sweep_runner.run_experiments(experiments, result_store,
+                                     self.summary_file, processes=2)
+        summary = self._read_summary()
+        self.assertEqual([x['seed'] for x in summary], [0, 1, 2])
+        self.assertEqual([x['average_jct'] for x in summary], [0.0, 1.0, 2.0])
+
+        # Completed configurations are not run again.
+        experiments = [
+            sweep_runner.Experiment(configs=[self._get_config(seed=seed)],
+                                    size=1.0, simulate_fn=_simulate,
+                                    args=(-1.0,))
+            for seed in range(4)
+        ]
+        sweep_runner.run_experiments(experiments, result_store,
+                                     self.summary_file, processes=2)
+        summary = self._read_summary()
+        self.assertEqual([x['average_jct'] for x in summary],
+                         [0.0, 1.0, 2.0, -1.0])
+
+if __name__=='__main__':
+    unittest.main()
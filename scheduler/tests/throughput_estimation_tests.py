@@ -1,5 +1,6 @@
 import sys; sys.path.append("..")
 from throughput_estimator import ThroughputEstimator
+from throughput_oracle import ThroughputOracle
 from job_table import JobTable
 import utils
 
@@ -58,5 +59,50 @@ class TestThroughputEstimator(unittest.TestCase):
             reference_models.add(predicted_job_type)
         assert(len(reference_models) <= num_reference_models)
 
+class TestBatchedThroughputEstimation(unittest.TestCase):
+
+    def setUp(self):
+        self._oracle_throughputs = \
+            ThroughputOracle.load('../simulation_throughputs.json')
+        self._worker_types = ['k80', 'p100', 'v100']
+        self._job_types = [(JobTable[i].model, 1) for i in range(len(JobTable))]
+
+    def _get_estimator(self, num_reference_models, profiling_percentage):
+        return ThroughputEstimator(self._oracle_throughputs,
+                                   self._worker_types, self._job_types,
+                                   num_reference_models,
+                                   profiling_percentage)
+
+    def test_no_estimation(self):
+        estimator = self._get_estimator(len(self._job_types), 1.0)
+        profiles = [estimator.profile_job(job_type)
+                    for job_type in self._job_types]
+        self.assertEqual(estimator.match_jobs_to_reference_jobs(profiles),
+                         self._job_types)
+        for profile in profiles:
+            self.assertEqual(estimator.get_provisional_reference_job(profile),
+                             profile.job_type)
+
+    def test_batched_estimation(self):
+        num_reference_models = 16
+        estimator = self._get_estimator(num_reference_models, 0.6)
+        profiles = [estimator.profile_job(job_type)
+                    for job_type in self._job_types]
+        reference_job_types = set(estimator._reference_job_types)
+        for profile in profiles:
+            self.assertIn(estimator.get_provisional_reference_job(profile),
+                          reference_job_types)
+        predicted_job_types = estimator.match_jobs_to_reference_jobs(profiles)
+        self.assertEqual(len(predicted_job_types), len(profiles))
+        for predicted_job_type in predicted_job_types:
+            self.assertIn(predicted_job_type, reference_job_types)
+
+        # Matches are cached by job type and profiling mask.
+        self.assertEqual(estimator.match_jobs_to_reference_jobs(profiles[::-1]),
+                         predicted_job_types[::-1])
+        for profile, predicted_job_type in zip(profiles, predicted_job_types):
+            self.assertEqual(estimator.get_provisional_reference_job(profile),
+                             predicted_job_type)
+
 if __name__=='__main__':
     unittest.main()
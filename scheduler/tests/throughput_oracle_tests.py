@@ -0,0 +1,77 @@
+import sys; sys.path.append("..")
+from throughput_oracle import ThroughputOracle
+import utils
+
+import json
+import os
+import tempfile
+import unittest
+
+class TestThroughputOracle(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.throughputs_file = os.path.join(self.directory.name,
+                                             'throughputs.json')
+        self.job_types = [('A', 1), ('B', 1), ('C', 2)]
+        raw_throughputs = {
+            'v100': {
+                "('A', 1)": {'null': 4.0, "('A', 1)": [1.5, 1.5],
+                             "('B', 1)": [2.0, 1.0]},
+                "('B', 1)": {'null': 2.0, "('A', 1)": [1.0, 2.0],
+                             "('B', 1)": [0.5, 0.5]},
+                "('C', 2)": {'null': 1.0},
+            },
+            'k80': {
+                "('A', 1)": {'null': 1.0},
+            },
+        }
+        with open(self.throughputs_file, 'w') as f:
+            json.dump(raw_throughputs, f)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lookups(self):
+        oracle = ThroughputOracle.compile(self.throughputs_file)
+        self.assertEqual(oracle.worker_types, ['v100', 'k80'])
+        self.assertEqual(oracle.job_types, self.job_types)
+        self.assertEqual(oracle.get_isolated_throughput('v100', ('B', 1)), 2.0)
+        self.assertEqual(
+            oracle.get_colocated_throughputs('v100', ('A', 1), ('B', 1)),
+            [2.0, 1.0])
+        with self.assertRaises(KeyError):
+            oracle.get_isolated_throughput('k80', ('B', 1))
+        with self.assertRaises(KeyError):
+            oracle.get_colocated_throughputs('v100', ('A', 1), ('C', 2))
+
+    def test_matches_json(self):
+        oracle = ThroughputOracle.compile(self.throughputs_file)
+        throughputs = utils.read_all_throughputs_json_v2(self.throughputs_file)
+        self.assertEqual(
+            {worker_type: {job_type: dict(oracle[worker_type][job_type])
+                           for job_type in oracle[worker_type]}
+             for worker_type in oracle},
+            throughputs)
+        self.assertTrue(('C', 2) in oracle['v100'])
+        self.assertFalse(('C', 2) in oracle['k80'])
+
+    def test_cache(self):
+        oracle = ThroughputOracle.load(self.throughputs_file)
+        self.assertTrue(os.path.exists(self.throughputs_file + '.oracle.npy'))
+        cached_oracle = ThroughputOracle.load(self.throughputs_file)
+        self.assertEqual(cached_oracle.job_types, oracle.job_types)
+        self.assertEqual(
+            cached_oracle.get_colocated_throughputs('v100', ('B', 1),
+                                                    ('A', 1)),
+            [1.0, 2.0])
+
+        # Changing the source file invalidates the cache.
+        with open(self.throughputs_file, 'w') as f:
+            json.dump({'v100': {"('A', 1)": {'null': 3.0}}}, f)
+        os.utime(self.throughputs_file, ns=(0, 0))
+        oracle = ThroughputOracle.load(self.throughputs_file)
+        self.assertEqual(oracle.get_isolated_throughput('v100', ('A', 1)), 3.0)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import sys; sys.path.append("..")
+from arrival_queue import ArrivalQueue
+from job import Job
+import utils
+
+import os
+import tempfile
+import unittest
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.trace = [
+            (Job(None, 'ResNet-18 (batch size 64)', 'python3 main.py',
+                 'image_classification', '--num_steps', 1000, None,
+                 scale_factor=1, priority_weight=1, SLO=None,
+                 needs_data_dir=True), 0.0),
+            (Job(None, 'LM (batch size 20)', 'python main.py', 'language',
+                 '--steps', 500, None, scale_factor=4, priority_weight=5,
+                 SLO=1.5), 12.5),
+            (Job(None, 'ResNet-18 (batch size 64)', 'python3 main.py',
+                 'image_classification', '--num_steps', 250, None), 30.0),
+        ]
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _check_trace(self, trace):
+        trace = list(trace)
+        self.assertEqual(len(trace), len(self.trace))
+        for (job, arrival_time), (expected_job, expected_arrival_time) in \
+            zip(trace, self.trace):
+            self.assertEqual(vars(job), vars(expected_job))
+            self.assertEqual(arrival_time, expected_arrival_time)
+
+    def test_read_trace(self):
+        trace_file = os.path.join(self.directory.name, 'test.trace')
+        with open(trace_file, 'w') as f:
+            for job, arrival_time in self.trace:
+                f.write('%s\t%f\n' % (str(job), arrival_time))
+        self._check_trace(utils.read_trace(trace_file))
+        jobs, arrival_times = utils.parse_trace(trace_file)
+        self._check_trace(zip(jobs, arrival_times))
+
+    def test_binary_trace(self):
+        trace_file = os.path.join(self.directory.name,
+                                  'test' + utils.BINARY_TRACE_SUFFIX)
+        utils.write_binary_trace(self.trace, trace_file)
+        self._check_trace(utils.read_trace(trace_file))
+
+    def test_arrival_queue(self):
+        num_jobs_read = []
+        def trace():
+            for i, (job, arrival_time) in enumerate(self.trace):
+                num_jobs_read.append(i)
+                yield job, arrival_time
+        queue = ArrivalQueue(trace())
+        self.assertEqual(len(num_jobs_read), 0)
+        self.assertEqual(queue.peek()[0], 0.0)
+        self.assertEqual(queue.pop()[0], 0.0)
+        # Only the head of the queue is read from the trace.
+        self.assertEqual(queue.peek()[0], 12.5)
+        self.assertEqual(len(num_jobs_read), 2)
+        queue.pop()
+        queue.pop()
+        self.assertEqual(len(queue), 0)
+
+if __name__=='__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import collections
 import copy
 import json
 import matrix_completion
@@ -9,9 +10,22 @@ import warnings
 DEFAULT_MATRIX_COMPLETION_K = 10
 DEFAULT_MATRIX_COMPLETION_MU = 1e-2
 
+# The normalized throughputs measured when profiling a job of type job_type
+# against the reference job types, and the mask of which were measured.
+JobProfile = collections.namedtuple('JobProfile',
+                                    ['job_type', 'throughputs', 'mask'])
+
 def cosine_distance(a, b):
     return 1.0 - np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
+def _cosine_distances(a, b):
+    """Returns the cosine distance between every row of a and every row of
+    b (NaN for rows with a norm of 0)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1.0 - (np.dot(a, b.T) /
+                      np.outer(np.linalg.norm(a, axis=1),
+                               np.linalg.norm(b, axis=1)))
+
 class ThroughputEstimator:
     def __init__(self, oracle_throughputs, worker_types, job_types,
                  num_reference_job_types, profiling_percentage, seed=0,
@@ -27,6 +41,8 @@ class ThroughputEstimator:
         self._get_normalized_throughputs()
         self._get_reference_throughputs(num_reference_job_types)
         self._verbose = verbose
+        # Map from (job type, profiling mask) to matched reference job type.
+        self._reference_job_cache = {}
 
     def _get_normalized_throughputs(self):
         m = self._m
@@ -66,46 +82,71 @@ class ThroughputEstimator:
             assert((self._normalized_throughputs == \
                     self._reference_throughputs).all())
 
-    def _profile_jobs(self, true_job_type):
+    def profile_job(self, true_job_type):
+        """Profiles a job against a random subset of the reference job types.
+
+        Returns a JobProfile.
+        """
         true_job_type_idx = self._job_types.index(true_job_type)
-        profiled_jobs = {}
+        throughputs = np.zeros(self._reference_throughputs.shape[1],
+                               dtype=np.float32)
+        mask = np.zeros(self._reference_throughputs.shape[1],
+                        dtype=np.float32)
         for i, worker_type in enumerate(self._worker_types):
-            profiled_jobs[worker_type] = {}
             for j, reference_job_type in enumerate(self._reference_job_types):
                 r = self._rng.uniform(0, 1)
                 if r <= self._profiling_percentage:
                     offset = i * len(self._reference_job_types) + j
-                    profiled_jobs[worker_type][reference_job_type] = \
+                    throughputs[offset] = \
                         self._normalized_throughputs[true_job_type_idx][offset]
-        return profiled_jobs
+                    mask[offset] = 1
+        return JobProfile(true_job_type, throughputs, mask)
 
-    def match_job_to_reference_job(self, true_job_type):
-        """Uses matrix completion to match a job to a reference job type.
+    def _get_cache_key(self, profile):
+        return (profile.job_type, profile.mask.tobytes())
 
-        Uses a subset of measured data points to match an unseen job to
-        a reference job type measured offline.
+    def get_provisional_reference_job(self, profile):
+        """Cheaply matches a profiled job to a reference job type.
+
+        Returns the cached match for the job's type and profiling mask if
+        there is one, and otherwise the reference job type closest to the
+        measured data points alone (without matrix completion).
         """
-        profiled_jobs = self._profile_jobs(true_job_type)
+        cache_key = self._get_cache_key(profile)
+        if cache_key in self._reference_job_cache:
+            return self._reference_job_cache[cache_key]
+        distances = _cosine_distances(
+            np.multiply(self._reference_throughputs, profile.mask),
+            profile.throughputs[np.newaxis])[:,0]
+        if np.isnan(distances).all():
+            return self._rng.choice(self._reference_job_types)
+        return self._reference_job_types[np.nanargmin(distances)]
 
-        # Initialize the throughputs matrix using the pre-measured
-        # reference throughputs.
-        throughputs_matrix = np.zeros((self._reference_throughputs.shape[0] + 1,
-                                       self._reference_throughputs.shape[1]),
-                                       dtype=np.float32)
-        throughputs_matrix[:-1,:] = self._reference_throughputs
+    def _complete_and_match(self, profiles):
+        """Uses matrix completion to match profiled jobs to reference job
+        types, completing the throughputs of all jobs in a single
+        factorization.
 
-        # Initialize the mask, setting the mask of all pre-measured values to 1.
-        mask = np.zeros(throughputs_matrix.shape, dtype=np.float32)
-        mask[:-1,:] = 1
+        Returns the matched reference job type for each profile, or None if
+        its throughputs could not be estimated.
+        """
+        num_reference_job_types = self._reference_throughputs.shape[0]
 
-        # Fill in measured data points.
-        for i, worker_type in enumerate(sorted(profiled_jobs.keys())):
-            for j, reference_job_type in enumerate(self._reference_job_types):
-                if reference_job_type in profiled_jobs[worker_type]:
-                    offset = i * len(self._reference_job_types) + j
-                    throughputs_matrix[-1][offset] = \
-                        profiled_jobs[worker_type][reference_job_type]
-                    mask[-1][offset] = 1
+        # Initialize the throughputs matrix using the pre-measured
+        # reference throughputs and the measured data points of each job,
+        # and the mask accordingly.
+        throughputs_matrix = \
+            np.zeros((num_reference_job_types + len(profiles),
+                      self._reference_throughputs.shape[1]),
+                     dtype=np.float32)
+        throughputs_matrix[:num_reference_job_types] = \
+            self._reference_throughputs
+        mask = np.zeros(throughputs_matrix.shape, dtype=np.float32)
+        mask[:num_reference_job_types] = 1
+        for i, profile in enumerate(profiles):
+            throughputs_matrix[num_reference_job_types + i] = \
+                profile.throughputs
+            mask[num_reference_job_types + i] = profile.mask
 
         if np.min(mask) == 0:
             # Run matrix completion algorithm if there are values to estimate.
@@ -116,36 +157,85 @@ class ThroughputEstimator:
                 try:
                     estimated_throughputs = \
                         matrix_completion.pmf_solve(throughputs_matrix,
-                                                    mask, k=k, mu=mu),
+                                                    mask, k=k, mu=mu)
                     throughputs_matrix = \
                         np.where(mask, throughputs_matrix,
-                                 np.clip(estimated_throughputs, 0, 1))[0]
+                                 np.clip(estimated_throughputs, 0, 1))
                 except np.linalg.LinAlgError as e:
                     if self._verbose:
                         print('WARNING: could not estimate throughputs!',
                               file=sys.stderr)
                         print(e, file=sys.stderr)
-                    return self._rng.choice(self._reference_job_types)
+                    return [None] * len(profiles)
         else:
             if self._verbose:
                 print('WARNING: Did not run matrix completion as '
                       'mask is complete', file=sys.stderr)
 
-        # Measure the distance from the new row to every other row and find
-        # the row with the smallest distance.
-        distances = []
-        if np.linalg.norm(throughputs_matrix[-1]) == 0:
-            if self._verbose:
-                print('WARNING: Norm of predicted throughputs is 0!')
-            return self._rng.choice(self._reference_job_types)
-        for i, reference_job_type in enumerate(self._reference_job_types):
-            distance = cosine_distance(throughputs_matrix[i],
-                                       throughputs_matrix[-1])
-            distances.append((reference_job_type, distance))
-        distances.sort(key=lambda x: x[1])
-        predicted_job_type = distances[0][0]
-
-        return predicted_job_type
+        # Measure the distance from each new row to every reference row and
+        # find the reference row with the smallest distance.
+        distances = \
+            _cosine_distances(throughputs_matrix[num_reference_job_types:],
+                              throughputs_matrix[:num_reference_job_types])
+        predicted_job_types = []
+        for i in range(len(profiles)):
+            if np.isnan(distances[i]).all():
+                if self._verbose:
+                    print('WARNING: Norm of predicted throughputs is 0!')
+                predicted_job_types.append(None)
+            else:
+                predicted_job_types.append(
+                    self._reference_job_types[np.nanargmin(distances[i])])
+        return predicted_job_types
+
+    def match_jobs_to_reference_jobs(self, profiles):
+        """Matches a batch of profiled jobs to reference job types.
+
+        Matches are cached by job type and profiling mask; the remaining
+        jobs are matched using a single matrix completion (see
+        _complete_and_match). Jobs whose throughputs cannot be estimated are
+        matched to a random reference job type.
+
+        Args:
+          profiles: A list of JobProfiles.
+
+        Returns:
+          A list with the matched reference job type of each profile.
+        """
+        predicted_job_types = [None] * len(profiles)
+        uncached_profile_idxs = collections.OrderedDict()
+        for i, profile in enumerate(profiles):
+            cache_key = self._get_cache_key(profile)
+            if cache_key in self._reference_job_cache:
+                predicted_job_types[i] = self._reference_job_cache[cache_key]
+            else:
+                if cache_key not in uncached_profile_idxs:
+                    uncached_profile_idxs[cache_key] = []
+                uncached_profile_idxs[cache_key].append(i)
+        if len(uncached_profile_idxs) == 0:
+            return predicted_job_types
+
+        uncached_profiles = [profiles[idxs[0]]
+                             for idxs in uncached_profile_idxs.values()]
+        matched_job_types = self._complete_and_match(uncached_profiles)
+        for cache_key, matched_job_type in zip(uncached_profile_idxs,
+                                               matched_job_types):
+            if matched_job_type is None:
+                matched_job_type = self._rng.choice(self._reference_job_types)
+            else:
+                self._reference_job_cache[cache_key] = matched_job_type
+            for i in uncached_profile_idxs[cache_key]:
+                predicted_job_types[i] = matched_job_type
+        return predicted_job_types
+
+    def match_job_to_reference_job(self, true_job_type):
+        """Uses matrix completion to match a job to a reference job type.
+
+        Uses a subset of measured data points to match an unseen job to
+        a reference job type measured offline.
+        """
+        profile = self.profile_job(true_job_type)
+        return self.match_jobs_to_reference_jobs([profile])[0]
 
     def get_reference_throughputs(self):
         m = self._m
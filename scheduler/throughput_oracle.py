@@ -0,0 +1,251 @@
+import collections.abc
+import json
+import math
+import numpy as np
+import os
+
+import utils
+
+# Suffixes of the compiled oracle cache files, appended to the path of the
+# throughputs JSON file they were compiled from.
+CACHE_TENSOR_SUFFIX = '.oracle.npy'
+CACHE_METADATA_SUFFIX = '.oracle.json'
+
+class _JobTypeView(collections.abc.Mapping):
+    """Read-only map from co-located job type (or 'null') to oracle
+    throughput(s) for a single job type on a single worker type."""
+
+    def __init__(self, oracle, worker_type_idx, job_type_idx):
+        self._oracle = oracle
+        self._worker_type_idx = worker_type_idx
+        self._job_type_idx = job_type_idx
+
+    def __getitem__(self, other_job_type):
+        oracle = self._oracle
+        row = oracle._get_row(self._worker_type_idx, self._job_type_idx)
+        if other_job_type == 'null':
+            return row[oracle._null_idx][0]
+        throughputs = row[oracle._job_type_indices[other_job_type]]
+        if math.isnan(throughputs[0]):
+            raise KeyError(other_job_type)
+        return list(throughputs)
+
+    def __iter__(self):
+        oracle = self._oracle
+        yield 'null'
+        other_job_type_idxs = np.flatnonzero(
+            ~np.isnan(oracle._throughputs[self._worker_type_idx,
+                                          self._job_type_idx,
+                                          :oracle._null_idx, 0]))
+        for other_job_type_idx in other_job_type_idxs:
+            yield oracle._job_types[other_job_type_idx]
+
+    def __len__(self):
+        return 1 + int(np.count_nonzero(
+            ~np.isnan(self._oracle._throughputs[self._worker_type_idx,
+                                                self._job_type_idx,
+                                                :self._oracle._null_idx, 0])))
+
+class _WorkerTypeView(collections.abc.Mapping):
+    """Read-only map from job type to oracle throughputs for a single
+    worker type."""
+
+    def __init__(self, oracle, worker_type_idx):
+        self._oracle = oracle
+        self._worker_type_idx = worker_type_idx
+
+    def __getitem__(self, job_type):
+        oracle = self._oracle
+        job_type_idx = oracle._job_type_indices[job_type]
+        row = oracle._get_row(self._worker_type_idx, job_type_idx)
+        if math.isnan(row[oracle._null_idx][0]):
+            raise KeyError(job_type)
+        return _JobTypeView(oracle, self._worker_type_idx, job_type_idx)
+
+    def __iter__(self):
+        oracle = self._oracle
+        job_type_idxs = np.flatnonzero(
+            ~np.isnan(oracle._throughputs[self._worker_type_idx, :,
+                                          oracle._null_idx, 0]))
+        for job_type_idx in job_type_idxs:
+            yield oracle._job_types[job_type_idx]
+
+    def __len__(self):
+        oracle = self._oracle
+        return int(np.count_nonzero(
+            ~np.isnan(oracle._throughputs[self._worker_type_idx, :,
+                                          oracle._null_idx, 0])))
+
+class ThroughputOracle(collections.abc.Mapping):
+    """Pre-measured throughputs compiled into a dense NumPy tensor.
+
+    Throughputs are stored in a tensor indexed by
+    [worker_type, job_type, co-located job_type or null, 2], where job types
+    are (model, scale_factor) tuples assigned an integer index and the null
+    column (the last one) holds the isolated throughput in its first entry.
+    Missing measurements are stored as NaN.
+
+    The oracle can be indexed like the nested dict returned by
+    utils.read_all_throughputs_json_v2 (i.e.,
+    oracle[worker_type][job_type]['null']), but hot paths should use
+    get_isolated_throughput and get_colocated_throughputs, which skip the
+    intermediate views.
+    """
+
+    def __init__(self, worker_types, job_types, throughputs):
+        """
+        Args:
+          worker_types: A list of worker types.
+          job_types: A list of (model, scale_factor) tuples.
+          throughputs: A NumPy array of shape
+                       [len(worker_types), len(job_types),
+                        len(job_types) + 1, 2].
+        """
+        assert(throughputs.shape == (len(worker_types), len(job_types),
+                                     len(job_types) + 1, 2))
+        self._worker_types = list(worker_types)
+        self._job_types = [tuple(job_type) for job_type in job_types]
+        self._throughputs = throughputs
+        self._worker_type_indices = \
+            {worker_type: i for i, worker_type in enumerate(self._worker_types)}
+        self._job_type_indices = \
+            {job_type: i for i, job_type in enumerate(self._job_types)}
+        self._null_idx = len(self._job_types)
+        # Rows of the tensor converted to Python lists on first use, keyed
+        # by (worker_type index, job_type index); element-wise NumPy
+        # indexing is much slower than list indexing on the simulator's hot
+        # paths.
+        self._rows = {}
+
+    def _get_row(self, worker_type_idx, job_type_idx):
+        row = self._rows.get((worker_type_idx, job_type_idx))
+        if row is None:
+            row = self._throughputs[worker_type_idx, job_type_idx].tolist()
+            self._rows[(worker_type_idx, job_type_idx)] = row
+        return row
+
+    @classmethod
+    def compile(cls, throughputs_file):
+        """Compiles a throughputs JSON file into an oracle."""
+        with open(throughputs_file, 'r') as f:
+            raw_throughputs = json.load(f)
+        worker_types = list(raw_throughputs.keys())
+        job_types = []
+        job_type_indices = {}
+        for worker_type in worker_types:
+            for job_type_str in raw_throughputs[worker_type]:
+                if job_type_str not in job_type_indices:
+                    job_type = utils.parse_job_type_tuple(job_type_str)
+                    assert(job_type is not None)
+                    job_type_indices[job_type_str] = len(job_types)
+                    job_types.append(job_type)
+        null_idx = len(job_types)
+        throughputs = np.full((len(worker_types), len(job_types),
+                               len(job_types) + 1, 2), np.nan)
+        for i, worker_type in enumerate(worker_types):
+            for job_type_str, colocated in \
+                raw_throughputs[worker_type].items():
+                j = job_type_indices[job_type_str]
+                for other_job_type_str, throughput in colocated.items():
+                    if other_job_type_str == 'null':
+                        throughputs[i, j, null_idx, 0] = throughput
+                    else:
+                        k = job_type_indices.get(other_job_type_str)
+                        if k is None:
+                            # Only co-located with a job type that was not
+                            # measured in isolation on any worker type.
+                            continue
+                        throughputs[i, j, k] = throughput
+        return cls(worker_types, job_types, throughputs)
+
+    @classmethod
+    def load(cls, throughputs_file):
+        """Loads the oracle for a throughputs JSON file.
+
+        The compiled tensor is cached next to the JSON file and memory-mapped
+        read-only on subsequent loads, so that processes sharing the oracle
+        (e.g., the workers of a sweep) also share its pages. The cache is
+        recompiled whenever the JSON file changes.
+        """
+        tensor_file = throughputs_file + CACHE_TENSOR_SUFFIX
+        metadata_file = throughputs_file + CACHE_METADATA_SUFFIX
+        source = os.stat(throughputs_file)
+        try:
+            with open(metadata_file, 'r') as f:
+                metadata = json.load(f)
+            if (metadata['source_size'] == source.st_size and
+                metadata['source_mtime_ns'] == source.st_mtime_ns):
+                throughputs = np.load(tensor_file, mmap_mode='r')
+                return cls(metadata['worker_types'], metadata['job_types'],
+                           throughputs)
+        except (OSError, ValueError, KeyError):
+            pass
+        oracle = cls.compile(throughputs_file)
+        metadata = {
+            'source_size': source.st_size,
+            'source_mtime_ns': source.st_mtime_ns,
+            'worker_types': oracle._worker_types,
+            'job_types': oracle._job_types,
+        }
+        # Write to temporary files first so that concurrent loads never
+        # see a partially written cache.
+        pid = os.getpid()
+        try:
+            with open('%s.%d' % (tensor_file, pid), 'wb') as f:
+                np.save(f, oracle._throughputs)
+            os.replace('%s.%d' % (tensor_file, pid), tensor_file)
+            with open('%s.%d' % (metadata_file, pid), 'w') as f:
+                json.dump(metadata, f)
+            os.replace('%s.%d' % (metadata_file, pid), metadata_file)
+        except OSError:
+            # The cache is optional (e.g., for read-only checkouts).
+            pass
+        return oracle
+
+    @property
+    def worker_types(self):
+        return self._worker_types
+
+    @property
+    def job_types(self):
+        return self._job_types
+
+    def get_isolated_throughput(self, worker_type, job_type):
+        """Returns the throughput of job_type running alone on worker_type.
+
+        Args:
+          worker_type: The worker type.
+          job_type: A (model, scale_factor) tuple.
+        """
+        row = self._get_row(self._worker_type_indices[worker_type],
+                            self._job_type_indices[job_type])
+        throughput = row[self._null_idx][0]
+        if math.isnan(throughput):
+            raise KeyError(job_type)
+        return throughput
+
+    def get_colocated_throughputs(self, worker_type, job_type,
+                                  other_job_type):
+        """Returns a list with the throughputs of job_type and other_job_type
+        when co-located on worker_type.
+
+        Args:
+          worker_type: The worker type.
+          job_type: A (model, scale_factor) tuple.
+          other_job_type: A (model, scale_factor) tuple.
+        """
+        row = self._get_row(self._worker_type_indices[worker_type],
+                            self._job_type_indices[job_type])
+        throughputs = row[self._job_type_indices[other_job_type]]
+        if math.isnan(throughputs[0]):
+            raise KeyError((job_type, other_job_type))
+        return list(throughputs)
+
+    def __getitem__(self, worker_type):
+        return _WorkerTypeView(self, self._worker_type_indices[worker_type])
+
+    def __iter__(self):
+        return iter(self._worker_types)
+
+    def __len__(self):
+        return len(self._worker_types)
@@ -1,6 +1,7 @@
 import csv
 from datetime import datetime
 import json
+import numpy as np
 import os
 import pickle
 import psutil
@@ -278,110 +279,6 @@ def read_per_instance_type_spot_prices_json(directory):
     }
     return per_instance_type_spot_prices
 
-def get_latest_price_for_worker_type_aws(worker_type, current_time,
-                                         per_instance_type_spot_prices):
-    # TODO: Make this function more efficient.
-    if worker_type == 'v100':
-        instance_type = 'p3.2xlarge'
-    elif worker_type == 'p100':
-        # NOTE: AWS does not have single P100 instances, use 1.5x K80 price
-        # as a proxy.
-        instance_type = 'p2.xlarge'
-    elif worker_type == 'k80':
-        instance_type = 'p2.xlarge'
-
-    timestamps = [datetime.strptime(x['Timestamp'], '%Y-%m-%dT%H:%M:%S.000Z')
-                  for x in per_instance_type_spot_prices[instance_type]]
-    timestamps.sort()
-
-    availability_zones = \
-        [x['AvailabilityZone']
-         for x in per_instance_type_spot_prices[instance_type]]
-    latest_prices = []
-    for availability_zone in set(availability_zones):
-        per_instance_type_spot_prices[instance_type].sort(
-            key=lambda x: datetime.strptime(x['Timestamp'],
-                                            '%Y-%m-%dT%H:%M:%S.000Z'))
-        latest_price = None
-        for x in per_instance_type_spot_prices[instance_type]:
-            if x['AvailabilityZone'] != availability_zone:
-                continue
-            timestamp = (datetime.strptime(x['Timestamp'],
-                                          '%Y-%m-%dT%H:%M:%S.000Z') -
-                         timestamps[0]).total_seconds()
-            if timestamp > current_time and latest_price is not None:
-                break
-            latest_price = float(x['SpotPrice'])
-        assert(latest_price is not None)
-        latest_prices.append(latest_price)
-
-    # NOTE: AWS does not have single P100 instances, use 1.5x K80 price
-    # as a proxy.
-    if worker_type == 'p100':
-        return min(latest_prices) * 1.5
-    else:
-        return min(latest_prices)
-
-def get_latest_price_for_worker_type_gcp(worker_type, current_time,
-                                         per_instance_type_spot_prices):
-    return per_instance_type_spot_prices[worker_type]
-
-def get_latest_price_for_worker_type_azure(worker_type, current_time,
-                                           per_instance_type_spot_prices):
-    if worker_type == 'k80':
-        instance_type = 'NC6'
-    elif worker_type == 'p100':
-        instance_type = 'NC6s v2'
-    elif worker_type == 'v100':
-        instance_type = 'NC6s v3'
-
-    earliest_timestamps = []
-    for zone in per_instance_type_spot_prices[instance_type]:
-        per_instance_type_spot_prices[instance_type][zone].sort(
-            key=lambda x: x[0])
-        earliest_timestamps.append(
-            per_instance_type_spot_prices[instance_type][zone][0][0])
-    earliest_timestamp = min(earliest_timestamps)
-    latest_prices = []
-    for zone in per_instance_type_spot_prices[instance_type]:
-        latest_price = None
-        for x in per_instance_type_spot_prices[instance_type][zone]:
-            timestamp = (x[0] - earliest_timestamp).total_seconds()
-            if timestamp > current_time and latest_price is not None:
-                break
-            elif x[1] == '':
-                continue
-            else:
-                # Remove '$' character.
-                latest_price = float(x[1][1:])
-    return latest_price
-
-def get_latest_price_for_worker_type(worker_type, current_time,
-                                     per_instance_type_spot_prices,
-                                     available_clouds):
-    assert(len(available_clouds) > 0)
-    prices = []
-    if 'aws' in available_clouds:
-        aws_price = \
-            get_latest_price_for_worker_type_aws(
-                    worker_type, current_time,
-                    per_instance_type_spot_prices['aws'])
-        prices.append(aws_price)
-    if 'gcp' in available_clouds:
-        gcp_price = \
-            get_latest_price_for_worker_type_gcp(
-                    worker_type, current_time,
-                    per_instance_type_spot_prices['gcp'])
-        prices.append(gcp_price)
-    if 'azure' in available_clouds:
-        azure_price = \
-            get_latest_price_for_worker_type_azure(
-                    worker_type, current_time,
-                    per_instance_type_spot_prices['azure'])
-        prices.append(azure_price)
-
-    return min(prices)
-
 def parse_job_type_str(job_type):
     if job_type is None:
         return None
@@ -514,27 +411,121 @@ def get_policy(policy_name, solver=None, seed=None,
         raise ValueError('Unknown policy!')
     return policy
 
+# Suffix of traces stored in the binary columnar format.
+BINARY_TRACE_SUFFIX = '.npz'
+# Columns of the binary trace format stored as indices into a table of
+# their distinct values.
+_TRACE_STRING_COLUMNS = ['job_type', 'command', 'working_directory',
+                         'num_steps_arg']
+
+def _parse_trace_line(line):
+    (job_type, command, working_directory, num_steps_arg,
+     needs_data_dir, total_steps, scale_factor, priority_weight, SLO,
+     arrival_time) = line.split('\t')
+    assert(int(scale_factor) >= 1)
+    job = Job(job_id=None,
+              job_type=job_type,
+              command=command,
+              working_directory=working_directory,
+              needs_data_dir=bool(int(needs_data_dir)),
+              num_steps_arg=num_steps_arg,
+              total_steps=int(total_steps),
+              duration=None,
+              scale_factor=int(scale_factor),
+              priority_weight=float(priority_weight),
+              SLO=float(SLO))
+    return job, float(arrival_time)
+
+def _read_binary_trace(trace_file):
+    with np.load(trace_file) as trace:
+        columns = {column: trace[column] for column in trace.files}
+    string_values = {
+        column: columns['%s_values' % (column)].tolist()
+        for column in _TRACE_STRING_COLUMNS
+    }
+    for i in range(len(columns['arrival_time'])):
+        strings = {
+            column: string_values[column][columns[column][i]]
+            for column in _TRACE_STRING_COLUMNS
+        }
+        assert(columns['scale_factor'][i] >= 1)
+        job = Job(job_id=None,
+                  job_type=strings['job_type'],
+                  command=strings['command'],
+                  working_directory=strings['working_directory'],
+                  needs_data_dir=bool(columns['needs_data_dir'][i]),
+                  num_steps_arg=strings['num_steps_arg'],
+                  total_steps=int(columns['total_steps'][i]),
+                  duration=None,
+                  scale_factor=int(columns['scale_factor'][i]),
+                  priority_weight=float(columns['priority_weight'][i]),
+                  SLO=float(columns['SLO'][i]))
+        yield job, float(columns['arrival_time'][i])
+
+def read_trace(trace_file):
+    """Yields (job, arrival_time) tuples from a trace in file order.
+
+    Jobs are created as the trace is read, so the whole trace is never held
+    in memory as Job objects. Traces ending in BINARY_TRACE_SUFFIX are read
+    from the binary columnar format written by write_binary_trace; all
+    other traces are read as one line per job in the format written by
+    Job.__str__, followed by a tab and the arrival time.
+    """
+    if trace_file.endswith(BINARY_TRACE_SUFFIX):
+        yield from _read_binary_trace(trace_file)
+        return
+    with open(trace_file, 'r') as f:
+        for line in f:
+            yield _parse_trace_line(line)
+
+def write_binary_trace(trace, trace_file):
+    """Writes (job, arrival_time) tuples to trace_file in a compact binary
+    columnar format.
+
+    The trace is stored as a NumPy archive with one array per column;
+    string columns are stored as indices into a table of their distinct
+    values.
+    """
+    assert(trace_file.endswith(BINARY_TRACE_SUFFIX))
+    string_codes = {column: {} for column in _TRACE_STRING_COLUMNS}
+    columns = {
+        column: [] for column in _TRACE_STRING_COLUMNS +
+            ['needs_data_dir', 'total_steps', 'scale_factor',
+             'priority_weight', 'SLO', 'arrival_time']
+    }
+    for job, arrival_time in trace:
+        for column in _TRACE_STRING_COLUMNS:
+            codes = string_codes[column]
+            columns[column].append(
+                codes.setdefault(getattr(job, column), len(codes)))
+        columns['needs_data_dir'].append(job.needs_data_dir)
+        columns['total_steps'].append(job.total_steps)
+        columns['scale_factor'].append(job.scale_factor)
+        columns['priority_weight'].append(job.priority_weight)
+        columns['SLO'].append(-1 if job.SLO is None else job.SLO)
+        columns['arrival_time'].append(arrival_time)
+    arrays = {
+        'needs_data_dir': np.array(columns['needs_data_dir'], dtype=bool),
+        'total_steps': np.array(columns['total_steps'], dtype=np.int64),
+        'scale_factor': np.array(columns['scale_factor'], dtype=np.int32),
+        'priority_weight': np.array(columns['priority_weight'],
+                                    dtype=np.float64),
+        'SLO': np.array(columns['SLO'], dtype=np.float64),
+        'arrival_time': np.array(columns['arrival_time'], dtype=np.float64),
+    }
+    for column in _TRACE_STRING_COLUMNS:
+        arrays[column] = np.array(columns[column], dtype=np.int32)
+        # Codes are assigned in insertion order.
+        arrays['%s_values' % (column)] = \
+            np.array(list(string_codes[column]), dtype=str)
+    np.savez_compressed(trace_file, **arrays)
+
 def parse_trace(trace_file):
     jobs = []
     arrival_times = []
-    with open(trace_file, 'r') as f:
-        for line in f:
-            (job_type, command, working_directory, num_steps_arg,
-             needs_data_dir, total_steps, scale_factor, priority_weight, SLO,
-             arrival_time) = line.split('\t')
-            assert(int(scale_factor) >= 1)
-            jobs.append(Job(job_id=None,
-                            job_type=job_type,
-                            command=command,
-                            working_directory=working_directory,
-                            needs_data_dir=bool(int(needs_data_dir)),
-                            num_steps_arg=num_steps_arg,
-                            total_steps=int(total_steps),
-                            duration=None,
-                            scale_factor=int(scale_factor),
-                            priority_weight=float(priority_weight),
-                            SLO=float(SLO)))
-            arrival_times.append(float(arrival_time))
+    for job, arrival_time in read_trace(trace_file):
+        jobs.append(job)
+        arrival_times.append(arrival_time)
     return jobs, arrival_times
 
 def print_allocation(allocation, current_time=None):
@@ -136,7 +136,8 @@ def save_checkpoint(state, checkpoint_path):
     torch.save(state, checkpoint_path)
 
 if opt.enable_gavel_iterator:
-    dataloader = GavelIterator(dataloader, opt.checkpoint_dir, load_checkpoint, save_checkpoint)
+    dataloader = GavelIterator(dataloader, opt.checkpoint_dir, load_checkpoint, save_checkpoint,
+                               asynchronous_checkpointing=True)
 
 checkpoint_path = os.path.join(opt.checkpoint_dir, "model.chkpt")
 checkpoint = None
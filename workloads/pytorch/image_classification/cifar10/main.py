@@ -147,7 +147,8 @@ if args.checkpoint_dir is not None:
 if args.enable_gavel_iterator:
     trainloader = GavelIterator(trainloader, args.checkpoint_dir,
                                 load_checkpoint_func=load_checkpoint,
-                                save_checkpoint_func=save_checkpoint)
+                                save_checkpoint_func=save_checkpoint,
+                                asynchronous_checkpointing=True)
     checkpoint = trainloader.load_checkpoint(args, checkpoint_path)
 else:
     checkpoint = load_checkpoint(args, checkpoint_path)
@@ -218,7 +218,8 @@ test_loader = torch.utils.data.DataLoader(test_dataset,
 
 if args.enable_gavel_iterator:
     train_loader = GavelIterator(train_loader, args.checkpoint_dir,
-                                 load_checkpoint, save_checkpoint)
+                                 load_checkpoint, save_checkpoint,
+                                 asynchronous_checkpointing=True)
 
 state = None
 if args.checkpoint_dir is not None:
@@ -385,6 +386,10 @@ try:
         else:
             state = {'model': model}
         if args.enable_gavel_iterator:
+            # Asynchronous checkpoints only copy the tensors in dicts, lists,
+            # and tuples, so the model is moved to the CPU to be written by
+            # another process.
+            state['model'] = state['model'].cpu()
             train_loader.save_checkpoint(state, checkpoint_path)
         else:
             save_checkpoint(state, f)
@@ -186,7 +186,8 @@ if __name__ == '__main__':
         if args.enable_gavel_iterator and rank == 0:
             iters[rank] = GavelIterator(iters[rank], args.checkpoint_dir,
                                         load_checkpoint, save_checkpoint,
-                                        write_on_close=False)
+                                        write_on_close=False,
+                                        asynchronous_checkpointing=True)
 
     if not os.path.isdir(args.checkpoint_dir):
         os.mkdir(args.checkpoint_dir)
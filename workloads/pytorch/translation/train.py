@@ -400,7 +400,8 @@ def main():
 
     if opt.enable_gavel_iterator:
         training_data = GavelIterator(training_data, opt.checkpoint_dir,
-                                      load_checkpoint, save_checkpoint)
+                                      load_checkpoint, save_checkpoint,
+                                      asynchronous_checkpointing=True)
 
     optimizer = ScheduledOptim(
         optim.Adam(